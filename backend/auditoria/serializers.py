@@ -21,22 +21,21 @@ class LogAuditoriaSerializer(serializers.ModelSerializer):
             'usuario_detail',
             'acao',
             'acao_display',
-            'modelo',
+            'tabela',
             'modelo_display',
-            'objeto_id',
-            'objeto_repr',
+            'registro_id',
             'dados_anteriores',
             'dados_novos',
             'ip_address',
             'user_agent',
-            'timestamp',
+            'data_hora',
         ]
-        read_only_fields = '__all__'  # Todos os campos são read-only
+        read_only_fields = fields  # Todos os campos são read-only
     
     def get_modelo_display(self, obj):
         """Retornar nome amigável do modelo"""
-        if obj.modelo:
-            return obj.modelo.split('.')[-1].capitalize()
+        if obj.tabela:
+            return obj.tabela.split('.')[-1].capitalize()
         return None
 
 
@@ -54,15 +53,15 @@ class LogAuditoriaListSerializer(serializers.ModelSerializer):
             'usuario_nome',
             'acao',
             'acao_display',
-            'modelo',
+            'tabela',
             'modelo_display',
-            'objeto_repr',
-            'timestamp',
+            'registro_id',
+            'data_hora',
         ]
-        read_only_fields = '__all__'
+        read_only_fields = fields
     
     def get_modelo_display(self, obj):
         """Retornar nome amigável do modelo"""
-        if obj.modelo:
-            return obj.modelo.split('.')[-1].capitalize()
+        if obj.tabela:
+            return obj.tabela.split('.')[-1].capitalize()
         return None
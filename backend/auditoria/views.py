@@ -1,11 +1,12 @@
 from rest_framework import viewsets, filters
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
+from config.condicional import GetCondicionalMixin
 from .models import LogAuditoria
 from .serializers import LogAuditoriaSerializer, LogAuditoriaListSerializer
 
 
-class LogAuditoriaViewSet(viewsets.ReadOnlyModelViewSet):
+class LogAuditoriaViewSet(GetCondicionalMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet read-only para consulta de Logs de Auditoria.
     Apenas administradores podem visualizar logs.
@@ -14,10 +15,12 @@ class LogAuditoriaViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated, IsAdminUser]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     
-    filterset_fields = ['acao', 'modelo', 'usuario']
-    search_fields = ['objeto_repr', 'modelo']
-    ordering_fields = ['timestamp']
-    ordering = ['-timestamp']
+    filterset_fields = ['acao', 'tabela', 'usuario']
+    search_fields = ['tabela']
+    ordering_fields = ['data_hora']
+    ordering = ['-data_hora']
+    campo_atualizacao = 'data_hora'  # logs só recebem inclusões
+    paginacao_cursor = True  # ?paginacao=cursor usa o índice (-data_hora)
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cliente
+from .models import Cliente, DuplicidadeCliente
 
 
 @admin.register(Cliente)
@@ -26,3 +26,11 @@ class ClienteAdmin(admin.ModelAdmin):
             'fields': ('data_cadastro', 'data_atualizacao')
         }),
     )
+
+
+@admin.register(DuplicidadeCliente)
+class DuplicidadeClienteAdmin(admin.ModelAdmin):
+    list_display = ('cliente', 'duplicado', 'pontuacao', 'status', 'data_deteccao')
+    list_filter = ('status',)
+    raw_id_fields = ('cliente', 'duplicado')
+    readonly_fields = ('pontuacao', 'motivos', 'data_deteccao')
@@ -0,0 +1,39 @@
+"""Comando Django para encontrar clientes provavelmente duplicados."""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from clientes.services import LIMIAR_DUPLICIDADE, detectar_duplicados
+
+
+class Command(BaseCommand):
+    help = (
+        'Agrupa os clientes em blocos (documento, e-mail, telefone e nome fonético), '
+        'pontua os pares de cada bloco e grava os prováveis duplicados para revisão'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limiar',
+            type=float,
+            default=LIMIAR_DUPLICIDADE,
+            help=f'Pontuação mínima de 0 a 1 (padrão: {LIMIAR_DUPLICIDADE})'
+        )
+
+    def handle(self, *args, **options):
+        if not 0 < options['limiar'] <= 1:
+            raise CommandError('--limiar deve estar entre 0 e 1')
+
+        inicio = time.perf_counter()
+        totais = detectar_duplicados(options['limiar'])
+        duracao = time.perf_counter() - inicio
+
+        self.stdout.write(
+            f"{totais['clientes']} cliente(s), {totais['comparacoes']} par(es) comparado(s) em {duracao:.2f}s"
+        )
+        if totais['blocos_ignorados']:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {totais['blocos_ignorados']} bloco(s) grande(s) demais ignorado(s)"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {totais['duplicidades']} possível(is) duplicidade(s): {totais['novas']} nova(s), "
+            f"{totais['removidas']} pendente(s) removida(s)"
+        ))
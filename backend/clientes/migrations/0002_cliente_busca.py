@@ -0,0 +1,29 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:05
+
+from django.db import migrations
+
+from config.busca import IndiceBusca
+
+INDICE = IndiceBusca(
+    'clientes_cliente', ['nome_completo', 'cpf_cnpj', 'email', 'telefone'], pesos=[5, 10, 3, 3],
+    coluna_trigrama='nome_completo'
+)
+
+
+def criar_indice(apps, schema_editor):
+    INDICE.criar(schema_editor)
+
+
+def remover_indice(apps, schema_editor):
+    INDICE.remover(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from clientes.normalizacao import chave_fonetica, normalizar_documento
+
+
+def preencher_chaves(apps, schema_editor):
+    Cliente = apps.get_model('clientes', 'Cliente')
+    lote = []
+    for cliente in Cliente.objects.only('cpf_cnpj', 'nome_completo').iterator(chunk_size=2000):
+        cliente.documento = normalizar_documento(cliente.cpf_cnpj)
+        cliente.nome_fonetico = chave_fonetica(cliente.nome_completo)
+        lote.append(cliente)
+        if len(lote) == 2000:
+            Cliente.objects.bulk_update(lote, ['documento', 'nome_fonetico'])
+            lote = []
+    Cliente.objects.bulk_update(lote, ['documento', 'nome_fonetico'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0002_cliente_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicidadeCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pontuacao', models.FloatField(verbose_name='Pontuação')),
+                ('motivos', models.JSONField(default=list, verbose_name='Motivos')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('confirmada', 'Confirmada'), ('descartada', 'Descartada')], default='pendente', max_length=15, verbose_name='Status')),
+                ('data_deteccao', models.DateTimeField(auto_now_add=True, verbose_name='Data de Detecção')),
+                ('data_revisao', models.DateTimeField(blank=True, null=True, verbose_name='Data de Revisão')),
+            ],
+            options={
+                'verbose_name': 'Duplicidade de Cliente',
+                'verbose_name_plural': 'Duplicidades de Clientes',
+                'ordering': ['-pontuacao', 'cliente_id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='documento',
+            field=models.CharField(blank=True, editable=False, max_length=14, null=True, verbose_name='Documento (só dígitos)'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='nome_fonetico',
+            field=models.CharField(blank=True, editable=False, max_length=200, null=True, verbose_name='Nome Fonético'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['documento'], name='cliente_documento_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['nome_fonetico'], name='cliente_nome_fonetico_idx'),
+        ),
+        migrations.AddField(
+            model_name='duplicidadecliente',
+            name='cliente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicidades', to='clientes.cliente', verbose_name='Cliente'),
+        ),
+        migrations.AddField(
+            model_name='duplicidadecliente',
+            name='duplicado',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clientes.cliente', verbose_name='Possível Duplicado'),
+        ),
+        migrations.AddIndex(
+            model_name='duplicidadecliente',
+            index=models.Index(fields=['status', '-pontuacao'], name='duplicidade_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='duplicidadecliente',
+            constraint=models.UniqueConstraint(fields=('cliente', 'duplicado'), name='duplicidade_cliente_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='duplicidadecliente',
+            constraint=models.CheckConstraint(check=models.Q(('cliente__lt', models.F('duplicado'))), name='duplicidade_cliente_ordem'),
+        ),
+        migrations.RunPython(preencher_chaves, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.core.validators import RegexValidator
+from config.cache_versionado import PREFIXO, incrementar_versoes_por_chave
+from .normalizacao import chave_fonetica, normalizar_documento
 
 
 class Cliente(models.Model):
@@ -57,6 +59,10 @@ class Cliente(models.Model):
     data_cadastro = models.DateTimeField('Data de Cadastro', auto_now_add=True)
     data_atualizacao = models.DateTimeField('Data de Atualização', auto_now=True)
     
+    # Chaves de deduplicação, derivadas de cpf_cnpj e nome_completo no save()
+    documento = models.CharField('Documento (só dígitos)', max_length=14, null=True, blank=True, editable=False)
+    nome_fonetico = models.CharField('Nome Fonético', max_length=200, null=True, blank=True, editable=False)
+    
     class Meta:
         verbose_name = 'Cliente'
         verbose_name_plural = 'Clientes'
@@ -65,11 +71,37 @@ class Cliente(models.Model):
             models.Index(fields=['cpf_cnpj']),
             models.Index(fields=['status']),
             models.Index(fields=['data_cadastro']),
+            models.Index(fields=['documento'], name='cliente_documento_idx'),
+            models.Index(fields=['nome_fonetico'], name='cliente_nome_fonetico_idx'),
         ]
     
     def __str__(self):
         return f"{self.nome_completo} - {self.cpf_cnpj}"
     
+    def normalizar(self):
+        """Atualiza as chaves de deduplicação (documento e nome fonético)"""
+        self.documento = normalizar_documento(self.cpf_cnpj)
+        self.nome_fonetico = chave_fonetica(self.nome_completo)
+    
+    def save(self, *args, **kwargs):
+        self.normalizar()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'documento', 'nome_fonetico'}
+        super().save(*args, **kwargs)
+    
+    @staticmethod
+    def chave_versao_resumo(cliente_id):
+        """Versão do resumo 360 do cliente em cache (clientes.services.resumo_cliente)"""
+        return f'{PREFIXO}:resumo-cliente:{cliente_id}:v'
+    
+    @classmethod
+    def invalidar_resumo(cls, *cliente_ids):
+        """Nova versão do resumo dos clientes cujos pedidos ou contas a receber mudaram (após o commit)"""
+        incrementar_versoes_por_chave(
+            cls.chave_versao_resumo(cliente_id) for cliente_id in set(cliente_ids) if cliente_id is not None
+        )
+    
     @property
     def nome_razao_social(self):
         """Alias para nome_completo (compatibilidade admin)"""
@@ -84,3 +116,51 @@ class Cliente(models.Model):
     def is_ativo(self):
         """Retorna True se o cliente está ativo"""
         return self.status == 'ativo'
+
+
+class DuplicidadeCliente(models.Model):
+    """
+    Par de cadastros provavelmente da mesma pessoa, encontrado pelo comando
+    detectar_clientes_duplicados (cliente_id < duplicado_id). A revisão
+    (confirmada/descartada) é preservada nas execuções seguintes.
+    """
+    
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('confirmada', 'Confirmada'),
+        ('descartada', 'Descartada'),
+    ]
+    
+    cliente = models.ForeignKey(
+        Cliente,
+        on_delete=models.CASCADE,
+        related_name='duplicidades',
+        verbose_name='Cliente'
+    )
+    duplicado = models.ForeignKey(
+        Cliente,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Possível Duplicado'
+    )
+    pontuacao = models.FloatField('Pontuação')
+    # Critérios que coincidiram: documento, nome_fonetico, nome, email, telefone
+    motivos = models.JSONField('Motivos', default=list)
+    status = models.CharField('Status', max_length=15, choices=STATUS_CHOICES, default='pendente')
+    data_deteccao = models.DateTimeField('Data de Detecção', auto_now_add=True)
+    data_revisao = models.DateTimeField('Data de Revisão', null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Duplicidade de Cliente'
+        verbose_name_plural = 'Duplicidades de Clientes'
+        ordering = ['-pontuacao', 'cliente_id']
+        constraints = [
+            models.UniqueConstraint(fields=['cliente', 'duplicado'], name='duplicidade_cliente_unica'),
+            models.CheckConstraint(check=models.Q(cliente__lt=models.F('duplicado')), name='duplicidade_cliente_ordem'),
+        ]
+        indexes = [
+            models.Index(fields=['status', '-pontuacao'], name='duplicidade_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.cliente_id} x {self.duplicado_id} ({self.pontuacao:.2f})"
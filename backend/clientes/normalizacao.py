@@ -0,0 +1,92 @@
+"""
+Normalização de documento e nome dos clientes, para encontrar o mesmo
+cadastro escrito de formas diferentes.
+
+- normalizar_documento: CPF/CNPJ só com dígitos;
+- chave_fonetica: nome reduzido à pronúncia aproximada em português
+  (sem acentos, partículas, letras mudas e grafias equivalentes), de modo
+  que "Luiz Gonçalves de Souza" e "Luis Goncalves Sousa" tenham a mesma chave;
+- similaridade: semelhança por trigramas entre dois nomes (0 a 1), no
+  mesmo critério do pg_trgm, para nomes com erros de digitação.
+"""
+import re
+import unicodedata
+
+PARTICULAS = {'da', 'das', 'de', 'di', 'do', 'dos', 'du', 'e'}
+
+# Substituições em ordem, sobre cada palavra em maiúsculas e sem acentos
+REGRAS_FONETICAS = [
+    (re.compile(padrao), troca) for padrao, troca in (
+        (r'PH', 'F'),
+        (r'TH', 'T'),
+        (r'LH', 'L'),
+        (r'NH', 'N'),
+        (r'[CS]H', 'X'),
+        (r'SC(?=[EI])', 'S'),
+        (r'C(?=[EI])', 'S'),
+        (r'QU?', 'K'),
+        (r'C', 'K'),
+        (r'G(?=[EI])', 'J'),
+        (r'GU(?=[EI])', 'G'),
+        (r'Y', 'I'),
+        (r'W', 'V'),
+        (r'Z', 'S'),
+        (r'N(?=[BP])', 'M'),
+        (r'H', ''),
+        (r'(.)\1+', r'\1'),
+    )
+]
+
+
+def sem_acentos(texto):
+    return ''.join(
+        caractere for caractere in unicodedata.normalize('NFKD', texto)
+        if not unicodedata.combining(caractere)
+    )
+
+
+def normalizar_documento(valor):
+    """Dígitos do CPF/CNPJ (None se não houver nenhum)"""
+    return re.sub(r'\D', '', valor or '') or None
+
+
+def palavras_nome(nome):
+    """Palavras do nome em minúsculas, sem acentos nem partículas (da, de, dos...)"""
+    return [
+        palavra for palavra in re.findall(r'[a-z0-9]+', sem_acentos(nome or '').lower())
+        if palavra not in PARTICULAS
+    ]
+
+
+def chave_fonetica(nome):
+    """Chave fonética do nome: uma chave por palavra, separadas por espaço"""
+    chaves = []
+    for palavra in palavras_nome(nome):
+        chave = palavra.upper()
+        for padrao, troca in REGRAS_FONETICAS:
+            chave = padrao.sub(troca, chave)
+        if chave:
+            chaves.append(chave)
+    return ' '.join(chaves) or None
+
+
+def trigramas(nome):
+    """Trigramas das palavras do nome, com as bordas marcadas como no pg_trgm"""
+    return {
+        f'  {palavra} '[i:i + 3]
+        for palavra in palavras_nome(nome)
+        for i in range(len(palavra) + 1)
+    }
+
+
+def similaridade(nome_a, nome_b):
+    """Trigramas em comum sobre o total de trigramas dos dois nomes (0 a 1)"""
+    return similaridade_trigramas(trigramas(nome_a), trigramas(nome_b))
+
+
+def similaridade_trigramas(a, b):
+    """similaridade() a partir dos trigramas já calculados"""
+    if not a or not b:
+        return 0.0
+    comuns = len(a & b)
+    return comuns / (len(a) + len(b) - comuns)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Cliente
+from .models import Cliente, DuplicidadeCliente
 
 
 class ClienteSerializer(serializers.ModelSerializer):
@@ -19,8 +19,6 @@ class ClienteSerializer(serializers.ModelSerializer):
             'cpf_cnpj',
             'email',
             'telefone',
-            'celular',
-            'website',
             'tipo',
             'status',
             'endereco',
@@ -30,8 +28,6 @@ class ClienteSerializer(serializers.ModelSerializer):
             'cidade',
             'estado',
             'cep',
-            'inscricao_estadual',
-            'limite_credito',
             'observacoes',
             'data_cadastro',
             'data_atualizacao',
@@ -96,3 +92,38 @@ class ClienteListSerializer(serializers.ModelSerializer):
             'estado',
             'data_cadastro',
         ]
+
+
+class SugestaoDuplicadosSerializer(serializers.Serializer):
+    """Dados de um cadastro em digitação, para procurar clientes parecidos"""
+    
+    nome_completo = serializers.CharField(required=False, allow_blank=True, max_length=200)
+    cpf_cnpj = serializers.CharField(required=False, allow_blank=True, max_length=18)
+    email = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    telefone = serializers.CharField(required=False, allow_blank=True, max_length=20)
+    
+    def validate(self, data):
+        if not data.get('nome_completo') and not data.get('cpf_cnpj'):
+            raise serializers.ValidationError('Informe o nome ou o CPF/CNPJ')
+        return data
+
+
+class DuplicidadeClienteSerializer(serializers.ModelSerializer):
+    """Par de possíveis duplicados; só o status é alterado (revisão)"""
+    
+    cliente = ClienteListSerializer(read_only=True)
+    duplicado = ClienteListSerializer(read_only=True)
+    
+    class Meta:
+        model = DuplicidadeCliente
+        fields = [
+            'id',
+            'cliente',
+            'duplicado',
+            'pontuacao',
+            'motivos',
+            'status',
+            'data_deteccao',
+            'data_revisao',
+        ]
+        read_only_fields = ['id', 'pontuacao', 'motivos', 'data_deteccao', 'data_revisao']
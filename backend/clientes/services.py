@@ -0,0 +1,325 @@
+"""
+Deduplicação e resumo (visão 360) de clientes.
+
+Os candidatos a duplicado não saem da comparação de todos com todos:
+cada cliente entra em blocos pelas chaves que compartilha com outros
+(documento só com dígitos, e-mail, telefone, nome fonético e primeiro +
+último nome fonético) e só os pares dentro de um mesmo bloco são
+pontuados. Blocos grandes demais (um telefone de central, por exemplo)
+são ignorados.
+"""
+import itertools
+import re
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from config.busca import IndiceBusca
+from config.cache_versionado import PREFIXO, versoes_por_chave
+from estoque.services import gravar_em_lote
+from financeiro.models import ContaReceber
+from vendas.models import Pedido
+from .models import Cliente, DuplicidadeCliente
+from .normalizacao import chave_fonetica, normalizar_documento, palavras_nome, similaridade_trigramas, trigramas
+
+INDICE_BUSCA = IndiceBusca(
+    Cliente._meta.db_table, ['nome_completo', 'cpf_cnpj', 'email', 'telefone'], pesos=[5, 10, 3, 3],
+    coluna_trigrama='nome_completo'
+)
+
+# Pontuação mínima (0 a 1) para um par ser considerado duplicidade
+LIMIAR_DUPLICIDADE = 0.75
+
+# Nomes com a mesma chave fonética valem pelo menos esta semelhança
+PONTUACAO_FONETICA = 0.9
+
+# Acréscimos quando o contato coincide
+PONTUACAO_EMAIL = 0.2
+PONTUACAO_TELEFONE = 0.1
+
+# Blocos com mais clientes que isso não são comparados
+LIMITE_BLOCO = 100
+
+# Candidatos lidos do banco e sugestões devolvidas por consulta
+LIMITE_CANDIDATOS = 200
+LIMITE_SUGESTOES = 10
+
+CAMPOS = ('id', 'nome_completo', 'cpf_cnpj', 'documento', 'nome_fonetico', 'email', 'telefone')
+
+
+def _email(valor):
+    return (valor or '').strip().lower() or None
+
+
+def _telefone(valor):
+    digitos = re.sub(r'\D', '', valor or '')
+    return digitos if len(digitos) >= 8 else None
+
+
+def chaves_bloco(cliente):
+    """Chaves de bloqueio de um cliente (dict com os CAMPOS)"""
+    chaves = []
+    if cliente['documento']:
+        chaves.append(('documento', cliente['documento']))
+    if _email(cliente['email']):
+        chaves.append(('email', _email(cliente['email'])))
+    if _telefone(cliente['telefone']):
+        chaves.append(('telefone', _telefone(cliente['telefone'])))
+    if cliente['nome_fonetico']:
+        chaves.append(('nome', cliente['nome_fonetico']))
+        partes = cliente['nome_fonetico'].split()
+        if len(partes) > 1:
+            # Nomes do meio omitidos ou abreviados
+            chaves.append(('nome_extremos', f'{partes[0]} {partes[-1]}'))
+    return chaves
+
+
+def _trigramas(cliente):
+    """Trigramas do nome, calculados uma vez por cliente (guardados no dict)"""
+    if '_trigramas' not in cliente:
+        cliente['_trigramas'] = trigramas(cliente['nome_completo'])
+    return cliente['_trigramas']
+
+
+def pontuar(a, b):
+    """(pontuação de 0 a 1, motivos) de dois clientes (dicts com os CAMPOS)"""
+    if a['documento'] and a['documento'] == b['documento']:
+        return 1.0, ['documento']
+    motivos = []
+    pontuacao = similaridade_trigramas(_trigramas(a), _trigramas(b))
+    if a['nome_fonetico'] and a['nome_fonetico'] == b['nome_fonetico']:
+        pontuacao = max(pontuacao, PONTUACAO_FONETICA)
+        motivos.append('nome_fonetico')
+    elif pontuacao >= 0.5:
+        motivos.append('nome')
+    if _email(a['email']) and _email(a['email']) == _email(b['email']):
+        pontuacao += PONTUACAO_EMAIL
+        motivos.append('email')
+    if _telefone(a['telefone']) and _telefone(a['telefone']) == _telefone(b['telefone']):
+        pontuacao += PONTUACAO_TELEFONE
+        motivos.append('telefone')
+    return round(min(pontuacao, 1.0), 3), motivos
+
+
+def sugerir_duplicados(dados, excluir=None, limiar=LIMIAR_DUPLICIDADE, limite=LIMITE_SUGESTOES):
+    """
+    Clientes já cadastrados parecidos com `dados` (nome_completo, cpf_cnpj,
+    email, telefone), do mais para o menos provável. Os candidatos vêm dos
+    índices: documento, nome fonético e busca textual pelo primeiro e
+    último nome (no PostgreSQL, também por trigramas do nome).
+    """
+    alvo = {
+        'id': None,
+        'nome_completo': dados.get('nome_completo') or '',
+        'documento': normalizar_documento(dados.get('cpf_cnpj')),
+        'nome_fonetico': chave_fonetica(dados.get('nome_completo')),
+        'email': dados.get('email'),
+        'telefone': dados.get('telefone'),
+    }
+    clientes = Cliente.objects.exclude(pk=excluir) if excluir else Cliente.objects.all()
+
+    filtro = Q()
+    if alvo['documento']:
+        filtro |= Q(documento=alvo['documento'])
+    if alvo['nome_fonetico']:
+        filtro |= Q(nome_fonetico=alvo['nome_fonetico'])
+    consultas = [clientes.filter(filtro)] if filtro else []
+    palavras = palavras_nome(alvo['nome_completo'])
+    if palavras and INDICE_BUSCA.disponivel(clientes.db):
+        termos = [palavras[0], palavras[-1]] if len(palavras) > 1 else palavras
+        consultas.append(INDICE_BUSCA.buscar(clientes, termos).order_by('-relevancia_busca'))
+
+    candidatos = {}
+    for consulta in consultas:
+        for cliente in consulta.values(*CAMPOS)[:LIMITE_CANDIDATOS]:
+            candidatos[cliente['id']] = cliente
+
+    sugestoes = []
+    for cliente in candidatos.values():
+        pontuacao, motivos = pontuar(alvo, cliente)
+        if pontuacao >= limiar:
+            sugestoes.append({
+                'id': cliente['id'],
+                'nome_completo': cliente['nome_completo'],
+                'cpf_cnpj': cliente['cpf_cnpj'],
+                'email': cliente['email'],
+                'telefone': cliente['telefone'],
+                'pontuacao': pontuacao,
+                'motivos': motivos,
+            })
+    sugestoes.sort(key=lambda sugestao: (-sugestao['pontuacao'], sugestao['id']))
+    return sugestoes[:limite]
+
+
+def detectar_duplicados(limiar=LIMIAR_DUPLICIDADE):
+    """
+    Compara os clientes bloco a bloco e grava os pares com pontuação >=
+    `limiar` em DuplicidadeCliente. Pares pendentes que deixaram de
+    coincidir são removidos; os já revisados (confirmados/descartados) são
+    mantidos como estão. Retorna os totais da execução.
+    """
+    clientes = {}
+    blocos = defaultdict(list)
+    for cliente in Cliente.objects.order_by().values(*CAMPOS).iterator(chunk_size=5000):
+        clientes[cliente['id']] = cliente
+        for chave in chaves_bloco(cliente):
+            blocos[chave].append(cliente['id'])
+
+    pares, ignorados = set(), 0
+    for ids in blocos.values():
+        if len(ids) > LIMITE_BLOCO:
+            ignorados += 1
+        elif len(ids) > 1:
+            pares.update(itertools.combinations(sorted(ids), 2))
+
+    encontrados = {}
+    for par in pares:
+        pontuacao, motivos = pontuar(clientes[par[0]], clientes[par[1]])
+        if pontuacao >= limiar:
+            encontrados[par] = (pontuacao, motivos)
+
+    with transaction.atomic():
+        existentes = {
+            (cliente_id, duplicado_id): (pk, status)
+            for pk, cliente_id, duplicado_id, status in DuplicidadeCliente.objects.values_list(
+                'pk', 'cliente_id', 'duplicado_id', 'status'
+            ).iterator(chunk_size=5000)
+        }
+        novas = [
+            DuplicidadeCliente(cliente_id=a, duplicado_id=b, pontuacao=pontuacao, motivos=motivos)
+            for (a, b), (pontuacao, motivos) in encontrados.items()
+            if (a, b) not in existentes
+        ]
+        DuplicidadeCliente.objects.bulk_create(novas, batch_size=500)
+
+        obsoletas = [
+            pk for par, (pk, status) in existentes.items()
+            if status == 'pendente' and par not in encontrados
+        ]
+        for inicio in range(0, len(obsoletas), 500):
+            DuplicidadeCliente.objects.filter(pk__in=obsoletas[inicio:inicio + 500]).delete()
+
+        gravar_em_lote(DuplicidadeCliente, [
+            (existentes[par][0], list(encontrados[par]))
+            for par in encontrados.keys() & existentes.keys()
+            if existentes[par][1] == 'pendente'
+        ], ['pontuacao', 'motivos'])
+
+    return {
+        'clientes': len(clientes),
+        'comparacoes': len(pares),
+        'duplicidades': len(encontrados),
+        'novas': len(novas),
+        'removidas': len(obsoletas),
+        'blocos_ignorados': ignorados,
+    }
+
+
+# ----------------------------------------------------------------------
+# Resumo do cliente
+# ----------------------------------------------------------------------
+
+# Pedidos mais recentes exibidos no resumo, com estes campos
+ULTIMOS_PEDIDOS = 5
+CAMPOS_PEDIDO = ('id', 'numero_pedido', 'data_pedido', 'status', 'valor_total', 'quantidade_itens')
+
+VALOR = models.DecimalField(max_digits=14, decimal_places=2)
+
+
+def _soma(expressao, condicao):
+    return Coalesce(models.Sum(expressao, filter=condicao), Decimal('0.00'), output_field=VALOR)
+
+
+def _resumo_pedidos(cliente_id):
+    """
+    Totais e últimos pedidos em uma consulta: as agregações são funções de
+    janela sobre todos os pedidos do cliente, calculadas antes do LIMIT.
+    """
+    valido = Q(status__in=[status for status, _ in Pedido.STATUS_CHOICES if status != 'cancelado'])
+
+    linhas = list(
+        Pedido.objects.filter(cliente_id=cliente_id).annotate(
+            total_pedidos=models.Window(models.Count('pk', filter=valido)),
+            total_cancelados=models.Window(models.Count('pk', filter=~valido)),
+            valor_vitalicio=Coalesce(
+                models.Window(models.Sum('valor_total', filter=valido)), Decimal('0.00'), output_field=VALOR
+            ),
+            primeiro_pedido=models.Window(models.Min('data_pedido', filter=valido)),
+            ultimo_pedido=models.Window(models.Max('data_pedido', filter=valido)),
+        ).order_by('-data_pedido', '-pk').values(
+            *CAMPOS_PEDIDO, 'total_pedidos', 'total_cancelados', 'valor_vitalicio', 'primeiro_pedido', 'ultimo_pedido',
+        )[:ULTIMOS_PEDIDOS]
+    )
+    totais = linhas[0] if linhas else {
+        'total_pedidos': 0, 'total_cancelados': 0, 'valor_vitalicio': Decimal('0.00'),
+        'primeiro_pedido': None, 'ultimo_pedido': None,
+    }
+    quantidade = totais['total_pedidos']
+    primeiro, ultimo = totais['primeiro_pedido'], totais['ultimo_pedido']
+    return {
+        'total_pedidos': quantidade,
+        'pedidos_cancelados': totais['total_cancelados'],
+        'valor_vitalicio': totais['valor_vitalicio'],
+        'ticket_medio': (totais['valor_vitalicio'] / quantidade).quantize(Decimal('0.01')) if quantidade else None,
+        'primeiro_pedido': primeiro,
+        'ultimo_pedido': ultimo,
+        # Frequência: dias médios entre pedidos e dias desde o último
+        'intervalo_medio_dias': round((ultimo - primeiro).days / (quantidade - 1), 1) if quantidade > 1 else None,
+        'dias_desde_ultimo_pedido': (timezone.now() - ultimo).days if ultimo else None,
+        'ultimos_pedidos': [{campo: linha[campo] for campo in CAMPOS_PEDIDO} for linha in linhas],
+    }
+
+
+def _resumo_contas(cliente_id, hoje):
+    """Saldos a receber do cliente em uma agregação"""
+    aberta = Q(status__in=['aberto', 'atrasado'])
+    vencida = aberta & (Q(status='atrasado') | Q(data_vencimento__lt=hoje))
+    saldo = models.ExpressionWrapper(
+        models.F('valor') + models.F('juros') + models.F('multa') - models.F('desconto') - models.F('valor_recebido'),
+        output_field=VALOR
+    )
+    return ContaReceber.objects.filter(cliente_id=cliente_id).aggregate(
+        contas_em_aberto=models.Count('pk', filter=aberta),
+        valor_em_aberto=_soma(saldo, aberta),
+        contas_vencidas=models.Count('pk', filter=vencida),
+        valor_vencido=_soma(saldo, vencida),
+        proximo_vencimento=models.Min('data_vencimento', filter=aberta & Q(data_vencimento__gte=hoje)),
+        total_recebido=_soma('valor_recebido', Q(status='recebido')),
+    )
+
+
+def resumo_cliente(cliente_id):
+    """
+    Visão 360 do cliente: valor vitalício, frequência e últimos pedidos,
+    saldos em aberto e vencidos. Retorna (dados, veio_do_cache).
+
+    Fica em cache com chave pela versão do resumo do próprio cliente
+    (Cliente.chave_versao_resumo, que muda a cada gravação de pedido ou
+    conta a receber dele) e pela data de hoje (o que está vencido muda à
+    meia-noite). Dentro de uma transação aberta o cache é ignorado, como no
+    CacheVersionadoMixin.
+    """
+    hoje = timezone.localdate()
+    if transaction.get_connection().in_atomic_block:
+        return _calcular_resumo(cliente_id, hoje), False
+
+    versao, = versoes_por_chave([Cliente.chave_versao_resumo(cliente_id)])
+    chave = f'{PREFIXO}:resumo-cliente:{cliente_id}:{versao}:{hoje.isoformat()}'
+    dados = cache.get(chave)
+    if dados is not None:
+        return dados, True
+    dados = _calcular_resumo(cliente_id, hoje)
+    cache.set(chave, dados, settings.API_CACHE_TTL)
+    return dados, False
+
+
+def _calcular_resumo(cliente_id, hoje):
+    return {
+        'cliente': cliente_id,
+        'pedidos': _resumo_pedidos(cliente_id),
+        'contas_receber': _resumo_contas(cliente_id, hoje),
+    }
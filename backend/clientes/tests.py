@@ -1,3 +1,286 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from financeiro.models import ContaReceber
+from usuarios.models import Usuario
+from vendas.models import Pedido
+from vendas.services import transicionar_pedidos_em_lote
+from .models import Cliente, DuplicidadeCliente
+from .normalizacao import chave_fonetica, similaridade
 
-# Create your tests here.
+
+class BuscaClienteTest(TestCase):
+    """Busca textual indexada e filtros de /api/clientes/"""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(username='atendimento')
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+
+        def cliente(nome, documento, email, **extra):
+            return Cliente.objects.create(
+                nome_completo=nome,
+                cpf_cnpj=documento,
+                email=email,
+                telefone='11999999999',
+                endereco='Rua A',
+                bairro='Centro',
+                cidade='São Paulo',
+                estado='SP',
+                cep='01310-100',
+                **extra
+            )
+
+        cliente('João da Silva', '123.456.789-01', 'joao@email.com')
+        cliente('Maria Souza', '987.654.321-00', 'maria.silva@email.com')
+        cliente('Comércio Silva Ltda', '12.345.678/0001-90', 'contato@silva.com.br', tipo='PJ', status='inativo')
+
+    def buscar(self, termo, **params):
+        resposta = self.api.get('/api/clientes/', {'search': termo, **params})
+        self.assertEqual(resposta.status_code, 200)
+        return [c['nome_completo'] for c in resposta.data['results']]
+
+    def test_busca_por_nome_email_e_documento(self):
+        self.assertEqual(self.buscar('joao'), ['João da Silva'])
+        self.assertEqual(self.buscar('maria sou'), ['Maria Souza'])
+        self.assertEqual(self.buscar('987.654'), ['Maria Souza'])
+        self.assertCountEqual(self.buscar('silva'), ['João da Silva', 'Maria Souza', 'Comércio Silva Ltda'])
+        # O nome pesa mais que o e-mail
+        self.assertNotEqual(self.buscar('silva')[0], 'Maria Souza')
+
+    def test_filtros(self):
+        self.assertCountEqual(self.buscar('silva', status='ativo'), ['João da Silva', 'Maria Souza'])
+        self.assertEqual(self.buscar('silva', tipo='PJ'), ['Comércio Silva Ltda'])
+
+
+class DuplicidadeClienteTest(TestCase):
+    """Chaves normalizadas, sugestão de duplicados e detecção em lote por blocos"""
+
+    def setUp(self):
+        self.gerente = Usuario.objects.create(username='gerente', tipo='gerente')
+        self.api = APIClient()
+        self.api.force_authenticate(self.gerente)
+
+    def cliente(self, nome, documento, email='cliente@email.com', telefone='(11) 3333-4444'):
+        return Cliente.objects.create(
+            nome_completo=nome, cpf_cnpj=documento, email=email, telefone=telefone,
+            endereco='Rua A', bairro='Centro', cidade='São Paulo', estado='SP', cep='01310-100'
+        )
+
+    def test_chaves_normalizadas(self):
+        self.assertEqual(chave_fonetica('Luiz Gonçalves de Souza'), chave_fonetica('Luis Goncalves Sousa'))
+        self.assertEqual(chave_fonetica('Thiago Phelipe'), chave_fonetica('Tiago Felipe'))
+        self.assertNotEqual(chave_fonetica('Maria Souza'), chave_fonetica('Mário Souza'))
+        self.assertGreater(similaridade('João da Silva', 'Joao Silva'), similaridade('João da Silva', 'Joana Sales'))
+
+        cliente = self.cliente('Luiz Souza', '123.456.789-01')
+        self.assertEqual((cliente.documento, cliente.nome_fonetico), ('12345678901', 'LUIS SOUSA'))
+        cliente.nome_completo = 'Luiz Sousa Lima'
+        cliente.save(update_fields=['nome_completo'])
+        cliente.refresh_from_db()
+        self.assertEqual(cliente.nome_fonetico, 'LUIS SOUSA LIMA')
+
+    def test_sugestao_ao_digitar_e_ao_cadastrar(self):
+        luiz = self.cliente('Luiz Gonçalves de Souza', '123.456.789-01', email='luiz@email.com')
+        self.cliente('Maria Souza', '987.654.321-00')
+
+        resposta = self.api.post('/api/clientes/sugerir-duplicados/', {'nome_completo': 'Luis Goncalves Sousa'})
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+        self.assertEqual([(s['id'], s['motivos']) for s in resposta.data], [(luiz.pk, ['nome_fonetico'])])
+
+        resposta = self.api.post('/api/clientes/sugerir-duplicados/', {'cpf_cnpj': '12345678901'})
+        self.assertEqual((resposta.data[0]['id'], resposta.data[0]['pontuacao']), (luiz.pk, 1.0))
+        self.assertEqual(self.api.post('/api/clientes/sugerir-duplicados/', {'email': 'x@x.com'}).status_code, 400)
+
+        resposta = self.api.post('/api/clientes/', {
+            'nome_completo': 'Luiz Gonçalves Souza', 'cpf_cnpj': '111.222.333-44', 'email': 'luiz@email.com',
+            'telefone': '11988887777', 'tipo': 'PF', 'endereco': 'Rua B', 'bairro': 'Centro',
+            'cidade': 'Santos', 'estado': 'SP', 'cep': '11000-000',
+        })
+        self.assertEqual(resposta.status_code, 201, resposta.data)
+        sugestao, = resposta.data['duplicados_sugeridos']
+        self.assertEqual((sugestao['id'], sugestao['motivos']), (luiz.pk, ['nome_fonetico', 'email']))
+
+    def test_deteccao_em_lote_por_blocos(self):
+        maria = self.cliente('Maria Aparecida Souza', '111.111.111-12', email='maria@email.com')
+        maria_abreviada = self.cliente('Maria Souza', '222.222.222-23', email='Maria@Email.com ')
+        legado = self.cliente('Pedro Lima', '33333333334', telefone='1144445555')
+        pedro = self.cliente('Pedro H. Lima', '333.333.333-34', telefone='1155556666')
+        self.cliente('José Santos', '444.444.444-45')
+
+        self.enterContext(mock.patch('clientes.services.LIMITE_BLOCO', 2))
+        saida = StringIO()
+        call_command('detectar_clientes_duplicados', stdout=saida)
+        # O telefone e o e-mail comuns a 3 clientes formam blocos grandes
+        # demais e não são comparados; as duas Marias se encontram pelo e-mail
+        # e pelo primeiro + último nome
+        self.assertIn('2 bloco(s) grande(s) demais ignorado(s)', saida.getvalue())
+        pares = {
+            (d.cliente_id, d.duplicado_id): d.motivos
+            for d in DuplicidadeCliente.objects.all()
+        }
+        self.assertEqual(pares, {
+            (maria.pk, maria_abreviada.pk): ['nome', 'email', 'telefone'],
+            (legado.pk, pedro.pk): ['documento'],
+        })
+
+        resposta = self.api.get('/api/clientes/duplicidades/', {'status': 'pendente'})
+        self.assertEqual(resposta.data['count'], 2)
+        duplicidade = DuplicidadeCliente.objects.get(cliente=maria)
+        resposta = self.api.patch(f'/api/clientes/duplicidades/{duplicidade.pk}/', {'status': 'descartada'})
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+
+        # Nova execução: a revisão é mantida e o par que deixou de coincidir sai
+        pedro.cpf_cnpj = '555.555.555-56'
+        pedro.nome_completo = 'Paulo Lima'
+        pedro.save()
+        call_command('detectar_clientes_duplicados', stdout=StringIO())
+        self.assertEqual(
+            list(DuplicidadeCliente.objects.values_list('cliente_id', 'status')), [(maria.pk, 'descartada')]
+        )
+
+
+class ResumoClienteTest(TransactionTestCase):
+    """Visão 360 do cliente em cache (commit real: versões mudam no on_commit)"""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create(username='atendimento')
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        self.cliente = Cliente.objects.create(
+            nome_completo='Ana Costa', cpf_cnpj='123.456.789-01', email='ana@email.com', telefone='11999990000',
+            endereco='Rua A', bairro='Centro', cidade='São Paulo', estado='SP', cep='01310-100'
+        )
+        agora = timezone.now()
+        self.pedidos = []
+        for dias, subtotal, status in ((30, '100.00', 'entregue'), (10, '200.00', 'confirmado'), (5, '50.00', 'cancelado')):
+            pedido = Pedido.objects.create(
+                cliente=self.cliente, vendedor=self.usuario, valor_subtotal=Decimal(subtotal), status=status
+            )
+            Pedido.objects.filter(pk=pedido.pk).update(data_pedido=agora - timedelta(days=dias))
+            self.pedidos.append(pedido)
+
+        hoje = timezone.localdate()
+        for valor, recebido, vencimento, status in (
+            ('100.00', '0.00', hoje + timedelta(days=5), 'aberto'),
+            ('80.00', '20.00', hoje - timedelta(days=3), 'aberto'),
+            ('50.00', '50.00', hoje - timedelta(days=20), 'recebido'),
+        ):
+            self.conta(valor, vencimento, valor_recebido=Decimal(recebido), status=status)
+
+    def conta(self, valor, vencimento, **extras):
+        return ContaReceber.objects.create(
+            cliente=self.cliente, descricao='Venda', valor=Decimal(valor), data_vencimento=vencimento, **extras
+        )
+
+    def resumo(self):
+        resposta = self.api.get(f'/api/clientes/{self.cliente.pk}/resumo/')
+        self.assertEqual(resposta.status_code, 200)
+        return resposta
+
+    def test_totais_por_dominio_em_uma_consulta_cada(self):
+        with self.assertNumQueries(3):  # cliente, pedidos e contas
+            resposta = self.resumo()
+        self.assertEqual(resposta['X-Cache'], 'MISS')
+        pedidos, contas = resposta.data['pedidos'], resposta.data['contas_receber']
+
+        self.assertEqual((pedidos['total_pedidos'], pedidos['pedidos_cancelados']), (2, 1))
+        self.assertEqual((pedidos['valor_vitalicio'], pedidos['ticket_medio']), (Decimal('300.00'), Decimal('150.00')))
+        self.assertEqual((pedidos['intervalo_medio_dias'], pedidos['dias_desde_ultimo_pedido']), (20.0, 10))
+        self.assertEqual(
+            [pedido['id'] for pedido in pedidos['ultimos_pedidos']], [pedido.pk for pedido in reversed(self.pedidos)]
+        )
+
+        self.assertEqual((contas['contas_em_aberto'], contas['valor_em_aberto']), (2, Decimal('160.00')))
+        self.assertEqual((contas['contas_vencidas'], contas['valor_vencido']), (1, Decimal('60.00')))
+        self.assertEqual(contas['proximo_vencimento'], timezone.localdate() + timedelta(days=5))
+        self.assertEqual(contas['total_recebido'], Decimal('50.00'))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.resumo()['X-Cache'], 'HIT')
+
+    def test_gravacoes_de_pedidos_e_contas_invalidam(self):
+        self.resumo()
+        self.conta('40.00', timezone.localdate() + timedelta(days=1))
+        resposta = self.resumo()
+        self.assertEqual(resposta['X-Cache'], 'MISS')
+        self.assertEqual(resposta.data['contas_receber']['valor_em_aberto'], Decimal('200.00'))
+
+        # UPDATE direto nos totais do pedido (itens alterados)
+        Pedido.aplicar_delta_itens(self.pedidos[0].pk, 1, Decimal('25.00'))
+        self.assertEqual(self.resumo().data['pedidos']['valor_vitalicio'], Decimal('325.00'))
+
+        # Troca de status em lote (UPDATE direto)
+        transicionar_pedidos_em_lote([self.pedidos[1].pk], 'em_separacao', self.usuario)
+        self.assertEqual(self.resumo().data['pedidos']['ultimos_pedidos'][1]['status'], 'em_separacao')
+
+        self.assertEqual(self.api.get('/api/clientes/999999/resumo/').status_code, 404)
+
+    def test_transicao_em_lote_dentro_de_transacao_invalida_todos_os_clientes(self):
+        outro = Cliente.objects.create(
+            nome_completo='Bruno Lima', cpf_cnpj='987.654.321-00', email='bruno@email.com', telefone='11988880000',
+            endereco='Rua B', bairro='Centro', cidade='Santos', estado='SP', cep='11000-000'
+        )
+        pendente = Pedido.objects.create(cliente=outro, vendedor=self.usuario, valor_subtotal=Decimal('10.00'))
+        url_outro = f'/api/clientes/{outro.pk}/resumo/'
+        self.resumo()
+        self.api.get(url_outro)
+
+        # Pedidos de dois status de origem: um UPDATE (e um grupo) por origem
+        with mock.patch.dict(Pedido.TRANSICOES, {'pendente': ['confirmado', 'cancelado', 'em_separacao']}):
+            with transaction.atomic():
+                transicionar_pedidos_em_lote([pendente.pk, self.pedidos[1].pk], 'em_separacao', self.usuario)
+
+        self.assertEqual(self.resumo()['X-Cache'], 'MISS')
+        resposta = self.api.get(url_outro)
+        self.assertEqual(resposta['X-Cache'], 'MISS')
+        self.assertEqual(resposta.data['pedidos']['ultimos_pedidos'][0]['status'], 'em_separacao')
+
+    def test_troca_de_cliente_invalida_o_anterior_e_o_novo(self):
+        outro = Cliente.objects.create(
+            nome_completo='Bruno Lima', cpf_cnpj='987.654.321-00', email='bruno@email.com', telefone='11988880000',
+            endereco='Rua B', bairro='Centro', cidade='Santos', estado='SP', cep='11000-000'
+        )
+        url_outro = f'/api/clientes/{outro.pk}/resumo/'
+        for modelo in (Pedido, ContaReceber):
+            self.resumo()
+            self.api.get(url_outro)
+            registro = modelo.objects.filter(cliente=self.cliente).first()
+            registro.cliente = outro
+            registro.save()
+            self.assertEqual(self.resumo()['X-Cache'], 'MISS')
+            self.assertEqual(self.api.get(url_outro)['X-Cache'], 'MISS')
+
+        pedidos = self.resumo().data['pedidos']
+        self.assertEqual(len(pedidos['ultimos_pedidos']), 2)
+
+    def test_gravacoes_de_outro_cliente_mantem_o_cache(self):
+        outro = Cliente.objects.create(
+            nome_completo='Bruno Lima', cpf_cnpj='987.654.321-00', email='bruno@email.com', telefone='11988880000',
+            endereco='Rua B', bairro='Centro', cidade='Santos', estado='SP', cep='11000-000'
+        )
+        self.resumo()
+        Pedido.objects.create(cliente=outro, vendedor=self.usuario, valor_subtotal=Decimal('10.00'))
+        ContaReceber.objects.create(
+            cliente=outro, descricao='Venda', valor=Decimal('10.00'), data_vencimento=timezone.localdate()
+        )
+        self.assertEqual(self.resumo()['X-Cache'], 'HIT')
+
+    def test_cliente_sem_movimento(self):
+        outro = Cliente.objects.create(
+            nome_completo='Bruno Lima', cpf_cnpj='987.654.321-00', email='bruno@email.com', telefone='11988880000',
+            endereco='Rua B', bairro='Centro', cidade='Santos', estado='SP', cep='11000-000'
+        )
+        resposta = self.api.get(f'/api/clientes/{outro.pk}/resumo/')
+        self.assertEqual(resposta.data['pedidos']['total_pedidos'], 0)
+        self.assertIsNone(resposta.data['pedidos']['ticket_medio'])
+        self.assertEqual(resposta.data['pedidos']['ultimos_pedidos'], [])
+        self.assertEqual(resposta.data['contas_receber']['valor_em_aberto'], Decimal('0.00'))
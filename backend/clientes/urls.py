@@ -1,7 +1,9 @@
 from rest_framework.routers import DefaultRouter
-from .views import ClienteViewSet
+from .views import ClienteViewSet, DuplicidadeClienteViewSet
 
 router = DefaultRouter()
+# Antes de 'clientes': "duplicidades" não pode ser lido como pk de cliente
+router.register(r'clientes/duplicidades', DuplicidadeClienteViewSet, basename='duplicidade-cliente')
 router.register(r'clientes', ClienteViewSet, basename='cliente')
 
 urlpatterns = router.urls
@@ -1,14 +1,26 @@
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, mixins
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Cliente
-from .serializers import ClienteSerializer, ClienteListSerializer
+from config.busca import BuscaTextualFilter
+from config.condicional import GetCondicionalMixin
+from config.permissoes import GerenteOuAdmin
+from .models import Cliente, DuplicidadeCliente
+from .serializers import (
+    ClienteSerializer,
+    ClienteListSerializer,
+    DuplicidadeClienteSerializer,
+    SugestaoDuplicadosSerializer
+)
+from .services import INDICE_BUSCA, resumo_cliente, sugerir_duplicados
 
 
-class ClienteViewSet(viewsets.ModelViewSet):
+class ClienteViewSet(GetCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para operações CRUD de Cliente.
-    
+
     Endpoints:
     - GET /api/clientes/ - Lista todos os clientes
     - POST /api/clientes/ - Cria um novo cliente
@@ -16,23 +28,76 @@ class ClienteViewSet(viewsets.ModelViewSet):
     - PUT /api/clientes/{id}/ - Atualiza um cliente
     - PATCH /api/clientes/{id}/ - Atualiza parcialmente um cliente
     - DELETE /api/clientes/{id}/ - Remove um cliente
+    - POST /api/clientes/sugerir-duplicados/ - Clientes parecidos com um cadastro em digitação
+    - GET /api/clientes/{id}/resumo/ - Visão 360: pedidos e contas a receber do cliente
     """
     queryset = Cliente.objects.all()
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, BuscaTextualFilter]
+
     # Filtros
-    filterset_fields = ['tipo', 'ativo', 'cidade', 'estado']
-    
-    # Busca
-    search_fields = ['nome_completo', 'razao_social', 'cpf', 'cnpj', 'email', 'telefone']
-    
+    filterset_fields = ['tipo', 'status', 'cidade', 'estado']
+
+    # Busca (índice textual; search_fields é o fallback sem índice)
+    search_fields = ['nome_completo', 'cpf_cnpj', 'email', 'telefone']
+    indice_busca = INDICE_BUSCA
+
     # Ordenação
-    ordering_fields = ['nome_completo', 'razao_social', 'data_cadastro']
+    ordering_fields = ['nome_completo', 'data_cadastro']
     ordering = ['-data_cadastro']
-    
+
     def get_serializer_class(self):
         """Retorna serializer apropriado baseado na action"""
         if self.action == 'list':
             return ClienteListSerializer
         return ClienteSerializer
+
+    def create(self, request, *args, **kwargs):
+        """Cria o cliente e devolve os cadastros parecidos já existentes em `duplicados_sugeridos`"""
+        response = super().create(request, *args, **kwargs)
+        response.data['duplicados_sugeridos'] = sugerir_duplicados(response.data, excluir=response.data['id'])
+        return response
+
+    @action(detail=True, methods=['get'])
+    def resumo(self, request, pk=None):
+        """
+        Valor vitalício, frequência e últimos pedidos, saldo em aberto e
+        vencido do cliente, em cache até a próxima gravação de pedido ou
+        conta a receber dele (cabeçalho X-Cache: HIT|MISS).
+        """
+        dados, do_cache = resumo_cliente(self.get_object().pk)
+        response = Response(dados)
+        response['X-Cache'] = 'HIT' if do_cache else 'MISS'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='sugerir-duplicados')
+    def sugerir_duplicados(self, request):
+        """
+        Clientes parecidos com os dados informados (antes de cadastrar).
+        Body: {"nome_completo", "cpf_cnpj", "email", "telefone"}
+        """
+        serializer = SugestaoDuplicadosSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(sugerir_duplicados(serializer.validated_data))
+
+
+class DuplicidadeClienteViewSet(
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.UpdateModelMixin,
+    viewsets.GenericViewSet
+):
+    """
+    Pares de possíveis duplicados encontrados pelo comando
+    detectar_clientes_duplicados. PATCH {"status": "confirmada|descartada"}
+    registra a revisão.
+    """
+    queryset = DuplicidadeCliente.objects.select_related('cliente', 'duplicado')
+    serializer_class = DuplicidadeClienteSerializer
+    permission_classes = [IsAuthenticated, GerenteOuAdmin]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['status', 'cliente']
+    ordering_fields = ['pontuacao', 'data_deteccao']
+
+    def perform_update(self, serializer):
+        serializer.save(data_revisao=timezone.now())
@@ -0,0 +1,235 @@
+"""
+Busca textual indexada para as listagens da API.
+
+BuscaTextualFilter substitui o SearchFilter (icontains em várias colunas,
+varredura completa da tabela a cada tecla) nas views que declaram
+`indice_busca`:
+
+- SQLite: tabela virtual FTS5 com conteúdo externo, mantida por triggers
+  (INSERT/UPDATE/DELETE, inclusive update() e bulk_create) e ordenada por
+  bm25 com pesos por coluna;
+- PostgreSQL: índice GIN sobre o tsvector ponderado das colunas e índice
+  GIN de trigramas (pg_trgm) na coluna principal, para erros de digitação.
+
+O índice é criado por migração (IndiceBusca.criar). Sem índice disponível
+(outro banco, SQLite sem FTS5) a busca volta a ser a do SearchFilter.
+"""
+import re
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+# Letras de peso do setweight do PostgreSQL, por posição da coluna
+PESOS_TSVECTOR = 'ABCD'
+
+# Palavras (letras, dígitos e hífen, como nos códigos "SKU-0001"); o mesmo
+# critério do tokenizador do FTS5 (unicode61 com tokenchars '-')
+PALAVRA = re.compile(r'[\w-]+')
+
+
+class IndiceBusca:
+    """
+    Índice textual de `tabela` sobre `colunas` (em ordem de importância).
+    `pesos` são os pesos do bm25 no SQLite (padrão: decrescentes); no
+    PostgreSQL as colunas recebem os pesos A, B, C e D nessa ordem e
+    `coluna_trigrama` (padrão: a primeira coluna) ganha o índice de trigramas.
+    """
+
+    def __init__(self, tabela, colunas, pesos=None, coluna_trigrama=None, config='portuguese'):
+        if len(colunas) > len(PESOS_TSVECTOR):
+            raise ValueError(f'No máximo {len(PESOS_TSVECTOR)} colunas por índice de busca')
+        self.tabela = tabela
+        self.colunas = list(colunas)
+        self.pesos = list(pesos or range(len(colunas) * 5, 0, -5))
+        self.coluna_trigrama = coluna_trigrama or colunas[0]
+        self.config = config
+        self._disponivel = {}
+
+    @property
+    def tabela_fts(self):
+        return f'{self.tabela}_busca'
+
+    # ------------------------------------------------------------------
+    # Criação (migrações)
+    # ------------------------------------------------------------------
+
+    def criar(self, schema_editor):
+        connection = schema_editor.connection
+        if connection.vendor == 'sqlite' and self._sqlite_tem_fts5(connection):
+            for sql in self._sql_sqlite(schema_editor.quote_name):
+                schema_editor.execute(sql)
+        elif connection.vendor == 'postgresql':
+            for sql in self._sql_postgresql(schema_editor.quote_name):
+                schema_editor.execute(sql)
+
+    def remover(self, schema_editor):
+        qn = schema_editor.quote_name
+        if schema_editor.connection.vendor == 'sqlite':
+            for sufixo in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {qn(f"{self.tabela}_busca_{sufixo}")}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {qn(self.tabela_fts)}')
+        elif schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {qn(f"{self.tabela}_busca_idx")}')
+            schema_editor.execute(f'DROP INDEX IF EXISTS {qn(f"{self.tabela}_trgm_idx")}')
+
+    def otimizar(self, alias='default'):
+        """
+        Compacta o índice após cargas ou exclusões em massa: no FTS5 cada
+        exclusão deixa marcas nos segmentos até a fusão, e a busca fica
+        várias vezes mais lenta; no PostgreSQL, esvazia a lista pendente do
+        GIN e atualiza as estatísticas da tabela.
+        """
+        if not self.disponivel(alias):
+            return
+        connection = connections[alias]
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                fts = qn(self.tabela_fts)
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('optimize')")
+            else:
+                cursor.execute('SELECT gin_clean_pending_list(%s::regclass)', [f'{self.tabela}_busca_idx'])
+                cursor.execute(f'ANALYZE {qn(self.tabela)}')
+
+    @staticmethod
+    def _sqlite_tem_fts5(connection):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            opcoes = {linha[0] for linha in cursor.fetchall()}
+        return 'ENABLE_FTS5' in opcoes
+
+    def _sql_sqlite(self, qn):
+        tabela, fts = qn(self.tabela), qn(self.tabela_fts)
+        colunas = ', '.join(qn(coluna) for coluna in self.colunas)
+        novos = ', '.join(f'new.{qn(coluna)}' for coluna in self.colunas)
+        antigos = ', '.join(f'old.{qn(coluna)}' for coluna in self.colunas)
+        inserir = f'INSERT INTO {fts}(rowid, {colunas}) VALUES (new."id", {novos});'
+        remover = f"INSERT INTO {fts}({fts}, rowid, {colunas}) VALUES ('delete', old.\"id\", {antigos});"
+        return [
+            # Conteúdo externo: o FTS5 guarda só o índice e lê o texto da tabela
+            f'CREATE VIRTUAL TABLE {fts} USING fts5({colunas}, content={tabela}, content_rowid="id", '
+            f"tokenize=\"unicode61 remove_diacritics 2 tokenchars '-'\", prefix='2 3 4')",
+            f'CREATE TRIGGER {qn(f"{self.tabela}_busca_ai")} AFTER INSERT ON {tabela} BEGIN {inserir} END',
+            f'CREATE TRIGGER {qn(f"{self.tabela}_busca_ad")} AFTER DELETE ON {tabela} BEGIN {remover} END',
+            f'CREATE TRIGGER {qn(f"{self.tabela}_busca_au")} AFTER UPDATE OF {colunas} ON {tabela} '
+            f'BEGIN {remover} {inserir} END',
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+
+    def _sql_postgresql(self, qn):
+        return [
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+            f'CREATE INDEX IF NOT EXISTS {qn(f"{self.tabela}_busca_idx")} ON {qn(self.tabela)} '
+            f'USING gin (({self._tsvector_sql(qn)}))',
+            f'CREATE INDEX IF NOT EXISTS {qn(f"{self.tabela}_trgm_idx")} ON {qn(self.tabela)} '
+            f'USING gin ({qn(self.coluna_trigrama)} gin_trgm_ops)',
+        ]
+
+    def _tsvector_sql(self, qn, prefixo=''):
+        """Expressão do tsvector ponderado; a consulta usa a mesma do índice"""
+        return ' || '.join(
+            f"setweight(to_tsvector('{self.config}', coalesce({prefixo}{qn(coluna)}, '')), '{peso}')"
+            for coluna, peso in zip(self.colunas, PESOS_TSVECTOR)
+        )
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def disponivel(self, alias):
+        connection = connections[alias]
+        if connection.vendor == 'postgresql':
+            return True
+        if connection.vendor != 'sqlite':
+            return False
+        chave = connection.settings_dict['NAME']
+        if chave not in self._disponivel:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1 FROM sqlite_master WHERE type = %s AND name = %s', ['table', self.tabela_fts])
+                self._disponivel[chave] = cursor.fetchone() is not None
+        return self._disponivel[chave]
+
+    @staticmethod
+    def palavras(termos):
+        """Palavras da busca em minúsculas, sem hífens soltos nas pontas"""
+        return [
+            palavra.strip('-').lower()
+            for termo in termos
+            for palavra in PALAVRA.findall(termo)
+            if palavra.strip('-')
+        ]
+
+    def buscar(self, queryset, termos):
+        """
+        Filtra `queryset` pelas palavras de `termos` (todas obrigatórias; a
+        última vale como prefixo, para busca enquanto se digita) e anota
+        `relevancia_busca` (maior = mais relevante).
+        """
+        palavras = self.palavras(termos)
+        if not palavras:
+            return queryset
+        if connections[queryset.db].vendor == 'postgresql':
+            return self._buscar_postgresql(queryset, palavras)
+        return self._buscar_sqlite(queryset, palavras)
+
+    def _buscar_sqlite(self, queryset, palavras):
+        frases = ['"%s"' % palavra.replace('"', '""') for palavra in palavras]
+        if len(palavras[-1]) >= 2:
+            frases[-1] += '*'
+        expressao = ' '.join(frases)
+
+        qn = connections[queryset.db].ops.quote_name
+        fts = qn(self.tabela_fts)
+        opts = queryset.model._meta
+        pesos = ', '.join(f'{float(peso)}' for peso in self.pesos)
+        # JOIN com a tabela virtual (e não pk IN / subconsulta correlacionada):
+        # o FTS5 conduz o plano e o bm25 é calculado uma vez por linha
+        # encontrada. O ORM não junta tabelas sem model, daí o extra().
+        return queryset.extra(
+            tables=[self.tabela_fts],
+            where=[f'{fts}.rowid = {qn(opts.db_table)}.{qn(opts.pk.column)}', f'{fts} MATCH %s'],
+            params=[expressao],
+            select={'relevancia_busca': f'-bm25({fts}, {pesos})'},
+        )
+
+    def _buscar_postgresql(self, queryset, palavras):
+        qn = connections[queryset.db].ops.quote_name
+        prefixo = f'{qn(queryset.model._meta.db_table)}.'
+        vetor = self._tsvector_sql(qn, prefixo)
+        consulta = ' & '.join(palavras[:-1] + [f'{palavras[-1]}:*'])
+        texto = ' '.join(palavras)
+        trigrama = f'{prefixo}{qn(self.coluna_trigrama)}'
+        return queryset.filter(
+            RawSQL(
+                f"({vetor}) @@ to_tsquery('{self.config}', %s) OR {trigrama} %% %s",
+                [consulta, texto],
+                output_field=models.BooleanField()
+            )
+        ).annotate(
+            relevancia_busca=RawSQL(
+                f"ts_rank(({vetor}), to_tsquery('{self.config}', %s)) + similarity({trigrama}, %s)",
+                [consulta, texto],
+                output_field=models.FloatField()
+            )
+        )
+
+
+class BuscaTextualFilter(filters.SearchFilter):
+    """
+    SearchFilter sobre o índice textual da view (`indice_busca`), com os
+    resultados ordenados por relevância quando não há ?ordering=.
+
+    Deve vir depois do OrderingFilter em filter_backends, para que a
+    ordenação padrão da view não substitua a ordem por relevância.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        termos = self.get_search_terms(request)
+        indice = getattr(view, 'indice_busca', None)
+        if not termos or indice is None or not indice.disponivel(queryset.db):
+            return super().filter_queryset(request, queryset, view)
+
+        resultado = indice.buscar(queryset, termos)
+        if filters.OrderingFilter.ordering_param not in request.query_params:
+            resultado = resultado.order_by('-relevancia_busca', *queryset.query.order_by)
+        return resultado
@@ -0,0 +1,224 @@
+"""
+Cache de leitura (read-through) das respostas GET da API, invalidado por
+versão de model.
+
+Cada model tem um contador de versão no cache, incrementado após o commit
+de qualquer gravação (sinais post_save/post_delete e, nos UPDATEs em massa
+que não disparam sinais, chamadas explícitas a incrementar_versao). A chave
+de uma resposta inclui as versões dos models que ela exibe: uma gravação
+muda a chave e as respostas antigas simplesmente deixam de ser lidas (e
+expiram pelo TTL), sem varrer nem apagar chaves.
+"""
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+PREFIXO = 'api-cache'
+
+# Segundos até a trava de geração expirar sozinha (processo que morreu gerando)
+TRAVA_TIMEOUT = 30
+
+# Intervalo entre as leituras de quem espera outra requisição gerar a resposta
+INTERVALO_ESPERA = 0.02
+
+# Nomes registrados pelas views com cache (para as estatísticas)
+NOMES_CACHE = set()
+
+
+def chave_versao(modelo):
+    return f'{PREFIXO}:versao:{modelo._meta.label_lower}'
+
+
+def versoes(modelos):
+    """Versão atual de cada model, criando as que ainda não existem no cache"""
+    return versoes_por_chave([chave_versao(modelo) for modelo in modelos])
+
+
+def versoes_por_chave(chaves):
+    """versoes() para chaves de versão quaisquer (ex: uma por objeto)"""
+    atuais = cache.get_many(chaves)
+    faltando = [chave for chave in chaves if chave not in atuais]
+    if faltando:
+        for chave in faltando:
+            # Começa no relógio (e não em 1): uma versão despejada do cache
+            # não volta a um número já usado por respostas ainda guardadas
+            cache.add(chave, time.time_ns(), timeout=None)
+        atuais.update(cache.get_many(faltando))
+    return [atuais.get(chave, 0) for chave in chaves]
+
+
+def incrementar_versao(*modelos):
+    """Invalida as respostas em cache que exibem algum dos `modelos`"""
+    incrementar_versoes_por_chave(chave_versao(modelo) for modelo in modelos)
+
+
+def incrementar_versoes_por_chave(chaves):
+    for chave in chaves:
+        try:
+            cache.incr(chave)
+        except ValueError:
+            cache.add(chave, time.time_ns(), timeout=None)
+
+
+def _contar(nome, tipo):
+    chave = f'{PREFIXO}:estatisticas:{nome}:{tipo}'
+    try:
+        cache.incr(chave)
+    except ValueError:
+        if not cache.add(chave, 1, timeout=None):
+            cache.incr(chave)
+
+
+def estatisticas_cache():
+    """Acertos, falhas e esperas por view com cache, com a taxa de acerto"""
+    tipos = ('acertos', 'falhas', 'esperas')
+    chaves = {
+        (nome, tipo): f'{PREFIXO}:estatisticas:{nome}:{tipo}'
+        for nome in sorted(NOMES_CACHE)
+        for tipo in tipos
+    }
+    valores = cache.get_many(list(chaves.values()))
+    resultado = {}
+    for nome in sorted(NOMES_CACHE):
+        contagem = {tipo: valores.get(chaves[nome, tipo], 0) for tipo in tipos}
+        total = contagem['acertos'] + contagem['falhas']
+        contagem['taxa_acerto'] = round(contagem['acertos'] / total, 4) if total else None
+        resultado[nome] = contagem
+    return resultado
+
+
+def zerar_estatisticas_cache():
+    cache.delete_many([
+        f'{PREFIXO}:estatisticas:{nome}:{tipo}'
+        for nome in NOMES_CACHE
+        for tipo in ('acertos', 'falhas', 'esperas')
+    ])
+
+
+class CacheVersionadoMixin:
+    """
+    Serve `list` e `retrieve` do cache, com chave formada pelas versões de
+    `modelos_cache`, pela URL completa (filtros, página, host dos links) e
+    pelo formato da resposta. Guarda o payload já serializado: um acerto não
+    consulta o banco nem serializa nada.
+
+    - Proteção contra estouro: só uma requisição por chave gera a resposta
+      (trava com cache.add); as demais esperam até API_CACHE_ESPERA segundos
+      por ela antes de gerá-la por conta própria.
+    - GET condicional: o ETag/Last-Modified da resposta original é guardado
+      junto e conferido nos acertos (304 sem tocar no banco). Deve vir antes
+      do GetCondicionalMixin nas bases da view.
+    - A resposta leva o cabeçalho X-Cache (HIT/MISS); os totais por view
+      ficam em estatisticas_cache().
+
+    Só para respostas que não dependem do usuário autenticado. Dentro de uma
+    transação aberta (ATOMIC_REQUESTS, TestCase) o cache é ignorado: a versão
+    só muda no commit e a transação pode enxergar dados que ainda não valem.
+    """
+    modelos_cache = ()
+    nome_cache = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        queryset = getattr(cls, 'queryset', None)
+        nome = cls.nome_cache or (queryset.model._meta.label_lower if queryset is not None else None)
+        if cls.modelos_cache and nome:
+            cls.nome_cache = nome
+            NOMES_CACHE.add(nome)
+
+    def list(self, request, *args, **kwargs):
+        return self.responder_do_cache(
+            request, lambda: super(CacheVersionadoMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.responder_do_cache(
+            request, lambda: super(CacheVersionadoMixin, self).retrieve(request, *args, **kwargs)
+        )
+
+    def chave_cache(self, request):
+        formato = getattr(request, 'accepted_media_type', '') or ''
+        url = hashlib.md5(
+            f'{request.build_absolute_uri()}|{formato}'.encode(), usedforsecurity=False
+        ).hexdigest()
+        versao = '.'.join(str(v) for v in versoes(self.modelos_cache))
+        return f'{PREFIXO}:{self.nome_cache}:{self.action}:{versao}:{url}'
+
+    def responder_do_cache(self, request, gerar_resposta):
+        """Resposta em cache para a requisição ou a gerada por `gerar_resposta` (e guardada)"""
+        if not self.modelos_cache or transaction.get_connection().in_atomic_block:
+            return gerar_resposta()
+
+        chave = self.chave_cache(request)
+        registro = cache.get(chave)
+        if registro is not None:
+            _contar(self.nome_cache, 'acertos')
+            return self._resposta_do_registro(request, registro)
+
+        trava = f'{chave}:trava'
+        if not cache.add(trava, 1, TRAVA_TIMEOUT):
+            # Outra requisição já está gerando esta resposta
+            _contar(self.nome_cache, 'esperas')
+            limite = time.monotonic() + settings.API_CACHE_ESPERA
+            while time.monotonic() < limite:
+                time.sleep(INTERVALO_ESPERA)
+                registro = cache.get(chave)
+                if registro is not None:
+                    _contar(self.nome_cache, 'acertos')
+                    return self._resposta_do_registro(request, registro)
+            trava = None
+
+        _contar(self.nome_cache, 'falhas')
+        try:
+            response = gerar_resposta()
+            if response.status_code == status.HTTP_200_OK and isinstance(response, Response):
+                cache.set(chave, {
+                    'data': response.data,
+                    'etag': response.get('ETag'),
+                    'last_modified': response.get('Last-Modified'),
+                }, settings.API_CACHE_TTL)
+        finally:
+            if trava:
+                cache.delete(trava)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def _resposta_do_registro(self, request, registro):
+        nao_modificado = get_conditional_response(
+            request,
+            etag=registro['etag'],
+            last_modified=parse_http_date_safe(registro['last_modified'] or ''),
+        )
+        if nao_modificado is not None:
+            response = nao_modificado
+        else:
+            response = Response(registro['data'])
+            for cabecalho, valor in (('ETag', registro['etag']), ('Last-Modified', registro['last_modified'])):
+                if valor:
+                    response[cabecalho] = valor
+        response['X-Cache'] = 'HIT'
+        return response
+
+
+class EstatisticasCacheView(APIView):
+    """
+    Acertos/falhas do cache da API por view (GET) e zeragem dos contadores
+    (DELETE). `esperas` conta as requisições que aguardaram outra gerar a
+    mesma resposta.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        return Response(estatisticas_cache())
+
+    def delete(self, request):
+        zerar_estatisticas_cache()
+        return Response(status=status.HTTP_204_NO_CONTENT)
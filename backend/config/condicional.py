@@ -0,0 +1,137 @@
+"""GET condicional (ETag/Last-Modified) para os ViewSets da API."""
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class GetCondicionalMixin:
+    """
+    Responde 304 Not Modified em `list` e `retrieve` quando os validadores
+    enviados pelo cliente (If-None-Match / If-Modified-Since) ainda valem.
+
+    Os validadores vêm de uma consulta de sonda, feita antes de qualquer
+    serialização:
+    - detalhe: o `campo_atualizacao` da linha;
+    - listagem: Max(campo_atualizacao) e Count(*) do queryset filtrado,
+      de modo que alterações, inclusões e exclusões mudam o ETag. A
+      contagem é repassada à paginação, que não repete o COUNT(*).
+      Listagens revalidam só pelo ETag: uma exclusão não muda o
+      timestamp máximo, então não enviam nem aceitam Last-Modified.
+
+    O ETag é fraco e inclui a URL completa (filtros, página, cursor) e o
+    formato da resposta. Ele acompanha o timestamp da própria linha: dados
+    de relacionamentos exibidos no payload (ex: nome do cliente no pedido)
+    não invalidam o ETag por si só.
+
+    `campos_atualizacao_extras` lista timestamps de relacionamentos que
+    entram no payload (ex: 'estoque__ultima_atualizacao'); a sonda usa o
+    maior entre eles e o da própria linha.
+
+    `campo_atualizacao` é detectado entre os nomes usados nos models
+    (data_atualizacao, ultima_atualizacao, data_modificacao); views sem
+    esse campo seguem sem GET condicional. Listagens em modo cursor também
+    ficam de fora, já que a sonda faria o COUNT(*) que o cursor evita.
+    """
+    campo_atualizacao = None
+    campos_atualizacao_conhecidos = ('data_atualizacao', 'ultima_atualizacao', 'data_modificacao')
+    campos_atualizacao_extras = ()
+
+    def get_campo_atualizacao(self):
+        if self.campo_atualizacao:
+            return self.campo_atualizacao
+        nomes = {campo.name for campo in self.queryset.model._meta.get_fields()}
+        for nome in self.campos_atualizacao_conhecidos:
+            if nome in nomes:
+                return nome
+        return None
+
+    def list(self, request, *args, **kwargs):
+        campo = self.get_campo_atualizacao()
+        usar_cursor = getattr(self.paginator, 'usar_cursor', None)
+        if campo is None or (usar_cursor and usar_cursor(request, self)):
+            return super().list(request, *args, **kwargs)
+
+        # Relacionamentos a-muitos multiplicam as linhas: contagem distinta
+        sonda = self.filter_queryset(self.get_queryset()).aggregate(
+            total=Count('pk', distinct=bool(self.campos_atualizacao_extras)),
+            **self._marcas_atualizacao(campo)
+        )
+        # A página reaproveita a contagem da sonda em vez de repetir o COUNT(*)
+        informar_total = getattr(self.paginator, 'informar_total', None)
+        if informar_total:
+            informar_total(sonda['total'])
+        return self._responder_condicional(
+            request,
+            _mais_recente(sonda),
+            f'{sonda["total"]}',
+            lambda: super(GetCondicionalMixin, self).list(request, *args, **kwargs),
+            last_modified=False
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        campo = self.get_campo_atualizacao()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if campo is None or lookup_url_kwarg not in self.kwargs:
+            return super().retrieve(request, *args, **kwargs)
+
+        linha = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        if self.campos_atualizacao_extras:
+            ultima = _mais_recente(linha.aggregate(**self._marcas_atualizacao(campo)))
+        else:
+            ultima = linha.values_list(campo, flat=True).first()
+        if ultima is None:
+            # Inexistente (404) ou sem timestamp: segue o fluxo normal
+            return super().retrieve(request, *args, **kwargs)
+
+        return self._responder_condicional(
+            request,
+            ultima,
+            '',
+            lambda: super(GetCondicionalMixin, self).retrieve(request, *args, **kwargs)
+        )
+
+    def _marcas_atualizacao(self, campo):
+        campos = (campo, *self.campos_atualizacao_extras)
+        return {f'marca_{i}': Max(nome) for i, nome in enumerate(campos)}
+
+    def _responder_condicional(self, request, ultima, extra, gerar_resposta, last_modified=True):
+        """
+        Retorna 304 se os validadores conferem; senão gera a resposta e anexa
+        ETag e, com `last_modified`, Last-Modified
+        """
+        if ultima is None:
+            # Listagem vazia: o ETag ainda distingue pela contagem
+            marca = 'vazio'
+        else:
+            marca = ultima.isoformat()
+        ultima_ts = int(ultima.timestamp()) if ultima is not None and last_modified else None
+
+        chave = '|'.join([
+            request.get_full_path(),
+            getattr(request, 'accepted_media_type', '') or '',
+            marca,
+            extra,
+        ])
+        etag = 'W/"%s"' % hashlib.md5(chave.encode(), usedforsecurity=False).hexdigest()
+
+        nao_modificado = get_conditional_response(request, etag=etag, last_modified=ultima_ts)
+        if nao_modificado is not None:
+            return nao_modificado
+
+        response = gerar_resposta()
+        if 200 <= response.status_code < 300:
+            response['ETag'] = etag
+            if ultima_ts is not None:
+                response['Last-Modified'] = http_date(ultima_ts)
+        return response
+
+
+def _mais_recente(sonda):
+    """Maior timestamp entre as marcas da sonda (None se todas vazias)"""
+    return max(
+        (valor for nome, valor in sonda.items() if nome.startswith('marca_') and valor is not None),
+        default=None
+    )
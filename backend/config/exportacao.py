@@ -0,0 +1,137 @@
+"""Exportação em streaming (CSV/XLSX) das listagens da API."""
+import csv
+import datetime
+import tempfile
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework import status
+from rest_framework.response import Response
+from auditoria.models import LogAuditoria
+
+
+# Início de célula que o Excel/LibreOffice interpretam como fórmula
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _sem_formula(valor):
+    """Texto que abriria como fórmula recebe um apóstrofo na frente (injeção de fórmula)"""
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+class _Eco:
+    """Buffer de escrita que apenas devolve o que recebe (para csv.writer)"""
+
+    def write(self, valor):
+        return valor
+
+
+class ExportacaoMixin:
+    """
+    Adiciona `?export=csv|xlsx` à listagem de um ViewSet.
+
+    As linhas saem de `values_list(...).iterator(chunk_size=...)` sobre o
+    mesmo queryset filtrado da listagem, sem instanciar models nem passar
+    pelos serializers, então a memória fica constante qualquer que seja o
+    volume. O CSV é enviado enquanto é gerado (o primeiro byte sai após o
+    primeiro lote). O XLSX não é enviado em streaming: o modo write-only do
+    openpyxl grava as linhas em disco e só monta o zip no save(), então o
+    arquivo sai (em blocos) ao final da geração.
+
+    Textos iniciados por =, +, - ou @ saem com um apóstrofo na frente, para
+    não serem executados como fórmula pela planilha.
+
+    Deve vir antes do GetCondicionalMixin nas bases da view: uma exportação
+    nunca é respondida com 304 e sempre passa pelo registro de auditoria.
+
+    A view define `colunas_exportacao` como lista de (caminho, título), onde
+    caminho é qualquer expressão aceita por values_list (ex: cliente__nome_completo).
+    """
+    colunas_exportacao = []
+    nome_exportacao = 'exportacao'
+    tamanho_lote_exportacao = 2000
+    formatos_exportacao = ('csv', 'xlsx')
+
+    def list(self, request, *args, **kwargs):
+        formato = request.query_params.get('export')
+        if formato is None:
+            return super().list(request, *args, **kwargs)
+        if formato not in self.formatos_exportacao:
+            return Response(
+                {'error': f'Formato de exportação inválido. Use: {", ".join(self.formatos_exportacao)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        LogAuditoria.registrar(
+            usuario=request.user,
+            acao='exportar',
+            tabela=self.queryset.model._meta.db_table,
+            dados_novos={'formato': formato, 'filtros': request.query_params.dict()},
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT'),
+        )
+
+        nome_arquivo = f'{self.nome_exportacao}_{timezone.localtime():%Y%m%d_%H%M%S}.{formato}'
+        if formato == 'csv':
+            return self.exportar_csv(nome_arquivo)
+        return self.exportar_xlsx(nome_arquivo)
+
+    def linhas_exportacao(self):
+        """Gera as linhas (tuplas já formatadas) do queryset filtrado da listagem"""
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        caminhos = [caminho for caminho, _ in self.colunas_exportacao]
+        formatadores = [self._formatador(queryset.model, caminho) for caminho in caminhos]
+
+        for linha in queryset.values_list(*caminhos).iterator(chunk_size=self.tamanho_lote_exportacao):
+            yield [_sem_formula(formatar(valor)) for formatar, valor in zip(formatadores, linha)]
+
+    def exportar_csv(self, nome_arquivo):
+        escritor = csv.writer(_Eco())
+
+        def gerar():
+            yield '\ufeff'  # BOM para o Excel reconhecer UTF-8
+            yield escritor.writerow([titulo for _, titulo in self.colunas_exportacao])
+            for linha in self.linhas_exportacao():
+                yield escritor.writerow(linha)
+
+        response = StreamingHttpResponse(gerar(), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+        return response
+
+    def exportar_xlsx(self, nome_arquivo):
+        workbook = Workbook(write_only=True)
+        planilha = workbook.create_sheet(self.nome_exportacao[:31])
+        planilha.append([titulo for _, titulo in self.colunas_exportacao])
+        for linha in self.linhas_exportacao():
+            planilha.append(linha)
+
+        arquivo = tempfile.TemporaryFile()
+        workbook.save(arquivo)
+        arquivo.seek(0)
+        return FileResponse(
+            arquivo,
+            as_attachment=True,
+            filename=nome_arquivo,
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+
+    @staticmethod
+    def _formatador(model, caminho):
+        """Converte choices em rótulos e datas com fuso para horário local"""
+        campo = None
+        for parte in caminho.split('__'):
+            campo = model._meta.get_field(parte)
+            if campo.is_relation and campo.related_model is not None:
+                model = campo.related_model
+        rotulos = dict(campo.flatchoices) if campo is not None and campo.choices else None
+
+        def formatar(valor):
+            if rotulos is not None:
+                return rotulos.get(valor, valor)
+            if isinstance(valor, datetime.datetime) and timezone.is_aware(valor):
+                return timezone.localtime(valor).replace(tzinfo=None)
+            return valor
+
+        return formatar
@@ -0,0 +1,95 @@
+"""Classes de paginação compartilhadas pelas APIs."""
+from django.core.paginator import Paginator
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+
+
+class PaginadorContado(Paginator):
+    """Paginator do Django que aceita a contagem já feita (evita um segundo COUNT(*))"""
+
+    def __init__(self, object_list, per_page, total=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if total is not None:
+            self.count = total
+
+
+class PaginacaoCursor(CursorPagination):
+    """
+    Paginação por cursor (keyset): cada página é um WHERE sobre a coluna de
+    ordenação a partir da última posição vista, sem COUNT(*) nem OFFSET, então
+    o custo da página N não depende de N nem do tamanho da tabela.
+
+    A ordenação vem de `ordering` da view (via OrderingFilter) e deve começar
+    por uma coluna indexada, ex.: -data_pedido, -data_movimentacao, -data_hora.
+    A chave primária entra sempre como último critério: em colunas com valores
+    repetidos (?ordering=status, valor_total) o deslocamento do cursor dentro
+    do empate só é estável se a ordem das linhas empatadas for determinística.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not any(campo.lstrip('-') in ('pk', 'id') for campo in ordering):
+            ordering += ('-pk' if ordering[0].startswith('-') else 'pk',)
+        return ordering
+
+
+class PaginacaoPadrao(PageNumberPagination):
+    """
+    Paginação por número de página (padrão), com paginação por cursor opcional
+    por requisição: `?paginacao=cursor` na primeira página; as seguintes
+    seguem os links `next`/`previous`, que carregam o parâmetro `cursor`.
+
+    Só as views com `paginacao_cursor = True` aceitam o modo cursor.
+    """
+    modo_query_param = 'paginacao'
+
+    def __init__(self):
+        self.cursor = None
+        self.total_conhecido = None
+
+    def informar_total(self, total):
+        """Contagem do queryset já filtrado, calculada por quem chamou (ex: GetCondicionalMixin)"""
+        self.total_conhecido = total
+
+    def django_paginator_class(self, queryset, page_size):
+        return PaginadorContado(queryset, page_size, total=self.total_conhecido)
+
+    def usar_cursor(self, request, view):
+        if not getattr(view, 'paginacao_cursor', False):
+            return False
+        return (
+            request.query_params.get(self.modo_query_param) == 'cursor'
+            or PaginacaoCursor.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.usar_cursor(request, view):
+            self.cursor = PaginacaoCursor()
+            return self.cursor.paginate_queryset(queryset, request, view)
+        self.cursor = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor is not None:
+            return self.cursor.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        parametros = super().get_schema_operation_parameters(view)
+        if getattr(view, 'paginacao_cursor', False):
+            parametros += [
+                {
+                    'name': self.modo_query_param,
+                    'required': False,
+                    'in': 'query',
+                    'description': 'Use "cursor" para paginação por cursor (sem contagem total)',
+                    'schema': {'type': 'string', 'enum': ['cursor']},
+                },
+                {
+                    'name': PaginacaoCursor.cursor_query_param,
+                    'required': False,
+                    'in': 'query',
+                    'description': 'Cursor retornado nos links next/previous',
+                    'schema': {'type': 'string'},
+                },
+            ]
+        return parametros
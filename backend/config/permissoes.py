@@ -0,0 +1,10 @@
+"""Permissões compartilhadas pelas APIs."""
+from rest_framework.permissions import BasePermission
+
+
+class GerenteOuAdmin(BasePermission):
+    """Usuários do tipo gerente/admin ou da equipe (is_staff)"""
+
+    def has_permission(self, request, view):
+        usuario = request.user
+        return bool(usuario and (usuario.is_staff or getattr(usuario, 'tipo', None) in ('gerente', 'admin')))
@@ -75,6 +75,8 @@ INSTALLED_APPS = [
     'fornecedores',
     'usuarios',
     'auditoria',
+    'sequencias',
+    'importacao',
 ]
 
 MIDDLEWARE = [
@@ -120,6 +122,14 @@ DATABASES = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
         # conn_health_checks=True,  # Removido ou ajuste conforme necessário
+        'OPTIONS': {
+            'timeout': 20,  # segundos aguardando o lock de escrita do SQLite
+        },
+        'TEST': {
+            # Banco em arquivo (e não em memória compartilhada) para que os
+            # testes de concorrência esperem pelo lock em vez de falhar
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -189,7 +199,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'config.pagination.PaginacaoPadrao',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -302,6 +312,68 @@ SPECTACULAR_SETTINGS = {
     'SCHEMA_PATH_PREFIX': r'/api/',
 }
 
+# =============================================================================
+# SEQUÊNCIAS (numeração de pedidos e faturas)
+# =============================================================================
+
+# Quantidade de números reservada por processo a cada acesso ao contador.
+# 1 = números estritamente contíguos; valores maiores reduzem a disputa pela
+# linha do contador ao custo de lacunas quando um processo é reiniciado.
+SEQUENCIA_TAMANHO_BLOCO = config('SEQUENCIA_TAMANHO_BLOCO', default=1, cast=int)
+
+# =============================================================================
+# ESTOQUE
+# =============================================================================
+
+# Segundos de cache do total de produtos abaixo do mínimo (badge do dashboard).
+# O cache também é limpo quando o estoque muda neste processo.
+ESTOQUE_REPOSICAO_CACHE_TTL = config('ESTOQUE_REPOSICAO_CACHE_TTL', default=60, cast=int)
+
+# =============================================================================
+# PRODUTOS
+# =============================================================================
+
+# Variantes geradas de Produto.imagem (produtos/imagens.py): nome -> caixa
+# (largura, altura) em que a imagem é encaixada, sem ampliar nem cortar.
+PRODUTO_IMAGEM_VARIANTES = {
+    'thumb': (160, 160),
+    'card': (480, 480),
+    'zoom': (1600, 1600),
+}
+PRODUTO_IMAGEM_FORMATOS = ('webp', 'jpeg')
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+# Sem REDIS_URL o cache é local a cada processo (LocMem): serve a um único
+# worker. Com vários workers (gunicorn) use um cache compartilhado, senão a
+# invalidação do cache da API (config/cache_versionado.py) não chega aos
+# outros processos. O RedisCache exige o pacote `redis`.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Segundos que uma resposta do catálogo fica em cache. A invalidação é feita
+# pela versão dos models; o TTL só limita a memória ocupada por versões antigas.
+API_CACHE_TTL = config('API_CACHE_TTL', default=300, cast=int)
+
+# Segundos que uma requisição espera outra gerar a mesma resposta (proteção
+# contra estouro de requisições simultâneas) antes de gerá-la por conta própria.
+API_CACHE_ESPERA = config('API_CACHE_ESPERA', default=2.0, cast=float)
+
 # =============================================================================
 # LOGGING SETTINGS
 # =============================================================================
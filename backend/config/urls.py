@@ -28,6 +28,7 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
     SpectacularRedocView,
 )
+from config.cache_versionado import EstatisticasCacheView
 
 urlpatterns = [
     # Django Admin
@@ -52,6 +53,10 @@ urlpatterns = [
     path('api/', include('fornecedores.urls')),
     path('api/', include('usuarios.urls')),
     path('api/', include('auditoria.urls')),
+    path('api/', include('importacao.urls')),
+    
+    # Cache da API (acertos/falhas)
+    path('api/cache/estatisticas/', EstatisticasCacheView.as_view(), name='cache-estatisticas'),
 ]
 
 # Debug Toolbar (apenas em desenvolvimento)
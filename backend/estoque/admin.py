@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Estoque, MovimentacaoEstoque
+from .models import CamadaCusto, Estoque, FragmentoEstoque, MovimentacaoEstoque, SnapshotEstoque
 
 
 @admin.register(Estoque)
@@ -24,7 +24,7 @@ class MovimentacaoEstoqueAdmin(admin.ModelAdmin):
     list_display = ('produto', 'tipo', 'quantidade', 'motivo', 'usuario', 'data_movimentacao')
     list_filter = ('tipo', 'motivo', 'data_movimentacao')
     search_fields = ('produto__nome', 'produto__codigo_sku', 'observacoes')
-    readonly_fields = ('quantidade_anterior', 'quantidade_posterior', 'data_movimentacao')
+    readonly_fields = ('quantidade_anterior', 'quantidade_posterior', 'custo_fifo', 'data_movimentacao')
     
     fieldsets = (
         ('Movimentação', {
@@ -33,7 +33,33 @@ class MovimentacaoEstoqueAdmin(admin.ModelAdmin):
         ('Quantidades', {
             'fields': ('quantidade_anterior', 'quantidade_posterior')
         }),
+        ('Custos', {
+            'fields': ('custo_unitario', 'custo_fifo')
+        }),
         ('Detalhes', {
             'fields': ('observacoes', 'data_movimentacao')
         }),
     )
+
+
+@admin.register(SnapshotEstoque)
+class SnapshotEstoqueAdmin(admin.ModelAdmin):
+    list_display = ('produto', 'data_hora', 'quantidade', 'data_criacao')
+    list_filter = ('data_hora',)
+    search_fields = ('produto__nome', 'produto__codigo')
+    readonly_fields = ('produto', 'data_hora', 'quantidade', 'data_criacao')
+
+
+@admin.register(CamadaCusto)
+class CamadaCustoAdmin(admin.ModelAdmin):
+    list_display = ('produto', 'data_entrada', 'quantidade_original', 'quantidade_restante', 'custo_unitario')
+    list_filter = ('data_entrada',)
+    search_fields = ('produto__nome', 'produto__codigo')
+    readonly_fields = ('produto', 'movimentacao', 'data_entrada', 'quantidade_original', 'quantidade_restante', 'custo_unitario')
+
+
+@admin.register(FragmentoEstoque)
+class FragmentoEstoqueAdmin(admin.ModelAdmin):
+    list_display = ('produto', 'indice', 'quantidade')
+    search_fields = ('produto__nome', 'produto__codigo')
+    readonly_fields = ('produto', 'indice', 'quantidade')
@@ -0,0 +1,106 @@
+"""Comando Django para medir saídas concorrentes em um SKU com e sem contadores fragmentados."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection
+from usuarios.models import Usuario
+from produtos.models import Categoria, Produto
+from estoque.models import Estoque, MovimentacaoEstoque
+from estoque.services import (
+    EstoqueInsuficienteError,
+    configurar_fragmentos,
+    divergencias_estoque,
+    dobrar_fragmentos,
+    registrar_movimentacoes,
+)
+
+PREFIXO = 'BENCH-FRAGMENTOS'
+
+
+class Command(BaseCommand):
+    help = 'Mede a vazão de saídas simultâneas em um único SKU conforme a quantidade de fragmentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--saidas', type=int, default=400, help='Saídas de 1 unidade por rodada')
+        parser.add_argument('--threads', type=int, default=16, help='Threads simultâneas')
+        parser.add_argument(
+            '--fragmentos',
+            nargs='+',
+            type=int,
+            default=[0, 1, 4, 16],
+            help='Quantidades de fragmentos a medir (0 = linha única de estoque)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('=== BENCHMARK CONTADORES FRAGMENTADOS ===\n')
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                '⚠️ SQLite serializa todas as escritas no arquivo: espere vazão constante. '
+                'Meça em PostgreSQL/MySQL para ver o ganho dos fragmentos.\n'
+            ))
+        self.stdout.write(f'{"fragmentos":>10} | {"recusadas":>9} | {"segundos":>8} | {"saídas/s":>9} | saldo')
+
+        try:
+            for fragmentos in options['fragmentos']:
+                self._rodada(fragmentos, options)
+        finally:
+            self._limpar()
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark concluído (dados removidos)'))
+
+    def _rodada(self, fragmentos, options):
+        usuario, produto = self._criar_dados()
+        saldo = options['saidas']
+        registrar_movimentacoes([
+            MovimentacaoEstoque(produto=produto, tipo='entrada', quantidade=saldo, motivo='compra', usuario=usuario)
+        ])
+        configurar_fragmentos([produto.pk], fragmentos)
+
+        def vender(_):
+            try:
+                registrar_movimentacoes([
+                    MovimentacaoEstoque(produto=produto, tipo='saida', quantidade=1, motivo='venda', usuario=usuario)
+                ])
+                return True
+            except EstoqueInsuficienteError:
+                return False
+            finally:
+                connection.close()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            resultados = list(executor.map(vender, range(options['saidas'])))
+        duracao = time.perf_counter() - inicio
+
+        dobrar_fragmentos([produto.pk])
+        saldo_final = Estoque.objects.get(produto=produto).quantidade_atual
+        consistente = (
+            saldo_final == saldo - sum(resultados)
+            and not divergencias_estoque(produto.pk, produto.pk)
+        )
+        self.stdout.write(
+            f'{fragmentos:>10} | {len(resultados) - sum(resultados):>9} | {duracao:>8.2f} | '
+            f'{len(resultados) / duracao:>9.1f} | '
+            + ('OK' if consistente else self.style.ERROR('INCONSISTENTE'))
+        )
+        self._limpar()
+
+    def _criar_dados(self):
+        usuario = Usuario.objects.create(username=PREFIXO.lower())
+        categoria = Categoria.objects.create(nome=PREFIXO)
+        produto = Produto.objects.create(
+            codigo=f'{PREFIXO}-001',
+            nome='SKU em promoção',
+            categoria=categoria,
+            preco_custo=Decimal('10.00'),
+            preco_venda=Decimal('15.00'),
+        )
+        return usuario, produto
+
+    def _limpar(self):
+        produtos = Produto.objects.filter(codigo__startswith=PREFIXO)
+        MovimentacaoEstoque.objects.filter(produto__in=produtos).delete()
+        produtos.delete()
+        Categoria.objects.filter(nome=PREFIXO).delete()
+        Usuario.objects.filter(username=PREFIXO.lower()).delete()
@@ -0,0 +1,65 @@
+"""Comando Django para calcular demanda prevista e sugestões de reposição."""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from estoque import previsao
+
+
+class Command(BaseCommand):
+    help = 'Calcula demanda prevista, estoque mínimo e quantidade de reposição sugeridos (NumPy, em lote)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=90, help='Dias de histórico de saídas (padrão: 90)')
+        parser.add_argument(
+            '--metodo',
+            choices=previsao.METODOS,
+            default='exponencial',
+            help='Previsão da demanda diária (padrão: exponencial)'
+        )
+        parser.add_argument('--alpha', type=float, default=0.3, help='Suavização exponencial (padrão: 0.3)')
+        parser.add_argument(
+            '--janela',
+            type=int,
+            default=28,
+            help='Dias da média móvel e do desvio padrão (padrão: 28)'
+        )
+        parser.add_argument(
+            '--nivel-servico',
+            type=float,
+            default=0.95,
+            help='Probabilidade de não faltar durante o prazo de reposição (padrão: 0.95)'
+        )
+        parser.add_argument(
+            '--cobertura',
+            type=int,
+            default=30,
+            help='Dias de demanda cobertos por uma reposição (padrão: 30)'
+        )
+        parser.add_argument(
+            '--aplicar-minimo',
+            action='store_true',
+            help='Também substitui quantidade_minima pelo mínimo sugerido'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            resultado = previsao.atualizar_sugestoes(
+                dias=options['dias'],
+                aplicar_minimo=options['aplicar_minimo'],
+                metodo=options['metodo'],
+                alpha=options['alpha'],
+                janela=options['janela'],
+                nivel_servico=options['nivel_servico'],
+                cobertura=options['cobertura'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        duracao = time.perf_counter() - inicio
+
+        total = len(resultado['pks'])
+        com_demanda = int((resultado['demanda'] > 0).sum())
+        repor = int((resultado['reposicao'] > 0).sum())
+        self.stdout.write(f'Produtos: {total} | com demanda: {com_demanda} | a repor: {repor}')
+        if options['aplicar_minimo']:
+            self.stdout.write('Quantidade mínima atualizada com o valor sugerido')
+        self.stdout.write(self.style.SUCCESS(f'✅ Sugestões calculadas em {duracao:.2f}s'))
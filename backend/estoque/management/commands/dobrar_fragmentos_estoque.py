@@ -0,0 +1,16 @@
+"""Comando Django para dobrar os contadores fragmentados em Estoque.quantidade_atual."""
+from django.core.management.base import BaseCommand
+from estoque.services import dobrar_fragmentos
+
+
+class Command(BaseCommand):
+    help = (
+        'Soma os fragmentos em quantidade_atual, zera os fragmentos e calcula os custos '
+        'pendentes das movimentações de produtos fragmentados. Agende periodicamente'
+    )
+
+    def handle(self, *args, **options):
+        produtos, movimentacoes = dobrar_fragmentos()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {produtos} produto(s) dobrado(s), {movimentacoes} movimentação(ões) com custo calculado'
+        ))
@@ -0,0 +1,40 @@
+"""Comando Django para ligar/desligar contadores fragmentados de estoque."""
+from django.core.management.base import BaseCommand, CommandError
+from produtos.models import Produto
+from estoque.services import configurar_fragmentos
+
+
+class Command(BaseCommand):
+    help = (
+        'Divide o saldo de produtos muito disputados (ex: em promoção) em N contadores '
+        'para que vendas simultâneas não esperem pela mesma linha de estoque. '
+        'Use --fragmentos 0 para desligar'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('codigos', nargs='+', help='Códigos dos produtos')
+        parser.add_argument(
+            '--fragmentos',
+            type=int,
+            required=True,
+            help='Quantidade de contadores por produto (0 desliga)'
+        )
+
+    def handle(self, *args, **options):
+        fragmentos = options['fragmentos']
+        if not 0 <= fragmentos <= 256:
+            raise CommandError('--fragmentos deve estar entre 0 e 256')
+
+        produtos = dict(Produto.objects.filter(codigo__in=options['codigos']).values_list('codigo', 'pk'))
+        faltando = sorted(set(options['codigos']) - set(produtos))
+        if faltando:
+            raise CommandError(f'Produto(s) não encontrado(s): {", ".join(faltando)}')
+
+        configurar_fragmentos(produtos.values(), fragmentos)
+        if fragmentos:
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {len(produtos)} produto(s) com {fragmentos} fragmento(s). '
+                'Agende dobrar_fragmentos_estoque (ex: a cada minuto)'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ Fragmentação desligada em {len(produtos)} produto(s)'))
@@ -0,0 +1,48 @@
+"""Comando Django para gravar snapshots de saldo a partir do razão de estoque."""
+import datetime
+from django.core.management.base import BaseCommand
+from estoque.models import SnapshotEstoque
+from estoque.services import gerar_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Grava snapshots de saldo por produto (base de /api/estoques/historico/). '
+        'Agende periodicamente (ex: cron diário com --diario)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--a-cada',
+            type=int,
+            default=None,
+            help='Grava um snapshot a cada N movimentações do produto'
+        )
+        parser.add_argument(
+            '--diario',
+            action='store_true',
+            help='Grava um snapshot no fechamento de cada dia com movimentação'
+        )
+        parser.add_argument(
+            '--margem',
+            type=int,
+            default=5,
+            help='Ignora movimentações dos últimos N minutos (padrão: 5)'
+        )
+        parser.add_argument(
+            '--reconstruir',
+            action='store_true',
+            help='Apaga os snapshots existentes e reconstrói a partir de todo o razão'
+        )
+
+    def handle(self, *args, **options):
+        if options['reconstruir']:
+            removidos, _ = SnapshotEstoque.objects.all().delete()
+            self.stdout.write(f'🗑️ {removidos} snapshot(s) removido(s)')
+
+        gravados = gerar_snapshots(
+            a_cada=options['a_cada'],
+            diario=options['diario'],
+            margem=datetime.timedelta(minutes=options['margem']),
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ {gravados} snapshot(s) gravado(s)'))
@@ -0,0 +1,81 @@
+"""Comando Django para conferir os saldos de estoque contra o razão de movimentações."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from estoque.services import faixas_produtos, divergencias_estoque, corrigir_divergencias
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara Estoque.quantidade_atual com a soma das movimentações de cada produto '
+        '(agregada no banco, por faixas de produtos) e lista as divergências'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corrigir',
+            action='store_true',
+            help='Iguala o saldo dos estoques divergentes ao razão'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Produtos por faixa/consulta (padrão: 1000)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Faixas processadas em paralelo, cada uma com sua conexão (padrão: 1)'
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1 or options['workers'] < 1:
+            raise CommandError('--lote e --workers devem ser maiores que zero')
+
+        inicio = time.perf_counter()
+        faixas = faixas_produtos(options['lote'])
+        corrigir = options['corrigir']
+
+        def processar(faixa):
+            divergencias = divergencias_estoque(*faixa)
+            corrigidos = corrigir_divergencias(*faixa) if corrigir and divergencias else 0
+            return divergencias, corrigidos
+
+        def processar_em_thread(faixa):
+            # Cada thread abre a própria conexão; fecha ao terminar a faixa
+            try:
+                return processar(faixa)
+            finally:
+                connection.close()
+
+        total_divergentes = 0
+        total_corrigidos = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            if options['workers'] > 1:
+                resultados = executor.map(processar_em_thread, faixas)
+            else:
+                resultados = map(processar, faixas)
+            for divergencias, corrigidos in resultados:
+                for produto_id, codigo, atual, razao in divergencias:
+                    self.stdout.write(
+                        f'{codigo} (produto {produto_id}): estoque {atual} | razão {razao} | '
+                        f'diferença {atual - razao:+d}'
+                    )
+                total_divergentes += len(divergencias)
+                total_corrigidos += corrigidos
+
+        duracao = time.perf_counter() - inicio
+        resumo = f'{len(faixas)} faixa(s) em {duracao:.2f}s'
+        if not total_divergentes:
+            self.stdout.write(self.style.SUCCESS(f'✅ Estoque consistente com o razão ({resumo})'))
+        elif corrigir:
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {total_corrigidos} de {total_divergentes} estoque(s) corrigido(s) ({resumo})'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️ {total_divergentes} estoque(s) divergente(s) do razão ({resumo}); use --corrigir'
+            ))
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0002_initial'),
+        ('produtos', '0002_categoria_data_atualizacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimentacaoestoque',
+            index=models.Index(fields=['-data_movimentacao'], name='estoque_mov_data_mo_3d05e9_idx'),
+        ),
+    ]
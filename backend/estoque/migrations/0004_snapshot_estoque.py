@@ -0,0 +1,34 @@
+# Generated by Django 5.0.7 on 2026-10-18 16:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0003_movimentacao_indice_data'),
+        ('produtos', '0002_categoria_data_atualizacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_hora', models.DateTimeField(verbose_name='Data/Hora')),
+                ('quantidade', models.IntegerField(verbose_name='Quantidade')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots_estoque', to='produtos.produto', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Estoque',
+                'verbose_name_plural': 'Snapshots de Estoque',
+                'ordering': ['produto', '-data_hora'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotestoque',
+            constraint=models.UniqueConstraint(fields=('produto', 'data_hora'), name='snapshot_estoque_produto_data_unico'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.7 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0004_snapshot_estoque'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estoque',
+            name='demanda_diaria_prevista',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Demanda Diária Prevista'),
+        ),
+        migrations.AddField(
+            model_name='estoque',
+            name='prazo_reposicao',
+            field=models.PositiveSmallIntegerField(default=7, help_text='Dias entre o pedido ao fornecedor e a chegada da mercadoria', verbose_name='Prazo de Reposição (dias)'),
+        ),
+        migrations.AddField(
+            model_name='estoque',
+            name='quantidade_minima_sugerida',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Quantidade Mínima Sugerida'),
+        ),
+        migrations.AddField(
+            model_name='estoque',
+            name='quantidade_reposicao_sugerida',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Quantidade de Reposição Sugerida'),
+        ),
+        migrations.AddField(
+            model_name='estoque',
+            name='sugestao_calculada_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Sugestão Calculada em'),
+        ),
+    ]
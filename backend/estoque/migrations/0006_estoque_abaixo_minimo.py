@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-18 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0005_estoque_sugestao_reposicao'),
+        ('produtos', '0002_categoria_data_atualizacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estoque',
+            name='abaixo_minimo',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(quantidade_atual__lte=models.F('quantidade_minima'), then=models.Value(True)), default=models.Value(False)), output_field=models.BooleanField(), verbose_name='Abaixo do Mínimo'),
+        ),
+        migrations.AddIndex(
+            model_name='estoque',
+            index=models.Index(condition=models.Q(('abaixo_minimo', True)), fields=['produto'], name='estoque_abaixo_minimo_idx'),
+        ),
+    ]
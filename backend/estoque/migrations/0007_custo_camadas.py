@@ -0,0 +1,84 @@
+# Generated by Django 5.0.7 on 2026-10-18 16:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def abrir_camadas(apps, schema_editor):
+    """Saldo já existente entra como camada de abertura ao preço de custo do produto"""
+    Estoque = apps.get_model('estoque', 'Estoque')
+    CamadaCusto = apps.get_model('estoque', 'CamadaCusto')
+    Produto = apps.get_model('produtos', 'Produto')
+
+    preco_custo = models.Subquery(
+        Produto.objects.filter(pk=models.OuterRef('produto_id')).values('preco_custo')[:1]
+    )
+    Estoque.objects.update(custo_medio=preco_custo)
+    Estoque.objects.update(valor_fifo=models.F('quantidade_atual') * models.F('custo_medio'))
+
+    lote = []
+    abertos = Estoque.objects.filter(quantidade_atual__gt=0).values_list(
+        'produto_id', 'quantidade_atual', 'custo_medio', 'ultima_atualizacao'
+    )
+    for produto_id, quantidade, custo, data in abertos.iterator(chunk_size=2000):
+        lote.append(CamadaCusto(
+            produto_id=produto_id,
+            data_entrada=data,
+            quantidade_original=quantidade,
+            quantidade_restante=quantidade,
+            custo_unitario=custo,
+        ))
+        if len(lote) >= 2000:
+            CamadaCusto.objects.bulk_create(lote)
+            lote = []
+    CamadaCusto.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0006_estoque_abaixo_minimo'),
+        ('produtos', '0002_categoria_data_atualizacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estoque',
+            name='custo_medio',
+            field=models.DecimalField(decimal_places=4, default=0, help_text='Custo médio ponderado da unidade em estoque', max_digits=14, verbose_name='Custo Médio'),
+        ),
+        migrations.AddField(
+            model_name='estoque',
+            name='valor_fifo',
+            field=models.DecimalField(decimal_places=4, default=0, help_text='Soma das camadas de custo em aberto (primeiro a entrar, primeiro a sair)', max_digits=18, verbose_name='Valor (PEPS)'),
+        ),
+        migrations.AddField(
+            model_name='movimentacaoestoque',
+            name='custo_fifo',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=18, null=True, verbose_name='Custo Total (PEPS)'),
+        ),
+        migrations.AddField(
+            model_name='movimentacaoestoque',
+            name='custo_unitario',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True, verbose_name='Custo Unitário'),
+        ),
+        migrations.CreateModel(
+            name='CamadaCusto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_entrada', models.DateTimeField(verbose_name='Data de Entrada')),
+                ('quantidade_original', models.IntegerField(verbose_name='Quantidade Original')),
+                ('quantidade_restante', models.IntegerField(verbose_name='Quantidade Restante')),
+                ('custo_unitario', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Custo Unitário')),
+                ('movimentacao', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='camadas_custo', to='estoque.movimentacaoestoque', verbose_name='Movimentação de Entrada')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='camadas_custo', to='produtos.produto', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Camada de Custo',
+                'verbose_name_plural': 'Camadas de Custo',
+                'ordering': ['produto', 'data_entrada', 'id'],
+                'indexes': [models.Index(condition=models.Q(('quantidade_restante__gt', 0)), fields=['produto', 'data_entrada', 'id'], name='camada_custo_aberta_idx')],
+            },
+        ),
+        migrations.RunPython(abrir_camadas, migrations.RunPython.noop),
+    ]
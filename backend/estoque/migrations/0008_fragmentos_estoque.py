@@ -0,0 +1,53 @@
+# Generated by Django 5.0.7 on 2026-10-18 16:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0007_custo_camadas'),
+        ('produtos', '0002_categoria_data_atualizacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FragmentoEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.PositiveSmallIntegerField(verbose_name='Índice')),
+                ('quantidade', models.IntegerField(default=0, verbose_name='Quantidade')),
+            ],
+            options={
+                'verbose_name': 'Fragmento de Estoque',
+                'verbose_name_plural': 'Fragmentos de Estoque',
+                'ordering': ['produto', 'indice'],
+            },
+        ),
+        migrations.AddField(
+            model_name='estoque',
+            name='fragmentos',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Contadores paralelos para produtos muito disputados (0 = desligado). Configure com o comando fragmentar_estoque', verbose_name='Fragmentos'),
+        ),
+        migrations.AddField(
+            model_name='movimentacaoestoque',
+            name='custo_pendente',
+            field=models.BooleanField(default=False, verbose_name='Custo Pendente'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacaoestoque',
+            index=models.Index(condition=models.Q(('custo_pendente', True)), fields=['produto', 'data_movimentacao'], name='mov_custo_pendente_idx'),
+        ),
+        migrations.AddField(
+            model_name='fragmentoestoque',
+            name='produto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fragmentos_estoque', to='produtos.produto', verbose_name='Produto'),
+        ),
+        migrations.AddConstraint(
+            model_name='fragmentoestoque',
+            constraint=models.UniqueConstraint(fields=('produto', 'indice'), name='fragmento_estoque_produto_indice_unico'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0008_fragmentos_estoque'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fragmentoestoque',
+            name='ultima_atualizacao',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última Atualização'),
+        ),
+    ]
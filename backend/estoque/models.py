@@ -39,12 +39,73 @@ class Estoque(models.Model):
         null=True,
         help_text='Ex: Prateleira A3, Galpão 2, etc.'
     )
+    fragmentos = models.PositiveSmallIntegerField(
+        'Fragmentos',
+        default=0,
+        help_text=(
+            'Contadores paralelos para produtos muito disputados (0 = desligado). '
+            'Configure com o comando fragmentar_estoque'
+        )
+    )
+    prazo_reposicao = models.PositiveSmallIntegerField(
+        'Prazo de Reposição (dias)',
+        default=7,
+        help_text='Dias entre o pedido ao fornecedor e a chegada da mercadoria'
+    )
+    
+    # Sugestões calculadas pelo comando calcular_reposicao (estoque/previsao.py)
+    demanda_diaria_prevista = models.DecimalField(
+        'Demanda Diária Prevista',
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True
+    )
+    quantidade_minima_sugerida = models.IntegerField('Quantidade Mínima Sugerida', null=True, blank=True)
+    quantidade_reposicao_sugerida = models.IntegerField('Quantidade de Reposição Sugerida', null=True, blank=True)
+    sugestao_calculada_em = models.DateTimeField('Sugestão Calculada em', null=True, blank=True)
+    
+    # Custos mantidos por registrar_movimentacoes a cada entrada/saída
+    custo_medio = models.DecimalField(
+        'Custo Médio',
+        max_digits=14,
+        decimal_places=4,
+        default=0,
+        help_text='Custo médio ponderado da unidade em estoque'
+    )
+    valor_fifo = models.DecimalField(
+        'Valor (PEPS)',
+        max_digits=18,
+        decimal_places=4,
+        default=0,
+        help_text='Soma das camadas de custo em aberto (primeiro a entrar, primeiro a sair)'
+    )
+    
     ultima_atualizacao = models.DateTimeField('Última Atualização', auto_now=True)
     
+    # Mantido pelo próprio banco a cada escrita (inclusive UPDATEs com F()),
+    # para que "abaixo do mínimo" use o índice parcial abaixo
+    abaixo_minimo = models.GeneratedField(
+        expression=models.Case(
+            models.When(quantidade_atual__lte=models.F('quantidade_minima'), then=models.Value(True)),
+            default=models.Value(False),
+        ),
+        output_field=models.BooleanField(),
+        db_persist=True,
+        verbose_name='Abaixo do Mínimo'
+    )
+    
     class Meta:
         verbose_name = 'Estoque'
         verbose_name_plural = 'Estoques'
         ordering = ['produto__nome']
+        indexes = [
+            models.Index(
+                fields=['produto'],
+                condition=models.Q(abaixo_minimo=True),
+                name='estoque_abaixo_minimo_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"Estoque: {self.produto.nome} - Qtd: {self.quantidade_atual}"
@@ -59,6 +120,11 @@ class Estoque(models.Model):
         """Alias para ultima_atualizacao (compatibilidade admin)"""
         return self.ultima_atualizacao
     
+    @property
+    def valor_medio(self):
+        """Valor do estoque pelo custo médio ponderado"""
+        return self.quantidade_atual * self.custo_medio
+    
     @property
     def precisa_reposicao(self):
         """Verifica se o estoque está abaixo do mínimo"""
@@ -125,36 +191,164 @@ class MovimentacaoEstoque(models.Model):
     quantidade_anterior = models.IntegerField('Quantidade Anterior', default=0)
     quantidade_posterior = models.IntegerField('Quantidade Posterior', default=0)
     
+    # Custos: na entrada, custo_unitario é o custo informado (padrão: preço de
+    # custo do produto); na saída, o custo médio vigente. custo_fifo é o custo
+    # total da linha pelas camadas PEPS (na saída, o CMV consumido).
+    custo_unitario = models.DecimalField(
+        'Custo Unitário',
+        max_digits=14,
+        decimal_places=4,
+        null=True,
+        blank=True
+    )
+    custo_fifo = models.DecimalField(
+        'Custo Total (PEPS)',
+        max_digits=18,
+        decimal_places=4,
+        null=True,
+        blank=True
+    )
+    # Movimentação de produto fragmentado: custos e saldos anterior/posterior
+    # definitivos são calculados na dobra (services.dobrar_fragmentos)
+    custo_pendente = models.BooleanField('Custo Pendente', default=False)
+    
     class Meta:
         verbose_name = 'Movimentação de Estoque'
         verbose_name_plural = 'Movimentações de Estoque'
         ordering = ['-data_movimentacao']
         indexes = [
             models.Index(fields=['produto', '-data_movimentacao']),
+            models.Index(fields=['-data_movimentacao']),
             models.Index(fields=['tipo']),
             models.Index(fields=['motivo']),
+            models.Index(
+                fields=['produto', 'data_movimentacao'],
+                condition=models.Q(custo_pendente=True),
+                name='mov_custo_pendente_idx'
+            ),
         ]
     
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.produto.nome} - Qtd: {self.quantidade}"
     
     def save(self, *args, **kwargs):
-        """Atualiza o estoque automaticamente ao salvar a movimentação"""
-        estoque, created = Estoque.objects.get_or_create(produto=self.produto)
-        
-        # Registra quantidade anterior
-        self.quantidade_anterior = estoque.quantidade_atual
-        
-        # Atualiza estoque
-        if self.tipo == 'entrada':
-            estoque.quantidade_atual += self.quantidade
-        else:  # saída
-            estoque.quantidade_atual -= self.quantidade
-            if estoque.quantidade_atual < 0:
-                raise ValueError('Quantidade em estoque insuficiente!')
-        
-        # Registra quantidade posterior
-        self.quantidade_posterior = estoque.quantidade_atual
-        
-        estoque.save()
+        """
+        Ao incluir, aplica a movimentação ao estoque pelo serviço de lote
+        (UPDATE atômico com F() e saldos anterior/posterior). Alterações
+        posteriores não movimentam o estoque novamente.
+        """
+        if self._state.adding and self.pk is None:
+            from .services import registrar_movimentacoes
+            registrar_movimentacoes([self])
+            return
         super().save(*args, **kwargs)
+
+
+class FragmentoEstoque(models.Model):
+    """
+    Contador parcial do saldo de um produto fragmentado.
+
+    Com Estoque.fragmentos = N, cada movimentação soma seu delta em um dos N
+    fragmentos escolhido ao acaso (sem bloquear a linha de Estoque); o saldo
+    é quantidade_atual + soma dos fragmentos até a próxima dobra, que leva a
+    soma para quantidade_atual e zera os fragmentos.
+    """
+    
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='fragmentos_estoque',
+        verbose_name='Produto'
+    )
+    indice = models.PositiveSmallIntegerField('Índice')
+    quantidade = models.IntegerField('Quantidade', default=0)
+    # Gravada a cada delta (que não toca a linha de Estoque): entra no
+    # ETag das listagens de estoque e de produtos
+    ultima_atualizacao = models.DateTimeField('Última Atualização', auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Fragmento de Estoque'
+        verbose_name_plural = 'Fragmentos de Estoque'
+        ordering = ['produto', 'indice']
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'indice'], name='fragmento_estoque_produto_indice_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.produto_id}[{self.indice}]: {self.quantidade:+d}"
+
+
+class SnapshotEstoque(models.Model):
+    """
+    Saldo de um produto em um instante, derivado do razão de movimentações.
+
+    Cobre todas as movimentações do produto com data_movimentacao <= data_hora;
+    consultas históricas partem do snapshot mais próximo e reproduzem apenas
+    as movimentações seguintes. Gerado pelo comando gerar_snapshots_estoque.
+    """
+    
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='snapshots_estoque',
+        verbose_name='Produto'
+    )
+    data_hora = models.DateTimeField('Data/Hora')
+    quantidade = models.IntegerField('Quantidade')
+    data_criacao = models.DateTimeField('Data de Criação', auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Snapshot de Estoque'
+        verbose_name_plural = 'Snapshots de Estoque'
+        ordering = ['produto', '-data_hora']
+        constraints = [
+            # Também serve de índice para "último snapshot do produto até D"
+            models.UniqueConstraint(fields=['produto', 'data_hora'], name='snapshot_estoque_produto_data_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.produto_id} em {self.data_hora:%d/%m/%Y %H:%M}: {self.quantidade}"
+
+
+class CamadaCusto(models.Model):
+    """
+    Camada de custo PEPS: o que resta de uma entrada ao seu custo unitário.
+
+    Criada a cada entrada e consumida, da mais antiga para a mais nova, pelas
+    saídas (ver registrar_movimentacoes). Camadas esgotadas ficam com
+    quantidade_restante = 0 e saem do índice parcial de camadas abertas.
+    """
+    
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='camadas_custo',
+        verbose_name='Produto'
+    )
+    movimentacao = models.ForeignKey(
+        MovimentacaoEstoque,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='camadas_custo',
+        verbose_name='Movimentação de Entrada'
+    )
+    data_entrada = models.DateTimeField('Data de Entrada')
+    quantidade_original = models.IntegerField('Quantidade Original')
+    quantidade_restante = models.IntegerField('Quantidade Restante')
+    custo_unitario = models.DecimalField('Custo Unitário', max_digits=14, decimal_places=4)
+    
+    class Meta:
+        verbose_name = 'Camada de Custo'
+        verbose_name_plural = 'Camadas de Custo'
+        ordering = ['produto', 'data_entrada', 'id']
+        indexes = [
+            models.Index(
+                fields=['produto', 'data_entrada', 'id'],
+                condition=models.Q(quantidade_restante__gt=0),
+                name='camada_custo_aberta_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.produto_id}: {self.quantidade_restante}/{self.quantidade_original} a {self.custo_unitario}"
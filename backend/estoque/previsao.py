@@ -0,0 +1,175 @@
+"""
+Previsão de demanda e ponto de reposição, calculados em lote com NumPy.
+
+O histórico de saídas é agregado por produto/dia no banco e carregado em
+uma matriz [produto, dia]; demanda, desvio, estoque de segurança e
+quantidades sugeridas são operações sobre a matriz inteira (sem laço por
+produto), e o resultado volta ao banco com um UPDATE parametrizado em lote
+(services.gravar_em_lote).
+"""
+import datetime
+import math
+from decimal import Decimal
+from statistics import NormalDist
+import numpy as np
+from django.db import models, transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Estoque, MovimentacaoEstoque
+from .services import gravar_em_lote, invalidar_caches_estoque
+
+# Saídas que representam demanda (perdas e ajustes não entram na previsão)
+MOTIVOS_DEMANDA = ('venda',)
+
+METODOS = ('exponencial', 'media_movel')
+
+
+def carregar_estoques():
+    """Arrays (pk, produto_id, quantidade_atual, prazo_reposicao) ordenados por produto_id"""
+    linhas = list(
+        Estoque.objects.order_by('produto_id').values_list(
+            'pk', 'produto_id', 'quantidade_atual', 'prazo_reposicao'
+        )
+    )
+    dados = np.array(linhas, dtype=np.int64).reshape(-1, 4)
+    return dados[:, 0], dados[:, 1], dados[:, 2], dados[:, 3]
+
+
+def carregar_demanda(produto_ids, dias, fim=None, motivos=MOTIVOS_DEMANDA):
+    """
+    Matriz [len(produto_ids), dias] com a soma das saídas de cada produto nos
+    `dias` dias anteriores a `fim` (data local, exclusiva; padrão: hoje).
+    `produto_ids` deve estar ordenado.
+    """
+    fim = fim or timezone.localdate()
+    inicio = fim - datetime.timedelta(days=dias)
+    matriz = np.zeros((len(produto_ids), dias))
+    if not len(produto_ids) or not dias:
+        return matriz
+
+    linhas = list(
+        MovimentacaoEstoque.objects.order_by().filter(
+            tipo='saida',
+            motivo__in=motivos,
+            data_movimentacao__gte=timezone.make_aware(datetime.datetime.combine(inicio, datetime.time.min)),
+            data_movimentacao__lt=timezone.make_aware(datetime.datetime.combine(fim, datetime.time.min)),
+        ).annotate(
+            dia=TruncDate('data_movimentacao')
+        ).values('produto_id', 'dia').annotate(
+            total=models.Sum('quantidade')
+        ).values_list('produto_id', 'dia', 'total')
+    )
+    if not linhas:
+        return matriz
+
+    produtos, datas, totais = (np.array(coluna) for coluna in zip(*linhas))
+    posicoes = np.searchsorted(produto_ids, produtos)
+    conhecidos = posicoes < len(produto_ids)
+    conhecidos[conhecidos] = produto_ids[posicoes[conhecidos]] == produtos[conhecidos]
+    colunas = (datas.astype('datetime64[D]') - np.datetime64(inicio, 'D')).astype(np.int64)
+
+    np.add.at(matriz, (posicoes[conhecidos], colunas[conhecidos]), totais[conhecidos].astype(float))
+    return matriz
+
+
+def calcular_sugestoes(matriz, quantidade_atual, prazo_reposicao, metodo='exponencial', alpha=0.3,
+                       janela=28, nivel_servico=0.95, cobertura=30):
+    """
+    Calcula, para todas as linhas da matriz de demanda diária:
+
+    - demanda: média móvel dos últimos `janela` dias ou suavização
+      exponencial simples (`alpha`) sobre todo o histórico;
+    - seguranca: z(nivel_servico) * desvio diário * raiz(prazo);
+    - minimo: ponto de pedido = demanda * prazo + segurança;
+    - reposicao: quanto pedir agora para voltar a minimo + `cobertura` dias
+      de demanda (zero se o saldo está acima do ponto de pedido).
+
+    Retorna um dict de arrays alinhados às linhas da matriz.
+    """
+    if metodo not in METODOS:
+        raise ValueError(f'Método inválido: {metodo}. Use: {", ".join(METODOS)}')
+    if not 0 < alpha <= 1:
+        raise ValueError('alpha deve estar em (0, 1]')
+    if not 0 < nivel_servico < 1:
+        raise ValueError('nivel_servico deve estar em (0, 1)')
+
+    produtos, dias = matriz.shape
+    if not dias:
+        demanda = desvio = np.zeros(produtos)
+    else:
+        recente = matriz[:, -min(janela, dias):]
+        if metodo == 'media_movel':
+            demanda = recente.mean(axis=1)
+        else:
+            # Nível final da suavização exponencial em forma fechada:
+            # pesos alpha*(1-alpha)^k a partir do dia mais recente; o dia mais
+            # antigo (valor inicial) fica com o peso restante (1-alpha)^(dias-1)
+            pesos = alpha * (1 - alpha) ** np.arange(dias - 1, -1, -1, dtype=float)
+            pesos[0] = (1 - alpha) ** (dias - 1)
+            demanda = matriz @ pesos
+        desvio = recente.std(axis=1, ddof=1) if recente.shape[1] > 1 else np.zeros(produtos)
+
+    z = NormalDist().inv_cdf(nivel_servico)
+    prazo = np.asarray(prazo_reposicao, dtype=float)
+    seguranca = z * desvio * np.sqrt(prazo)
+    minimo = np.ceil(demanda * prazo + seguranca).astype(np.int64)
+    alvo = minimo + np.ceil(demanda * cobertura).astype(np.int64)
+    atual = np.asarray(quantidade_atual, dtype=np.int64)
+    reposicao = np.where(atual <= minimo, np.maximum(alvo - atual, 0), 0)
+
+    return {
+        'demanda': demanda,
+        'seguranca': seguranca,
+        'minimo': minimo,
+        'reposicao': reposicao,
+    }
+
+
+def atualizar_sugestoes(dias=90, fim=None, aplicar_minimo=False, **parametros):
+    """
+    Carrega estoques e histórico, calcula as sugestões e grava
+    demanda_diaria_prevista, quantidade_minima_sugerida e
+    quantidade_reposicao_sugerida (e quantidade_minima, se `aplicar_minimo`)
+    em lote. `parametros` vão para calcular_sugestoes.
+
+    Retorna o dict de calcular_sugestoes acrescido de `pks`.
+    """
+    pks, produto_ids, atuais, prazos = carregar_estoques()
+    matriz = carregar_demanda(produto_ids, dias, fim=fim)
+    resultado = calcular_sugestoes(matriz, atuais, prazos, **parametros)
+    resultado['pks'] = pks
+
+    campos = [
+        'demanda_diaria_prevista',
+        'quantidade_minima_sugerida',
+        'quantidade_reposicao_sugerida',
+        'sugestao_calculada_em',
+        'ultima_atualizacao',  # mantém ETag/Last-Modified da API coerentes
+    ]
+    if aplicar_minimo:
+        campos.append('quantidade_minima')
+
+    agora = timezone.now()
+    demandas = np.round(resultado['demanda'], 2).tolist()
+    minimos = resultado['minimo'].tolist()
+    reposicoes = resultado['reposicao'].tolist()
+
+    def linhas():
+        for pk, demanda, minimo, reposicao in zip(pks.tolist(), demandas, minimos, reposicoes):
+            valores = [
+                Decimal(str(demanda)) if math.isfinite(demanda) else None,
+                minimo,
+                reposicao,
+                agora,
+                agora,
+            ]
+            if aplicar_minimo:
+                valores.append(minimo)
+            yield pk, valores
+
+    with transaction.atomic():
+        gravar_em_lote(Estoque, linhas(), campos)
+        if aplicar_minimo:
+            transaction.on_commit(invalidar_caches_estoque)
+
+    return resultado
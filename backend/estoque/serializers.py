@@ -1,6 +1,16 @@
 from rest_framework import serializers
 from .models import Estoque, MovimentacaoEstoque
-from produtos.serializers import ProdutoListSerializer
+from .services import registrar_movimentacoes
+from produtos.models import Produto
+from produtos.serializers import ProdutoListSerializer, ProdutoEmLoteField
+
+
+def validar_custo_unitario(data):
+    """Custo unitário só é informado na entrada; na saída vem do custo médio"""
+    if data.get('custo_unitario') is not None and data.get('tipo') != 'entrada':
+        raise serializers.ValidationError({
+            'custo_unitario': 'O custo unitário só pode ser informado em entradas'
+        })
 
 
 class EstoqueSerializer(serializers.ModelSerializer):
@@ -15,6 +25,9 @@ class EstoqueSerializer(serializers.ModelSerializer):
     precisa_reposicao = serializers.ReadOnlyField()
     percentual_ocupacao = serializers.ReadOnlyField()
     status_estoque = serializers.ReadOnlyField()
+    valor_medio = serializers.DecimalField(max_digits=20, decimal_places=4, read_only=True)
+    # Saldo ainda nos fragmentos (produtos fragmentados, até a próxima dobra)
+    quantidade_em_fragmentos = serializers.IntegerField(read_only=True, default=0)
     
     class Meta:
         model = Estoque
@@ -24,16 +37,37 @@ class EstoqueSerializer(serializers.ModelSerializer):
             'produto_detail',
             'quantidade_atual',
             'quantidade',
+            'quantidade_em_fragmentos',
+            'fragmentos',
             'quantidade_minima',
             'quantidade_maxima',
             'localizacao',
+            'prazo_reposicao',
+            'demanda_diaria_prevista',
+            'quantidade_minima_sugerida',
+            'quantidade_reposicao_sugerida',
+            'sugestao_calculada_em',
+            'custo_medio',
+            'valor_medio',
+            'valor_fifo',
             'ultima_atualizacao',
             'data_atualizacao',
+            'abaixo_minimo',
             'precisa_reposicao',
             'percentual_ocupacao',
             'status_estoque',
         ]
-        read_only_fields = ['id', 'ultima_atualizacao']
+        read_only_fields = [
+            'id',
+            'fragmentos',
+            'demanda_diaria_prevista',
+            'quantidade_minima_sugerida',
+            'quantidade_reposicao_sugerida',
+            'sugestao_calculada_em',
+            'custo_medio',
+            'valor_fifo',
+            'ultima_atualizacao',
+        ]
     
     def validate(self, data):
         """Validações do estoque"""
@@ -78,8 +112,10 @@ class MovimentacaoEstoqueSerializer(serializers.ModelSerializer):
             'observacoes',
             'quantidade_anterior',
             'quantidade_posterior',
+            'custo_unitario',
+            'custo_fifo',
         ]
-        read_only_fields = ['id', 'data_movimentacao', 'quantidade_anterior', 'quantidade_posterior']
+        read_only_fields = ['id', 'data_movimentacao', 'quantidade_anterior', 'quantidade_posterior', 'custo_fifo']
     
     def validate_quantidade(self, value):
         """Validar quantidade positiva"""
@@ -89,6 +125,8 @@ class MovimentacaoEstoqueSerializer(serializers.ModelSerializer):
     
     def validate(self, data):
         """Validações da movimentação"""
+        validar_custo_unitario(data)
+        
         # Validar que há estoque suficiente para saída
         if data.get('tipo') == 'saida':
             produto = data.get('produto')
@@ -121,3 +159,53 @@ class MovimentacaoEstoqueCreateSerializer(serializers.ModelSerializer):
             'usuario',
             'observacoes',
         ]
+
+
+class MovimentacaoLoteItemSerializer(serializers.ModelSerializer):
+    """Linha de um lote de movimentações (entrada e saída)"""
+    
+    produto = ProdutoEmLoteField(queryset=Produto.objects.all())
+    
+    class Meta:
+        model = MovimentacaoEstoque
+        fields = [
+            'id',
+            'produto',
+            'tipo',
+            'quantidade',
+            'motivo',
+            'observacoes',
+            'quantidade_anterior',
+            'quantidade_posterior',
+            'custo_unitario',
+            'custo_fifo',
+        ]
+        read_only_fields = ['id', 'quantidade_anterior', 'quantidade_posterior', 'custo_fifo']
+    
+    def validate(self, data):
+        validar_custo_unitario(data)
+        return data
+
+
+class MovimentacaoLoteSerializer(serializers.Serializer):
+    """Lote de movimentações aplicado de uma vez (ex: recebimento de mercadorias)"""
+    
+    itens = MovimentacaoLoteItemSerializer(many=True, allow_empty=False, max_length=5000)
+    observacoes = serializers.CharField(required=False, allow_blank=True)
+    
+    def to_internal_value(self, data):
+        """Carrega todos os produtos referenciados em uma consulta"""
+        self.produtos_em_lote = ProdutoEmLoteField.carregar_em_lote(
+            data.get('itens') if hasattr(data, 'get') else None,
+            Produto.objects.only('pk')
+        )
+        return super().to_internal_value(data)
+    
+    def create(self, validated_data):
+        movimentacoes = []
+        for item in validated_data['itens']:
+            movimentacao = MovimentacaoEstoque(**item)
+            if not movimentacao.observacoes:
+                movimentacao.observacoes = validated_data.get('observacoes') or None
+            movimentacoes.append(movimentacao)
+        return registrar_movimentacoes(movimentacoes, usuario=self.context['request'].user)
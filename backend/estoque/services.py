@@ -0,0 +1,767 @@
+"""Serviços de domínio do módulo de estoque."""
+import datetime
+import random
+from collections import deque
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from config.cache_versionado import incrementar_versao
+from produtos.models import Produto
+from .models import CamadaCusto, Estoque, FragmentoEstoque, MovimentacaoEstoque, SnapshotEstoque
+
+# Produtos por UPDATE agrupado (mantém o CASE abaixo dos limites de
+# expressão/parâmetros do SQLite)
+TAMANHO_GRUPO_UPDATE = 200
+
+CHAVE_TOTAL_REPOSICAO = 'estoque:necessita_reposicao:total'
+
+# Precisão dos custos unitários e valores (campos com 4 casas decimais)
+CASAS_CUSTO = Decimal('0.0001')
+
+# Anterior a qualquer movimentação: limite inferior da reprodução sem snapshot
+INICIO_RAZAO = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Quantidade com sinal (+entrada / -saída) de uma movimentação
+QUANTIDADE_COM_SINAL = models.Case(
+    models.When(tipo='entrada', then=models.F('quantidade')),
+    default=-models.F('quantidade'),
+    output_field=models.IntegerField(),
+)
+
+
+class EstoqueInsuficienteError(ValueError):
+    """Um ou mais produtos não têm saldo para a saída solicitada"""
+
+    def __init__(self, faltas):
+        # faltas: {produto_id: (disponivel, solicitado)}
+        self.faltas = faltas
+        detalhes = ', '.join(
+            f'produto {produto_id} (disponível: {disponivel}, solicitado: {solicitado})'
+            for produto_id, (disponivel, solicitado) in sorted(faltas.items())
+        )
+        super().__init__(f'Quantidade em estoque insuficiente: {detalhes}')
+
+
+def registrar_movimentacoes(movimentacoes, usuario=None):
+    """
+    Aplica um lote de movimentações (instâncias não salvas de
+    MovimentacaoEstoque, em ordem) em uma única transação.
+
+    Por produto, o saldo é alterado pelo delta líquido do lote; os produtos
+    são agrupados em UPDATEs com CASE sobre F('quantidade_atual'), e o razão
+    é gravado com um único bulk_create. quantidade_anterior/posterior de cada
+    linha seguem a ordem do lote a partir do saldo lido após o UPDATE (com a
+    linha de estoque já bloqueada pela transação).
+
+    Nenhuma linha pode deixar o saldo negativo em seu ponto do lote; se isso
+    ocorrer em qualquer produto, nada é aplicado e EstoqueInsuficienteError
+    informa o saldo disponível e o mínimo exigido por produto.
+
+    Os custos (médio ponderado e camadas PEPS) são atualizados na mesma
+    transação; ver _aplicar_custos.
+    """
+    movimentacoes = list(movimentacoes)
+    if not movimentacoes:
+        return []
+
+    deltas = {}
+    exigidos = {}  # saldo inicial mínimo para nenhuma linha ficar negativa
+    for movimentacao in movimentacoes:
+        if movimentacao.tipo not in ('entrada', 'saida'):
+            raise ValueError(f'Tipo de movimentação inválido: {movimentacao.tipo}')
+        if not movimentacao.quantidade or movimentacao.quantidade < 1:
+            raise ValueError('A quantidade deve ser maior que zero')
+        if usuario is not None and movimentacao.usuario_id is None:
+            movimentacao.usuario = usuario
+
+        produto_id = movimentacao.produto_id
+        sinal = 1 if movimentacao.tipo == 'entrada' else -1
+        deltas[produto_id] = deltas.get(produto_id, 0) + sinal * movimentacao.quantidade
+        exigidos[produto_id] = max(exigidos.get(produto_id, 0), -deltas[produto_id])
+
+    ids = sorted(deltas)
+    agora = timezone.now()
+
+    with transaction.atomic():
+        Estoque.objects.bulk_create(
+            [Estoque(produto_id=produto_id) for produto_id in ids],
+            ignore_conflicts=True
+        )
+        # Linhas de produtos não fragmentados, já bloqueadas (onde houver suporte)
+        estoques = Estoque.objects.filter(produto_id__in=ids, fragmentos=0).order_by('produto_id')
+        if connection.features.has_select_for_update:
+            estoques = estoques.select_for_update()
+        diretos = list(estoques.values_list('produto_id', flat=True))
+        fragmentados = set(ids).difference(diretos)
+
+        saldos = {}
+        custos = {}
+        if diretos:
+            saldos, custos = _movimentar_estoques(diretos, deltas, agora)
+        if fragmentados:
+            saldos.update(_movimentar_fragmentos(fragmentados, deltas))
+
+        faltas = {
+            produto_id: (saldos[produto_id], exigidos[produto_id])
+            for produto_id in ids
+            if saldos[produto_id] < exigidos[produto_id]
+        }
+        if faltas:
+            raise EstoqueInsuficienteError(faltas)
+
+        for movimentacao in movimentacoes:
+            sinal = 1 if movimentacao.tipo == 'entrada' else -1
+            movimentacao.quantidade_anterior = saldos[movimentacao.produto_id]
+            saldos[movimentacao.produto_id] += sinal * movimentacao.quantidade
+            movimentacao.quantidade_posterior = saldos[movimentacao.produto_id]
+            movimentacao.custo_pendente = movimentacao.produto_id in fragmentados
+
+        novas_camadas = []
+        if diretos:
+            novas_camadas = _aplicar_custos(
+                [movimentacao for movimentacao in movimentacoes if not movimentacao.custo_pendente],
+                custos,
+                agora
+            )
+
+        transaction.on_commit(invalidar_caches_estoque)
+        criadas = MovimentacaoEstoque.objects.bulk_create(movimentacoes)
+        for camada, movimentacao in novas_camadas:
+            # Sem pk (backends que não retornam ids no bulk_create) a camada fica sem vínculo
+            camada.movimentacao_id = movimentacao.pk
+        CamadaCusto.objects.bulk_create([camada for camada, _ in novas_camadas])
+        return criadas
+
+
+def _movimentar_estoques(ids, deltas, agora):
+    """
+    Aplica os deltas nas linhas de Estoque já bloqueadas (agrupados em UPDATEs
+    com CASE) e devolve (saldos antes do lote, custos) por produto.
+    """
+    alterados = [produto_id for produto_id in ids if deltas[produto_id]]
+    for inicio in range(0, len(alterados), TAMANHO_GRUPO_UPDATE):
+        grupo = alterados[inicio:inicio + TAMANHO_GRUPO_UPDATE]
+        Estoque.objects.filter(produto_id__in=grupo).update(
+            quantidade_atual=models.F('quantidade_atual') + models.Case(
+                *[models.When(produto_id=produto_id, then=models.Value(deltas[produto_id]))
+                  for produto_id in grupo],
+                default=models.Value(0),
+                output_field=models.IntegerField(),
+            ),
+            ultima_atualizacao=agora
+        )
+
+    saldos = {}
+    custos = {}
+    for produto_id, quantidade, custo_medio, valor_fifo in Estoque.objects.filter(
+        produto_id__in=ids
+    ).values_list('produto_id', 'quantidade_atual', 'custo_medio', 'valor_fifo'):
+        saldos[produto_id] = quantidade - deltas[produto_id]
+        custos[produto_id] = [custo_medio, valor_fifo]
+    return saldos, custos
+
+
+def _movimentar_fragmentos(ids, deltas):
+    """
+    Soma o delta de cada produto fragmentado em um fragmento sorteado; só
+    essa linha fica bloqueada, então vendas simultâneas do mesmo produto
+    raramente se esperam. Devolve o saldo (quantidade_atual + fragmentos)
+    antes do lote.
+
+    A conferência de saldo não enxerga saídas de transações ainda não
+    confirmadas: em corridas, o saldo pode ficar negativo por no máximo
+    essas saídas simultâneas (o que reconciliar_estoque acusa).
+    """
+    fragmentados = dict(
+        Estoque.objects.filter(produto_id__in=ids).values_list('produto_id', 'fragmentos')
+    )
+    agora = timezone.now()
+    for produto_id in sorted(fragmentados):
+        if not deltas[produto_id]:
+            continue
+        indice = random.randrange(max(fragmentados[produto_id], 1))
+        fragmento = FragmentoEstoque.objects.filter(produto_id=produto_id, indice=indice)
+        alteracao = {'quantidade': models.F('quantidade') + deltas[produto_id], 'ultima_atualizacao': agora}
+        if not fragmento.update(**alteracao):
+            FragmentoEstoque.objects.get_or_create(produto_id=produto_id, indice=indice)
+            fragmento.update(**alteracao)
+
+    totais = Estoque.objects.filter(produto_id__in=fragmentados).annotate(
+        total=models.F('quantidade_atual') + quantidade_em_fragmentos()
+    ).values_list('produto_id', 'total')
+    return {produto_id: total - deltas[produto_id] for produto_id, total in totais}
+
+
+def quantidade_em_fragmentos(referencia='produto'):
+    """
+    Expressão: soma dos fragmentos ainda não dobrados do produto externo
+    (`referencia`: 'produto' num queryset de Estoque, 'pk' num de Produto)
+    """
+    return Coalesce(
+        models.Subquery(
+            FragmentoEstoque.objects.filter(
+                produto=models.OuterRef(referencia)
+            ).order_by().values('produto').annotate(
+                total=models.Sum('quantidade')
+            ).values('total'),
+            output_field=models.IntegerField()
+        ),
+        0
+    )
+
+
+def anotar_situacao_estoque(produtos):
+    """
+    Anota num queryset de Produto o saldo (linha de Estoque + fragmentos) e
+    o mínimo, usados por situacao_estoque; NULL para produto sem Estoque.
+    """
+    return produtos.annotate(
+        saldo_estoque=models.F('estoque__quantidade_atual') + quantidade_em_fragmentos('pk'),
+        minimo_estoque=models.F('estoque__quantidade_minima'),
+    )
+
+
+def prefetch_situacao_estoque(relacao='produto'):
+    """
+    Prefetch do produto (com categoria) já anotado por anotar_situacao_estoque,
+    para os serializers que aninham ProdutoListSerializer
+    """
+    return models.Prefetch(
+        relacao, queryset=anotar_situacao_estoque(Produto.objects.select_related('categoria'))
+    )
+
+
+def situacao_estoque(produto):
+    """
+    'sem_estoque', 'abaixo_minimo' ou 'disponivel' (None sem registro de
+    estoque). Lê as anotações de anotar_situacao_estoque, sem consultar o
+    banco: o queryset de origem precisa anotá-las (ou usar
+    prefetch_situacao_estoque); sem elas, None.
+    """
+    saldo = getattr(produto, 'saldo_estoque', None)
+    if saldo is None:
+        return None
+    if saldo <= 0:
+        return 'sem_estoque'
+    if saldo <= produto.minimo_estoque:
+        return 'abaixo_minimo'
+    return 'disponivel'
+
+
+def dobrar_fragmentos(produto_ids=None):
+    """
+    Leva a soma dos fragmentos para Estoque.quantidade_atual e zera os
+    fragmentos. Na mesma transação, processa em ordem as movimentações com
+    custo pendente: saldos anterior/posterior definitivos, custo médio e
+    camadas PEPS (como registrar_movimentacoes faz para os demais produtos).
+
+    Sem `produto_ids`, dobra todos os produtos fragmentados ou com
+    fragmentos/custos pendentes. Retorna (produtos, movimentações) dobrados.
+    """
+    if produto_ids is None:
+        produto_ids = set(
+            Estoque.objects.filter(fragmentos__gt=0).values_list('produto_id', flat=True)
+        ) | set(
+            FragmentoEstoque.objects.exclude(quantidade=0).values_list('produto_id', flat=True)
+        ) | set(
+            MovimentacaoEstoque.objects.filter(custo_pendente=True).values_list('produto_id', flat=True)
+        )
+    produto_ids = sorted(set(produto_ids))
+    if not produto_ids:
+        return 0, 0
+
+    agora = timezone.now()
+    with transaction.atomic():
+        # Mesma ordem de bloqueio das saídas diretas: Estoque e depois fragmentos
+        estoques = Estoque.objects.filter(produto_id__in=produto_ids).order_by('produto_id')
+        fragmentos = FragmentoEstoque.objects.filter(produto_id__in=produto_ids).order_by('produto_id', 'indice')
+        if connection.features.has_select_for_update:
+            estoques = estoques.select_for_update()
+            fragmentos = fragmentos.select_for_update()
+
+        atuais = {}
+        custos = {}
+        for produto_id, quantidade, custo_medio, valor_fifo in estoques.values_list(
+            'produto_id', 'quantidade_atual', 'custo_medio', 'valor_fifo'
+        ):
+            atuais[produto_id] = quantidade
+            custos[produto_id] = [custo_medio, valor_fifo]
+        saldos = dict(atuais)
+        somas = dict.fromkeys(atuais, 0)
+        nao_zerados = set()
+        for produto_id, quantidade in fragmentos.values_list('produto_id', 'quantidade'):
+            somas[produto_id] += quantidade
+            if quantidade:
+                nao_zerados.add(produto_id)
+
+        pendentes = list(
+            MovimentacaoEstoque.objects.filter(
+                produto_id__in=saldos, custo_pendente=True
+            ).order_by('data_movimentacao', 'pk').only(
+                'pk', 'produto_id', 'tipo', 'quantidade', 'custo_unitario'
+            )
+        )
+        for movimentacao in pendentes:
+            sinal = 1 if movimentacao.tipo == 'entrada' else -1
+            movimentacao.quantidade_anterior = saldos[movimentacao.produto_id]
+            saldos[movimentacao.produto_id] += sinal * movimentacao.quantidade
+            movimentacao.quantidade_posterior = saldos[movimentacao.produto_id]
+
+        if pendentes:
+            novas_camadas = _aplicar_custos(pendentes, custos, agora)
+            gravar_em_lote(
+                MovimentacaoEstoque,
+                ((m.pk, [m.quantidade_anterior, m.quantidade_posterior, m.custo_unitario, m.custo_fifo, False])
+                 for m in pendentes),
+                ['quantidade_anterior', 'quantidade_posterior', 'custo_unitario', 'custo_fifo', 'custo_pendente'],
+            )
+            for camada, movimentacao in novas_camadas:
+                camada.movimentacao_id = movimentacao.pk
+            CamadaCusto.objects.bulk_create([camada for camada, _ in novas_camadas])
+
+        if nao_zerados:
+            gravar_em_lote(
+                Estoque,
+                ((produto_id, [atuais[produto_id] + somas[produto_id], agora]) for produto_id in sorted(nao_zerados)),
+                ['quantidade_atual', 'ultima_atualizacao'],
+                chave='produto_id',
+            )
+            FragmentoEstoque.objects.filter(produto_id__in=nao_zerados).exclude(quantidade=0).update(quantidade=0)
+            transaction.on_commit(invalidar_caches_estoque)
+
+    return len(nao_zerados.union(m.produto_id for m in pendentes)), len(pendentes)
+
+
+def configurar_fragmentos(produto_ids, fragmentos):
+    """
+    Liga (fragmentos > 0), altera ou desliga (0) a fragmentação dos produtos.
+    Dobra os fragmentos atuais antes, para que nada fique em índices que
+    deixam de existir.
+    """
+    produto_ids = sorted(set(produto_ids))
+    with transaction.atomic():
+        Estoque.objects.bulk_create(
+            [Estoque(produto_id=produto_id) for produto_id in produto_ids],
+            ignore_conflicts=True
+        )
+        dobrar_fragmentos(produto_ids)
+        Estoque.objects.filter(produto_id__in=produto_ids).update(fragmentos=fragmentos)
+        FragmentoEstoque.objects.filter(produto_id__in=produto_ids, indice__gte=fragmentos).delete()
+        FragmentoEstoque.objects.bulk_create(
+            [
+                FragmentoEstoque(produto_id=produto_id, indice=indice)
+                for produto_id in produto_ids
+                for indice in range(fragmentos)
+            ],
+            ignore_conflicts=True
+        )
+
+
+def _aplicar_custos(movimentacoes, custos, agora):
+    """
+    Percorre o lote (com quantidade_anterior/posterior já calculadas) mantendo,
+    por produto, o custo médio ponderado e as camadas PEPS:
+
+    - entrada: custo_unitario informado ou, na falta, o preço de custo do
+      produto; recalcula o custo médio e abre uma camada;
+    - saída: sai pelo custo médio vigente (custo_unitario) e consome as
+      camadas mais antigas (custo_fifo). Saldo sem camada (ex: saldo editado
+      manualmente) é baixado pelo custo médio.
+
+    `custos` mapeia produto_id -> [custo_medio, valor_fifo] lidos com a linha
+    de estoque bloqueada. Grava custos de Estoque e camadas consumidas em lote
+    e devolve as novas camadas (pares camada, movimentação) para gravação
+    após o razão.
+    """
+    sem_custo = {m.produto_id for m in movimentacoes if m.tipo == 'entrada' and m.custo_unitario is None}
+    precos = dict(
+        Produto.objects.filter(pk__in=sem_custo).values_list('pk', 'preco_custo')
+    ) if sem_custo else {}
+
+    com_saida = {m.produto_id for m in movimentacoes if m.tipo == 'saida'}
+    camadas = {produto_id: deque() for produto_id in custos}
+    if com_saida:
+        abertas = CamadaCusto.objects.filter(
+            produto_id__in=com_saida, quantidade_restante__gt=0
+        ).order_by('produto_id', 'data_entrada', 'pk').values_list(
+            'pk', 'produto_id', 'quantidade_restante', 'custo_unitario'
+        )
+        for pk, produto_id, restante, custo in abertas:
+            camadas[produto_id].append([restante, custo, pk])
+
+    consumidas = {}
+    novas_camadas = []
+    for movimentacao in movimentacoes:
+        produto_id = movimentacao.produto_id
+        quantidade = movimentacao.quantidade
+        custo = custos[produto_id]
+        fila = camadas[produto_id]
+
+        if movimentacao.tipo == 'entrada':
+            unitario = movimentacao.custo_unitario
+            if unitario is None:
+                unitario = precos.get(produto_id) or Decimal('0')
+            unitario = Decimal(unitario).quantize(CASAS_CUSTO)
+            if movimentacao.quantidade_posterior > 0:
+                custo[0] = (
+                    (movimentacao.quantidade_anterior * custo[0] + quantidade * unitario)
+                    / movimentacao.quantidade_posterior
+                ).quantize(CASAS_CUSTO)
+            total = quantidade * unitario
+            custo[1] += total
+
+            camada = CamadaCusto(
+                produto_id=produto_id,
+                data_entrada=agora,
+                quantidade_original=quantidade,
+                quantidade_restante=quantidade,
+                custo_unitario=unitario,
+            )
+            novas_camadas.append((camada, movimentacao))
+            fila.append([quantidade, unitario, camada])
+        else:
+            unitario = custo[0]
+            total = Decimal('0')
+            restante = quantidade
+            while restante and fila:
+                aberta = fila[0]
+                usado = min(restante, aberta[0])
+                aberta[0] -= usado
+                restante -= usado
+                total += usado * aberta[1]
+                if isinstance(aberta[2], CamadaCusto):
+                    aberta[2].quantidade_restante = aberta[0]
+                else:
+                    consumidas[aberta[2]] = aberta[0]
+                if not aberta[0]:
+                    fila.popleft()
+            total += restante * unitario
+            custo[1] = custo[1] - total if movimentacao.quantidade_posterior else Decimal('0')
+
+        movimentacao.custo_unitario = unitario
+        movimentacao.custo_fifo = total.quantize(CASAS_CUSTO)
+
+    gravar_em_lote(
+        Estoque,
+        ((produto_id, [medio, max(fifo, Decimal('0')).quantize(CASAS_CUSTO)])
+         for produto_id, (medio, fifo) in custos.items()),
+        ['custo_medio', 'valor_fifo'],
+        chave='produto_id',
+    )
+    if consumidas:
+        gravar_em_lote(CamadaCusto, ((pk, [restante]) for pk, restante in consumidas.items()),
+                       ['quantidade_restante'])
+    return novas_camadas
+
+
+def gravar_em_lote(modelo, valores_por_chave, campos, chave='pk', tamanho_lote=5000):
+    """
+    Grava `campos` de `modelo` para cada (chave, valores) com um único UPDATE
+    parametrizado via executemany. Para dezenas de milhares de linhas o
+    bulk_update do ORM gasta quase todo o tempo montando expressões CASE em
+    Python; aqui o mesmo comando é reutilizado e só os parâmetros mudam.
+    """
+    opts = modelo._meta
+    qn = connection.ops.quote_name
+    fields = [opts.get_field(campo) for campo in campos]
+    coluna_chave = opts.pk.column if chave == 'pk' else opts.get_field(chave).column
+    sql = 'UPDATE %s SET %s WHERE %s = %%s' % (
+        qn(opts.db_table),
+        ', '.join('%s = %%s' % qn(field.column) for field in fields),
+        qn(coluna_chave),
+    )
+
+    with connection.cursor() as cursor:
+        lote = []
+        for valor_chave, valores in valores_por_chave:
+            lote.append([
+                field.get_db_prep_save(valor, connection) for field, valor in zip(fields, valores)
+            ] + [valor_chave])
+            if len(lote) >= tamanho_lote:
+                cursor.executemany(sql, lote)
+                lote = []
+        if lote:
+            cursor.executemany(sql, lote)
+
+
+def movimentar_em_lote(quantidades, tipo, motivo, usuario, observacoes=None):
+    """
+    Aplica entradas ou saídas de vários produtos em uma única transação.
+
+    `quantidades` mapeia produto_id -> quantidade. Atalho para
+    registrar_movimentacoes com uma linha por produto.
+    """
+    return registrar_movimentacoes([
+        MovimentacaoEstoque(
+            produto_id=produto_id,
+            tipo=tipo,
+            quantidade=quantidade,
+            motivo=motivo,
+            usuario=usuario,
+            observacoes=observacoes,
+        )
+        for produto_id, quantidade in sorted(quantidades.items())
+        if quantidade
+    ])
+
+
+def total_necessita_reposicao():
+    """
+    Quantidade de produtos abaixo do mínimo: COUNT sobre o índice parcial de
+    Estoque.abaixo_minimo, guardado em cache por ESTOQUE_REPOSICAO_CACHE_TTL.
+    """
+    total = cache.get(CHAVE_TOTAL_REPOSICAO)
+    if total is None:
+        total = Estoque.objects.filter(abaixo_minimo=True).count()
+        cache.set(CHAVE_TOTAL_REPOSICAO, total, settings.ESTOQUE_REPOSICAO_CACHE_TTL)
+    return total
+
+
+def invalidar_total_reposicao():
+    cache.delete(CHAVE_TOTAL_REPOSICAO)
+
+
+def invalidar_caches_estoque():
+    """Saldos mudaram: total de reposição e respostas da API que exibem a situação do estoque"""
+    invalidar_total_reposicao()
+    incrementar_versao(Estoque)
+
+
+def valorizacao_estoque(estoques=None):
+    """
+    Valor do estoque pelo custo médio e pelas camadas PEPS, total e por
+    categoria, em uma única consulta agregada sobre Estoque (os custos já
+    são mantidos por linha a cada movimentação).
+    """
+    estoques = Estoque.objects.all() if estoques is None else estoques
+    valor_medio = models.ExpressionWrapper(
+        models.F('quantidade_atual') * models.F('custo_medio'),
+        output_field=models.DecimalField(max_digits=20, decimal_places=4)
+    )
+    categorias = list(
+        estoques.order_by().values(
+            categoria=models.F('produto__categoria'),
+            categoria_nome=models.F('produto__categoria__nome'),
+        ).annotate(
+            produtos=models.Count('pk'),
+            quantidade=Coalesce(models.Sum('quantidade_atual'), 0),
+            valor_medio=Coalesce(models.Sum(valor_medio), Decimal('0'), output_field=valor_medio.output_field),
+            valor_fifo=Coalesce(models.Sum('valor_fifo'), Decimal('0'), output_field=valor_medio.output_field),
+        ).order_by('categoria_nome')
+    )
+    total = {
+        campo: sum((categoria[campo] for categoria in categorias), Decimal('0') if campo.startswith('valor') else 0)
+        for campo in ('produtos', 'quantidade', 'valor_medio', 'valor_fifo')
+    }
+    for linha in [total, *categorias]:
+        for campo in ('valor_medio', 'valor_fifo'):
+            linha[campo] = Decimal(linha[campo]).quantize(Decimal('0.01'))
+    return {'total': total, 'categorias': categorias}
+
+
+def saldo_razao():
+    """Expressão: soma com sinal das movimentações do produto do Estoque externo"""
+    return Coalesce(
+        models.Subquery(
+            MovimentacaoEstoque.objects.filter(
+                produto=models.OuterRef('produto')
+            ).order_by().values('produto').annotate(
+                total=models.Sum(QUANTIDADE_COM_SINAL)
+            ).values('total'),
+            output_field=models.IntegerField()
+        ),
+        0
+    )
+
+
+def faixas_produtos(tamanho=1000):
+    """Divide o intervalo de produto_id dos estoques em faixas [inicio, fim]"""
+    limites = Estoque.objects.aggregate(menor=models.Min('produto_id'), maior=models.Max('produto_id'))
+    if limites['menor'] is None:
+        return []
+    return [
+        (inicio, min(inicio + tamanho - 1, limites['maior']))
+        for inicio in range(limites['menor'], limites['maior'] + 1, tamanho)
+    ]
+
+
+def divergencias_estoque(inicio, fim):
+    """
+    Estoques de produto_id em [inicio, fim] cujo saldo (quantidade_atual +
+    fragmentos não dobrados) difere da soma do razão. A soma é feita no banco
+    (subconsulta pelo índice produto/data), então só as linhas divergentes
+    chegam ao Python.
+
+    Retorna tuplas (produto_id, codigo, saldo, quantidade_razao).
+    """
+    return list(
+        Estoque.objects.filter(
+            produto_id__gte=inicio, produto_id__lte=fim
+        ).annotate(
+            saldo=models.F('quantidade_atual') + quantidade_em_fragmentos(),
+            quantidade_razao=saldo_razao()
+        ).exclude(
+            saldo=models.F('quantidade_razao')
+        ).order_by('produto_id').values_list(
+            'produto_id', 'produto__codigo', 'saldo', 'quantidade_razao'
+        )
+    )
+
+
+def corrigir_divergencias(inicio, fim):
+    """
+    Iguala ao razão o saldo dos estoques divergentes em [inicio, fim] com um
+    UPDATE em lote. As linhas são bloqueadas antes (onde houver suporte) para
+    que a soma não fique para trás de uma movimentação concorrente.
+    Retorna a quantidade de estoques corrigidos.
+    """
+    with transaction.atomic():
+        estoques = Estoque.objects.filter(produto_id__gte=inicio, produto_id__lte=fim)
+        if connection.features.has_select_for_update:
+            list(estoques.select_for_update().order_by('produto_id').values_list('pk', flat=True))
+
+        divergentes = estoques.annotate(
+            saldo=models.F('quantidade_atual') + quantidade_em_fragmentos(),
+            quantidade_razao=saldo_razao()
+        ).exclude(saldo=models.F('quantidade_razao'))
+        corrigidos = Estoque.objects.filter(pk__in=divergentes.values('pk')).update(
+            quantidade_atual=saldo_razao() - quantidade_em_fragmentos(),
+            ultima_atualizacao=timezone.now(),
+        )
+        if corrigidos:
+            transaction.on_commit(invalidar_caches_estoque)
+    return corrigidos
+
+
+def saldos_em(estoques, data_hora):
+    """
+    Anota em um queryset de Estoque o saldo de cada produto em `data_hora`.
+
+    Parte do snapshot mais recente até `data_hora` (snapshot_data/
+    snapshot_quantidade) e soma apenas as movimentações entre ele e
+    `data_hora` (movimentacoes_reproduzidas), tudo em subconsultas
+    correlacionadas sobre os índices (produto, data_hora) e
+    (produto, -data_movimentacao): o custo depende do intervalo desde o
+    snapshot, não do tamanho do histórico.
+    """
+    snapshot = SnapshotEstoque.objects.filter(
+        produto=models.OuterRef('produto'),
+        data_hora__lte=data_hora,
+    ).order_by('-data_hora')
+
+    reproduzidas = MovimentacaoEstoque.objects.filter(
+        produto=models.OuterRef('produto'),
+        data_movimentacao__lte=data_hora,
+        data_movimentacao__gt=Coalesce(
+            models.OuterRef('snapshot_data'),
+            models.Value(INICIO_RAZAO, output_field=models.DateTimeField())
+        ),
+    ).order_by().values('produto')
+
+    return estoques.annotate(
+        snapshot_data=models.Subquery(snapshot.values('data_hora')[:1]),
+        snapshot_quantidade=models.Subquery(snapshot.values('quantidade')[:1]),
+    ).annotate(
+        delta_reproduzido=models.Subquery(
+            reproduzidas.annotate(total=models.Sum(QUANTIDADE_COM_SINAL)).values('total'),
+            output_field=models.IntegerField()
+        ),
+        movimentacoes_reproduzidas=Coalesce(
+            models.Subquery(reproduzidas.annotate(total=models.Count('pk')).values('total')),
+            0
+        ),
+    ).annotate(
+        quantidade_em=Coalesce('snapshot_quantidade', 0) + Coalesce('delta_reproduzido', 0)
+    )
+
+
+def gerar_snapshots(a_cada=None, diario=False, margem=datetime.timedelta(minutes=5)):
+    """
+    Grava snapshots a partir do razão, continuando de onde a última execução
+    parou: um a cada `a_cada` movimentações do produto, um no fim de cada dia
+    com movimentação (`diario`) e sempre um na última movimentação
+    processada de cada produto.
+
+    Como toda execução fecha cada produto movimentado com um snapshot, tudo
+    até o snapshot mais recente da tabela já está coberto, e cada execução lê
+    só as movimentações posteriores a ele (índice em -data_movimentacao).
+    Movimentações dos últimos `margem` ficam para a próxima execução, para
+    não passar à frente de transações ainda não confirmadas.
+
+    Retorna a quantidade de snapshots gravados.
+    """
+    corte = timezone.now() - margem
+    inicio = SnapshotEstoque.objects.aggregate(ultimo=models.Max('data_hora'))['ultimo'] or INICIO_RAZAO
+
+    movimentacoes = MovimentacaoEstoque.objects.filter(
+        data_movimentacao__gt=inicio,
+        data_movimentacao__lte=corte,
+    ).order_by()
+    produtos = list(movimentacoes.values_list('produto_id', flat=True).distinct())
+    if not produtos:
+        return 0
+
+    saldos = dict(
+        SnapshotEstoque.objects.filter(
+            produto_id__in=produtos,
+            data_hora=models.Subquery(
+                SnapshotEstoque.objects.filter(
+                    produto=models.OuterRef('produto')
+                ).order_by('-data_hora').values('data_hora')[:1]
+            ),
+        ).values_list('produto_id', 'quantidade')
+    )
+
+    def fim_do_dia(instante):
+        dia = timezone.localdate(instante)
+        return timezone.make_aware(datetime.datetime.combine(dia, datetime.time.max))
+
+    pendentes = []
+    total = 0
+    linhas = movimentacoes.order_by('produto_id', 'data_movimentacao', 'pk').values_list(
+        'produto_id', 'data_movimentacao', 'tipo', 'quantidade'
+    ).iterator(chunk_size=2000)
+
+    atual = None
+    linha = next(linhas, None)
+    while linha is not None:
+        produto_id, instante, tipo, quantidade = linha
+        if produto_id != atual:
+            atual = produto_id
+            saldo = saldos.get(produto_id, 0)
+            contador = 0
+
+        saldo += quantidade if tipo == 'entrada' else -quantidade
+        contador += 1
+        proxima = next(linhas, None)
+
+        mesmo_produto = proxima is not None and proxima[0] == produto_id
+        if mesmo_produto and proxima[1] == instante:
+            # Um snapshot só fecha depois de todas as movimentações do instante
+            linha = proxima
+            continue
+
+        fechamento = fim_do_dia(instante)
+        if not mesmo_produto:
+            if diario and fechamento <= corte:
+                pendentes.append(SnapshotEstoque(produto_id=produto_id, data_hora=fechamento, quantidade=saldo))
+            else:
+                pendentes.append(SnapshotEstoque(produto_id=produto_id, data_hora=instante, quantidade=saldo))
+        elif diario and proxima[1] > fechamento:
+            pendentes.append(SnapshotEstoque(produto_id=produto_id, data_hora=fechamento, quantidade=saldo))
+            contador = 0
+        elif a_cada and contador >= a_cada:
+            pendentes.append(SnapshotEstoque(produto_id=produto_id, data_hora=instante, quantidade=saldo))
+            contador = 0
+
+        if len(pendentes) >= 1000:
+            total += len(SnapshotEstoque.objects.bulk_create(pendentes, ignore_conflicts=True))
+            pendentes = []
+        linha = proxima
+
+    if pendentes:
+        total += len(SnapshotEstoque.objects.bulk_create(pendentes, ignore_conflicts=True))
+    return total
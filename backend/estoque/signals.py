@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Estoque
+from .services import invalidar_caches_estoque
+
+
+@receiver(post_save, sender=Estoque)
+@receiver(post_delete, sender=Estoque)
+def invalidar_reposicao_ao_alterar_estoque(sender, instance, **kwargs):
+    """Saldo ou mínimo alterados pela API/admin mudam o total de reposição e o catálogo em cache"""
+    transaction.on_commit(invalidar_caches_estoque)
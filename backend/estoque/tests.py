@@ -1,3 +1,630 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+import numpy as np
+from django.db import connection
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from usuarios.models import Usuario
+from produtos.models import Categoria, Produto
+from .models import CamadaCusto, Estoque, FragmentoEstoque, MovimentacaoEstoque, SnapshotEstoque
+from .previsao import calcular_sugestoes, atualizar_sugestoes
+from .services import (
+    registrar_movimentacoes,
+    saldos_em,
+    gerar_snapshots,
+    total_necessita_reposicao,
+    faixas_produtos,
+    divergencias_estoque,
+    corrigir_divergencias,
+    valorizacao_estoque,
+    configurar_fragmentos,
+    dobrar_fragmentos,
+    EstoqueInsuficienteError,
+)
 
-# Create your tests here.
+
+class EstoqueTestMixin:
+    """Dados básicos compartilhados pelos testes de estoque"""
+
+    def criar_dados(self, quantidade_produtos=5, saldo=10):
+        self.usuario = Usuario.objects.create(username='estoquista')
+        self.categoria = Categoria.objects.create(nome='Geral')
+        self.produtos = self.criar_produtos('EST', quantidade_produtos)
+        Estoque.objects.bulk_create([
+            Estoque(produto=produto, quantidade_atual=saldo) for produto in self.produtos
+        ])
+
+    def criar_produtos(self, prefixo, quantidade):
+        return Produto.objects.bulk_create([
+            Produto(
+                codigo=f'{prefixo}-{i:04d}',
+                nome=f'Produto {prefixo} {i}',
+                categoria=self.categoria,
+                preco_custo=Decimal('10.00'),
+                preco_venda=Decimal('15.00'),
+            )
+            for i in range(quantidade)
+        ])
+
+    def setUp(self):
+        self.criar_dados()
+
+    def saldo(self, produto):
+        return Estoque.objects.get(produto=produto).quantidade_atual
+
+    def movimentacao(self, produto, tipo, quantidade, motivo='ajuste'):
+        return MovimentacaoEstoque(produto=produto, tipo=tipo, quantidade=quantidade, motivo=motivo)
+
+
+class RegistrarMovimentacoesTest(EstoqueTestMixin, TestCase):
+    """Lote de movimentações com F() agrupado e razão em bulk"""
+
+    def test_saldos_sequenciais_no_lote(self):
+        produto = self.produtos[0]
+        movimentacoes = registrar_movimentacoes([
+            self.movimentacao(produto, 'saida', 4),
+            self.movimentacao(produto, 'entrada', 10, 'compra'),
+            self.movimentacao(produto, 'saida', 15),
+        ], usuario=self.usuario)
+
+        self.assertEqual(
+            [(m.quantidade_anterior, m.quantidade_posterior) for m in movimentacoes],
+            [(10, 6), (6, 16), (16, 1)]
+        )
+        self.assertTrue(all(m.pk for m in movimentacoes))
+        self.assertEqual(self.saldo(produto), 1)
+
+    def test_saldo_negativo_no_meio_do_lote_nada_aplica(self):
+        produto = self.produtos[0]
+        with self.assertRaises(EstoqueInsuficienteError) as erro:
+            registrar_movimentacoes([
+                self.movimentacao(produto, 'saida', 12),
+                self.movimentacao(produto, 'entrada', 20, 'compra'),
+            ], usuario=self.usuario)
+
+        self.assertEqual(erro.exception.faltas, {produto.pk: (10, 12)})
+        self.assertEqual(self.saldo(produto), 10)
+        self.assertFalse(MovimentacaoEstoque.objects.exists())
+
+    def test_consultas_nao_crescem_com_o_lote(self):
+        def medir(produtos):
+            with CaptureQueriesContext(connection) as consultas:
+                registrar_movimentacoes(
+                    [self.movimentacao(produto, 'entrada', 1, 'compra') for produto in produtos],
+                    usuario=self.usuario
+                )
+            return len(consultas)
+
+        # Só cresce pelos lotes de bulk_create/UPDATE (limite de parâmetros do SQLite)
+        self.assertLess(medir(self.criar_produtos('EXT', 300)), 20)
+        self.assertLess(medir(self.produtos[:2]), 12)
+
+    def test_save_usa_o_servico(self):
+        produto = Produto.objects.create(
+            codigo='SEM-ESTOQUE',
+            nome='Sem estoque',
+            categoria=self.categoria,
+            preco_custo=Decimal('1.00'),
+            preco_venda=Decimal('2.00'),
+        )
+        movimentacao = MovimentacaoEstoque.objects.create(
+            produto=produto, tipo='entrada', quantidade=7, motivo='compra', usuario=self.usuario
+        )
+        self.assertEqual((movimentacao.quantidade_anterior, movimentacao.quantidade_posterior), (0, 7))
+        self.assertEqual(self.saldo(produto), 7)
+
+        # Editar a movimentação não movimenta o estoque de novo
+        movimentacao.observacoes = 'Nota 123'
+        movimentacao.save()
+        self.assertEqual(self.saldo(produto), 7)
+
+        with self.assertRaises(EstoqueInsuficienteError):
+            MovimentacaoEstoque.objects.create(
+                produto=produto, tipo='saida', quantidade=8, motivo='venda', usuario=self.usuario
+            )
+        self.assertEqual(self.saldo(produto), 7)
+
+
+class MovimentacaoLoteApiTest(EstoqueTestMixin, TestCase):
+    """POST /api/movimentacoes/bulk/"""
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+
+    def test_recebimento(self):
+        resposta = self.api.post('/api/movimentacoes/bulk/', {
+            'observacoes': 'NF 4567',
+            'itens': [
+                {'produto': produto.pk, 'tipo': 'entrada', 'quantidade': 5, 'motivo': 'compra'}
+                for produto in self.produtos
+            ],
+        }, format='json')
+
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(resposta.data['total'], len(self.produtos))
+        self.assertEqual(resposta.data['movimentacoes'][0]['quantidade_posterior'], 15)
+        self.assertEqual(
+            set(MovimentacaoEstoque.objects.values_list('observacoes', 'usuario')),
+            {('NF 4567', self.usuario.pk)}
+        )
+
+    def test_estoque_insuficiente(self):
+        produto = self.produtos[0]
+        resposta = self.api.post('/api/movimentacoes/bulk/', {
+            'itens': [{'produto': produto.pk, 'tipo': 'saida', 'quantidade': 11, 'motivo': 'perda'}],
+        }, format='json')
+
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(
+            resposta.data['faltas'], [{'produto': produto.pk, 'disponivel': 10, 'solicitado': 11}]
+        )
+        self.assertEqual(self.saldo(produto), 10)
+
+    def test_produto_inexistente(self):
+        resposta = self.api.post('/api/movimentacoes/bulk/', {
+            'itens': [{'produto': 999999, 'tipo': 'entrada', 'quantidade': 1, 'motivo': 'compra'}],
+        }, format='json')
+        self.assertEqual(resposta.status_code, 400)
+
+
+class HistoricoEstoqueTest(EstoqueTestMixin, TestCase):
+    """Saldo em uma data = snapshot mais próximo + reprodução limitada"""
+
+    def setUp(self):
+        super().setUp()
+        self.produto = self.criar_produtos('HIST', 1)[0]
+        dia = timezone.localdate() - datetime.timedelta(days=10)
+        self.inicio = timezone.make_aware(datetime.datetime.combine(dia, datetime.time.min))
+        # Dia 1: +10 -3 | Dia 2: +5 | Dia 3: -4
+        self.mover('entrada', 10, dias=0, horas=10)
+        self.mover('saida', 3, dias=0, horas=15)
+        self.mover('entrada', 5, dias=1, horas=9)
+        self.mover('saida', 4, dias=2, horas=11)
+
+    def mover(self, tipo, quantidade, dias, horas):
+        movimentacao, = registrar_movimentacoes(
+            [self.movimentacao(self.produto, tipo, quantidade)], usuario=self.usuario
+        )
+        instante = self.inicio + datetime.timedelta(days=dias, hours=horas)
+        MovimentacaoEstoque.objects.filter(pk=movimentacao.pk).update(data_movimentacao=instante)
+        return instante
+
+    def saldo_em(self, instante):
+        return saldos_em(Estoque.objects.filter(produto=self.produto), instante).get()
+
+    def fim_do_dia(self, dias):
+        return self.inicio + datetime.timedelta(days=dias + 1, microseconds=-1)
+
+    def test_sem_snapshot_reproduz_desde_o_inicio(self):
+        estoque = self.saldo_em(self.fim_do_dia(1))
+        self.assertEqual(estoque.quantidade_em, 12)
+        self.assertIsNone(estoque.snapshot_data)
+        self.assertEqual(estoque.movimentacoes_reproduzidas, 3)
+
+    def test_snapshots_diarios(self):
+        gerar_snapshots(diario=True, margem=datetime.timedelta(0))
+        self.assertEqual(
+            list(SnapshotEstoque.objects.filter(produto=self.produto).order_by('data_hora').values_list(
+                'data_hora', 'quantidade'
+            )),
+            [(self.fim_do_dia(0), 7), (self.fim_do_dia(1), 12), (self.fim_do_dia(2), 8)]
+        )
+
+        estoque = self.saldo_em(self.inicio + datetime.timedelta(days=1, hours=12))
+        self.assertEqual((estoque.quantidade_em, estoque.movimentacoes_reproduzidas), (12, 1))
+        self.assertEqual(self.saldo_em(self.fim_do_dia(1)).movimentacoes_reproduzidas, 0)
+        self.assertEqual(self.saldo_em(self.inicio).quantidade_em, 0)
+
+        # Execução seguinte só processa o que veio depois
+        self.mover('entrada', 1, dias=3, horas=8)
+        self.assertEqual(gerar_snapshots(diario=True, margem=datetime.timedelta(0)), 1)
+        self.assertEqual(self.saldo_em(timezone.now()).quantidade_em, 9)
+
+    def test_a_cada_n_limita_a_reproducao(self):
+        for hora in range(1, 20):
+            self.mover('entrada', 1, dias=4, horas=hora)
+        gerar_snapshots(a_cada=5, margem=datetime.timedelta(0))
+
+        for hora in range(1, 20):
+            estoque = self.saldo_em(self.inicio + datetime.timedelta(days=4, hours=hora, minutes=30))
+            self.assertEqual(estoque.quantidade_em, 8 + hora)
+            self.assertLess(estoque.movimentacoes_reproduzidas, 5)
+
+    def test_api(self):
+        api = APIClient()
+        api.force_authenticate(self.usuario)
+        dia = timezone.localdate(self.inicio) + datetime.timedelta(days=1)
+
+        resposta = api.get('/api/estoques/historico/', {'data': dia.isoformat(), 'produto': self.produto.pk})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['count'], 1)
+        self.assertEqual(resposta.data['results'][0]['quantidade'], 12)
+
+        self.assertEqual(api.get('/api/estoques/historico/', {'data': 'ontem'}).status_code, 400)
+
+
+class PrevisaoReposicaoTest(EstoqueTestMixin, TestCase):
+    """Demanda prevista e reposição sugerida, vetorizadas"""
+
+    def test_calculo_vetorizado(self):
+        matriz = np.array([
+            [5.0] * 30,            # demanda constante
+            [0.0] * 30,            # sem demanda
+            [0.0, 10.0] * 15,      # demanda irregular
+        ])
+        resultado = calcular_sugestoes(
+            matriz, quantidade_atual=[10, 0, 200], prazo_reposicao=[4, 4, 4],
+            metodo='media_movel', janela=30, cobertura=10
+        )
+        np.testing.assert_allclose(resultado['demanda'], [5, 0, 5])
+        # Sem variação não há estoque de segurança: mínimo = 5/dia * 4 dias
+        self.assertEqual(resultado['minimo'][0], 20)
+        self.assertEqual(resultado['reposicao'][0], 20 + 50 - 10)
+        self.assertEqual((resultado['minimo'][1], resultado['reposicao'][1]), (0, 0))
+        # Demanda irregular exige segurança; saldo alto não pede reposição
+        self.assertGreater(resultado['minimo'][2], 20)
+        self.assertEqual(resultado['reposicao'][2], 0)
+
+    def test_suavizacao_exponencial_igual_a_recursiva(self):
+        serie = np.random.default_rng(1).poisson(4, 60).astype(float)
+        nivel = serie[0]
+        for valor in serie[1:]:
+            nivel = 0.2 * valor + 0.8 * nivel
+        resultado = calcular_sugestoes(serie[None, :], [0], [7], alpha=0.2)
+        self.assertAlmostEqual(resultado['demanda'][0], nivel)
+
+    def test_grava_sugestoes_a_partir_do_razao(self):
+        produto = self.produtos[0]
+        hoje = timezone.localdate()
+        vendas = []
+        for dias in range(1, 15):
+            instante = timezone.make_aware(
+                datetime.datetime.combine(hoje - datetime.timedelta(days=dias), datetime.time(12))
+            )
+            vendas.append((instante, 'venda'))
+            vendas.append((instante, 'perda'))  # perdas não são demanda
+        movimentacoes = MovimentacaoEstoque.objects.bulk_create([
+            MovimentacaoEstoque(produto=produto, tipo='saida', quantidade=3, motivo=motivo, usuario=self.usuario)
+            for _, motivo in vendas
+        ])
+        for movimentacao, (instante, _) in zip(movimentacoes, vendas):
+            MovimentacaoEstoque.objects.filter(pk=movimentacao.pk).update(data_movimentacao=instante)
+
+        atualizar_sugestoes(dias=14, metodo='media_movel', janela=14, cobertura=10, aplicar_minimo=True)
+
+        estoque = Estoque.objects.get(produto=produto)
+        self.assertEqual(estoque.demanda_diaria_prevista, Decimal('3.00'))
+        self.assertEqual(estoque.quantidade_minima_sugerida, 21)  # 3/dia * 7 dias de prazo
+        self.assertEqual(estoque.quantidade_minima, 21)
+        self.assertEqual(estoque.quantidade_reposicao_sugerida, 21 + 30 - 10)
+        self.assertIsNotNone(estoque.sugestao_calculada_em)
+
+        outro = Estoque.objects.get(produto=self.produtos[1])
+        self.assertEqual((outro.quantidade_minima_sugerida, outro.quantidade_reposicao_sugerida), (0, 0))
+
+
+class NecessitaReposicaoTest(EstoqueTestMixin, TestCase):
+    """abaixo_minimo mantido pelo banco, listagem paginada e total em cache"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        Estoque.objects.filter(produto__in=self.produtos[:3]).update(quantidade_minima=5)
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+
+    def abaixo(self):
+        return set(Estoque.objects.filter(abaixo_minimo=True).values_list('produto_id', flat=True))
+
+    def test_coluna_acompanha_updates_com_f(self):
+        self.assertEqual(self.abaixo(), set())
+        registrar_movimentacoes(
+            [self.movimentacao(self.produtos[0], 'saida', 5), self.movimentacao(self.produtos[3], 'saida', 10)],
+            usuario=self.usuario
+        )
+        # produtos[3] tem mínimo 0: saldo 0 também conta como abaixo do mínimo
+        self.assertEqual(self.abaixo(), {self.produtos[0].pk, self.produtos[3].pk})
+
+        registrar_movimentacoes([self.movimentacao(self.produtos[0], 'entrada', 1, 'compra')], usuario=self.usuario)
+        self.assertEqual(self.abaixo(), {self.produtos[3].pk})
+
+    def test_listagem_paginada(self):
+        registrar_movimentacoes(
+            [self.movimentacao(produto, 'saida', 6) for produto in self.produtos[:3]], usuario=self.usuario
+        )
+        resposta = self.api.get('/api/estoques/necessita_reposicao/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['count'], 3)
+        self.assertEqual(resposta.data['results'][0]['produto_detail']['categoria_nome'], 'Geral')
+
+    def test_total_em_cache_e_invalidado(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(total_necessita_reposicao(), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.api.get('/api/estoques/necessita_reposicao/total/').data, {'total': 0})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_movimentacoes([self.movimentacao(self.produtos[0], 'saida', 6)], usuario=self.usuario)
+        self.assertEqual(total_necessita_reposicao(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            estoque = Estoque.objects.get(produto=self.produtos[1])
+            estoque.quantidade_minima = 50
+            estoque.save()
+        self.assertEqual(total_necessita_reposicao(), 2)
+
+
+class ConsultasListagemEstoqueTest(EstoqueTestMixin, TestCase):
+    """produto_detail.situacao_estoque vem do prefetch anotado, sem N+1"""
+
+    def setUp(self):
+        self.criar_dados(quantidade_produtos=25)
+        Estoque.objects.filter(produto=self.produtos[0]).update(quantidade_minima=20)
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+
+    def test_listagem(self):
+        # Sonda do GET condicional, página de estoques e produtos anotados
+        with self.assertNumQueries(3):
+            resposta = self.api.get('/api/estoques/')
+        self.assertEqual(resposta.status_code, 200)
+        situacoes = {item['produto']: item['produto_detail']['situacao_estoque'] for item in resposta.data['results']}
+        self.assertEqual(len(situacoes), 20)
+        self.assertEqual(situacoes[self.produtos[0].pk], 'abaixo_minimo')
+        self.assertEqual(situacoes[self.produtos[1].pk], 'disponivel')
+
+    def test_movimentacoes(self):
+        registrar_movimentacoes(
+            [self.movimentacao(produto, 'entrada', 1, 'compra') for produto in self.produtos], usuario=self.usuario
+        )
+        # Contagem, página de movimentações e produtos anotados
+        with self.assertNumQueries(3):
+            resposta = self.api.get('/api/movimentacoes/')
+        self.assertEqual(len(resposta.data['results']), 20)
+        self.assertEqual(resposta.data['results'][0]['produto_detail']['situacao_estoque'], 'disponivel')
+
+    def test_atualizacao_retorna_situacao_atual(self):
+        estoque = Estoque.objects.get(produto=self.produtos[1])
+        resposta = self.api.patch(f'/api/estoques/{estoque.pk}/', {'quantidade_minima': 50}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['produto_detail']['situacao_estoque'], 'abaixo_minimo')
+
+
+class ReconciliarEstoqueTest(EstoqueTestMixin, TestCase):
+    """Conferência do saldo contra a soma do razão"""
+
+    def setUp(self):
+        super().setUp()
+        # Saldo inicial de 10 registrado no razão: tudo consistente
+        Estoque.objects.update(quantidade_atual=0)
+        registrar_movimentacoes(
+            [self.movimentacao(produto, 'entrada', 10, 'compra') for produto in self.produtos],
+            usuario=self.usuario
+        )
+        registrar_movimentacoes([self.movimentacao(self.produtos[0], 'saida', 4)], usuario=self.usuario)
+
+    def divergencias(self, lote=2):
+        return [linha for faixa in faixas_produtos(lote) for linha in divergencias_estoque(*faixa)]
+
+    def test_faixas_cobrem_todos_os_produtos(self):
+        faixas = faixas_produtos(2)
+        ids = [produto.pk for produto in self.produtos]
+        self.assertEqual(faixas[0][0], min(ids))
+        self.assertEqual(faixas[-1][1], max(ids))
+        self.assertEqual(len(faixas), 3)
+
+    def test_detecta_e_corrige_edicao_manual(self):
+        self.assertEqual(self.divergencias(), [])
+
+        # Edição direta do saldo (como via PUT em /api/estoques/)
+        Estoque.objects.filter(produto=self.produtos[0]).update(quantidade_atual=9)
+        Estoque.objects.filter(produto=self.produtos[3]).update(quantidade_atual=2)
+        self.assertEqual(self.divergencias(), [
+            (self.produtos[0].pk, 'EST-0000', 9, 6),
+            (self.produtos[3].pk, 'EST-0003', 2, 10),
+        ])
+
+        corrigidos = sum(corrigir_divergencias(*faixa) for faixa in faixas_produtos(2))
+        self.assertEqual(corrigidos, 2)
+        self.assertEqual(self.saldo(self.produtos[0]), 6)
+        self.assertEqual(self.saldo(self.produtos[3]), 10)
+        self.assertEqual(self.divergencias(), [])
+
+    def test_estoque_sem_movimentacoes_confere_com_zero(self):
+        produto = self.criar_produtos('NOV', 1)[0]
+        Estoque.objects.create(produto=produto, quantidade_atual=3)
+        self.assertEqual(self.divergencias(), [(produto.pk, 'NOV-0000', 3, 0)])
+
+    def test_comando(self):
+        Estoque.objects.filter(produto=self.produtos[1]).update(quantidade_atual=15)
+
+        saida = StringIO()
+        call_command('reconciliar_estoque', '--lote', '2', stdout=saida)
+        self.assertIn('EST-0001', saida.getvalue())
+        self.assertIn('diferença +5', saida.getvalue())
+        self.assertEqual(self.saldo(self.produtos[1]), 15)
+
+        saida = StringIO()
+        call_command('reconciliar_estoque', '--corrigir', stdout=saida)
+        self.assertIn('1 de 1', saida.getvalue())
+        self.assertEqual(self.saldo(self.produtos[1]), 10)
+
+
+class CustoEstoqueTest(EstoqueTestMixin, TestCase):
+    """Custo médio ponderado e camadas PEPS mantidos a cada movimentação"""
+
+    def setUp(self):
+        super().setUp()
+        Estoque.objects.update(quantidade_atual=0)
+        self.produto = self.produtos[0]
+
+    def entrada(self, quantidade, custo=None, produto=None):
+        movimentacao = self.movimentacao(produto or self.produto, 'entrada', quantidade, 'compra')
+        movimentacao.custo_unitario = custo
+        return movimentacao
+
+    def custos(self, produto=None):
+        return Estoque.objects.values_list('custo_medio', 'valor_fifo').get(produto=produto or self.produto)
+
+    def test_medio_e_peps(self):
+        registrar_movimentacoes([self.entrada(10, Decimal('10'))], usuario=self.usuario)
+        registrar_movimentacoes([self.entrada(10, Decimal('20'))], usuario=self.usuario)
+        self.assertEqual(self.custos(), (Decimal('15'), Decimal('300')))
+
+        saida, = registrar_movimentacoes([self.movimentacao(self.produto, 'saida', 15, 'venda')], usuario=self.usuario)
+        self.assertEqual(saida.custo_unitario, Decimal('15'))
+        self.assertEqual(saida.custo_fifo, Decimal('200'))  # 10 x 10 + 5 x 20
+        self.assertEqual(self.custos(), (Decimal('15'), Decimal('100')))
+        self.assertEqual(
+            list(CamadaCusto.objects.filter(produto=self.produto).values_list('quantidade_restante', 'custo_unitario')),
+            [(0, Decimal('10')), (5, Decimal('20'))]
+        )
+
+    def test_saida_consome_camada_criada_no_mesmo_lote(self):
+        entrada, saida = registrar_movimentacoes(
+            [self.entrada(4, Decimal('2.5')), self.movimentacao(self.produto, 'saida', 3)],
+            usuario=self.usuario
+        )
+        self.assertEqual(saida.custo_fifo, Decimal('7.5'))
+        camada = CamadaCusto.objects.get(produto=self.produto)
+        self.assertEqual((camada.quantidade_restante, camada.movimentacao_id), (1, entrada.pk))
+        self.assertEqual(self.custos(), (Decimal('2.5'), Decimal('2.5')))
+
+    def test_entrada_sem_custo_usa_preco_de_custo(self):
+        entrada, = registrar_movimentacoes([self.entrada(2)], usuario=self.usuario)
+        self.assertEqual(entrada.custo_unitario, Decimal('10'))
+        self.assertEqual(self.custos(), (Decimal('10'), Decimal('20')))
+
+    def test_saldo_sem_camada_sai_pelo_custo_medio(self):
+        registrar_movimentacoes([self.entrada(5, Decimal('8'))], usuario=self.usuario)
+        Estoque.objects.filter(produto=self.produto).update(quantidade_atual=7)  # edição manual
+        saida, = registrar_movimentacoes([self.movimentacao(self.produto, 'saida', 7)], usuario=self.usuario)
+        self.assertEqual(saida.custo_fifo, Decimal('56'))
+        self.assertEqual(self.custos(), (Decimal('8'), Decimal('0')))
+
+    def test_valorizacao_total_e_por_categoria(self):
+        outra = Categoria.objects.create(nome='Bebidas')
+        Produto.objects.filter(pk=self.produtos[1].pk).update(categoria=outra)
+        registrar_movimentacoes([
+            self.entrada(10, Decimal('10')),
+            self.entrada(10, Decimal('20')),
+            self.movimentacao(self.produto, 'saida', 15),
+            self.entrada(3, Decimal('1.5'), produto=self.produtos[1]),
+        ], usuario=self.usuario)
+
+        with self.assertNumQueries(1):
+            valorizacao = valorizacao_estoque()
+        self.assertEqual(valorizacao['total']['quantidade'], 8)
+        self.assertEqual(valorizacao['total']['valor_medio'], Decimal('79.50'))  # 5 x 15 + 3 x 1.5
+        self.assertEqual(valorizacao['total']['valor_fifo'], Decimal('104.50'))  # 5 x 20 + 3 x 1.5
+        bebidas, geral = valorizacao['categorias']
+        self.assertEqual((bebidas['categoria_nome'], bebidas['valor_fifo']), ('Bebidas', Decimal('4.50')))
+        self.assertEqual((geral['produtos'], geral['valor_medio']), (4, Decimal('75.00')))
+
+        api = APIClient()
+        api.force_authenticate(self.usuario)
+        resposta = api.get('/api/estoques/valorizacao/', {'produto': self.produtos[1].pk})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['total']['valor_fifo'], Decimal('4.50'))
+
+    def test_custo_unitario_apenas_na_entrada(self):
+        api = APIClient()
+        api.force_authenticate(self.usuario)
+        resposta = api.post('/api/movimentacoes/bulk/', {'itens': [
+            {'produto': self.produto.pk, 'tipo': 'saida', 'quantidade': 1, 'motivo': 'venda', 'custo_unitario': '3.00'},
+        ]}, format='json')
+        self.assertEqual(resposta.status_code, 400)
+
+
+class FragmentosEstoqueTest(EstoqueTestMixin, TestCase):
+    """Contadores fragmentados: soma na leitura e dobra periódica"""
+
+    def setUp(self):
+        super().setUp()
+        Estoque.objects.update(quantidade_atual=0)
+        self.produto = self.produtos[0]
+        entrada = self.movimentacao(self.produto, 'entrada', 10, 'compra')
+        entrada.custo_unitario = Decimal('4')
+        registrar_movimentacoes([entrada], usuario=self.usuario)
+        configurar_fragmentos([self.produto.pk], 4)
+
+    def test_movimentacao_vai_para_um_fragmento(self):
+        with CaptureQueriesContext(connection) as consultas:
+            saida, = registrar_movimentacoes([self.movimentacao(self.produto, 'saida', 3, 'venda')], usuario=self.usuario)
+        self.assertFalse(any('UPDATE "estoque_estoque"' in q['sql'] for q in consultas.captured_queries))
+
+        self.assertEqual(self.saldo(self.produto), 10)
+        self.assertEqual(sum(FragmentoEstoque.objects.filter(produto=self.produto).values_list('quantidade', flat=True)), -3)
+        self.assertEqual((saida.quantidade_anterior, saida.quantidade_posterior, saida.custo_pendente), (10, 7, True))
+
+        with self.assertRaises(EstoqueInsuficienteError) as erro:
+            registrar_movimentacoes([self.movimentacao(self.produto, 'saida', 8)], usuario=self.usuario)
+        self.assertEqual(erro.exception.faltas, {self.produto.pk: (7, 8)})
+
+        api = APIClient()
+        api.force_authenticate(self.usuario)
+        dados = api.get(f'/api/estoques/?produto={self.produto.pk}').data['results'][0]
+        self.assertEqual((dados['quantidade_atual'], dados['quantidade_em_fragmentos'], dados['fragmentos']), (10, -3, 4))
+
+    def test_saida_fragmentada_invalida_etag(self):
+        api = APIClient()
+        api.force_authenticate(self.usuario)
+        urls = ['/api/estoques/', f'/api/estoques/{Estoque.objects.get(produto=self.produto).pk}/']
+        etags = [api.get(url)['ETag'] for url in urls]
+        for url, etag in zip(urls, etags):
+            self.assertEqual(api.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        registrar_movimentacoes([self.movimentacao(self.produto, 'saida', 3, 'venda')], usuario=self.usuario)
+        for url, etag in zip(urls, etags):
+            self.assertEqual(api.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_dobra_leva_saldo_e_custos(self):
+        registrar_movimentacoes([
+            self.movimentacao(self.produto, 'saida', 3, 'venda'),
+            self.movimentacao(self.produto, 'saida', 2, 'venda'),
+        ], usuario=self.usuario)
+        entrada = self.movimentacao(self.produto, 'entrada', 5, 'compra')
+        entrada.custo_unitario = Decimal('6')
+        registrar_movimentacoes([entrada], usuario=self.usuario)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(dobrar_fragmentos(), (1, 3))
+        self.assertEqual(self.saldo(self.produto), 10)
+        self.assertFalse(FragmentoEstoque.objects.filter(produto=self.produto).exclude(quantidade=0).exists())
+        self.assertEqual(
+            Estoque.objects.values_list('custo_medio', 'valor_fifo').get(produto=self.produto),
+            (Decimal('5'), Decimal('50'))
+        )
+        pendentes = MovimentacaoEstoque.objects.filter(produto=self.produto, custo_pendente=True)
+        self.assertFalse(pendentes.exists())
+        self.assertEqual(
+            list(MovimentacaoEstoque.objects.filter(produto=self.produto).order_by('pk').values_list(
+                'quantidade_posterior', 'custo_fifo'
+            )),
+            [(10, Decimal('40')), (7, Decimal('12')), (5, Decimal('8')), (10, Decimal('30'))]
+        )
+        self.assertEqual(dobrar_fragmentos(), (0, 0))
+
+    def test_desligar_dobra_e_remove_fragmentos(self):
+        registrar_movimentacoes([self.movimentacao(self.produto, 'saida', 4)], usuario=self.usuario)
+        configurar_fragmentos([self.produto.pk], 0)
+        self.assertEqual(self.saldo(self.produto), 6)
+        self.assertFalse(FragmentoEstoque.objects.filter(produto=self.produto).exists())
+
+        registrar_movimentacoes([self.movimentacao(self.produto, 'saida', 1)], usuario=self.usuario)
+        self.assertEqual(self.saldo(self.produto), 5)
+
+    def test_reconciliacao_considera_fragmentos(self):
+        registrar_movimentacoes([self.movimentacao(self.produto, 'saida', 4)], usuario=self.usuario)
+        self.assertEqual(divergencias_estoque(self.produto.pk, self.produto.pk), [])
+        Estoque.objects.filter(produto=self.produto).update(quantidade_atual=20)
+        self.assertEqual(divergencias_estoque(self.produto.pk, self.produto.pk), [(self.produto.pk, 'EST-0000', 16, 6)])
+        corrigir_divergencias(self.produto.pk, self.produto.pk)
+        self.assertEqual(self.saldo(self.produto), 10)
@@ -1,55 +1,157 @@
+import datetime
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from config.condicional import GetCondicionalMixin
+from config.exportacao import ExportacaoMixin
 from .models import Estoque, MovimentacaoEstoque
+from .services import (
+    EstoqueInsuficienteError,
+    prefetch_situacao_estoque,
+    quantidade_em_fragmentos,
+    saldos_em,
+    total_necessita_reposicao,
+    valorizacao_estoque,
+)
 from .serializers import (
     EstoqueSerializer,
     MovimentacaoEstoqueSerializer,
-    MovimentacaoEstoqueCreateSerializer
+    MovimentacaoEstoqueCreateSerializer,
+    MovimentacaoLoteSerializer,
+    MovimentacaoLoteItemSerializer
 )
 
 
-class EstoqueViewSet(viewsets.ModelViewSet):
+class EstoqueViewSet(GetCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para operações CRUD de Estoque.
     """
-    queryset = Estoque.objects.select_related('produto').all()
+    queryset = Estoque.objects.prefetch_related(prefetch_situacao_estoque()).annotate(
+        quantidade_em_fragmentos=quantidade_em_fragmentos()
+    )
     serializer_class = EstoqueSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     
     filterset_fields = ['produto']
-    search_fields = ['produto__nome', 'produto__codigo_sku', 'localizacao']
-    ordering_fields = ['quantidade_atual', 'data_atualizacao']
+    search_fields = ['produto__nome', 'produto__codigo', 'localizacao']
+    ordering_fields = ['quantidade_atual', 'ultima_atualizacao']
     ordering = ['produto__nome']
     
+    # Saídas de produtos fragmentados não tocam a linha de Estoque
+    campos_atualizacao_extras = ('produto__fragmentos_estoque__ultima_atualizacao',)
+    
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self._recarregar(serializer)
+    
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self._recarregar(serializer)
+    
+    def _recarregar(self, serializer):
+        """Relê a instância salva com as anotações (saldo e situação do produto) da listagem"""
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
+    
     @action(detail=False, methods=['get'])
     def necessita_reposicao(self, request):
-        """Retorna produtos que precisam de reposição"""
-        estoques = self.queryset.filter(
-            quantidade_atual__lte=models.F('quantidade_minima')
-        )
+        """Retorna, paginados, os produtos que precisam de reposição"""
+        estoques = self.filter_queryset(self.get_queryset()).filter(abaixo_minimo=True)
+        
+        pagina = self.paginate_queryset(estoques)
+        if pagina is not None:
+            serializer = self.get_serializer(pagina, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(estoques, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], url_path='necessita_reposicao/total')
+    def necessita_reposicao_total(self, request):
+        """Total de produtos abaixo do mínimo (badge do dashboard, em cache)"""
+        return Response({'total': total_necessita_reposicao()})
+    
+    @action(detail=False, methods=['get'])
+    def valorizacao(self, request):
+        """
+        Valor do estoque (custo médio ponderado e PEPS), total e por categoria.
+        Aceita os mesmos filtros da listagem.
+        """
+        return Response(valorizacao_estoque(self.filter_queryset(self.get_queryset())))
+    
+    @action(detail=False, methods=['get'])
+    def historico(self, request):
+        """
+        Saldo dos produtos em uma data: ?data=AAAA-MM-DD (fechamento do dia)
+        ou data/hora ISO 8601. Aceita os mesmos filtros da listagem (?produto=).
+        Calculado a partir do snapshot mais próximo + movimentações seguintes.
+        """
+        valor = request.query_params.get('data', '')
+        try:
+            data = parse_date(valor)
+            data_hora = parse_datetime(valor) if data is None else datetime.datetime.combine(data, datetime.time.max)
+        except ValueError:
+            data_hora = None
+        if data_hora is None:
+            return Response(
+                {'error': 'Informe ?data= no formato AAAA-MM-DD ou AAAA-MM-DDTHH:MM'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(data_hora):
+            data_hora = timezone.make_aware(data_hora)
+        
+        estoques = saldos_em(self.filter_queryset(self.get_queryset()), data_hora)
+        pagina = self.paginate_queryset(estoques)
+        dados = [
+            {
+                'produto': estoque.produto_id,
+                'produto_codigo': estoque.produto.codigo,
+                'produto_nome': estoque.produto.nome,
+                'data': data_hora,
+                'quantidade': estoque.quantidade_em,
+                'snapshot_data': estoque.snapshot_data,
+                'movimentacoes_reproduzidas': estoque.movimentacoes_reproduzidas,
+            }
+            for estoque in (pagina if pagina is not None else estoques)
+        ]
+        if pagina is not None:
+            return self.get_paginated_response(dados)
+        return Response(dados)
 
 
-class MovimentacaoEstoqueViewSet(viewsets.ModelViewSet):
+class MovimentacaoEstoqueViewSet(ExportacaoMixin, viewsets.ModelViewSet):
     """
     ViewSet para operações de Movimentação de Estoque.
     """
-    queryset = MovimentacaoEstoque.objects.select_related(
-        'produto', 'usuario'
-    ).all()
+    queryset = MovimentacaoEstoque.objects.select_related('usuario').prefetch_related(
+        prefetch_situacao_estoque()
+    )
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     
-    filterset_fields = ['produto', 'tipo_movimentacao', 'usuario']
-    search_fields = ['produto__nome', 'observacao']
+    filterset_fields = ['produto', 'tipo', 'motivo', 'usuario']
+    search_fields = ['produto__nome', 'observacoes']
     ordering_fields = ['data_movimentacao']
     ordering = ['-data_movimentacao']
+    paginacao_cursor = True  # índices (produto, -data_movimentacao) e (-data_movimentacao)
+    
+    nome_exportacao = 'movimentacoes'
+    colunas_exportacao = [
+        ('data_movimentacao', 'Data'),
+        ('produto__codigo', 'Código'),
+        ('produto__nome', 'Produto'),
+        ('tipo', 'Tipo'),
+        ('motivo', 'Motivo'),
+        ('quantidade', 'Quantidade'),
+        ('quantidade_anterior', 'Saldo Anterior'),
+        ('quantidade_posterior', 'Saldo Posterior'),
+        ('usuario__username', 'Usuário'),
+        ('observacoes', 'Observações'),
+    ]
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -58,4 +160,37 @@ class MovimentacaoEstoqueViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         """Adiciona o usuário logado automaticamente"""
-        serializer.save(usuario=self.request.user)
+        try:
+            serializer.save(usuario=self.request.user)
+        except EstoqueInsuficienteError as e:
+            raise ValidationError({'quantidade': str(e)})
+    
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def lote(self, request):
+        """
+        Aplica um lote de movimentações em uma transação.
+        Body: {"itens": [{"produto", "tipo", "quantidade", "motivo", "observacoes"}], "observacoes": "..."}
+        """
+        serializer = MovimentacaoLoteSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        try:
+            movimentacoes = serializer.save()
+        except EstoqueInsuficienteError as e:
+            return Response(
+                {
+                    'error': str(e),
+                    'faltas': [
+                        {'produto': produto_id, 'disponivel': disponivel, 'solicitado': solicitado}
+                        for produto_id, (disponivel, solicitado) in sorted(e.faltas.items())
+                    ],
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(
+            {
+                'total': len(movimentacoes),
+                'movimentacoes': MovimentacaoLoteItemSerializer(movimentacoes, many=True).data,
+            },
+            status=status.HTTP_201_CREATED
+        )
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:48
+
+from django.db import migrations
+
+
+def inicializar_sequencia(apps, schema_editor):
+    """Posiciona o contador FAT de cada mês após o maior número já emitido"""
+    Fatura = apps.get_model('financeiro', 'Fatura')
+    Sequencia = apps.get_model('sequencias', 'Sequencia')
+
+    maiores = {}
+    for numero in Fatura.objects.values_list('numero_fatura', flat=True).iterator():
+        periodo, valor = numero[3:9], numero[9:]
+        if numero.startswith('FAT') and periodo.isdigit() and valor.isdigit():
+            maiores[periodo] = max(maiores.get(periodo, 0), int(valor))
+
+    for periodo, valor in maiores.items():
+        Sequencia.objects.update_or_create(
+            prefixo='FAT', periodo=periodo, defaults={'ultimo_valor': valor}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sequencias', '0001_initial'),
+        ('financeiro', '0003_contapagar_data_atualizacao_contapagar_desconto_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(inicializar_sequencia, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,11 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
 from clientes.models import Cliente
 from fornecedores.models import Fornecedor
 from vendas.models import Pedido
+from sequencias.services import proximo_numero
 
 
 class Fatura(models.Model):
@@ -82,13 +84,7 @@ class Fatura(models.Model):
     def save(self, *args, **kwargs):
         """Gera número da fatura automaticamente se não existir"""
         if not self.numero_fatura:
-            from django.utils import timezone
-            data = timezone.now()
-            ultima_fatura = Fatura.objects.filter(
-                data_emissao__year=data.year,
-                data_emissao__month=data.month
-            ).count()
-            self.numero_fatura = f"FAT{data.year}{data.month:02d}{ultima_fatura + 1:05d}"
+            self.numero_fatura = self.gerar_numero()
         
         # Atualiza status baseado no pagamento
         if self.valor_pago >= self.valor_total:
@@ -98,6 +94,12 @@ class Fatura(models.Model):
         
         super().save(*args, **kwargs)
     
+    @staticmethod
+    def gerar_numero():
+        """Reserva o próximo número de fatura do mês (FAT + AAAAMM + sequencial)"""
+        periodo, valor = proximo_numero('FAT')
+        return f"FAT{periodo}{valor:05d}"
+    
     @property
     def dias_vencimento(self):
         """Retorna quantos dias faltam para o vencimento (negativo se atrasado)"""
@@ -199,6 +201,13 @@ class ContaReceber(models.Model):
     def __str__(self):
         return f"{self.descricao} - R$ {self.valor} - {self.cliente.nome_completo}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Cliente carregado: se trocar, o resumo do anterior também é invalidado
+        instance._cliente_original = instance.__dict__.get('cliente_id')
+        return instance
+    
     @property
     def is_atrasado(self):
         """Verifica se a conta está atrasada"""
@@ -0,0 +1,15 @@
+"""Invalidação do resumo de clientes em cache."""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from clientes.models import Cliente
+from .models import ContaReceber
+
+
+@receiver(post_save, sender=ContaReceber)
+@receiver(post_delete, sender=ContaReceber)
+def invalidar_resumo_do_cliente(sender, instance, **kwargs):
+    """O resumo em cache do cliente da conta (e do anterior, se foi trocado) deixa de valer"""
+    clientes = {instance.cliente_id, getattr(instance, '_cliente_original', None)}
+    instance._cliente_original = instance.cliente_id
+    transaction.on_commit(lambda: Cliente.invalidar_resumo(*clientes))
@@ -5,6 +5,8 @@ from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db import models
 from django.utils import timezone
+from config.condicional import GetCondicionalMixin
+from config.exportacao import ExportacaoMixin
 from .models import Fatura, ContaReceber, ContaPagar
 from .serializers import (
     FaturaSerializer,
@@ -16,7 +18,7 @@ from .serializers import (
 )
 
 
-class FaturaViewSet(viewsets.ModelViewSet):
+class FaturaViewSet(GetCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para operações CRUD de Fatura.
     """
@@ -45,7 +47,7 @@ class FaturaViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ContaReceberViewSet(viewsets.ModelViewSet):
+class ContaReceberViewSet(ExportacaoMixin, GetCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para operações CRUD de Conta a Receber.
     """
@@ -58,6 +60,23 @@ class ContaReceberViewSet(viewsets.ModelViewSet):
     ordering_fields = ['data_vencimento', 'valor']
     ordering = ['-data_cadastro']
     
+    nome_exportacao = 'contas_receber'
+    colunas_exportacao = [
+        ('numero_documento', 'Documento'),
+        ('descricao', 'Descrição'),
+        ('cliente__nome_completo', 'Cliente'),
+        ('fatura__numero_fatura', 'Fatura'),
+        ('valor', 'Valor'),
+        ('valor_recebido', 'Valor Recebido'),
+        ('juros', 'Juros'),
+        ('multa', 'Multa'),
+        ('desconto', 'Desconto'),
+        ('forma_pagamento', 'Forma de Pagamento'),
+        ('data_vencimento', 'Vencimento'),
+        ('data_recebimento', 'Recebimento'),
+        ('status', 'Status'),
+    ]
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return ContaReceberListSerializer
@@ -83,7 +102,7 @@ class ContaReceberViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ContaPagarViewSet(viewsets.ModelViewSet):
+class ContaPagarViewSet(ExportacaoMixin, GetCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para operações CRUD de Conta a Pagar.
     """
@@ -96,6 +115,23 @@ class ContaPagarViewSet(viewsets.ModelViewSet):
     ordering_fields = ['data_vencimento', 'valor']
     ordering = ['-data_cadastro']
     
+    nome_exportacao = 'contas_pagar'
+    colunas_exportacao = [
+        ('numero_documento', 'Documento'),
+        ('descricao', 'Descrição'),
+        ('fornecedor__nome', 'Fornecedor'),
+        ('categoria', 'Categoria'),
+        ('valor', 'Valor'),
+        ('valor_pago', 'Valor Pago'),
+        ('juros', 'Juros'),
+        ('multa', 'Multa'),
+        ('desconto', 'Desconto'),
+        ('forma_pagamento', 'Forma de Pagamento'),
+        ('data_vencimento', 'Vencimento'),
+        ('data_pagamento', 'Pagamento'),
+        ('status', 'Status'),
+    ]
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return ContaPagarListSerializer
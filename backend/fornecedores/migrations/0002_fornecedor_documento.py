@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+from clientes.normalizacao import normalizar_documento
+
+
+def preencher_documentos(apps, schema_editor):
+    Fornecedor = apps.get_model('fornecedores', 'Fornecedor')
+    lote = []
+    for fornecedor in Fornecedor.objects.only('cnpj').iterator(chunk_size=2000):
+        fornecedor.documento = normalizar_documento(fornecedor.cnpj)
+        lote.append(fornecedor)
+        if len(lote) == 2000:
+            Fornecedor.objects.bulk_update(lote, ['documento'])
+            lote = []
+    Fornecedor.objects.bulk_update(lote, ['documento'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fornecedores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fornecedor',
+            name='documento',
+            field=models.CharField(blank=True, editable=False, max_length=14, null=True, verbose_name='Documento (só dígitos)'),
+        ),
+        migrations.AddIndex(
+            model_name='fornecedor',
+            index=models.Index(fields=['documento'], name='fornecedor_documento_idx'),
+        ),
+        migrations.RunPython(preencher_documentos, migrations.RunPython.noop),
+    ]
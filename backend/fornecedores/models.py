@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.validators import RegexValidator
+from clientes.normalizacao import normalizar_documento
 
 
 class Fornecedor(models.Model):
@@ -25,6 +26,8 @@ class Fornecedor(models.Model):
             )
         ]
     )
+    # CNPJ só com dígitos, para encontrar o cadastro qualquer que seja a máscara
+    documento = models.CharField('Documento (só dígitos)', max_length=14, null=True, blank=True, editable=False)
     inscricao_estadual = models.CharField('Inscrição Estadual', max_length=20, blank=True, null=True)
     
     # Contato
@@ -88,11 +91,23 @@ class Fornecedor(models.Model):
         indexes = [
             models.Index(fields=['cnpj']),
             models.Index(fields=['status']),
+            models.Index(fields=['documento'], name='fornecedor_documento_idx'),
         ]
     
     def __str__(self):
         return f"{self.nome} - {self.cnpj}"
     
+    def normalizar(self):
+        """Atualiza o documento (CNPJ só com dígitos)"""
+        self.documento = normalizar_documento(self.cnpj)
+    
+    def save(self, *args, **kwargs):
+        self.normalizar()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'documento'}
+        super().save(*args, **kwargs)
+    
     @property
     def razao_social(self):
         """Alias para nome (compatibilidade admin)"""
@@ -1,11 +1,12 @@
 from rest_framework import viewsets, filters
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from config.condicional import GetCondicionalMixin
 from .models import Fornecedor
 from .serializers import FornecedorSerializer, FornecedorListSerializer
 
 
-class FornecedorViewSet(viewsets.ModelViewSet):
+class FornecedorViewSet(GetCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para operações CRUD de Fornecedor.
     """
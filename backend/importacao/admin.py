@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Importacao
+
+
+@admin.register(Importacao)
+class ImportacaoAdmin(admin.ModelAdmin):
+    list_display = ('tipo', 'arquivo', 'status', 'linhas_processadas', 'criados', 'atualizados', 'linhas_com_erro', 'data_criacao')
+    list_filter = ('tipo', 'status')
+    readonly_fields = ('data_criacao', 'data_inicio', 'data_conclusao')
@@ -0,0 +1,54 @@
+"""Comando Django para importar produtos, clientes ou fornecedores de um arquivo CSV/XLSX."""
+import os
+import time
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from importacao.models import Importacao
+from importacao.services import EXTENSOES, executar_importacao
+
+
+class Command(BaseCommand):
+    help = 'Importa produtos, clientes ou fornecedores de um arquivo CSV/XLSX (cria ou atualiza pela chave)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=[valor for valor, _ in Importacao.TIPO_CHOICES])
+        parser.add_argument('arquivo', help='Caminho do arquivo .csv ou .xlsx')
+        parser.add_argument(
+            '--em-segundo-plano', action='store_true',
+            help='Apenas enfileira o arquivo para o worker (processar_importacoes)'
+        )
+
+    def handle(self, *args, **options):
+        caminho = options['arquivo']
+        if not os.path.isfile(caminho):
+            raise CommandError(f'Arquivo não encontrado: {caminho}')
+        if os.path.splitext(caminho)[1].lower() not in EXTENSOES:
+            raise CommandError(f'Formato não suportado: use {" ou ".join(EXTENSOES)}')
+
+        with open(caminho, 'rb') as arquivo:
+            importacao = Importacao.objects.create(
+                tipo=options['tipo'], arquivo=File(arquivo, name=os.path.basename(caminho))
+            )
+        if options['em_segundo_plano']:
+            self.stdout.write(self.style.SUCCESS(f'✅ Importação {importacao.pk} enfileirada'))
+            return
+
+        inicio = time.perf_counter()
+        importacao = executar_importacao(importacao, ao_progredir=self._progresso)
+        if importacao.status == 'falhou':
+            raise CommandError(importacao.mensagem)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {importacao.linhas_processadas} linha(s) em {time.perf_counter() - inicio:.1f}s: '
+            f'{importacao.criados} criado(s), {importacao.atualizados} atualizado(s)'
+        ))
+        if importacao.linhas_com_erro:
+            self.stdout.write(self.style.WARNING(f'⚠️ {importacao.linhas_com_erro} linha(s) com erro:'))
+            for erro in importacao.erros[:20]:
+                detalhes = '; '.join(f'{coluna}: {" ".join(mensagens)}' for coluna, mensagens in erro['erros'].items())
+                self.stdout.write(f'   linha {erro["linha"]}: {detalhes}')
+            if importacao.linhas_com_erro > 20:
+                self.stdout.write(f'   ... detalhes em /api/importacoes/{importacao.pk}/')
+
+    def _progresso(self, importacao):
+        progresso = f' ({importacao.progresso:.0f}%)' if importacao.progresso is not None else ''
+        self.stdout.write(f'   {importacao.linhas_processadas} linha(s) processada(s){progresso}')
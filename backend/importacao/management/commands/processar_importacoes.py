@@ -0,0 +1,43 @@
+"""Comando Django que processa as importações de arquivos enviadas pela API (fila de importações pendentes)."""
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from importacao.services import executar_importacao, proxima_pendente
+
+
+class Command(BaseCommand):
+    help = 'Processa as importações CSV/XLSX pendentes (produtos, clientes e fornecedores)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help='Continua rodando e verificando a fila (processo de worker)'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=5.0,
+            help='Segundos entre verificações da fila no modo contínuo'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            importacao = proxima_pendente()
+            if importacao is not None:
+                self._relatar(executar_importacao(importacao))
+                continue
+            if not options['continuo']:
+                return
+            close_old_connections()
+            time.sleep(options['intervalo'])
+
+    def _relatar(self, importacao):
+        if importacao.status == 'falhou':
+            self.stdout.write(self.style.ERROR(f'❌ Importação {importacao.pk}: {importacao.mensagem}'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Importação {importacao.pk} ({importacao.tipo}): {importacao.criados} criado(s), '
+            f'{importacao.atualizados} atualizado(s)'
+        ))
+        if importacao.linhas_com_erro:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️ {importacao.linhas_com_erro} linha(s) com erro (detalhes em /api/importacoes/{importacao.pk}/)'
+            ))
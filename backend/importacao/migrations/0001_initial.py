@@ -0,0 +1,43 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Importacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('produtos', 'Produtos'), ('clientes', 'Clientes'), ('fornecedores', 'Fornecedores')], max_length=15, verbose_name='Tipo')),
+                ('arquivo', models.FileField(upload_to='importacoes/%Y/%m/', verbose_name='Arquivo')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], default='pendente', max_length=15, verbose_name='Status')),
+                ('total_linhas', models.PositiveIntegerField(blank=True, null=True, verbose_name='Total de Linhas')),
+                ('linhas_processadas', models.PositiveIntegerField(default=0, verbose_name='Linhas Processadas')),
+                ('criados', models.PositiveIntegerField(default=0, verbose_name='Registros Criados')),
+                ('atualizados', models.PositiveIntegerField(default=0, verbose_name='Registros Atualizados')),
+                ('linhas_com_erro', models.PositiveIntegerField(default=0, verbose_name='Linhas com Erro')),
+                ('erros', models.JSONField(blank=True, default=list, verbose_name='Erros')),
+                ('mensagem', models.TextField(blank=True, verbose_name='Mensagem')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('data_inicio', models.DateTimeField(blank=True, null=True, verbose_name='Início do Processamento')),
+                ('data_conclusao', models.DateTimeField(blank=True, null=True, verbose_name='Conclusão')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='importacoes', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Importação',
+                'verbose_name_plural': 'Importações',
+                'ordering': ['-data_criacao'],
+                'indexes': [models.Index(condition=models.Q(('status', 'pendente')), fields=['data_criacao'], name='importacao_pendente_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.db import models
+
+
+class Importacao(models.Model):
+    """
+    Importação em lote de um arquivo CSV/XLSX (produtos, clientes ou
+    fornecedores), processada fora da requisição pelo comando
+    processar_importacoes. Os contadores são atualizados a cada bloco de
+    linhas, para acompanhar o progresso.
+    """
+
+    TIPO_CHOICES = [
+        ('produtos', 'Produtos'),
+        ('clientes', 'Clientes'),
+        ('fornecedores', 'Fornecedores'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('concluida', 'Concluída'),
+        ('falhou', 'Falhou'),
+    ]
+
+    tipo = models.CharField('Tipo', max_length=15, choices=TIPO_CHOICES)
+    arquivo = models.FileField('Arquivo', upload_to='importacoes/%Y/%m/')
+    status = models.CharField('Status', max_length=15, choices=STATUS_CHOICES, default='pendente')
+
+    # Progresso (total_linhas é estimado antes da leitura; None se desconhecido)
+    total_linhas = models.PositiveIntegerField('Total de Linhas', null=True, blank=True)
+    linhas_processadas = models.PositiveIntegerField('Linhas Processadas', default=0)
+    criados = models.PositiveIntegerField('Registros Criados', default=0)
+    atualizados = models.PositiveIntegerField('Registros Atualizados', default=0)
+    linhas_com_erro = models.PositiveIntegerField('Linhas com Erro', default=0)
+    # [{'linha': n, 'erros': {coluna: [mensagens]}}], limitado a LIMITE_ERROS
+    erros = models.JSONField('Erros', default=list, blank=True)
+    mensagem = models.TextField('Mensagem', blank=True)
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='importacoes',
+        verbose_name='Usuário'
+    )
+    data_criacao = models.DateTimeField('Data de Criação', auto_now_add=True)
+    data_inicio = models.DateTimeField('Início do Processamento', null=True, blank=True)
+    data_conclusao = models.DateTimeField('Conclusão', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Importação'
+        verbose_name_plural = 'Importações'
+        ordering = ['-data_criacao']
+        indexes = [
+            # Fila do worker: só as importações pendentes
+            models.Index(
+                fields=['data_criacao'],
+                condition=models.Q(status='pendente'),
+                name='importacao_pendente_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - {self.arquivo.name} ({self.get_status_display()})"
+
+    @property
+    def progresso(self):
+        """Percentual de linhas processadas (None sem total estimado)"""
+        if self.status == 'concluida':
+            return 100.0
+        if not self.total_linhas:
+            return None
+        return round(min(100.0, self.linhas_processadas * 100 / self.total_linhas), 1)
@@ -0,0 +1,71 @@
+import os
+from rest_framework import serializers
+from .models import Importacao
+from .services import EXTENSOES
+
+
+class ImportacaoSerializer(serializers.ModelSerializer):
+    """Serializer para o model Importacao (envio do arquivo e acompanhamento)"""
+    
+    tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    usuario_nome = serializers.CharField(source='usuario.nome_completo', read_only=True, default=None)
+    progresso = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = Importacao
+        fields = [
+            'id',
+            'tipo',
+            'tipo_display',
+            'arquivo',
+            'status',
+            'status_display',
+            'progresso',
+            'total_linhas',
+            'linhas_processadas',
+            'criados',
+            'atualizados',
+            'linhas_com_erro',
+            'erros',
+            'mensagem',
+            'usuario',
+            'usuario_nome',
+            'data_criacao',
+            'data_inicio',
+            'data_conclusao',
+        ]
+        read_only_fields = [
+            'id', 'status', 'total_linhas', 'linhas_processadas', 'criados', 'atualizados',
+            'linhas_com_erro', 'erros', 'mensagem', 'usuario', 'data_criacao', 'data_inicio', 'data_conclusao',
+        ]
+    
+    def validate_arquivo(self, value):
+        extensao = os.path.splitext(value.name)[1].lower()
+        if extensao not in EXTENSOES:
+            raise serializers.ValidationError(f'Formato não suportado: use {" ou ".join(EXTENSOES)}')
+        return value
+
+
+class ImportacaoListSerializer(serializers.ModelSerializer):
+    """Serializer simplificado para listagem de importações (sem a lista de erros)"""
+    
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    progresso = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = Importacao
+        fields = [
+            'id',
+            'tipo',
+            'arquivo',
+            'status',
+            'status_display',
+            'progresso',
+            'linhas_processadas',
+            'criados',
+            'atualizados',
+            'linhas_com_erro',
+            'data_criacao',
+            'data_conclusao',
+        ]
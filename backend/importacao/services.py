@@ -0,0 +1,524 @@
+"""
+Importação em streaming de produtos, clientes e fornecedores (CSV/XLSX).
+
+O arquivo é lido linha a linha (módulo csv ou openpyxl em modo read-only,
+memória constante) e processado em blocos de TAMANHO_BLOCO linhas:
+
+- cada célula passa pelo clean() do campo do model (tipo, choices e
+  validadores), sem consultas ao banco; relacionamentos são resolvidos por
+  mapas carregados uma vez;
+- a unicidade da chave (codigo, cpf_cnpj, cnpj) é conferida contra o mapa
+  chave -> pk carregado no início e contra as chaves já vistas no arquivo
+  (documentos comparados só pelos dígitos, qualquer que seja a máscara);
+- chaves novas são criadas com bulk_create e as existentes atualizadas com
+  gravar_em_lote (um UPDATE via executemany), uma transação por bloco.
+  Células vazias não alteram o cadastro existente.
+
+Linhas inválidas não interrompem a importação: vão para Importacao.erros
+com o número da linha no arquivo e as mensagens por coluna.
+"""
+import csv
+import io
+import itertools
+import logging
+import os
+import re
+from collections import defaultdict
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, models, transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+from clientes.models import Cliente
+from clientes.normalizacao import chave_fonetica, normalizar_documento
+from clientes.services import INDICE_BUSCA as INDICE_BUSCA_CLIENTES
+from config.cache_versionado import incrementar_versao
+from estoque.services import gravar_em_lote
+from fornecedores.models import Fornecedor
+from produtos.models import Categoria, Produto
+from .models import Importacao
+
+logger = logging.getLogger(__name__)
+
+# Linhas validadas e gravadas por transação (e por atualização do progresso)
+TAMANHO_BLOCO = 1000
+
+# Linhas com erro guardadas em Importacao.erros (as demais só são contadas)
+LIMITE_ERROS = 1000
+
+EXTENSOES = ('.csv', '.xlsx')
+
+# Delimitadores aceitos no CSV (o Excel em português grava com ';')
+DELIMITADORES_CSV = (';', ',', '\t')
+
+
+class ArquivoInvalidoError(ValueError):
+    """O arquivo não pode ser importado (formato, cabeçalho ou colunas)"""
+
+
+class LinhaInvalidaError(ValueError):
+    """Erros de validação de uma linha, por coluna"""
+
+    def __init__(self, erros):
+        self.erros = erros
+        super().__init__(str(erros))
+
+
+# ----------------------------------------------------------------------
+# Leitura
+# ----------------------------------------------------------------------
+
+def _vazio(valor):
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def _linhas_csv(arquivo):
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    try:
+        cabecalho = texto.readline()
+        delimitador = max(DELIMITADORES_CSV, key=cabecalho.count)
+        yield from csv.reader(itertools.chain([cabecalho], texto), delimiter=delimitador)
+    finally:
+        # Devolve o arquivo sem fechá-lo (quem abriu fecha)
+        if not texto.closed:
+            texto.detach()
+
+
+def _linhas_xlsx(arquivo):
+    planilha = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        yield from planilha.active.iter_rows(values_only=True)
+    finally:
+        planilha.close()
+
+
+def _contar_linhas(arquivo, extensao):
+    """Estimativa do número de linhas de dados (sem o cabeçalho)"""
+    if extensao == '.xlsx':
+        planilha = load_workbook(arquivo, read_only=True)
+        try:
+            total = planilha.active.max_row
+        finally:
+            planilha.close()
+    else:
+        total = 0
+        for pedaco in iter(lambda: arquivo.read(1 << 20), b''):
+            total += pedaco.count(b'\n')
+    arquivo.seek(0)
+    return max(total - 1, 0) if total else None
+
+
+def ler_arquivo(arquivo, nome):
+    """
+    Abre `arquivo` (binário, posicionável) como CSV ou XLSX conforme a
+    extensão de `nome`. Retorna (colunas, total estimado de linhas, gerador
+    de (número da linha, {coluna: valor})); linhas em branco são puladas.
+    """
+    extensao = os.path.splitext(nome)[1].lower()
+    if extensao not in EXTENSOES:
+        raise ArquivoInvalidoError(f'Formato não suportado: use {" ou ".join(EXTENSOES)}')
+    try:
+        total = _contar_linhas(arquivo, extensao)
+        linhas = _linhas_xlsx(arquivo) if extensao == '.xlsx' else _linhas_csv(arquivo)
+        cabecalho = next(linhas, None)
+    except (OSError, UnicodeDecodeError, ValueError, KeyError) as e:
+        raise ArquivoInvalidoError(f'Não foi possível ler o arquivo: {e}')
+    if not cabecalho:
+        raise ArquivoInvalidoError('Arquivo vazio')
+    colunas = [str(coluna).strip().lower() if coluna is not None else '' for coluna in cabecalho]
+
+    def registros():
+        for numero, valores in enumerate(linhas, start=2):
+            if all(_vazio(valor) for valor in valores):
+                continue
+            yield numero, dict(zip(colunas, valores))
+
+    return colunas, total, registros()
+
+
+# ----------------------------------------------------------------------
+# Conversão e validação
+# ----------------------------------------------------------------------
+
+def formatar_documento(valor):
+    """CPF/CNPJ só com dígitos recebe a máscara exigida pelos models"""
+    digitos = re.sub(r'\D', '', valor)
+    if len(digitos) == 11:
+        return f'{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}'
+    if len(digitos) == 14:
+        return f'{digitos[:2]}.{digitos[2:5]}.{digitos[5:8]}/{digitos[8:12]}-{digitos[12:]}'
+    return valor
+
+
+def formatar_cep(valor):
+    digitos = re.sub(r'\D', '', valor)
+    return f'{digitos[:5]}-{digitos[5:]}' if len(digitos) == 8 else valor
+
+
+def _numero(valor):
+    """Número de planilha ou texto no formato brasileiro (1.234,56)"""
+    if isinstance(valor, float):
+        return Decimal(repr(valor))
+    if isinstance(valor, str) and ',' in valor:
+        return valor.replace('.', '').replace(',', '.')
+    return valor
+
+
+def _texto(valor):
+    """Texto de uma célula (números inteiros do Excel sem o '.0')"""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+class Importador:
+    """
+    Validação e gravação das linhas de um tipo de cadastro. Subclasses
+    definem `modelo`, `chave` (campo único usado no upsert) e `campos`
+    (colunas aceitas); `formatadores` normalizam o texto antes do clean().
+    Com `campo_comparacao`, os cadastros existentes são encontrados por
+    esse campo normalizado, comparado a comparar(chave) da linha.
+    """
+    modelo = None
+    chave = None
+    campo_comparacao = None
+    campos = ()
+    formatadores = {}
+
+    def __init__(self, colunas):
+        desconhecidas = sorted(set(colunas) - set(self.campos) - {''})
+        if desconhecidas:
+            raise ArquivoInvalidoError(
+                f'Colunas desconhecidas: {", ".join(desconhecidas)}. '
+                f'Colunas aceitas: {", ".join(self.campos)}'
+            )
+        if self.chave not in colunas:
+            raise ArquivoInvalidoError(f'O arquivo precisa da coluna "{self.chave}"')
+        self.colunas = [coluna for coluna in self.campos if coluna in colunas]
+        self.fields = {nome: self.modelo._meta.get_field(nome) for nome in self.campos}
+        # Opções aceitas pelo valor ou pelo rótulo, sem diferenciar maiúsculas
+        self.opcoes = {
+            nome: {
+                texto.lower(): valor
+                for valor, rotulo in field.flatchoices
+                for texto in (str(valor), str(rotulo))
+            }
+            for nome, field in self.fields.items() if field.choices
+        }
+        # Obrigatórios para novos cadastros: sem valor padrão e sem aceitar vazio
+        self.obrigatorios = [
+            nome for nome, field in self.fields.items()
+            if not field.blank and not field.null and not field.has_default()
+        ]
+        # Unicidade pré-carregada: chave -> pk dos cadastros existentes
+        self.existentes = dict(
+            self.modelo.objects.values_list(self.campo_comparacao or self.chave, 'pk').iterator(chunk_size=5000)
+        )
+        self.vistos = set()
+
+    def comparar(self, chave):
+        """Chave já convertida no formato de `existentes` (e de `vistos`)"""
+        return chave
+
+    def converter(self, coluna, valor):
+        """Valor de uma célula não vazia já validado pelo campo do model"""
+        field = self.fields[coluna]
+        if isinstance(field, models.DecimalField):
+            valor = _numero(valor)
+        elif isinstance(field, (models.CharField, models.TextField)):
+            valor = _texto(valor)
+            formatar = self.formatadores.get(coluna)
+            if formatar:
+                valor = formatar(valor)
+            if coluna in self.opcoes:
+                valor = self.opcoes[coluna].get(valor.lower(), valor)
+        return field.clean(valor, None)
+
+    def validar_registro(self, valores, existente):
+        """Regras entre colunas (ValidationError com dict por coluna)"""
+
+    def validar(self, dados):
+        """(pk existente ou None, {campo: valor}) de uma linha, ou LinhaInvalidaError"""
+        if _vazio(dados.get(self.chave)):
+            raise LinhaInvalidaError({self.chave: ['Campo obrigatório']})
+        try:
+            chave = self.converter(self.chave, dados[self.chave])
+        except ValidationError as e:
+            raise LinhaInvalidaError({self.chave: e.messages})
+        comparacao = self.comparar(chave)
+        if comparacao in self.vistos:
+            raise LinhaInvalidaError({self.chave: ['Repetido em uma linha anterior do arquivo']})
+        pk = self.existentes.get(comparacao)
+
+        valores, erros = {self.chave: chave}, {}
+        for coluna in self.colunas:
+            if coluna == self.chave or _vazio(dados.get(coluna)):
+                continue
+            try:
+                valores[coluna] = self.converter(coluna, dados[coluna])
+            except ValidationError as e:
+                erros[coluna] = e.messages
+        if pk is None:
+            for coluna in self.obrigatorios:
+                if coluna not in valores and coluna not in erros:
+                    erros[coluna] = ['Campo obrigatório para novos cadastros']
+        if not erros:
+            try:
+                self.validar_registro(valores, existente=pk is not None)
+            except ValidationError as e:
+                erros.update(e.message_dict if hasattr(e, 'error_dict') else {'__all__': e.messages})
+        if erros:
+            raise LinhaInvalidaError(erros)
+        self.vistos.add(comparacao)
+        return pk, valores
+
+    def novo_objeto(self, valores):
+        return self.modelo(**valores)
+
+    def processar_bloco(self, linhas):
+        """
+        Valida e grava um bloco de (número da linha, dados). Retorna
+        (criados, atualizados, [{'linha': n, 'erros': {...}}]).
+        """
+        novos, alterados, erros = [], [], []
+        for numero, dados in linhas:
+            try:
+                pk, valores = self.validar(dados)
+            except LinhaInvalidaError as e:
+                erros.append({'linha': numero, 'erros': e.erros})
+                continue
+            if pk is None:
+                novos.append((numero, self.novo_objeto(valores)))
+            else:
+                alterados.append((numero, pk, valores))
+
+        try:
+            with transaction.atomic():
+                self.gravar([objeto for _, objeto in novos], [(pk, valores) for _, pk, valores in alterados])
+        except DatabaseError as e:
+            # Conflito com uma gravação concorrente, por exemplo: o bloco
+            # inteiro é descartado e as linhas válidas dele contam como erro
+            logger.warning('Bloco de importação descartado: %s', e)
+            erros += [
+                {'linha': numero, 'erros': {'__all__': [f'Não gravado: {e}']}}
+                for numero in sorted([numero for numero, _ in novos] + [numero for numero, _, _ in alterados])
+            ]
+            return 0, 0, erros
+
+        for _, objeto in novos:
+            self.existentes[self.comparar(getattr(objeto, self.chave))] = objeto.pk
+        return len(novos), len(alterados), erros
+
+    def gravar(self, novos, alterados):
+        self.modelo.objects.bulk_create(novos, batch_size=500)
+        # Atualizações agrupadas pelas colunas preenchidas em cada linha
+        agora = timezone.now()
+        grupos = defaultdict(list)
+        for pk, valores in alterados:
+            campos = tuple(campo for campo in self.colunas if campo in valores and campo != self.chave)
+            if campos:
+                grupos[campos].append((pk, [valores[campo] for campo in campos] + [agora]))
+        for campos, linhas in grupos.items():
+            gravar_em_lote(self.modelo, linhas, [*campos, 'data_atualizacao'])
+
+    def concluir(self):
+        """Ao fim da importação (índices, caches)"""
+
+
+class ImportadorProdutos(Importador):
+    modelo = Produto
+    chave = 'codigo'
+    campos = (
+        'codigo', 'nome', 'descricao', 'categoria', 'fornecedor', 'preco_custo', 'preco_venda',
+        'unidade_medida', 'peso', 'altura', 'largura', 'profundidade', 'status',
+    )
+
+    def __init__(self, colunas):
+        super().__init__(colunas)
+        # Categoria pelo nome (ou id) e fornecedor pelo CNPJ (ou id)
+        self.categorias = {}
+        for pk, nome in Categoria.objects.values_list('pk', 'nome'):
+            self.categorias[nome.strip().lower()] = self.categorias[str(pk)] = pk
+        self.fornecedores = {}
+        for pk, documento in Fornecedor.objects.values_list('pk', 'documento'):
+            self.fornecedores[documento] = self.fornecedores[str(pk)] = pk
+        self.precos_alterados = False
+
+    def converter(self, coluna, valor):
+        if coluna == 'categoria':
+            pk = self.categorias.get(_texto(valor).lower())
+            if pk is None:
+                raise ValidationError(f'Categoria não encontrada: {valor}')
+            return pk
+        if coluna == 'fornecedor':
+            texto = _texto(valor)
+            pk = self.fornecedores.get(normalizar_documento(texto)) or self.fornecedores.get(texto)
+            if pk is None:
+                raise ValidationError(f'Fornecedor não encontrado: {valor}')
+            return pk
+        return super().converter(coluna, valor)
+
+    def validar_registro(self, valores, existente):
+        custo, venda = valores.get('preco_custo'), valores.get('preco_venda')
+        if custo and venda and venda <= custo:
+            raise ValidationError({'preco_venda': ['O preço de venda deve ser maior que o preço de custo']})
+
+    def novo_objeto(self, valores):
+        produto = Produto(**{
+            f'{campo}_id' if campo in ('categoria', 'fornecedor') else campo: valor
+            for campo, valor in valores.items()
+        })
+        produto.calcular_margem_lucro()
+        return produto
+
+    def gravar(self, novos, alterados):
+        super().gravar(novos, alterados)
+        # Margem dos produtos com preço alterado, calculada no banco a
+        # partir dos preços já gravados (a linha pode trazer só um deles)
+        ids = [pk for pk, valores in alterados if 'preco_custo' in valores or 'preco_venda' in valores]
+        if ids:
+            Produto.objects.filter(pk__in=ids).update(margem_lucro=Produto.margem_lucro_sql())
+
+    def concluir(self):
+        from produtos.views import ProdutoViewSet
+        ProdutoViewSet.indice_busca.otimizar()
+        # bulk_create e UPDATEs diretos não disparam os sinais do catálogo em cache
+        transaction.on_commit(lambda: incrementar_versao(Produto))
+
+
+class ImportadorClientes(Importador):
+    modelo = Cliente
+    chave = 'cpf_cnpj'
+    campo_comparacao = 'documento'
+    campos = (
+        'cpf_cnpj', 'nome_completo', 'tipo', 'email', 'telefone', 'status', 'endereco', 'numero',
+        'complemento', 'bairro', 'cidade', 'estado', 'cep', 'observacoes',
+    )
+    formatadores = {'cpf_cnpj': formatar_documento, 'cep': formatar_cep}
+
+    def comparar(self, chave):
+        return normalizar_documento(chave)
+
+    def validar_registro(self, valores, existente):
+        digitos = re.sub(r'\D', '', valores['cpf_cnpj'])
+        if len(set(digitos)) == 1:
+            raise ValidationError({'cpf_cnpj': ['CPF/CNPJ inválido']})
+        tipo_documento = 'PF' if len(digitos) == 11 else 'PJ'
+        if 'tipo' not in valores and not existente:
+            valores['tipo'] = tipo_documento
+        elif valores.get('tipo', tipo_documento) != tipo_documento:
+            raise ValidationError({'tipo': [
+                'Para Pessoa Física, informe um CPF válido' if valores['tipo'] == 'PF'
+                else 'Para Pessoa Jurídica, informe um CNPJ válido'
+            ]})
+
+    def novo_objeto(self, valores):
+        cliente = Cliente(**valores)
+        cliente.normalizar()
+        return cliente
+
+    def gravar(self, novos, alterados):
+        super().gravar(novos, alterados)
+        # Chave fonética dos nomes alterados (o documento é a própria chave do upsert)
+        gravar_em_lote(Cliente, [
+            (pk, [chave_fonetica(valores['nome_completo'])])
+            for pk, valores in alterados if 'nome_completo' in valores
+        ], ['nome_fonetico'])
+
+    def concluir(self):
+        INDICE_BUSCA_CLIENTES.otimizar()
+        transaction.on_commit(lambda: incrementar_versao(Cliente))
+
+
+class ImportadorFornecedores(Importador):
+    modelo = Fornecedor
+    chave = 'cnpj'
+    campo_comparacao = 'documento'
+    campos = (
+        'cnpj', 'nome', 'nome_fantasia', 'inscricao_estadual', 'email', 'telefone', 'celular', 'site',
+        'contato_nome', 'contato_telefone', 'contato_email', 'endereco', 'numero', 'complemento',
+        'bairro', 'cidade', 'estado', 'cep', 'prazo_entrega_dias', 'prazo_pagamento_dias', 'status',
+    )
+    formatadores = {'cnpj': formatar_documento, 'cep': formatar_cep}
+
+    def comparar(self, chave):
+        return normalizar_documento(chave)
+
+    def validar_registro(self, valores, existente):
+        if len(set(re.sub(r'\D', '', valores['cnpj']))) == 1:
+            raise ValidationError({'cnpj': ['CNPJ inválido']})
+
+    def novo_objeto(self, valores):
+        fornecedor = Fornecedor(**valores)
+        fornecedor.normalizar()
+        return fornecedor
+
+    def concluir(self):
+        transaction.on_commit(lambda: incrementar_versao(Fornecedor))
+
+
+IMPORTADORES = {
+    'produtos': ImportadorProdutos,
+    'clientes': ImportadorClientes,
+    'fornecedores': ImportadorFornecedores,
+}
+
+
+# ----------------------------------------------------------------------
+# Execução
+# ----------------------------------------------------------------------
+
+def executar_importacao(importacao, ao_progredir=None):
+    """
+    Processa o arquivo de `importacao`, gravando o progresso na própria
+    linha a cada bloco (e chamando `ao_progredir(importacao)`, se informado).
+    Erros de arquivo deixam a importação como 'falhou' com a mensagem; erros
+    de linha ficam em `erros` e não interrompem o processamento.
+    """
+    importacao.status = 'processando'
+    importacao.data_inicio = timezone.now()
+    importacao.save(update_fields=['status', 'data_inicio'])
+    campos_progresso = ['total_linhas', 'linhas_processadas', 'criados', 'atualizados', 'linhas_com_erro', 'erros']
+
+    try:
+        with importacao.arquivo.open('rb') as arquivo:
+            colunas, importacao.total_linhas, registros = ler_arquivo(arquivo, importacao.arquivo.name)
+            importador = IMPORTADORES[importacao.tipo](colunas)
+            while bloco := list(itertools.islice(registros, TAMANHO_BLOCO)):
+                criados, atualizados, erros = importador.processar_bloco(bloco)
+                importacao.linhas_processadas += len(bloco)
+                importacao.criados += criados
+                importacao.atualizados += atualizados
+                importacao.linhas_com_erro += len(erros)
+                importacao.erros += erros[:max(LIMITE_ERROS - len(importacao.erros), 0)]
+                importacao.save(update_fields=campos_progresso)
+                if ao_progredir:
+                    ao_progredir(importacao)
+            importador.concluir()
+    except ArquivoInvalidoError as e:
+        importacao.status = 'falhou'
+        importacao.mensagem = str(e)
+    except Exception as e:
+        logger.exception('Falha na importação %s', importacao.pk)
+        importacao.status = 'falhou'
+        importacao.mensagem = f'Erro inesperado: {e}'
+    else:
+        importacao.status = 'concluida'
+        if importacao.linhas_com_erro > len(importacao.erros):
+            importacao.mensagem = (
+                f'{importacao.linhas_com_erro} linha(s) com erro; só as {LIMITE_ERROS} primeiras estão listadas'
+            )
+    importacao.data_conclusao = timezone.now()
+    importacao.save(update_fields=[*campos_progresso, 'status', 'mensagem', 'data_conclusao'])
+    return importacao
+
+
+def proxima_pendente():
+    """
+    Reserva a importação pendente mais antiga (pendente -> processando com
+    UPDATE condicional, para vários workers) e a retorna, ou None.
+    """
+    for pk in Importacao.objects.filter(status='pendente').order_by('data_criacao').values_list('pk', flat=True)[:10]:
+        if Importacao.objects.filter(pk=pk, status='pendente').update(status='processando'):
+            return Importacao.objects.get(pk=pk)
+    return None
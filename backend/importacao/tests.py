@@ -0,0 +1,168 @@
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from openpyxl import Workbook
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from clientes.models import Cliente
+from config.cache_versionado import versoes
+from fornecedores.models import Fornecedor
+from produtos.models import Categoria, Produto
+from usuarios.models import Usuario
+from . import services
+from .models import Importacao
+from .services import executar_importacao
+
+
+def arquivo_csv(linhas, nome='dados.csv', delimitador=';'):
+    conteudo = '\n'.join(delimitador.join(linha) for linha in linhas)
+    return SimpleUploadedFile(nome, ('﻿' + conteudo).encode('utf-8'), content_type='text/csv')
+
+
+def arquivo_xlsx(linhas, nome='dados.xlsx'):
+    planilha = Workbook()
+    for linha in linhas:
+        planilha.active.append(linha)
+    buffer = BytesIO()
+    planilha.save(buffer)
+    return SimpleUploadedFile(nome, buffer.getvalue())
+
+
+class ImportacaoTest(TestCase):
+    """Importação em streaming de CSV/XLSX com upsert em lote"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.gerente = Usuario.objects.create(username='gerente', tipo='gerente')
+        self.api = APIClient()
+        self.api.force_authenticate(self.gerente)
+        self.ferragens = Categoria.objects.create(nome='Ferragens')
+
+    def importar(self, tipo, arquivo):
+        return executar_importacao(Importacao.objects.create(tipo=tipo, arquivo=arquivo))
+
+    def test_produtos_csv_cria_atualiza_e_relata_erros_por_linha(self):
+        Produto.objects.create(
+            codigo='MRT-1', nome='Martelo', categoria=self.ferragens,
+            preco_custo=Decimal('10.00'), preco_venda=Decimal('15.00')
+        )
+        importacao = self.importar('produtos', arquivo_csv([
+            ['codigo', 'nome', 'categoria', 'preco_custo', 'preco_venda', 'unidade_medida'],
+            ['MRT-1', '', '', '', '20,00', ''],
+            ['PRF-1', 'Parafuso', 'ferragens', '0,50', '1,25', 'Peça'],
+            ['PRF-1', 'Parafuso repetido', 'Ferragens', '1', '2', 'UN'],
+            ['SRR-1', 'Serrote', 'Jardinagem', 'abc', '10', 'UN'],
+            ['', '', '', '', '', ''],
+            ['TRN-1', 'Trena', 'Ferragens', '', '', 'UN'],
+        ]))
+
+        self.assertEqual(importacao.status, 'concluida', importacao.mensagem)
+        self.assertEqual((importacao.criados, importacao.atualizados, importacao.linhas_com_erro), (1, 1, 3))
+        self.assertEqual(importacao.linhas_processadas, 5)  # a linha em branco é ignorada
+        self.assertEqual(importacao.progresso, 100.0)
+        erros = {erro['linha']: erro['erros'] for erro in importacao.erros}
+        self.assertEqual(set(erros), {4, 5, 7})
+        self.assertIn('codigo', erros[4])
+        self.assertEqual(set(erros[5]), {'categoria', 'preco_custo'})
+        self.assertEqual(set(erros[7]), {'preco_custo', 'preco_venda'})
+
+        # Atualização: só as células preenchidas mudam, e a margem acompanha
+        martelo = Produto.objects.get(codigo='MRT-1')
+        self.assertEqual((martelo.nome, martelo.preco_venda, martelo.margem_lucro), ('Martelo', Decimal('20.00'), Decimal('100.00')))
+        parafuso = Produto.objects.get(codigo='PRF-1')
+        self.assertEqual((parafuso.categoria, parafuso.unidade_medida), (self.ferragens, 'PC'))
+        self.assertEqual(parafuso.margem_lucro, Decimal('150.00'))
+
+    def test_clientes_xlsx_formata_documento_e_deduz_tipo(self):
+        Cliente.objects.create(
+            nome_completo='Ana Costa', cpf_cnpj='123.456.789-01', email='ana@exemplo.com', telefone='11999990000',
+            endereco='Rua A', bairro='Centro', cidade='São Paulo', estado='SP', cep='01000-000'
+        )
+        comum = ['e@exemplo.com', '1133334444', 'Rua B', 'Centro', 'Campinas', 'SP']
+        importacao = self.importar('clientes', arquivo_xlsx([
+            ['cpf_cnpj', 'nome_completo', 'email', 'telefone', 'endereco', 'bairro', 'cidade', 'estado', 'cep'],
+            ['12345678901', 'Ana Costa Silva', *comum, '01000000'],
+            ['12345678000199', 'Empresa Beta Ltda', *comum, '13000-000'],
+            ['11111111111', 'Documento Inválido', *comum, '13000-000'],
+        ]))
+
+        self.assertEqual((importacao.criados, importacao.atualizados, importacao.linhas_com_erro), (1, 1, 1))
+        self.assertEqual(Cliente.objects.get(cpf_cnpj='123.456.789-01').nome_completo, 'Ana Costa Silva')
+        empresa = Cliente.objects.get(cpf_cnpj='12.345.678/0001-99')
+        self.assertEqual((empresa.tipo, empresa.cep), ('PJ', '13000-000'))
+        self.assertEqual(importacao.erros[0]['linha'], 4)
+
+    def test_documentos_comparados_pelos_digitos(self):
+        endereco = {'endereco': 'Rua A', 'bairro': 'Centro', 'cidade': 'Santos', 'estado': 'SP', 'cep': '11000-000'}
+        # Cadastros antigos gravados sem a máscara
+        cliente = Cliente.objects.create(
+            nome_completo='Bruno Dias', cpf_cnpj='98765432100', email='b@exemplo.com', telefone='1133330000', **endereco
+        )
+        fornecedor = Fornecedor.objects.create(
+            nome='Alfa', cnpj='12345678000199', email='a@alfa.com', telefone='1133334444', numero='1', **endereco
+        )
+        versoes_antes = versoes((Cliente, Fornecedor))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            clientes = self.importar('clientes', arquivo_csv([
+                ['cpf_cnpj', 'nome_completo'], ['987.654.321-00', 'Bruno Dias Filho'],
+            ]))
+            fornecedores = self.importar('fornecedores', arquivo_csv([
+                ['cnpj', 'nome'], ['12.345.678/0001-99', 'Alfa Metais'],
+            ]))
+
+        self.assertEqual((clientes.criados, clientes.atualizados), (0, 1))
+        self.assertEqual((fornecedores.criados, fornecedores.atualizados), (0, 1))
+        cliente.refresh_from_db()
+        fornecedor.refresh_from_db()
+        self.assertEqual((cliente.nome_completo, fornecedor.nome), ('Bruno Dias Filho', 'Alfa Metais'))
+        # Respostas em cache que exibem clientes e fornecedores são invalidadas
+        for antes, depois in zip(versoes_antes, versoes((Cliente, Fornecedor))):
+            self.assertNotEqual(antes, depois)
+
+    def test_blocos_atualizam_o_progresso(self):
+        linhas = [['codigo', 'nome', 'categoria', 'preco_custo', 'preco_venda']]
+        linhas += [[f'P{i}', f'Produto {i}', 'Ferragens', '1.00', '2.00'] for i in range(25)]
+        progresso = []
+        original = services.TAMANHO_BLOCO
+        services.TAMANHO_BLOCO = 10
+        self.addCleanup(setattr, services, 'TAMANHO_BLOCO', original)
+
+        executar_importacao(
+            Importacao.objects.create(tipo='produtos', arquivo=arquivo_csv(linhas, delimitador=',')),
+            ao_progredir=lambda importacao: progresso.append(importacao.linhas_processadas),
+        )
+        self.assertEqual(progresso, [10, 20, 25])
+        self.assertEqual(Produto.objects.count(), 25)
+
+    def test_coluna_desconhecida_falha_sem_gravar(self):
+        importacao = self.importar('fornecedores', arquivo_csv([['cnpj', 'razao'], ['12345678000199', 'X']]))
+        self.assertEqual(importacao.status, 'falhou')
+        self.assertIn('razao', importacao.mensagem)
+
+    def test_api_enfileira_e_worker_processa(self):
+        resposta = self.api.post('/api/importacoes/', {
+            'tipo': 'fornecedores',
+            'arquivo': arquivo_csv([
+                ['cnpj', 'nome', 'email', 'telefone', 'endereco', 'numero', 'bairro', 'cidade', 'estado', 'cep'],
+                ['12345678000199', 'Metalúrgica Alfa', 'a@alfa.com', '1133334444', 'Rua C', '10',
+                 'Centro', 'Santos', 'SP', '11000000'],
+            ]),
+        }, format='multipart')
+        self.assertEqual(resposta.status_code, 202, resposta.data)
+        self.assertEqual(resposta.data['status'], 'pendente')
+
+        call_command('processar_importacoes', stdout=StringIO())
+        resposta = self.api.get(f'/api/importacoes/{resposta.data["id"]}/')
+        self.assertEqual((resposta.data['status'], resposta.data['criados']), ('concluida', 1))
+
+        self.api.force_authenticate(Usuario.objects.create(username='vendedor'))
+        self.assertEqual(self.api.get('/api/importacoes/').status_code, 403)
@@ -0,0 +1,7 @@
+from rest_framework.routers import DefaultRouter
+from .views import ImportacaoViewSet
+
+router = DefaultRouter()
+router.register(r'importacoes', ImportacaoViewSet, basename='importacao')
+
+urlpatterns = router.urls
@@ -0,0 +1,46 @@
+from rest_framework import mixins, status, viewsets
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from django_filters.rest_framework import DjangoFilterBackend
+from auditoria.models import LogAuditoria
+from config.permissoes import GerenteOuAdmin
+from .models import Importacao
+from .serializers import ImportacaoListSerializer, ImportacaoSerializer
+
+
+class ImportacaoViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                        viewsets.GenericViewSet):
+    """
+    Importação em lote de produtos, clientes e fornecedores a partir de
+    CSV/XLSX.
+
+    - POST /api/importacoes/ (multipart: tipo, arquivo) - enfileira o
+      arquivo e responde 202; o worker (processar_importacoes) o processa
+    - GET /api/importacoes/{id}/ - progresso, contadores e erros por linha
+    """
+    queryset = Importacao.objects.select_related('usuario')
+    permission_classes = [IsAuthenticated, GerenteOuAdmin]
+    parser_classes = [MultiPartParser, FormParser]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['tipo', 'status']
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ImportacaoListSerializer
+        return ImportacaoSerializer
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        importacao = serializer.save(usuario=request.user)
+        LogAuditoria.registrar(
+            usuario=request.user,
+            acao='importar',
+            tabela=importacao._meta.db_table,
+            registro_id=importacao.pk,
+            dados_novos={'tipo': importacao.tipo, 'arquivo': importacao.arquivo.name},
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT'),
+        )
+        return Response(self.get_serializer(importacao).data, status=status.HTTP_202_ACCEPTED)
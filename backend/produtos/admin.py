@@ -7,7 +7,7 @@ class CategoriaAdmin(admin.ModelAdmin):
     list_display = ('nome', 'categoria_pai', 'ativa', 'data_cadastro')
     list_filter = ('ativo', 'data_cadastro')
     search_fields = ('nome', 'descricao')
-    readonly_fields = ('data_cadastro', 'data_atualizacao')
+    readonly_fields = ('caminho', 'nivel', 'data_cadastro', 'data_atualizacao')
 
 
 @admin.register(Produto)
@@ -0,0 +1,18 @@
+import django_filters
+from .models import Categoria, Produto
+
+
+class ProdutoFilter(django_filters.FilterSet):
+    """Filtros de produto; ?categoria= inclui todas as subcategorias"""
+    
+    categoria = django_filters.ModelChoiceFilter(
+        queryset=Categoria.objects.all(),
+        method='filtrar_subarvore'
+    )
+    
+    class Meta:
+        model = Produto
+        fields = ['categoria', 'fornecedor', 'status', 'unidade_medida']
+    
+    def filtrar_subarvore(self, queryset, name, value):
+        return queryset.filter(value.descendentes_q('categoria__caminho'))
@@ -0,0 +1,244 @@
+"""
+Variantes redimensionadas de Produto.imagem (miniatura, card e zoom, em
+WebP e JPEG), geradas fora da requisição.
+
+O save() do produto marca `imagem_pendente` quando a imagem muda; o comando
+processar_imagens_produtos consome essa fila (índice parcial) com um pool de
+processos, já que o redimensionamento com o Pillow ocupa CPU e não libera o
+GIL o tempo todo. Os processos filhos só leem e gravam arquivos no storage;
+o banco é atualizado pelo processo principal.
+
+Execuções simultâneas (cron sobreposto, vários servidores) reservam os
+produtos antes de gerar os arquivos (UPDATE condicional em
+imagem_reservada_em): cada produto é processado por uma execução só, e
+nenhuma apaga os arquivos que outra acabou de gravar. A reserva de uma
+execução interrompida expira em PRAZO_RESERVA.
+"""
+import datetime
+import io
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+from config.cache_versionado import incrementar_versao
+from .models import Produto
+
+logger = logging.getLogger(__name__)
+
+DIRETORIO_VARIANTES = 'produtos/variantes'
+
+# Reserva mais antiga que isso é de uma execução que morreu e pode ser retomada
+PRAZO_RESERVA = datetime.timedelta(minutes=30)
+
+# Parâmetros do encoder por formato
+OPCOES_FORMATO = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+}
+
+
+def _iniciar_processo():
+    """Processos filhos criados por spawn (macOS/Windows) precisam configurar o Django"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _sem_transparencia(imagem):
+    """RGB para o JPEG: transparência vira fundo branco"""
+    if imagem.mode in ('RGBA', 'LA') or (imagem.mode == 'P' and 'transparency' in imagem.info):
+        rgba = imagem.convert('RGBA')
+        fundo = Image.new('RGB', rgba.size, (255, 255, 255))
+        fundo.paste(rgba, mask=rgba.getchannel('A'))
+        return fundo
+    return imagem.convert('RGB')
+
+
+def caminho_variante(produto_id, nome_imagem, variante, formato):
+    base = os.path.splitext(os.path.basename(nome_imagem))[0]
+    extensao = 'jpg' if formato == 'jpeg' else formato
+    return f'{DIRETORIO_VARIANTES}/{produto_id}/{base}-{variante}.{extensao}'
+
+
+def gerar_variantes(produto_id, nome_imagem):
+    """
+    Gera e grava no storage as variantes de uma imagem. Executa nos
+    processos do pool: não acessa o banco.
+
+    Retorna (produto_id, nome_imagem, variantes), com variantes no formato
+    de Produto.imagem_variantes ({'erro': ...} se a imagem não abrir ou a
+    geração falhar: o erro fica só neste produto e o lote continua).
+    """
+    try:
+        return produto_id, nome_imagem, _gerar_variantes(produto_id, nome_imagem)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as erro:
+        return produto_id, nome_imagem, {'erro': f'{type(erro).__name__}: {erro}'}
+    except Exception as erro:
+        logger.exception('Falha ao gerar as variantes do produto %s', produto_id)
+        return produto_id, nome_imagem, {'erro': f'{type(erro).__name__}: {erro}'}
+
+
+def _gerar_variantes(produto_id, nome_imagem):
+    tamanhos = sorted(settings.PRODUTO_IMAGEM_VARIANTES.items(), key=lambda item: -max(item[1]))
+    with default_storage.open(nome_imagem, 'rb') as arquivo:
+        imagem = Image.open(arquivo)
+        # JPEG: decodifica já reduzido (DCT em escala) até perto da maior
+        # variante. O alvo segue a proporção da imagem (antes da rotação
+        # do EXIF, daí o lado maior da caixa): a escala só é aplicada se o
+        # resultado cobrir o alvo nas duas dimensões.
+        escala = min(1.0, max(tamanhos[0][1]) / max(imagem.size))
+        imagem.draft('RGB', (math.ceil(imagem.width * escala), math.ceil(imagem.height * escala)))
+        imagem = ImageOps.exif_transpose(imagem)
+        imagem.load()
+
+    if imagem.mode not in ('RGB', 'RGBA'):
+        imagem = imagem.convert('RGBA' if 'transparency' in imagem.info or 'A' in imagem.mode else 'RGB')
+
+    variantes = {}
+    atual = imagem
+    # Da maior para a menor: cada variante é reduzida a partir da anterior
+    for variante, tamanho in tamanhos:
+        atual = atual.copy()
+        atual.thumbnail(tamanho, Image.Resampling.LANCZOS)
+        variantes[variante] = {}
+        for formato in settings.PRODUTO_IMAGEM_FORMATOS:
+            buffer = io.BytesIO()
+            origem = _sem_transparencia(atual) if formato == 'jpeg' else atual
+            origem.save(buffer, **OPCOES_FORMATO[formato])
+            caminho = caminho_variante(produto_id, nome_imagem, variante, formato)
+            if default_storage.exists(caminho):
+                default_storage.delete(caminho)
+            variantes[variante][formato] = default_storage.save(caminho, ContentFile(buffer.getvalue()))
+    return variantes
+
+
+def _caminhos(variantes):
+    return {
+        caminho
+        for formatos in variantes.values() if isinstance(formatos, dict)
+        for caminho in formatos.values()
+    }
+
+
+def _arquivos_do_produto(produto_id):
+    """Variantes gravadas no storage para o produto (inclusive de imagens anteriores)"""
+    diretorio = f'{DIRETORIO_VARIANTES}/{produto_id}'
+    try:
+        _, arquivos = default_storage.listdir(diretorio)
+    except (FileNotFoundError, NotImplementedError):
+        return set()
+    return {f'{diretorio}/{arquivo}' for arquivo in arquivos}
+
+
+def processar_pendentes(workers=None, lote=100, produto_ids=None):
+    """
+    Gera as variantes dos produtos com imagem pendente, `lote` produtos por
+    vez, em `workers` processos (1 = no próprio processo). Produtos sem
+    imagem só têm as variantes antigas apagadas; os reservados por outra
+    execução ficam para ela.
+
+    Retorna (processados, erros).
+    """
+    workers = workers or os.cpu_count() or 1
+    processados = erros = 0
+    ultimo_id = 0
+    executor = (
+        ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_processo) if workers > 1 else None
+    )
+    try:
+        while True:
+            reserva = timezone.now()
+            livres = Q(imagem_reservada_em__isnull=True) | Q(imagem_reservada_em__lt=reserva - PRAZO_RESERVA)
+            candidatos = Produto.objects.filter(livres, imagem_pendente=True, pk__gt=ultimo_id).order_by('pk')
+            if produto_ids is not None:
+                candidatos = candidatos.filter(pk__in=produto_ids)
+            candidatos = list(candidatos.values_list('pk', flat=True)[:lote])
+            if not candidatos:
+                break
+            ultimo_id = candidatos[-1]
+
+            # Só os produtos que esta execução conseguiu reservar
+            Produto.objects.filter(livres, pk__in=candidatos, imagem_pendente=True).update(
+                imagem_reservada_em=reserva
+            )
+            pendentes = list(
+                Produto.objects.filter(pk__in=candidatos, imagem_reservada_em=reserva).order_by('pk').values_list(
+                    'pk', 'imagem', 'imagem_variantes'
+                )
+            )
+            if not pendentes:
+                continue
+
+            anteriores = {pk: _caminhos(variantes) for pk, _, variantes in pendentes}
+            tarefas = [(pk, imagem) for pk, imagem, _ in pendentes if imagem]
+            if executor:
+                resultados = list(executor.map(gerar_variantes, *zip(*tarefas))) if tarefas else []
+            else:
+                resultados = [gerar_variantes(pk, imagem) for pk, imagem in tarefas]
+            resultados += [(pk, imagem, {}) for pk, imagem, _ in pendentes if not imagem]
+
+            obsoletos = set()
+            with transaction.atomic():
+                for produto_id, nome_imagem, variantes in resultados:
+                    # A condição na imagem descarta o resultado se ela foi trocada
+                    # durante o processamento (o produto continua pendente)
+                    mesma_imagem = Q(imagem=nome_imagem) if nome_imagem else Q(imagem='') | Q(imagem__isnull=True)
+                    reservado = Produto.objects.filter(pk=produto_id, imagem_reservada_em=reserva)
+                    atualizados = reservado.filter(mesma_imagem, imagem_pendente=True).update(
+                        imagem_variantes=variantes, imagem_pendente=False, imagem_reservada_em=None
+                    )
+                    if not atualizados:
+                        # Imagem trocada no meio do caminho: descarta o que foi
+                        # gerado. Reserva vencida e retomada por outra execução:
+                        # os arquivos (mesmos nomes) agora são dela
+                        if reservado.update(imagem_reservada_em=None):
+                            obsoletos |= _caminhos(variantes)
+                        continue
+                    # Tudo o que o produto tem no storage além das variantes atuais
+                    # (o registro anterior pode não listar arquivos já gerados)
+                    existentes = anteriores[produto_id] | _arquivos_do_produto(produto_id)
+                    obsoletos |= existentes - _caminhos(variantes)
+                    if 'erro' in variantes:
+                        erros += 1
+                        logger.warning('Imagem do produto %s não processada: %s', produto_id, variantes['erro'])
+                    else:
+                        processados += 1
+                transaction.on_commit(lambda: incrementar_versao(Produto))
+
+            for caminho in obsoletos:
+                default_storage.delete(caminho)
+    finally:
+        if executor:
+            executor.shutdown()
+    return processados, erros
+
+
+def enfileirar_existentes(todas=False):
+    """
+    Marca como pendentes as imagens já cadastradas sem variantes (ou todas,
+    para regerar após mudar tamanhos/formatos). Retorna quantas.
+    """
+    produtos = Produto.objects.exclude(imagem='').exclude(imagem__isnull=True).filter(imagem_pendente=False)
+    if not todas:
+        produtos = produtos.filter(imagem_variantes={})
+    return produtos.update(imagem_pendente=True)
+
+
+def urls_variantes(produto, request=None):
+    """{variante: {formato: url}} da imagem do produto, ou None enquanto pendente/sem variantes"""
+    variantes = produto.imagem_variantes
+    if produto.imagem_pendente or not variantes or 'erro' in variantes:
+        return None
+    construir = request.build_absolute_uri if request is not None else (lambda url: url)
+    return {
+        variante: {formato: construir(default_storage.url(caminho)) for formato, caminho in formatos.items()}
+        for variante, formatos in variantes.items()
+    }
@@ -0,0 +1,180 @@
+"""
+Consulta de produtos por código para o PDV (leitura de código de barras).
+
+O índice fica na memória do processo: um dict código -> dados do produto
+já prontos para a resposta. A cada consulta ele é validado por duas marcas:
+
+- a versão de Produto do cache (config.cache_versionado), que enxerga na
+  hora as gravações feitas pelo próprio processo;
+- uma marca lida do banco a cada INTERVALO_VERIFICACAO segundos
+  (Max(data_atualizacao), Count e Sum(id) dos produtos), que enxerga as
+  gravações de outros processos (worker, importação, reajuste de preços)
+  mesmo com o cache local de cada processo (LocMem).
+
+Quando uma delas muda, só os produtos alterados recentemente
+(data_atualizacao) são relidos; a carga completa só acontece na primeira
+consulta ou quando a contagem ou a soma dos ids não fecha (exclusões).
+
+O saldo de estoque muda a cada venda e não entra no índice de produtos:
+cada produto guarda o saldo com a versão de Estoque (cache + maior
+ultima_atualizacao das linhas e dos fragmentos) em que foi lido, e só os
+produtos consultados depois de uma alteração de estoque voltam ao banco
+(uma consulta por requisição, para todos os códigos dela).
+"""
+import datetime
+import threading
+import time
+from django.db import models
+from django.utils import timezone
+from config.cache_versionado import versoes
+from estoque.models import Estoque, FragmentoEstoque
+from estoque.services import quantidade_em_fragmentos
+from .models import Produto
+
+# Janela relida na atualização incremental: cobre transações que gravaram
+# data_atualizacao antes da carga anterior mas só confirmaram depois dela
+MARGEM_ATUALIZACAO = datetime.timedelta(minutes=5)
+
+# Segundos entre as leituras da marca do banco (gravações de outros processos)
+INTERVALO_VERIFICACAO = 1.0
+
+# Máximo de códigos por consulta em lote
+LIMITE_CODIGOS = 500
+
+CAMPOS_INDICE = ('id', 'codigo', 'nome', 'preco_venda', 'unidade_medida', 'status')
+
+
+class IndiceCodigos:
+    """Índice em memória código -> produto, com saldo de estoque invalidado por versão"""
+
+    def __init__(self):
+        self._produtos = {}
+        self._codigo_por_id = {}
+        self._versao_produtos = None
+        self._carregado_em = None
+        self._estoques = {}
+        self._marcas = None
+        self._verificado_em = None
+        self._trava = threading.Lock()
+
+    def buscar(self, codigos):
+        """{código: dados} dos códigos encontrados (os demais ficam de fora)"""
+        versao_produtos, versao_estoque = self._versoes()
+        if versao_produtos != self._versao_produtos:
+            self._atualizar(versao_produtos)
+
+        produtos = self._produtos
+        encontrados = {codigo: produtos[codigo] for codigo in codigos if codigo in produtos}
+        desatualizados = [
+            dados['id'] for dados in encontrados.values()
+            if self._estoques.get(dados['id'], (None,))[0] != versao_estoque
+        ]
+        if desatualizados:
+            self._carregar_estoques(desatualizados, versao_estoque)
+
+        resultado = {}
+        for codigo, dados in encontrados.items():
+            _, saldo, minimo = self._estoques.get(dados['id'], (None, None, None))
+            resultado[codigo] = {**dados, 'estoque': saldo, 'situacao_estoque': _situacao(saldo, minimo)}
+        return resultado
+
+    def limpar(self):
+        with self._trava:
+            self.__init__()
+
+    def _versoes(self):
+        """Versões (cache, marca do banco) de produtos e de estoque"""
+        agora = time.monotonic()
+        if self._marcas is None or agora - self._verificado_em >= INTERVALO_VERIFICACAO:
+            self._marcas = _marcas_banco()
+            self._verificado_em = agora
+        cache_produtos, cache_estoque = versoes((Produto, Estoque))
+        marca_produtos, marca_estoque = self._marcas
+        return (cache_produtos, marca_produtos), (cache_estoque, marca_estoque)
+
+    def _atualizar(self, versao):
+        with self._trava:
+            if versao == self._versao_produtos:
+                return  # outra thread já atualizou
+            inicio = timezone.now()
+            contagem = Produto.objects.aggregate(total=models.Count('pk'), soma=models.Sum('pk'))
+            if self._carregado_em is None:
+                self._carregar_tudo()
+            else:
+                alterados = Produto.objects.filter(
+                    data_atualizacao__gte=self._carregado_em - MARGEM_ATUALIZACAO
+                ).order_by().values_list(*CAMPOS_INDICE)
+                # Cópia: as leituras concorrentes continuam no dict anterior
+                produtos, codigo_por_id = dict(self._produtos), dict(self._codigo_por_id)
+                for linha in alterados:
+                    anterior = codigo_por_id.get(linha[0])
+                    if anterior is not None and anterior != linha[1]:
+                        produtos.pop(anterior, None)
+                    produtos[linha[1]] = _dados(linha)
+                    codigo_por_id[linha[0]] = linha[1]
+                self._produtos, self._codigo_por_id = produtos, codigo_por_id
+                if len(codigo_por_id) != contagem['total'] or sum(codigo_por_id) != (contagem['soma'] or 0):
+                    # Produtos excluídos não aparecem na leitura incremental
+                    self._carregar_tudo()
+            self._carregado_em = inicio
+            self._versao_produtos = versao
+
+    def _carregar_tudo(self):
+        produtos, codigo_por_id = {}, {}
+        for linha in Produto.objects.order_by().values_list(*CAMPOS_INDICE).iterator(chunk_size=5000):
+            produtos[linha[1]] = _dados(linha)
+            codigo_por_id[linha[0]] = linha[1]
+        self._produtos, self._codigo_por_id = produtos, codigo_por_id
+
+    def _carregar_estoques(self, produto_ids, versao):
+        encontrados = Estoque.objects.filter(produto_id__in=produto_ids).annotate(
+            saldo=models.F('quantidade_atual') + quantidade_em_fragmentos()
+        ).values_list('produto_id', 'saldo', 'quantidade_minima')
+        estoques = {produto_id: (versao, None, None) for produto_id in produto_ids}
+        for produto_id, saldo, minimo in encontrados:
+            estoques[produto_id] = (versao, saldo, minimo)
+        self._estoques.update(estoques)
+
+
+def _marcas_banco():
+    """
+    (marca de produtos, marca de estoque) lidas do banco. A soma dos ids
+    muda em qualquer exclusão, mesmo que uma inclusão mantenha a contagem.
+    """
+    produtos = Produto.objects.aggregate(
+        ultima=models.Max('data_atualizacao'),
+        total=models.Count('pk'),
+        soma=models.Sum('pk'),
+        estoque=models.Max('estoque__ultima_atualizacao'),
+    )
+    fragmentos = FragmentoEstoque.objects.aggregate(ultima=models.Max('ultima_atualizacao'))
+    return (
+        (produtos['ultima'], produtos['total'], produtos['soma']),
+        (produtos['estoque'], fragmentos['ultima']),
+    )
+
+
+def _dados(linha):
+    pk, codigo, nome, preco_venda, unidade_medida, status = linha
+    return {
+        'id': pk,
+        'codigo': codigo,
+        'nome': nome,
+        'preco_venda': str(preco_venda),
+        'unidade_medida': unidade_medida,
+        'status': status,
+    }
+
+
+def _situacao(saldo, minimo):
+    """Mesmos critérios de estoque.services.situacao_estoque"""
+    if saldo is None:
+        return None
+    if saldo <= 0:
+        return 'sem_estoque'
+    if saldo <= minimo:
+        return 'abaixo_minimo'
+    return 'disponivel'
+
+
+indice_codigos = IndiceCodigos()
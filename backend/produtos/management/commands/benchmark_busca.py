@@ -0,0 +1,158 @@
+"""Comando Django para medir a latência da busca textual de produtos (/api/produtos/?search=)."""
+import random
+import statistics
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+from usuarios.models import Usuario
+from produtos.models import Categoria, Produto
+from produtos.views import ProdutoViewSet
+
+PREFIXO = 'BENCH-BUSCA'
+
+TIPOS = ['notebook', 'monitor', 'teclado', 'mouse', 'cadeira', 'mesa', 'geladeira', 'fogão', 'cafeteira',
+         'liquidificador', 'fone', 'caixa de som', 'impressora', 'roteador', 'tênis', 'camiseta']
+MARCAS = ['dell', 'lenovo', 'samsung', 'lg', 'brastemp', 'electrolux', 'philips', 'logitech', 'nike',
+          'adidas', 'multilaser', 'positivo', 'mondial', 'arno', 'hp', 'tp-link']
+ATRIBUTOS = ['preto', 'branco', 'inox', 'gamer', 'sem fio', 'bivolt', 'ultra', 'compacto', 'profissional',
+             'slim', 'premium', 'básico', 'azul', 'vermelho', 'digital', 'portátil']
+
+
+class Command(BaseCommand):
+    help = 'Mede p50/p95 da busca textual de produtos pela API, opcionalmente com catálogo sintético'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--produtos', type=int, default=100000,
+            help='Produtos sintéticos a criar (0 = usar o catálogo existente)'
+        )
+        parser.add_argument('--consultas', type=int, default=200, help='Buscas medidas')
+        parser.add_argument('--semente', type=int, default=42, help='Semente do gerador aleatório')
+
+    def handle(self, *args, **options):
+        if options['consultas'] < 1 or options['produtos'] < 0:
+            raise CommandError('--consultas deve ser >= 1 e --produtos >= 0')
+        aleatorio = random.Random(options['semente'])
+
+        self.stdout.write('=== BENCHMARK BUSCA TEXTUAL ===\n')
+        if not ProdutoViewSet.indice_busca.disponivel(connection.alias):
+            self.stdout.write(self.style.WARNING(
+                '⚠️ Índice de busca indisponível neste banco: medindo o SearchFilter (icontains)\n'
+            ))
+
+        try:
+            if options['produtos']:
+                self._criar_catalogo(options['produtos'], aleatorio)
+                ProdutoViewSet.indice_busca.otimizar(connection.alias)
+            consultas = self._consultas(options['consultas'], aleatorio)
+            if not consultas:
+                raise CommandError('Nenhum produto cadastrado para montar as buscas')
+            self._medir(consultas)
+        finally:
+            if options['produtos']:
+                self._limpar()
+                self.stdout.write('Dados sintéticos removidos')
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark concluído'))
+
+    def _criar_catalogo(self, total, aleatorio):
+        inicio = time.perf_counter()
+        categoria = Categoria.objects.create(nome=PREFIXO)
+        lote = []
+        for i in range(total):
+            nome = (
+                f'{aleatorio.choice(TIPOS).title()} {aleatorio.choice(MARCAS).title()} '
+                f'{aleatorio.choice(ATRIBUTOS)} {aleatorio.randint(1, 999)}'
+            )
+            lote.append(Produto(
+                codigo=f'{PREFIXO}-{i:07d}',
+                nome=nome,
+                descricao=f'{nome} - {aleatorio.choice(ATRIBUTOS)}, {aleatorio.choice(ATRIBUTOS)}',
+                categoria=categoria,
+                preco_custo=Decimal('10.00'),
+                preco_venda=Decimal('15.00'),
+            ))
+            if len(lote) == 5000:
+                Produto.objects.bulk_create(lote)
+                lote = []
+        Produto.objects.bulk_create(lote)
+        self.stdout.write(f'{total} produtos criados em {time.perf_counter() - inicio:.1f}s\n')
+
+    def _consultas(self, quantidade, aleatorio):
+        """Palavras de nomes reais do catálogo (a última truncada) e códigos exatos"""
+        amostra = list(
+            Produto.objects.order_by('?').values_list('codigo', 'nome')[:max(quantidade, 50)]
+        )
+        consultas = []
+        for codigo, nome in amostra[:quantidade]:
+            if aleatorio.random() < 0.2:
+                consultas.append(codigo)
+                continue
+            palavras = nome.split()
+            palavras = palavras[:aleatorio.randint(1, len(palavras))]
+            ultima = palavras[-1]
+            palavras[-1] = ultima[:aleatorio.randint(min(3, len(ultima)), len(ultima))]
+            consultas.append(' '.join(palavras))
+        return consultas
+
+    def _medir(self, consultas):
+        usuario, _ = Usuario.objects.get_or_create(username=PREFIXO.lower())
+        hosts = [host for host in settings.ALLOWED_HOSTS if '*' not in host]
+        fabrica = APIRequestFactory(SERVER_NAME=hosts[0].lstrip('.') if hosts else 'localhost')
+        view = ProdutoViewSet.as_view({'get': 'list'})
+
+        # Aquecimento do cache de páginas do banco
+        for termo in consultas[:10]:
+            self._requisicao(fabrica, view, usuario, termo)
+
+        tempos, tempos_banco = [], []
+        banco = [0.0]
+
+        def cronometrar(execute, sql, params, many, context):
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                banco[0] += time.perf_counter() - inicio
+
+        with connection.execute_wrapper(cronometrar):
+            for termo in consultas:
+                banco[0] = 0.0
+                inicio = time.perf_counter()
+                resultados = self._requisicao(fabrica, view, usuario, termo)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+                tempos_banco.append(banco[0] * 1000)
+                if resultados is None:
+                    raise CommandError(f'Busca "{termo}" falhou')
+
+        self.stdout.write(f'{len(tempos)} buscas (sonda + 1ª página, via API):')
+        self.stdout.write(f'  requisição: {self._percentis(tempos)}')
+        self.stdout.write(f'  banco:      {self._percentis(tempos_banco)}')
+        self.stdout.write('Mais lentas:')
+        for tempo, termo in sorted(zip(tempos, consultas), reverse=True)[:5]:
+            self.stdout.write(f'  {tempo:8.1f} ms  "{termo}"')
+        Usuario.objects.filter(username=PREFIXO.lower()).delete()
+
+    @staticmethod
+    def _percentis(tempos):
+        tempos = sorted(tempos)
+        p95 = tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))]
+        return f'p50 {statistics.median(tempos):6.1f} ms | p95 {p95:6.1f} ms | máx {tempos[-1]:6.1f} ms'
+
+    @staticmethod
+    def _requisicao(fabrica, view, usuario, termo):
+        requisicao = fabrica.get('/api/produtos/', {'search': termo})
+        force_authenticate(requisicao, user=usuario)
+        resposta = view(requisicao)
+        if resposta.status_code != 200:
+            return None
+        resposta.render()
+        return resposta.data['count']
+
+    def _limpar(self):
+        Produto.objects.filter(codigo__startswith=PREFIXO).delete()
+        Categoria.objects.filter(nome=PREFIXO).delete()
+        ProdutoViewSet.indice_busca.otimizar(connection.alias)
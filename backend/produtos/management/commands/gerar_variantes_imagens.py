@@ -0,0 +1,42 @@
+"""Comando Django para gerar as variantes das imagens de produto já cadastradas (backfill)."""
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from produtos.imagens import enfileirar_existentes, processar_pendentes
+
+
+class Command(BaseCommand):
+    help = 'Enfileira as imagens de produto já cadastradas sem variantes e as processa em paralelo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todas', action='store_true',
+            help='Regera também as que já têm variantes (ex: após mudar tamanhos ou formatos)'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processos de redimensionamento (padrão: núcleos da máquina)'
+        )
+        parser.add_argument('--lote', type=int, default=200, help='Produtos por lote')
+        parser.add_argument(
+            '--apenas-enfileirar', action='store_true',
+            help='Só marca como pendentes; o worker (processar_imagens_produtos) processa depois'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['lote'] < 1:
+            raise CommandError('--workers e --lote devem ser >= 1')
+
+        enfileiradas = enfileirar_existentes(todas=options['todas'])
+        self.stdout.write(f'{enfileiradas} imagem(ns) enfileirada(s)')
+        if options['apenas_enfileirar']:
+            return
+
+        inicio = time.perf_counter()
+        processados, erros = processar_pendentes(options['workers'], options['lote'])
+        duracao = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {processados} imagem(ns) processada(s) em {duracao:.1f}s com {options["workers"]} processo(s)'
+        ))
+        if erros:
+            self.stdout.write(self.style.WARNING(f'⚠️ {erros} imagem(ns) não puderam ser abertas'))
@@ -0,0 +1,35 @@
+"""Comando Django para compactar os índices de busca textual após cargas ou exclusões em massa."""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from clientes.views import ClienteViewSet
+from produtos.views import ProdutoViewSet
+
+INDICES = {
+    'produtos': ProdutoViewSet.indice_busca,
+    'clientes': ClienteViewSet.indice_busca,
+}
+
+
+class Command(BaseCommand):
+    help = 'Compacta os índices de busca textual (produtos e clientes); rode após importações ou exclusões em massa'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'indices', nargs='*', help=f'Índices a compactar: {", ".join(sorted(INDICES))} (padrão: todos)'
+        )
+        parser.add_argument('--database', default='default', help='Alias do banco')
+
+    def handle(self, *args, **options):
+        invalidos = set(options['indices']) - set(INDICES)
+        if invalidos:
+            raise CommandError(f'Índices desconhecidos: {", ".join(sorted(invalidos))}')
+        for nome in options['indices'] or sorted(INDICES):
+            indice = INDICES[nome]
+            if not indice.disponivel(options['database']):
+                self.stdout.write(self.style.WARNING(f'⚠️ {nome}: índice de busca indisponível neste banco'))
+                continue
+            inicio = time.perf_counter()
+            indice.otimizar(options['database'])
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {nome}: índice compactado em {time.perf_counter() - inicio:.2f}s'
+            ))
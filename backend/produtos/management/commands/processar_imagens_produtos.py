@@ -0,0 +1,48 @@
+"""Comando Django que gera as variantes das imagens de produto enviadas (fila de imagens pendentes)."""
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from produtos.imagens import processar_pendentes
+
+
+class Command(BaseCommand):
+    help = 'Gera as variantes (thumb, card, zoom em WebP/JPEG) das imagens de produto pendentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processos de redimensionamento (padrão: núcleos da máquina; 1 = sem pool)'
+        )
+        parser.add_argument('--lote', type=int, default=100, help='Produtos lidos da fila por vez')
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help='Continua rodando e verificando a fila (processo de worker)'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=5.0,
+            help='Segundos entre verificações da fila no modo contínuo'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['lote'] < 1:
+            raise CommandError('--workers e --lote devem ser >= 1')
+
+        while True:
+            inicio = time.perf_counter()
+            processados, erros = processar_pendentes(options['workers'], options['lote'])
+            if processados or erros or not options['continuo']:
+                self._relatar(processados, erros, time.perf_counter() - inicio)
+            if not options['continuo']:
+                return
+            close_old_connections()
+            time.sleep(options['intervalo'])
+
+    def _relatar(self, processados, erros, duracao):
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {processados} imagem(ns) processada(s) em {duracao:.1f}s'
+        ))
+        if erros:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️ {erros} imagem(ns) não puderam ser abertas (detalhes em imagem_variantes e no log)'
+            ))
@@ -0,0 +1,63 @@
+"""Comando Django para reajustar em lote os preços dos produtos."""
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from fornecedores.models import Fornecedor
+from produtos.models import Categoria, Produto
+from produtos.services import CAMPOS_PRECO, ReajusteInvalidoError, produtos_para_reajuste, reajustar_precos
+
+
+class Command(BaseCommand):
+    help = (
+        'Reajusta em lote os preços dos produtos de uma categoria (com as subcategorias), '
+        'fornecedor e/ou status, recalculando a margem e gravando o histórico de preços'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categoria', type=int, help='ID da categoria (inclui as subcategorias)')
+        parser.add_argument('--fornecedor', type=int, help='ID do fornecedor')
+        parser.add_argument('--status', choices=[valor for valor, _ in Produto.STATUS_CHOICES])
+        valor = parser.add_mutually_exclusive_group(required=True)
+        valor.add_argument('--percentual', help='Reajuste em %% (ex: 8 ou -5)')
+        valor.add_argument('--valor', help='Reajuste em reais (ex: 2.50 ou -1)')
+        parser.add_argument(
+            '--campos', nargs='+', choices=CAMPOS_PRECO, default=['preco_venda'],
+            help='Preços a reajustar (padrão: preco_venda)'
+        )
+        parser.add_argument('--motivo', default='', help='Motivo gravado no histórico de preços')
+        parser.add_argument('--simular', action='store_true', help='Apenas conta os produtos afetados')
+
+    def handle(self, *args, **options):
+        if not any(options[filtro] for filtro in ('categoria', 'fornecedor', 'status')):
+            raise CommandError('Informe ao menos um filtro: --categoria, --fornecedor ou --status')
+        tipo = 'percentual' if options['percentual'] is not None else 'valor'
+        try:
+            valor = Decimal(options[tipo])
+        except InvalidOperation:
+            raise CommandError(f'Valor inválido: {options[tipo]}')
+        if tipo == 'percentual' and valor <= -100:
+            raise CommandError('A redução percentual deve ser menor que 100%')
+
+        categoria = fornecedor = None
+        try:
+            if options['categoria']:
+                categoria = Categoria.objects.get(pk=options['categoria'])
+            if options['fornecedor']:
+                fornecedor = Fornecedor.objects.get(pk=options['fornecedor'])
+        except (Categoria.DoesNotExist, Fornecedor.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        produtos = produtos_para_reajuste(categoria, fornecedor, options['status'])
+        if options['simular']:
+            self.stdout.write(f'{produtos.count()} produto(s) seriam reajustados')
+            return
+
+        try:
+            lote, reajustados = reajustar_precos(
+                produtos, valor, tipo=tipo, campos=options['campos'], motivo=options['motivo']
+            )
+        except ReajusteInvalidoError as e:
+            raise CommandError(str(e))
+        if not reajustados:
+            self.stdout.write(self.style.WARNING('⚠️ Nenhum produto encontrado com os filtros informados'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'✅ {reajustados} produto(s) reajustados (lote {lote})'))
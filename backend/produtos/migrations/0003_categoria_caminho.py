@@ -0,0 +1,42 @@
+# Generated by Django 5.0.7 on 2026-10-18 16:28
+
+from django.db import migrations, models
+
+
+def preencher_caminhos(apps, schema_editor):
+    Categoria = apps.get_model('produtos', 'Categoria')
+    pais = dict(Categoria.objects.values_list('pk', 'categoria_pai_id'))
+    caminhos = {}
+
+    def caminho(pk, visitados=()):
+        if pk not in caminhos:
+            pai = pais[pk]
+            if pai is None or pai in visitados or pai not in pais:
+                caminhos[pk] = f'/{pk}/'
+            else:
+                caminhos[pk] = f'{caminho(pai, visitados + (pk,))}{pk}/'
+        return caminhos[pk]
+
+    for pk in pais:
+        Categoria.objects.filter(pk=pk).update(caminho=caminho(pk), nivel=caminho(pk).count('/') - 2)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0002_categoria_data_atualizacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='caminho',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255, verbose_name='Caminho'),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='nivel',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Nível'),
+        ),
+        migrations.RunPython(preencher_caminhos, migrations.RunPython.noop),
+    ]
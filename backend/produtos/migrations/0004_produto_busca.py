@@ -0,0 +1,26 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:05
+
+from django.db import migrations
+
+from config.busca import IndiceBusca
+
+INDICE = IndiceBusca('produtos_produto', ['codigo', 'nome', 'descricao'], pesos=[10, 5, 1], coluna_trigrama='nome')
+
+
+def criar_indice(apps, schema_editor):
+    INDICE.criar(schema_editor)
+
+
+def remover_indice(apps, schema_editor):
+    INDICE.remover(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0003_categoria_caminho'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:11
+
+from django.db import migrations, models
+
+from config.busca import IndiceBusca
+
+INDICE = IndiceBusca('produtos_produto', ['codigo', 'nome', 'descricao'], pesos=[10, 5, 1], coluna_trigrama='nome')
+
+
+def recriar_indice_busca(apps, schema_editor):
+    # No SQLite, AddField/RemoveField recriam a tabela e os triggers do
+    # índice de busca (0004) somem junto com a tabela antiga
+    INDICE.remover(schema_editor)
+    INDICE.criar(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0004_produto_busca'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recriar_indice_busca),
+        migrations.AddField(
+            model_name='produto',
+            name='imagem_pendente',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Imagem Aguardando Processamento'),
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='imagem_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Variantes da Imagem'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(condition=models.Q(('imagem_pendente', True)), fields=['id'], name='produto_imagem_pendente_idx'),
+        ),
+        migrations.RunPython(recriar_indice_busca, migrations.RunPython.noop),
+    ]
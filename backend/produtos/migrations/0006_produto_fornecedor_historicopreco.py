@@ -0,0 +1,44 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fornecedores', '0001_initial'),
+        ('produtos', '0005_produto_imagem_variantes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='fornecedor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='produtos', to='fornecedores.fornecedor', verbose_name='Fornecedor'),
+        ),
+        migrations.CreateModel(
+            name='HistoricoPreco',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lote', models.UUIDField(db_index=True, verbose_name='Lote')),
+                ('preco_custo_anterior', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço de Custo Anterior')),
+                ('preco_custo', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço de Custo')),
+                ('preco_venda_anterior', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço de Venda Anterior')),
+                ('preco_venda', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço de Venda')),
+                ('margem_lucro', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Margem de Lucro (%)')),
+                ('motivo', models.CharField(blank=True, max_length=200, verbose_name='Motivo')),
+                ('data', models.DateTimeField(auto_now_add=True, verbose_name='Data')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historico_precos', to='produtos.produto', verbose_name='Produto')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reajustes_preco', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Histórico de Preço',
+                'verbose_name_plural': 'Históricos de Preço',
+                'ordering': ['-data', '-id'],
+                'indexes': [models.Index(fields=['produto', '-data'], name='produtos_hi_produto_a120e4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0006_produto_fornecedor_historicopreco'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='imagem_reservada_em',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Imagem Reservada em'),
+        ),
+    ]
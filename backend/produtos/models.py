@@ -1,4 +1,8 @@
-from django.db import models
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models.functions import Cast, Concat, Round, Substr
+from django.db.models.lookups import GreaterThan
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
@@ -17,6 +21,12 @@ class Categoria(models.Model):
         verbose_name='Categoria Pai'
     )
     ativo = models.BooleanField('Ativo', default=True)
+    
+    # Caminho materializado ("/1/5/12/": ids da raiz até a própria categoria),
+    # mantido em save(); a subárvore é uma faixa do índice (ver descendentes_q)
+    caminho = models.CharField('Caminho', max_length=255, db_index=True, editable=False, default='')
+    nivel = models.PositiveSmallIntegerField('Nível', default=0, editable=False)
+    
     data_cadastro = models.DateTimeField('Data de Cadastro', auto_now_add=True)
     data_atualizacao = models.DateTimeField('Data de Atualização', auto_now=True)
     
@@ -30,6 +40,75 @@ class Categoria(models.Model):
             return f"{self.categoria_pai.nome} > {self.nome}"
         return self.nome
     
+    def clean(self):
+        """A categoria pai não pode estar na subárvore da própria categoria"""
+        if self.pk and self.categoria_pai_id:
+            caminho_pai = Categoria.objects.filter(pk=self.categoria_pai_id).values_list('caminho', flat=True).first()
+            if f'/{self.pk}/' in (caminho_pai or ''):
+                raise ValidationError({
+                    'categoria_pai': 'A categoria pai não pode ser a própria categoria nem uma subcategoria dela'
+                })
+    
+    def save(self, *args, **kwargs):
+        """Grava e recalcula o caminho; ao mudar de pai, move a subárvore inteira"""
+        with transaction.atomic():
+            atuais = {
+                pk: (caminho, nivel)
+                for pk, caminho, nivel in Categoria.objects.filter(
+                    pk__in=[pk for pk in (self.pk, self.categoria_pai_id) if pk]
+                ).values_list('pk', 'caminho', 'nivel')
+            }
+            caminho_anterior, nivel_anterior = atuais.get(self.pk, ('', 0))
+            caminho_pai, nivel_pai = atuais.get(self.categoria_pai_id, ('/', -1))
+            if caminho_anterior and caminho_pai.startswith(caminho_anterior):
+                raise ValueError('A categoria pai não pode ser a própria categoria nem uma subcategoria dela')
+            
+            super().save(*args, **kwargs)
+            
+            caminho = f'{caminho_pai}{self.pk}/'
+            nivel = nivel_pai + 1
+            if caminho_anterior and caminho != caminho_anterior:
+                Categoria.mover_subarvore(caminho_anterior, caminho, nivel - nivel_anterior)
+            elif caminho != caminho_anterior:
+                Categoria.objects.filter(pk=self.pk).update(caminho=caminho, nivel=nivel)
+            self.caminho = caminho
+            self.nivel = nivel
+    
+    @staticmethod
+    def mover_subarvore(caminho_anterior, caminho, delta_nivel):
+        """Troca o prefixo do caminho (e ajusta o nível) da subárvore em um único UPDATE"""
+        Categoria.objects.filter(Categoria.faixa_caminho(caminho_anterior)).update(
+            caminho=Concat(models.Value(caminho), Substr('caminho', len(caminho_anterior) + 1)),
+            nivel=models.F('nivel') + delta_nivel,
+        )
+    
+    @staticmethod
+    def faixa_caminho(prefixo, campo='caminho'):
+        """
+        Q para caminhos que começam com `prefixo` ("/1/5/"), como faixa
+        [prefixo, prefixo com a última "/" trocada por "0"): "0" é o caractere
+        seguinte a "/", e a faixa usa o índice em qualquer banco (o LIKE com
+        ESCAPE do startswith não usa índice no SQLite).
+        """
+        return models.Q(**{f'{campo}__gte': prefixo, f'{campo}__lt': prefixo[:-1] + '0'})
+    
+    def descendentes_q(self, campo='caminho'):
+        """Q da própria categoria e de todas as descendentes"""
+        return Categoria.faixa_caminho(self.caminho, campo)
+    
+    @property
+    def ancestrais_ids(self):
+        """Ids dos ancestrais, da raiz até o pai"""
+        return [int(pk) for pk in self.caminho.strip('/').split('/')[:-1] if pk]
+    
+    @classmethod
+    def carregar_caminhos(cls, categorias):
+        """Carrega em uma consulta os nomes dos ancestrais de várias categorias"""
+        ids = {pk for categoria in categorias for pk in categoria.ancestrais_ids}
+        nomes = dict(cls.objects.filter(pk__in=ids).values_list('pk', 'nome')) if ids else {}
+        for categoria in categorias:
+            categoria._nomes_ancestrais = [nomes.get(pk, '') for pk in categoria.ancestrais_ids]
+    
     @property
     def ativa(self):
         """Alias para ativo (compatibilidade admin)"""
@@ -37,10 +116,10 @@ class Categoria(models.Model):
     
     @property
     def caminho_completo(self):
-        """Retorna o caminho completo da categoria"""
-        if self.categoria_pai:
-            return f"{self.categoria_pai.caminho_completo} > {self.nome}"
-        return self.nome
+        """Retorna o caminho completo da categoria ("Raiz > ... > Nome")"""
+        if not hasattr(self, '_nomes_ancestrais'):
+            Categoria.carregar_caminhos([self])
+        return ' > '.join([*self._nomes_ancestrais, self.nome])
 
 
 class Produto(models.Model):
@@ -71,6 +150,14 @@ class Produto(models.Model):
         related_name='produtos',
         verbose_name='Categoria'
     )
+    fornecedor = models.ForeignKey(
+        'fornecedores.Fornecedor',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='produtos',
+        verbose_name='Fornecedor'
+    )
     
     # Precificação
     preco_custo = models.DecimalField(
@@ -137,6 +224,12 @@ class Produto(models.Model):
         null=True,
         blank=True
     )
+    # Versões redimensionadas da imagem (produtos/imagens.py), geradas fora da
+    # requisição: {variante: {formato: caminho no storage}} ou {'erro': ...}
+    imagem_variantes = models.JSONField('Variantes da Imagem', default=dict, blank=True, editable=False)
+    imagem_pendente = models.BooleanField('Imagem Aguardando Processamento', default=False, editable=False)
+    # Reserva do processamento em andamento: uma execução por produto por vez
+    imagem_reservada_em = models.DateTimeField('Imagem Reservada em', null=True, blank=True, editable=False)
     
     # Status e datas
     status = models.CharField('Status', max_length=15, choices=STATUS_CHOICES, default='ativo')
@@ -151,16 +244,63 @@ class Produto(models.Model):
             models.Index(fields=['codigo']),
             models.Index(fields=['status']),
             models.Index(fields=['categoria']),
+            # Fila do processamento de imagens: só as linhas pendentes
+            models.Index(
+                fields=['id'],
+                condition=models.Q(imagem_pendente=True),
+                name='produto_imagem_pendente_idx'
+            ),
         ]
     
     def __str__(self):
         return f"{self.codigo} - {self.nome}"
     
-    def save(self, *args, **kwargs):
-        """Calcula a margem de lucro automaticamente"""
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        if 'imagem' in field_names:
+            # Imagem gravada no banco, para detectar troca no save()
+            instancia._imagem_original = instancia.__dict__['imagem'] or ''
+        return instancia
+    
+    @staticmethod
+    def margem_lucro_sql(preco_custo=models.F('preco_custo'), preco_venda=models.F('preco_venda')):
+        """
+        Margem de lucro (%) calculada no banco, com o mesmo cálculo do save(),
+        para UPDATEs em massa. Recebe as expressões dos preços novos: no SET
+        de um UPDATE as colunas ainda valem o valor anterior.
+        """
+        # Divisão em ponto flutuante: no SQLite preços sem casas decimais são
+        # gravados como inteiros e a divisão seria inteira
+        margem = (preco_venda - preco_custo) * 100 / Cast(preco_custo, models.FloatField())
+        return models.Case(
+            models.When(
+                GreaterThan(preco_custo, 0),
+                then=Round(Cast(margem, models.DecimalField(max_digits=5, decimal_places=2)), 2),
+            ),
+            default=models.F('margem_lucro'),
+            output_field=models.DecimalField(max_digits=5, decimal_places=2),
+        )
+    
+    def calcular_margem_lucro(self):
+        """Margem de lucro (%) a partir dos preços; usada pelo save() e por cargas com bulk_create"""
         if self.preco_custo and self.preco_venda:
             self.margem_lucro = ((self.preco_venda - self.preco_custo) / self.preco_custo) * 100
+    
+    def save(self, *args, **kwargs):
+        """Calcula a margem de lucro e enfileira as variantes de uma imagem nova"""
+        self.calcular_margem_lucro()
+        
+        original = '' if self._state.adding else getattr(self, '_imagem_original', None)
+        if original is not None and (self.imagem.name or '') != original:
+            # Imagem nova ou removida: o processamento gera as variantes (ou
+            # apaga as antigas) fora da requisição
+            self.imagem_pendente = True
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'imagem' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'imagem_pendente', 'imagem_variantes'}
         super().save(*args, **kwargs)
+        self._imagem_original = self.imagem.name or ''
     
     @property
     def codigo_sku(self):
@@ -181,3 +321,42 @@ class Produto(models.Model):
     def lucro_unitario(self):
         """Retorna o lucro por unidade"""
         return self.preco_venda - self.preco_custo
+
+
+class HistoricoPreco(models.Model):
+    """Preços anteriores e novos de um produto a cada reajuste em lote"""
+    
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='historico_precos',
+        verbose_name='Produto'
+    )
+    # Identifica as linhas gravadas por um mesmo reajuste
+    lote = models.UUIDField('Lote', db_index=True)
+    preco_custo_anterior = models.DecimalField('Preço de Custo Anterior', max_digits=10, decimal_places=2)
+    preco_custo = models.DecimalField('Preço de Custo', max_digits=10, decimal_places=2)
+    preco_venda_anterior = models.DecimalField('Preço de Venda Anterior', max_digits=10, decimal_places=2)
+    preco_venda = models.DecimalField('Preço de Venda', max_digits=10, decimal_places=2)
+    margem_lucro = models.DecimalField('Margem de Lucro (%)', max_digits=5, decimal_places=2)
+    motivo = models.CharField('Motivo', max_length=200, blank=True)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reajustes_preco',
+        verbose_name='Usuário'
+    )
+    data = models.DateTimeField('Data', auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Histórico de Preço'
+        verbose_name_plural = 'Históricos de Preço'
+        ordering = ['-data', '-id']
+        indexes = [
+            models.Index(fields=['produto', '-data']),
+        ]
+    
+    def __str__(self):
+        return f"{self.produto_id}: {self.preco_venda_anterior} -> {self.preco_venda} ({self.data:%d/%m/%Y})"
@@ -1,5 +1,19 @@
+from django.db import models
 from rest_framework import serializers
-from .models import Categoria, Produto
+from estoque.services import situacao_estoque
+from fornecedores.models import Fornecedor
+from .imagens import urls_variantes
+from .models import Categoria, HistoricoPreco, Produto
+from .services import CAMPOS_PRECO, TIPOS_REAJUSTE
+
+
+class CategoriaCaminhosListSerializer(serializers.ListSerializer):
+    """Carrega os nomes dos ancestrais de toda a página em uma consulta"""
+    
+    def to_representation(self, data):
+        categorias = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        Categoria.carregar_caminhos(categorias)
+        return super().to_representation(categorias)
 
 
 class CategoriaSerializer(serializers.ModelSerializer):
@@ -14,6 +28,7 @@ class CategoriaSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Categoria
+        list_serializer_class = CategoriaCaminhosListSerializer
         fields = [
             'id',
             'nome',
@@ -21,19 +36,29 @@ class CategoriaSerializer(serializers.ModelSerializer):
             'categoria_pai',
             'ativo',
             'ativa',
+            'caminho',
+            'nivel',
             'caminho_completo',
             'data_cadastro',
             'data_atualizacao',
             'subcategorias',
         ]
-        read_only_fields = ['id', 'data_cadastro', 'data_atualizacao']
+        read_only_fields = ['id', 'caminho', 'nivel', 'data_cadastro', 'data_atualizacao']
     
     def get_subcategorias(self, obj):
-        """Retorna subcategorias da categoria"""
-        if hasattr(obj, 'subcategorias'):
-            subcats = obj.subcategorias.filter(ativo=True)
-            return CategoriaListSerializer(subcats, many=True).data
-        return []
+        """Retorna subcategorias ativas (pré-carregadas pelo viewset em subcategorias_ativas)"""
+        subcats = getattr(obj, 'subcategorias_ativas', None)
+        if subcats is None:
+            subcats = obj.subcategorias.filter(ativo=True).select_related('categoria_pai')
+        return CategoriaListSerializer(subcats, many=True).data
+    
+    def validate_categoria_pai(self, value):
+        """Impede ciclos: o pai não pode estar na subárvore da categoria"""
+        if value and self.instance and f'/{self.instance.pk}/' in value.caminho:
+            raise serializers.ValidationError(
+                'A categoria pai não pode ser a própria categoria nem uma subcategoria dela'
+            )
+        return value
 
 
 class CategoriaListSerializer(serializers.ModelSerializer):
@@ -56,6 +81,8 @@ class ProdutoSerializer(serializers.ModelSerializer):
     codigo_sku = serializers.ReadOnlyField()
     ativo = serializers.ReadOnlyField()
     lucro_unitario = serializers.ReadOnlyField()
+    situacao_estoque = serializers.SerializerMethodField()
+    imagem_variantes = serializers.SerializerMethodField()
     
     # Display values
     unidade_medida_display = serializers.CharField(source='get_unidade_medida_display', read_only=True)
@@ -71,6 +98,7 @@ class ProdutoSerializer(serializers.ModelSerializer):
             'descricao',
             'categoria',
             'categoria_detail',
+            'fornecedor',
             'preco_custo',
             'preco_venda',
             'margem_lucro',
@@ -82,14 +110,22 @@ class ProdutoSerializer(serializers.ModelSerializer):
             'largura',
             'profundidade',
             'imagem',
+            'imagem_variantes',
             'status',
             'status_display',
             'ativo',
+            'situacao_estoque',
             'data_cadastro',
             'data_atualizacao',
         ]
         read_only_fields = ['id', 'margem_lucro', 'data_cadastro', 'data_atualizacao']
     
+    def get_situacao_estoque(self, obj):
+        return situacao_estoque(obj)
+    
+    def get_imagem_variantes(self, obj):
+        return urls_variantes(obj, self.context.get('request'))
+    
     def validate(self, data):
         """Validações do produto"""
         # Validar que preço de venda é maior que preço de custo
@@ -109,6 +145,8 @@ class ProdutoListSerializer(serializers.ModelSerializer):
     """Serializer simplificado para listagem de produtos"""
     
     categoria_nome = serializers.CharField(source='categoria.nome', read_only=True)
+    situacao_estoque = serializers.SerializerMethodField()
+    imagem_variantes = serializers.SerializerMethodField()
     
     class Meta:
         model = Produto
@@ -122,5 +160,97 @@ class ProdutoListSerializer(serializers.ModelSerializer):
             'margem_lucro',
             'unidade_medida',
             'status',
+            'situacao_estoque',
             'imagem',
+            'imagem_variantes',
+        ]
+    
+    def get_situacao_estoque(self, obj):
+        return situacao_estoque(obj)
+    
+    def get_imagem_variantes(self, obj):
+        return urls_variantes(obj, self.context.get('request'))
+
+
+class ProdutoEmLoteField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolve o produto a partir do mapa carregado em lote pelo serializer raiz
+    (atributo `produtos_em_lote`), evitando uma consulta por item. Sem o mapa,
+    comporta-se como um PrimaryKeyRelatedField comum.
+    """
+    
+    @classmethod
+    def carregar_em_lote(cls, itens, queryset=None):
+        """
+        Mapa pk -> produto dos itens recebidos (`itens`: lista de dicts com
+        a chave 'produto'), em uma consulta. Entradas malformadas ficam de
+        fora e são recusadas depois pelo próprio campo.
+        """
+        ids = set()
+        if isinstance(itens, list):
+            for item in itens:
+                try:
+                    ids.add(int(item.get('produto')))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+        return (Produto.objects.all() if queryset is None else queryset).in_bulk(ids)
+    
+    def to_internal_value(self, data):
+        produtos = getattr(self.root, 'produtos_em_lote', None)
+        if produtos is None:
+            return super().to_internal_value(data)
+        try:
+            return produtos[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class ReajustePrecoSerializer(serializers.Serializer):
+    """
+    Reajuste de preços em lote: produtos selecionados por categoria (com as
+    subcategorias), fornecedor e/ou status; `valor` em % ou em reais
+    (negativo para reduzir).
+    """
+    
+    categoria = serializers.PrimaryKeyRelatedField(queryset=Categoria.objects.all(), required=False)
+    fornecedor = serializers.PrimaryKeyRelatedField(queryset=Fornecedor.objects.all(), required=False)
+    status = serializers.ChoiceField(choices=Produto.STATUS_CHOICES, required=False)
+    tipo = serializers.ChoiceField(choices=TIPOS_REAJUSTE, default='percentual')
+    valor = serializers.DecimalField(max_digits=10, decimal_places=2)
+    campos = serializers.MultipleChoiceField(choices=CAMPOS_PRECO, default=['preco_venda'], allow_empty=False)
+    motivo = serializers.CharField(max_length=200, required=False, allow_blank=True, default='')
+    
+    def validate(self, data):
+        if not any(data.get(filtro) for filtro in ('categoria', 'fornecedor', 'status')):
+            raise serializers.ValidationError(
+                'Informe ao menos um filtro (categoria, fornecedor ou status) para o reajuste'
+            )
+        if data['tipo'] == 'percentual' and data['valor'] <= -100:
+            raise serializers.ValidationError({'valor': 'A redução percentual deve ser menor que 100%'})
+        if data['valor'] == 0:
+            raise serializers.ValidationError({'valor': 'O valor do reajuste não pode ser zero'})
+        return data
+
+
+class HistoricoPrecoSerializer(serializers.ModelSerializer):
+    """Serializer para o histórico de preços de um produto"""
+    
+    usuario_nome = serializers.CharField(source='usuario.nome_completo', read_only=True, default=None)
+    
+    class Meta:
+        model = HistoricoPreco
+        fields = [
+            'id',
+            'lote',
+            'preco_custo_anterior',
+            'preco_custo',
+            'preco_venda_anterior',
+            'preco_venda',
+            'margem_lucro',
+            'motivo',
+            'usuario',
+            'usuario_nome',
+            'data',
         ]
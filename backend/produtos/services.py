@@ -0,0 +1,130 @@
+"""Serviços de domínio do módulo de produtos."""
+import uuid
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models.functions import Round
+from django.utils import timezone
+from config.cache_versionado import incrementar_versao
+from .models import HistoricoPreco, Produto
+
+CAMPOS_PRECO = ('preco_venda', 'preco_custo')
+TIPOS_REAJUSTE = ('percentual', 'valor')
+
+# Produtos por consulta/bulk_create ao gravar o histórico
+TAMANHO_LOTE_HISTORICO = 1000
+
+# Quantos códigos de produto a mensagem de erro lista
+LIMITE_PRODUTOS_ERRO = 20
+
+
+class ReajusteInvalidoError(ValueError):
+    """O reajuste deixaria algum produto com preço inválido"""
+
+    def __init__(self, mensagem, codigos=(), total=0):
+        self.codigos = list(codigos)
+        self.total = total
+        super().__init__(mensagem)
+
+
+def produtos_para_reajuste(categoria=None, fornecedor=None, status=None):
+    """Produtos de uma categoria (com as subcategorias), de um fornecedor e/ou com um status"""
+    produtos = Produto.objects.all()
+    if categoria is not None:
+        produtos = produtos.filter(categoria.descendentes_q('categoria__caminho'))
+    if fornecedor is not None:
+        produtos = produtos.filter(fornecedor=fornecedor)
+    if status:
+        produtos = produtos.filter(status=status)
+    return produtos
+
+
+def preco_reajustado(campo, tipo, valor):
+    """Expressão SQL do novo valor de `campo`: +/- `valor` por cento ou em reais"""
+    if tipo not in TIPOS_REAJUSTE:
+        raise ValueError(f'Tipo de reajuste inválido: {tipo}')
+    valor = Decimal(valor)
+    if tipo == 'percentual':
+        novo = models.F(campo) * models.Value(1 + valor / 100)
+    else:
+        novo = models.F(campo) + models.Value(valor)
+    return Round(novo, 2, output_field=models.DecimalField(max_digits=10, decimal_places=2))
+
+
+def reajustar_precos(produtos, valor, tipo='percentual', campos=('preco_venda',), motivo='', usuario=None):
+    """
+    Reajusta os preços (`campos`) dos `produtos` em um único UPDATE, que
+    também recalcula margem_lucro com as expressões dos preços novos (sem
+    carregar nem salvar produto a produto). Os preços anteriores e novos vão
+    para HistoricoPreco em bulk_create, sob um mesmo `lote`.
+
+    Todo o reajuste é recusado (ReajusteInvalidoError) se algum produto
+    ficar com preço abaixo de 0,01 ou com preço de venda menor ou igual ao
+    de custo, a mesma regra do cadastro.
+
+    Retorna (lote, quantidade de produtos reajustados).
+    """
+    campos = [campo for campo in CAMPOS_PRECO if campo in set(campos)]
+    if not campos:
+        raise ValueError('Informe ao menos um campo de preço para reajustar')
+    novos = {campo: preco_reajustado(campo, tipo, valor) for campo in campos}
+    custo = novos.get('preco_custo', models.F('preco_custo'))
+    venda = novos.get('preco_venda', models.F('preco_venda'))
+    ids = produtos.order_by().values('pk')
+    lote = uuid.uuid4()
+
+    with transaction.atomic():
+        # Preços anteriores, com as linhas bloqueadas até o fim do reajuste
+        anteriores = {
+            pk: (preco_custo, preco_venda)
+            for pk, preco_custo, preco_venda in Produto.objects.filter(pk__in=ids)
+            .select_for_update()
+            .values_list('pk', 'preco_custo', 'preco_venda')
+        }
+        if not anteriores:
+            return lote, 0
+
+        invalidos = Produto.objects.filter(pk__in=ids).alias(novo_custo=custo, novo_venda=venda).filter(
+            models.Q(novo_custo__lt=Decimal('0.01'))
+            | models.Q(novo_venda__lt=Decimal('0.01'))
+            | models.Q(novo_venda__lte=models.F('novo_custo'))
+        )
+        total_invalidos = invalidos.count()
+        if total_invalidos:
+            codigos = list(invalidos.order_by('codigo').values_list('codigo', flat=True)[:LIMITE_PRODUTOS_ERRO])
+            raise ReajusteInvalidoError(
+                f'O reajuste deixaria {total_invalidos} produto(s) com preço inválido '
+                f'(menor que 0,01 ou venda menor ou igual ao custo): {", ".join(codigos)}',
+                codigos=codigos,
+                total=total_invalidos,
+            )
+
+        reajustados = Produto.objects.filter(pk__in=ids).update(
+            **novos,
+            margem_lucro=Produto.margem_lucro_sql(custo, venda),
+            # update() não aplica o auto_now (usado pelo GET condicional)
+            data_atualizacao=timezone.now(),
+        )
+
+        chaves = sorted(anteriores)
+        for inicio in range(0, len(chaves), TAMANHO_LOTE_HISTORICO):
+            atuais = Produto.objects.filter(pk__in=chaves[inicio:inicio + TAMANHO_LOTE_HISTORICO]).values_list(
+                'pk', 'preco_custo', 'preco_venda', 'margem_lucro'
+            )
+            HistoricoPreco.objects.bulk_create([
+                HistoricoPreco(
+                    produto_id=pk,
+                    lote=lote,
+                    preco_custo_anterior=anteriores[pk][0],
+                    preco_custo=preco_custo,
+                    preco_venda_anterior=anteriores[pk][1],
+                    preco_venda=preco_venda,
+                    margem_lucro=margem_lucro,
+                    motivo=motivo,
+                    usuario=usuario,
+                )
+                for pk, preco_custo, preco_venda, margem_lucro in atuais
+            ])
+
+        # O UPDATE em massa não dispara os sinais que invalidam o catálogo em cache
+        transaction.on_commit(lambda: incrementar_versao(Produto))
+    return lote, reajustados
@@ -0,0 +1,25 @@
+"""Manutenção do caminho materializado de Categoria fora de save() e invalidação do catálogo em cache."""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from config.cache_versionado import incrementar_versao
+from .models import Categoria, Produto
+
+
+@receiver(post_delete, sender=Categoria)
+def promover_subcategorias(sender, instance, **kwargs):
+    """
+    As filhas de uma categoria excluída ficam sem pai (SET_NULL via UPDATE,
+    sem save()); a subárvore delas sobe para a raiz.
+    """
+    if instance.caminho:
+        Categoria.mover_subarvore(instance.caminho, '/', -(instance.nivel + 1))
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+def invalidar_catalogo_em_cache(sender, instance, **kwargs):
+    """Nova versão do model: as respostas da API em cache que o exibem deixam de valer"""
+    transaction.on_commit(lambda: incrementar_versao(sender))
@@ -1,3 +1,627 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from unittest import mock
+from PIL import Image
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from config.cache_versionado import estatisticas_cache
+from estoque.models import MovimentacaoEstoque
+from estoque.services import configurar_fragmentos, registrar_movimentacoes
+from fornecedores.models import Fornecedor
+from usuarios.models import Usuario
+from .imagens import PRAZO_RESERVA, processar_pendentes
+from .lookup import LIMITE_CODIGOS, indice_codigos
+from .models import Categoria, HistoricoPreco, Produto
 
-# Create your tests here.
+
+class CategoriaArvoreTest(TestCase):
+    """Caminho materializado de Categoria e consultas de subárvore"""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(username='catalogo')
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+
+        self.eletronicos = Categoria.objects.create(nome='Eletrônicos')
+        self.informatica = Categoria.objects.create(nome='Informática', categoria_pai=self.eletronicos)
+        self.notebooks = Categoria.objects.create(nome='Notebooks', categoria_pai=self.informatica)
+        self.moveis = Categoria.objects.create(nome='Móveis')
+
+    def caminho(self, categoria):
+        return Categoria.objects.values_list('caminho', 'nivel').get(pk=categoria.pk)
+
+    def test_caminho_mantido_no_save(self):
+        e, i, n = self.eletronicos.pk, self.informatica.pk, self.notebooks.pk
+        self.assertEqual(self.caminho(self.notebooks), (f'/{e}/{i}/{n}/', 2))
+        self.assertEqual(self.notebooks.caminho_completo, 'Eletrônicos > Informática > Notebooks')
+
+        # Mover a subárvore reescreve os descendentes em um único UPDATE
+        self.informatica.categoria_pai = self.moveis
+        self.informatica.save()
+        self.assertEqual(self.caminho(self.notebooks), (f'/{self.moveis.pk}/{i}/{n}/', 2))
+
+        self.informatica.categoria_pai = None
+        self.informatica.save()
+        self.assertEqual(self.caminho(self.notebooks), (f'/{i}/{n}/', 1))
+
+    def test_exclusao_promove_subarvore(self):
+        self.eletronicos.delete()
+        self.assertEqual(self.caminho(self.informatica), (f'/{self.informatica.pk}/', 0))
+        self.assertEqual(self.caminho(self.notebooks), (f'/{self.informatica.pk}/{self.notebooks.pk}/', 1))
+
+    def test_ciclo_recusado(self):
+        resposta = self.api.patch(
+            f'/api/categorias/{self.eletronicos.pk}/', {'categoria_pai': self.notebooks.pk}, format='json'
+        )
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('categoria_pai', resposta.data)
+
+        self.eletronicos.categoria_pai = self.notebooks
+        with self.assertRaises(ValueError):
+            self.eletronicos.save()
+
+    def test_arvore_em_uma_consulta(self):
+        with self.assertNumQueries(1):
+            resposta = self.api.get('/api/categorias/arvore/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual([raiz['nome'] for raiz in resposta.data], ['Eletrônicos', 'Móveis'])
+        informatica, = resposta.data[0]['subcategorias']
+        self.assertEqual(informatica['subcategorias'][0]['nome'], 'Notebooks')
+
+    def test_listagem_nao_cresce_com_as_categorias(self):
+        def medir():
+            with CaptureQueriesContext(connection) as consultas:
+                resposta = self.api.get('/api/categorias/')
+            self.assertEqual(resposta.status_code, 200)
+            return len(consultas)
+
+        antes = medir()
+        for i in range(5):
+            Categoria.objects.create(nome=f'Sub {i}', categoria_pai=self.notebooks)
+        self.assertEqual(medir(), antes)
+
+        resultados = {c['nome']: c for c in self.api.get('/api/categorias/').data['results']}
+        self.assertEqual(resultados['Sub 0']['caminho_completo'], 'Eletrônicos > Informática > Notebooks > Sub 0')
+        self.assertEqual(len(resultados['Notebooks']['subcategorias']), 5)
+
+    def test_filtro_de_produtos_inclui_subcategorias(self):
+        def produto(codigo, categoria):
+            return Produto.objects.create(
+                codigo=codigo,
+                nome=codigo,
+                categoria=categoria,
+                preco_custo=Decimal('10.00'),
+                preco_venda=Decimal('15.00'),
+            )
+
+        produto('NB-1', self.notebooks)
+        produto('INF-1', self.informatica)
+        produto('MOV-1', self.moveis)
+
+        resposta = self.api.get('/api/produtos/', {'categoria': self.eletronicos.pk})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(sorted(p['codigo'] for p in resposta.data['results']), ['INF-1', 'NB-1'])
+
+        resposta = self.api.get('/api/produtos/', {'categoria': self.notebooks.pk})
+        self.assertEqual([p['codigo'] for p in resposta.data['results']], ['NB-1'])
+
+
+class BuscaProdutoTest(TestCase):
+    """Busca textual indexada em /api/produtos/?search="""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(username='busca')
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        self.categoria = Categoria.objects.create(nome='Informática')
+
+        def produto(codigo, nome, descricao=None):
+            return Produto.objects.create(
+                codigo=codigo,
+                nome=nome,
+                descricao=descricao,
+                categoria=self.categoria,
+                preco_custo=Decimal('10.00'),
+                preco_venda=Decimal('15.00'),
+            )
+
+        self.notebook = produto('NB-0001', 'Notebook Dell Inspiron', 'Tela 15 polegadas')
+        self.mochila = produto('MOC-0002', 'Mochila executiva', 'Cabe notebook de até 15 polegadas')
+        self.mouse = produto('MOU-0003', 'Mouse sem fio', 'Compatível com notebook')
+        self.cadeira = produto('CAD-0004', 'Cadeira Gamer', None)
+
+    def buscar(self, termo, **params):
+        resposta = self.api.get('/api/produtos/', {'search': termo, **params})
+        self.assertEqual(resposta.status_code, 200)
+        return [p['codigo'] for p in resposta.data['results']]
+
+    def test_ordena_por_relevancia(self):
+        # Nome pesa mais que descrição
+        self.assertEqual(self.buscar('notebook')[0], 'NB-0001')
+        self.assertCountEqual(self.buscar('notebook'), ['NB-0001', 'MOC-0002', 'MOU-0003'])
+        # ?ordering= explícito prevalece sobre a relevância
+        self.assertEqual(self.buscar('notebook', ordering='nome'), ['MOC-0002', 'MOU-0003', 'NB-0001'])
+
+    def test_prefixo_acentos_e_codigo(self):
+        self.assertEqual(self.buscar('cadei'), ['CAD-0004'])
+        self.assertEqual(self.buscar('compativel'), ['MOU-0003'])
+        self.assertEqual(self.buscar('nb-0001'), ['NB-0001'])
+        self.assertEqual(self.buscar('mouse fio'), ['MOU-0003'])
+        self.assertEqual(self.buscar('"mouse" (fio'), ['MOU-0003'])
+        self.assertEqual(self.buscar('teclado'), [])
+
+    def test_indice_acompanha_alteracoes(self):
+        self.cadeira.nome = 'Poltrona Gamer'
+        self.cadeira.save()
+        Produto.objects.filter(pk=self.mouse.pk).update(nome='Trackball sem fio')
+        self.mochila.delete()
+
+        self.assertEqual(self.buscar('cadeira'), [])
+        self.assertEqual(self.buscar('poltrona'), ['CAD-0004'])
+        self.assertEqual(self.buscar('trackball'), ['MOU-0003'])
+        self.assertEqual(self.buscar('mochila'), [])
+
+        # Compactar o índice não altera os resultados
+        call_command('otimizar_indices_busca', stdout=StringIO())
+        self.assertEqual(self.buscar('poltrona'), ['CAD-0004'])
+        self.assertEqual(self.buscar('mochila'), [])
+
+    def test_combina_com_filtros_e_paginacao(self):
+        Produto.objects.filter(pk=self.mochila.pk).update(status='inativo')
+        resposta = self.api.get('/api/produtos/', {'search': 'notebook', 'status': 'ativo'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['count'], 2)
+        self.assertEqual([p['codigo'] for p in resposta.data['results']], ['NB-0001', 'MOU-0003'])
+
+    def test_paginacao_reaproveita_contagem_da_sonda(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.api.get('/api/produtos/', {'search': 'notebook'})
+        self.assertEqual(resposta.data['count'], 3)
+        contagens = [q['sql'] for q in consultas.captured_queries if 'COUNT(' in q['sql']]
+        self.assertEqual(len(contagens), 1)
+
+
+class CatalogoCacheTest(TransactionTestCase):
+    """Cache versionado das respostas do catálogo (commit real: versões mudam no on_commit)"""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create(username='catalogo', is_staff=True)
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        self.categoria = Categoria.objects.create(nome='Papelaria')
+        self.produto = Produto.objects.create(
+            codigo='CAD-001',
+            nome='Caderno',
+            categoria=self.categoria,
+            preco_custo=Decimal('10.00'),
+            preco_venda=Decimal('15.00'),
+        )
+
+    def listar(self):
+        resposta = self.api.get('/api/produtos/')
+        self.assertEqual(resposta.status_code, 200)
+        return resposta
+
+    def test_acerto_sem_consultas_e_invalidacao_por_gravacao(self):
+        self.assertEqual(self.listar()['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            resposta = self.listar()
+        self.assertEqual(resposta['X-Cache'], 'HIT')
+        self.assertEqual(resposta.data['results'][0]['nome'], 'Caderno')
+
+        # GET condicional respondido a partir do cache
+        resposta = self.api.get('/api/produtos/', HTTP_IF_NONE_MATCH=resposta['ETag'])
+        self.assertEqual(resposta.status_code, 304)
+
+        self.api.patch(f'/api/produtos/{self.produto.pk}/', {'nome': 'Caderno universitário'})
+        resposta = self.listar()
+        self.assertEqual(resposta['X-Cache'], 'MISS')
+        self.assertEqual(resposta.data['results'][0]['nome'], 'Caderno universitário')
+
+        # Categoria exibida na listagem também invalida
+        self.categoria.nome = 'Escritório'
+        self.categoria.save()
+        self.assertEqual(self.listar().data['results'][0]['categoria_nome'], 'Escritório')
+
+    def test_movimentacao_de_estoque_invalida_situacao(self):
+        self.assertIsNone(self.listar().data['results'][0]['situacao_estoque'])
+        registrar_movimentacoes([
+            MovimentacaoEstoque(produto=self.produto, tipo='entrada', quantidade=5, motivo='compra')
+        ], usuario=self.usuario)
+        self.assertEqual(self.listar().data['results'][0]['situacao_estoque'], 'disponivel')
+
+        registrar_movimentacoes([
+            MovimentacaoEstoque(produto=self.produto, tipo='saida', quantidade=5, motivo='venda')
+        ], usuario=self.usuario)
+        resposta = self.api.get(f'/api/produtos/{self.produto.pk}/')
+        self.assertEqual(resposta.data['situacao_estoque'], 'sem_estoque')
+        self.assertEqual(self.api.get(f'/api/produtos/{self.produto.pk}/')['X-Cache'], 'HIT')
+
+    def test_movimentacao_de_estoque_invalida_etag(self):
+        urls = ['/api/produtos/', f'/api/produtos/{self.produto.pk}/']
+        etags = [self.api.get(url)['ETag'] for url in urls]
+        registrar_movimentacoes([
+            MovimentacaoEstoque(produto=self.produto, tipo='entrada', quantidade=5, motivo='compra')
+        ], usuario=self.usuario)
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.api.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # Produto fragmentado: a saída não toca a linha de Estoque
+        configurar_fragmentos([self.produto.pk], 2)
+        etags = [self.api.get(url)['ETag'] for url in urls]
+        registrar_movimentacoes([
+            MovimentacaoEstoque(produto=self.produto, tipo='saida', quantidade=5, motivo='venda')
+        ], usuario=self.usuario)
+        for url, etag in zip(urls, etags):
+            resposta = self.api.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['situacao_estoque'], 'sem_estoque')
+
+    def test_requisicoes_simultaneas_geram_a_resposta_uma_vez(self):
+        def listar(_):
+            try:
+                api = APIClient()
+                api.force_authenticate(self.usuario)
+                return api.get('/api/produtos/').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            self.assertEqual(set(executor.map(listar, range(16))), {200})
+
+        estatisticas = estatisticas_cache()['produtos.produto']
+        self.assertEqual(estatisticas['falhas'], 1)
+        self.assertEqual(estatisticas['acertos'], 15)
+
+    @override_settings(API_CACHE_ESPERA=0.05)
+    def test_espera_limitada_quando_outra_requisicao_trava(self):
+        self.listar()
+        self.categoria.save()  # nova versão: a próxima leitura é uma falha
+        adicionar = cache.add
+
+        def trava_ocupada(chave, *args, **kwargs):
+            # Simula outra requisição segurando a trava de geração
+            return False if chave.endswith(':trava') else adicionar(chave, *args, **kwargs)
+
+        with mock.patch.object(cache, 'add', side_effect=trava_ocupada):
+            resposta = self.listar()
+        self.assertEqual(resposta['X-Cache'], 'MISS')
+        self.assertEqual(estatisticas_cache()['produtos.produto']['esperas'], 1)
+
+    def test_estatisticas(self):
+        self.listar()
+        self.listar()
+        resposta = self.api.get('/api/cache/estatisticas/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['produtos.produto']['taxa_acerto'], 0.5)
+
+        self.assertEqual(self.api.delete('/api/cache/estatisticas/').status_code, 204)
+        self.assertEqual(self.api.get('/api/cache/estatisticas/').data['produtos.produto']['acertos'], 0)
+
+        self.usuario.is_staff = False
+        self.usuario.save()
+        self.assertEqual(self.api.get('/api/cache/estatisticas/').status_code, 403)
+
+
+class ImagemProdutoTest(TestCase):
+    """Variantes de Produto.imagem geradas fora da requisição"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.usuario = Usuario.objects.create(username='imagens')
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        self.categoria = Categoria.objects.create(nome='Fotografia')
+
+    def arquivo(self, nome='foto.jpg', tamanho=(2000, 1000), formato='JPEG', modo='RGB'):
+        buffer = BytesIO()
+        Image.new(modo, tamanho, (200, 30, 30, 128) if modo == 'RGBA' else (200, 30, 30)).save(buffer, formato)
+        return SimpleUploadedFile(nome, buffer.getvalue(), content_type=f'image/{formato.lower()}')
+
+    def criar(self, codigo='FOTO-1', **dados):
+        return Produto.objects.create(
+            codigo=codigo,
+            nome='Câmera',
+            categoria=self.categoria,
+            preco_custo=Decimal('10.00'),
+            preco_venda=Decimal('15.00'),
+            **dados
+        )
+
+    def tamanho(self, caminho):
+        with default_storage.open(caminho) as arquivo, Image.open(arquivo) as imagem:
+            return imagem.format, imagem.size
+
+    def test_upload_enfileira_e_processamento_gera_variantes(self):
+        resposta = self.api.post('/api/produtos/', {
+            'codigo': 'FOTO-1',
+            'nome': 'Câmera',
+            'categoria': self.categoria.pk,
+            'preco_custo': '10.00',
+            'preco_venda': '15.00',
+            'imagem': self.arquivo(),
+        }, format='multipart')
+        self.assertEqual(resposta.status_code, 201, resposta.data)
+        self.assertIsNone(resposta.data['imagem_variantes'])
+        self.assertTrue(Produto.objects.get(pk=resposta.data['id']).imagem_pendente)
+
+        self.assertEqual(processar_pendentes(workers=1), (1, 0))
+        produto = Produto.objects.get(pk=resposta.data['id'])
+        self.assertFalse(produto.imagem_pendente)
+        self.assertEqual(self.tamanho(produto.imagem_variantes['thumb']['webp']), ('WEBP', (160, 80)))
+        self.assertEqual(self.tamanho(produto.imagem_variantes['card']['jpeg']), ('JPEG', (480, 240)))
+        self.assertEqual(self.tamanho(produto.imagem_variantes['zoom']['jpeg']), ('JPEG', (1600, 800)))
+
+        resultado = self.api.get('/api/produtos/').data['results'][0]
+        self.assertTrue(resultado['imagem_variantes']['thumb']['webp'].startswith('http://testserver/media/'))
+        self.assertEqual(set(resultado['imagem_variantes']), {'thumb', 'card', 'zoom'})
+
+        # Salvar sem trocar a imagem não reenfileira
+        produto.nome = 'Câmera digital'
+        produto.save()
+        self.assertFalse(Produto.objects.get(pk=produto.pk).imagem_pendente)
+
+    def test_troca_e_remocao_apagam_variantes_antigas(self):
+        produto = self.criar(imagem=self.arquivo('antiga.png', (300, 300), 'PNG', 'RGBA'))
+        processar_pendentes(workers=1)
+        antigas = Produto.objects.get(pk=produto.pk).imagem_variantes
+        # Imagem menor que a caixa não é ampliada; a transparência vira fundo no JPEG
+        self.assertEqual(self.tamanho(antigas['zoom']['jpeg']), ('JPEG', (300, 300)))
+
+        produto = Produto.objects.get(pk=produto.pk)
+        produto.imagem = self.arquivo('nova.jpg')
+        produto.save()
+        self.assertTrue(produto.imagem_pendente)
+        processar_pendentes(workers=1)
+        novas = Produto.objects.get(pk=produto.pk).imagem_variantes
+        self.assertIn('nova-thumb', novas['thumb']['webp'])
+        self.assertFalse(default_storage.exists(antigas['thumb']['webp']))
+        self.assertTrue(default_storage.exists(novas['thumb']['webp']))
+
+        produto.imagem = None
+        produto.save()
+        processar_pendentes(workers=1)
+        self.assertEqual(Produto.objects.get(pk=produto.pk).imagem_variantes, {})
+        self.assertFalse(default_storage.exists(novas['thumb']['webp']))
+
+    def test_imagem_invalida_registra_erro(self):
+        produto = self.criar(imagem=SimpleUploadedFile('quebrada.jpg', b'nao e imagem', content_type='image/jpeg'))
+        self.assertEqual(processar_pendentes(workers=1), (0, 1))
+        produto = Produto.objects.get(pk=produto.pk)
+        self.assertFalse(produto.imagem_pendente)
+        self.assertIn('erro', produto.imagem_variantes)
+        self.assertIsNone(self.api.get(f'/api/produtos/{produto.pk}/').data['imagem_variantes'])
+
+    def test_falha_na_geracao_fica_so_no_produto(self):
+        quebrado = self.criar(codigo='FOTO-1', imagem=self.arquivo('a.jpg'))
+        inteiro = self.criar(codigo='FOTO-2', imagem=self.arquivo('b.jpg'))
+        salvar = default_storage.save
+
+        def falhar_no_primeiro(caminho, conteudo, *args, **kwargs):
+            if f'/{quebrado.pk}/' in caminho:
+                raise ValueError('encoder indisponível')
+            return salvar(caminho, conteudo, *args, **kwargs)
+
+        with mock.patch.object(default_storage, 'save', side_effect=falhar_no_primeiro), \
+                self.assertLogs('produtos.imagens', 'ERROR'):
+            self.assertEqual(processar_pendentes(workers=1), (1, 1))
+        self.assertIn('ValueError', Produto.objects.get(pk=quebrado.pk).imagem_variantes['erro'])
+        self.assertIn('thumb', Produto.objects.get(pk=inteiro.pk).imagem_variantes)
+
+    def test_produto_reservado_por_outra_execucao_fica_de_fora(self):
+        produto = self.criar(imagem=self.arquivo())
+        Produto.objects.filter(pk=produto.pk).update(imagem_reservada_em=timezone.now())
+        self.assertEqual(processar_pendentes(workers=1), (0, 0))
+        self.assertTrue(Produto.objects.get(pk=produto.pk).imagem_pendente)
+
+        # Reserva vencida: a execução que a fez morreu
+        Produto.objects.filter(pk=produto.pk).update(imagem_reservada_em=timezone.now() - PRAZO_RESERVA)
+        self.assertEqual(processar_pendentes(workers=1), (1, 0))
+        self.assertEqual(
+            Produto.objects.values_list('imagem_pendente', 'imagem_reservada_em').get(pk=produto.pk), (False, None)
+        )
+
+    def test_backfill_processa_imagens_existentes_em_paralelo(self):
+        for indice in range(3):
+            self.criar(codigo=f'FOTO-{indice}', imagem=self.arquivo(f'foto{indice}.jpg'))
+        # Imagens cadastradas antes do processamento existir
+        Produto.objects.update(imagem_pendente=False)
+
+        saida = StringIO()
+        call_command('gerar_variantes_imagens', workers=2, stdout=saida)
+        self.assertIn('3 imagem(ns) processada(s)', saida.getvalue())
+        self.assertFalse(Produto.objects.filter(imagem_variantes={}).exists())
+
+        # Sem --todas, as que já têm variantes ficam de fora
+        call_command('gerar_variantes_imagens', workers=1, stdout=saida)
+        self.assertIn('0 imagem(ns) enfileirada(s)', saida.getvalue())
+
+
+class ReajustePrecoTest(TestCase):
+    """Reajuste de preços em lote com margem recalculada no banco"""
+
+    def setUp(self):
+        self.gerente = Usuario.objects.create(username='gerente', tipo='gerente')
+        self.api = APIClient()
+        self.api.force_authenticate(self.gerente)
+
+        self.ferragens = Categoria.objects.create(nome='Ferragens')
+        self.parafusos = Categoria.objects.create(nome='Parafusos', categoria_pai=self.ferragens)
+        self.tintas = Categoria.objects.create(nome='Tintas')
+        self.fornecedor = Fornecedor.objects.create(
+            nome='Metalúrgica Alfa Ltda', cnpj='12.345.678/0001-90'
+        )
+        self.martelo = self.criar('MRT-1', self.ferragens, '7.00', '10.00', fornecedor=self.fornecedor)
+        self.parafuso = self.criar('PRF-1', self.parafusos, '0.50', '1.00')
+        self.tinta = self.criar('TNT-1', self.tintas, '40.00', '60.00', fornecedor=self.fornecedor)
+
+    def criar(self, codigo, categoria, custo, venda, **extras):
+        return Produto.objects.create(
+            codigo=codigo, nome=codigo, categoria=categoria,
+            preco_custo=Decimal(custo), preco_venda=Decimal(venda), **extras
+        )
+
+    def reajustar(self, **dados):
+        return self.api.post('/api/produtos/reajustar-precos/', dados, format='json')
+
+    def test_percentual_na_subarvore_recalcula_margem(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.reajustar(categoria=self.ferragens.pk, valor='8', motivo='Tabela 2026')
+        self.assertEqual(resposta.status_code, 200, resposta.data)
+        self.assertEqual(resposta.data['produtos_reajustados'], 2)
+        self.assertEqual(sum(1 for q in consultas.captured_queries if q['sql'].startswith('UPDATE')), 1)
+
+        self.martelo.refresh_from_db()
+        self.assertEqual(self.martelo.preco_venda, Decimal('10.80'))
+        # Mesma margem que o save() calcularia
+        esperado = Produto(preco_custo=self.martelo.preco_custo, preco_venda=self.martelo.preco_venda)
+        esperado.margem_lucro = (esperado.preco_venda - esperado.preco_custo) / esperado.preco_custo * 100
+        self.assertEqual(self.martelo.margem_lucro, esperado.margem_lucro.quantize(Decimal('0.01')))
+        self.tinta.refresh_from_db()
+        self.assertEqual(self.tinta.preco_venda, Decimal('60.00'))
+
+        historico = HistoricoPreco.objects.get(produto=self.parafuso)
+        self.assertEqual((historico.preco_venda_anterior, historico.preco_venda), (Decimal('1.00'), Decimal('1.08')))
+        self.assertEqual(historico.margem_lucro, Decimal('116.00'))
+        self.assertEqual(historico.usuario, self.gerente)
+        self.assertEqual(str(historico.lote), str(resposta.data['lote']))
+
+        resposta = self.api.get(f'/api/produtos/{self.parafuso.pk}/historico-precos/')
+        self.assertEqual(resposta.data['results'][0]['motivo'], 'Tabela 2026')
+
+    def test_valor_absoluto_por_fornecedor_nos_dois_precos(self):
+        resposta = self.reajustar(
+            fornecedor=self.fornecedor.pk, tipo='valor', valor='2.00', campos=['preco_custo', 'preco_venda']
+        )
+        self.assertEqual(resposta.data['produtos_reajustados'], 2)
+        self.tinta.refresh_from_db()
+        self.assertEqual((self.tinta.preco_custo, self.tinta.preco_venda), (Decimal('42.00'), Decimal('62.00')))
+        self.assertEqual(self.tinta.margem_lucro, Decimal('47.62'))
+
+    def test_preco_invalido_recusa_o_lote_inteiro(self):
+        resposta = self.reajustar(categoria=self.ferragens.pk, tipo='valor', valor='-1.00')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(resposta.data['produtos'], ['PRF-1'])
+        self.martelo.refresh_from_db()
+        self.assertEqual(self.martelo.preco_venda, Decimal('10.00'))
+        self.assertFalse(HistoricoPreco.objects.exists())
+
+    def test_exige_filtro_e_perfil(self):
+        self.assertEqual(self.reajustar(valor='5').status_code, 400)
+        self.api.force_authenticate(Usuario.objects.create(username='vendedor'))
+        self.assertEqual(self.reajustar(status='ativo', valor='5').status_code, 403)
+
+    def test_comando(self):
+        saida = StringIO()
+        call_command('reajustar_precos', '--status', 'ativo', '--percentual', '-10', stdout=saida)
+        self.assertIn('3 produto(s) reajustados', saida.getvalue())
+        self.tinta.refresh_from_db()
+        self.assertEqual(self.tinta.preco_venda, Decimal('54.00'))
+        self.assertEqual(HistoricoPreco.objects.count(), 3)
+
+
+class ConsultaCodigoTest(TransactionTestCase):
+    """Consulta por código do PDV a partir do índice em memória"""
+
+    def setUp(self):
+        cache.clear()
+        indice_codigos.limpar()
+        self.addCleanup(indice_codigos.limpar)
+        # Marca do banco relida só quando o teste pede
+        self.enterContext(mock.patch('produtos.lookup.INTERVALO_VERIFICACAO', 60))
+        self.usuario = Usuario.objects.create(username='caixa')
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        categoria = Categoria.objects.create(nome='Mercearia')
+        self.arroz = Produto.objects.create(
+            codigo='7891000100103', nome='Arroz 5kg', categoria=categoria,
+            preco_custo=Decimal('18.00'), preco_venda=Decimal('24.90')
+        )
+        self.feijao = Produto.objects.create(
+            codigo='7891000200200', nome='Feijão 1kg', categoria=categoria,
+            preco_custo=Decimal('6.00'), preco_venda=Decimal('8.50')
+        )
+
+    def consultar(self, codigo):
+        return self.api.get(f'/api/produtos/lookup/{codigo}/')
+
+    def test_indice_aquecido_responde_sem_consultas(self):
+        self.assertEqual(self.consultar('7891000100103').status_code, 200)
+        with self.assertNumQueries(0):
+            resposta = self.consultar('7891000100103')
+        self.assertEqual(resposta.json(), {
+            'id': self.arroz.pk, 'codigo': '7891000100103', 'nome': 'Arroz 5kg', 'preco_venda': '24.90',
+            'unidade_medida': 'UN', 'status': 'ativo', 'estoque': None, 'situacao_estoque': None,
+        })
+        with self.assertNumQueries(0):
+            resposta = self.consultar('0000')
+        self.assertEqual(resposta.status_code, 404)
+
+    def test_gravacoes_invalidam_o_indice(self):
+        self.consultar('7891000100103')
+        self.api.patch(f'/api/produtos/{self.arroz.pk}/', {'preco_venda': '26.90'})
+        self.assertEqual(self.consultar('7891000100103').json()['preco_venda'], '26.90')
+
+        # Código alterado: a chave antiga sai do índice
+        self.api.patch(f'/api/produtos/{self.arroz.pk}/', {'codigo': '7891000100110'})
+        self.assertEqual(self.consultar('7891000100103').status_code, 404)
+        self.assertEqual(self.consultar('7891000100110').json()['id'], self.arroz.pk)
+
+        self.feijao.delete()
+        self.assertEqual(self.consultar('7891000200200').status_code, 404)
+
+    def test_gravacoes_de_outros_processos_pela_marca_do_banco(self):
+        self.consultar('7891000100103')
+        self.consultar('7891000200200')
+        # Outro processo: o contador do cache local não muda
+        with mock.patch('produtos.lookup.versoes', return_value=[1, 1]):
+            self.consultar('7891000100103')
+            Produto.objects.filter(pk=self.arroz.pk).update(preco_venda=Decimal('27.90'), data_atualizacao=timezone.now())
+            Produto.objects.filter(pk=self.feijao.pk).delete()
+            registrar_movimentacoes([
+                MovimentacaoEstoque(produto=self.arroz, tipo='entrada', quantidade=3, motivo='compra')
+            ], usuario=self.usuario)
+            self.assertEqual(self.consultar('7891000100103').json()['preco_venda'], '24.90')
+
+            with mock.patch('produtos.lookup.INTERVALO_VERIFICACAO', 0):
+                resposta = self.consultar('7891000100103').json()
+                self.assertEqual((resposta['preco_venda'], resposta['estoque']), ('27.90', 3))
+                self.assertEqual(self.consultar('7891000200200').status_code, 404)
+
+    def test_movimentacao_de_estoque_atualiza_saldo(self):
+        self.consultar('7891000100103')
+        registrar_movimentacoes([
+            MovimentacaoEstoque(produto=self.arroz, tipo='entrada', quantidade=12, motivo='compra')
+        ], usuario=self.usuario)
+        with self.assertNumQueries(1):  # só o saldo do produto consultado
+            resposta = self.consultar('7891000100103')
+        self.assertEqual((resposta.json()['estoque'], resposta.json()['situacao_estoque']), (12, 'disponivel'))
+
+    def test_consulta_em_lote(self):
+        resposta = self.api.post('/api/produtos/lookup/', {
+            'codigos': ['7891000100103', '7891000200200', '123', '123']
+        }, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(set(resposta.json()['produtos']), {'7891000100103', '7891000200200'})
+        self.assertEqual(resposta.json()['produtos']['7891000200200']['preco_venda'], '8.50')
+        self.assertEqual(resposta.json()['nao_encontrados'], ['123'])
+
+        resposta = self.api.post('/api/produtos/lookup/', {'codigos': ['1'] * (LIMITE_CODIGOS + 1)}, format='json')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(self.api.post('/api/produtos/lookup/', {'codigos': '123'}, format='json').status_code, 400)
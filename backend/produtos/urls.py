@@ -1,8 +1,13 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import CategoriaViewSet, ProdutoViewSet
+from .views import CategoriaViewSet, ConsultaCodigoView, ConsultaCodigosView, ProdutoViewSet
 
 router = DefaultRouter()
 router.register(r'categorias', CategoriaViewSet, basename='categoria')
 router.register(r'produtos', ProdutoViewSet, basename='produto')
 
-urlpatterns = router.urls
+# Antes das rotas do router: "lookup" não pode ser lido como pk de produto
+urlpatterns = [
+    path('produtos/lookup/', ConsultaCodigosView.as_view(), name='produto-lookup-lote'),
+    path('produtos/lookup/<str:codigo>/', ConsultaCodigoView.as_view(), name='produto-lookup'),
+] + router.urls
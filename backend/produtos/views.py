@@ -1,43 +1,196 @@
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Prefetch
+from config.busca import BuscaTextualFilter, IndiceBusca
+from config.cache_versionado import CacheVersionadoMixin
+from config.condicional import GetCondicionalMixin
+from config.permissoes import GerenteOuAdmin
+from estoque.models import Estoque
+from estoque.services import anotar_situacao_estoque
+from .filters import ProdutoFilter
+from .lookup import LIMITE_CODIGOS, indice_codigos
 from .models import Categoria, Produto
 from .serializers import (
     CategoriaSerializer,
+    HistoricoPrecoSerializer,
     ProdutoSerializer,
-    ProdutoListSerializer
+    ProdutoListSerializer,
+    ReajustePrecoSerializer
 )
+from .services import ReajusteInvalidoError, produtos_para_reajuste, reajustar_precos
 
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(CacheVersionadoMixin, GetCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para operações CRUD de Categoria.
     """
-    queryset = Categoria.objects.all()
+    queryset = Categoria.objects.prefetch_related(
+        Prefetch(
+            'subcategorias',
+            queryset=Categoria.objects.filter(ativo=True).select_related('categoria_pai'),
+            to_attr='subcategorias_ativas'
+        )
+    )
     serializer_class = CategoriaSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     
-    filterset_fields = ['ativa', 'categoria_pai']
+    filterset_fields = ['ativo', 'categoria_pai']
     search_fields = ['nome', 'descricao']
-    ordering_fields = ['nome', 'data_criacao']
+    ordering_fields = ['nome', 'data_cadastro']
     ordering = ['nome']
+    modelos_cache = (Categoria,)
+    
+    @action(detail=False, methods=['get'])
+    def arvore(self, request):
+        """
+        Árvore completa de categorias (aceita os filtros da listagem, ex:
+        ?ativo=true), montada a partir de uma única consulta. Categorias cujo
+        pai ficou fora do filtro aparecem na raiz.
+        """
+        return self.responder_do_cache(request, lambda: self._arvore(request))
+    
+    def _arvore(self, request):
+        categorias = self.filter_queryset(Categoria.objects.all()).order_by('nome').values(
+            'id', 'nome', 'categoria_pai_id', 'ativo', 'nivel', 'caminho'
+        )
+        nos = {}
+        for categoria in categorias:
+            nos[categoria['id']] = {
+                'id': categoria['id'],
+                'nome': categoria['nome'],
+                'ativo': categoria['ativo'],
+                'nivel': categoria['nivel'],
+                'caminho': categoria['caminho'],
+                'categoria_pai': categoria['categoria_pai_id'],
+                'subcategorias': [],
+            }
+        
+        raizes = []
+        for no in nos.values():
+            pai = nos.get(no['categoria_pai'])
+            (pai['subcategorias'] if pai else raizes).append(no)
+        return Response(raizes)
 
 
-class ProdutoViewSet(viewsets.ModelViewSet):
+class ProdutoViewSet(CacheVersionadoMixin, GetCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para operações CRUD de Produto.
     """
-    queryset = Produto.objects.select_related('categoria').all()
+    queryset = anotar_situacao_estoque(Produto.objects.select_related('categoria'))
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, BuscaTextualFilter]
     
-    filterset_fields = ['categoria', 'ativo', 'unidade_medida']
-    search_fields = ['nome', 'descricao', 'codigo_sku', 'codigo_barras']
+    filterset_class = ProdutoFilter
+    search_fields = ['nome', 'descricao', 'codigo']
+    indice_busca = IndiceBusca(
+        Produto._meta.db_table, ['codigo', 'nome', 'descricao'], pesos=[10, 5, 1], coluna_trigrama='nome'
+    )
     ordering_fields = ['nome', 'preco_venda', 'data_cadastro']
     ordering = ['nome']
+    modelos_cache = (Produto, Categoria, Estoque)
+    # situacao_estoque vem do saldo: linha de Estoque e fragmentos
+    campos_atualizacao_extras = ('estoque__ultima_atualizacao', 'fragmentos_estoque__ultima_atualizacao')
     
     def get_serializer_class(self):
         if self.action == 'list':
             return ProdutoListSerializer
         return ProdutoSerializer
+    
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self._recarregar(serializer)
+    
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self._recarregar(serializer)
+    
+    def _recarregar(self, serializer):
+        """Relê a instância salva com as anotações de situacao_estoque"""
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
+    
+    @action(detail=False, methods=['post'], url_path='reajustar-precos',
+            permission_classes=[IsAuthenticated, GerenteOuAdmin])
+    def reajustar_precos(self, request):
+        """
+        Reajusta em lote os preços dos produtos filtrados (um único UPDATE,
+        com a margem recalculada no banco) e registra o histórico.
+        Body: {"categoria", "fornecedor", "status", "tipo": "percentual|valor",
+        "valor", "campos": ["preco_venda", "preco_custo"], "motivo"}
+        """
+        serializer = ReajustePrecoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        dados = serializer.validated_data
+        produtos = produtos_para_reajuste(dados.get('categoria'), dados.get('fornecedor'), dados.get('status'))
+        try:
+            lote, reajustados = reajustar_precos(
+                produtos,
+                dados['valor'],
+                tipo=dados['tipo'],
+                campos=dados['campos'],
+                motivo=dados['motivo'],
+                usuario=request.user,
+            )
+        except ReajusteInvalidoError as e:
+            return Response(
+                {'error': str(e), 'total': e.total, 'produtos': e.codigos},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'lote': lote, 'produtos_reajustados': reajustados})
+    
+    @action(detail=True, methods=['get'], url_path='historico-precos')
+    def historico_precos(self, request, pk=None):
+        """Reajustes de preço do produto, do mais recente para o mais antigo"""
+        historico = self.get_object().historico_precos.select_related('usuario')
+        pagina = self.paginate_queryset(historico)
+        if pagina is not None:
+            return self.get_paginated_response(HistoricoPrecoSerializer(pagina, many=True).data)
+        return Response(HistoricoPrecoSerializer(historico, many=True).data)
+
+
+class ConsultaCodigoView(APIView):
+    """
+    Consulta de um produto pelo código (leitura do PDV): preço e estoque
+    vindos do índice em memória (produtos.lookup), sem busca textual,
+    paginação nem serializer.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer]
+
+    def get(self, request, codigo):
+        produto = indice_codigos.buscar([codigo]).get(codigo)
+        if produto is None:
+            return Response({'error': 'Produto não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(produto)
+
+
+class ConsultaCodigosView(APIView):
+    """
+    Consulta em lote pelo código. Body: {"codigos": [...]} (até
+    LIMITE_CODIGOS). Responde {"produtos": {codigo: dados}, "nao_encontrados": [...]}.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer]
+
+    def post(self, request):
+        codigos = request.data.get('codigos') if isinstance(request.data, dict) else None
+        if not isinstance(codigos, list) or not all(isinstance(codigo, str) for codigo in codigos):
+            return Response(
+                {'error': 'Informe "codigos" como uma lista de códigos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(codigos) > LIMITE_CODIGOS:
+            return Response(
+                {'error': f'No máximo {LIMITE_CODIGOS} códigos por consulta'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        produtos = indice_codigos.buscar(codigos)
+        return Response({
+            'produtos': produtos,
+            'nao_encontrados': [codigo for codigo in dict.fromkeys(codigos) if codigo not in produtos],
+        })
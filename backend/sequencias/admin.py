@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import Sequencia
+
+
+@admin.register(Sequencia)
+class SequenciaAdmin(admin.ModelAdmin):
+    list_display = ('prefixo', 'periodo', 'ultimo_valor', 'data_atualizacao')
+    list_filter = ('prefixo',)
+    search_fields = ('prefixo', 'periodo')
+    readonly_fields = ('data_atualizacao',)
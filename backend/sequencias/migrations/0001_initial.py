@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefixo', models.CharField(max_length=10, verbose_name='Prefixo')),
+                ('periodo', models.CharField(help_text='Ano e mês no formato AAAAMM', max_length=6, verbose_name='Período')),
+                ('ultimo_valor', models.PositiveBigIntegerField(default=0, verbose_name='Último Valor')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')),
+            ],
+            options={
+                'verbose_name': 'Sequência',
+                'verbose_name_plural': 'Sequências',
+                'ordering': ['prefixo', '-periodo'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sequencia',
+            constraint=models.UniqueConstraint(fields=('prefixo', 'periodo'), name='sequencia_prefixo_periodo_unico'),
+        ),
+    ]
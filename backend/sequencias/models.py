@@ -0,0 +1,48 @@
+from django.db import models, transaction, IntegrityError
+from django.utils import timezone
+
+
+class Sequencia(models.Model):
+    """Model para contadores de numeração por prefixo e período (ex: PED/202611)"""
+    
+    prefixo = models.CharField('Prefixo', max_length=10)
+    periodo = models.CharField('Período', max_length=6, help_text='Ano e mês no formato AAAAMM')
+    ultimo_valor = models.PositiveBigIntegerField('Último Valor', default=0)
+    data_atualizacao = models.DateTimeField('Data de Atualização', auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Sequência'
+        verbose_name_plural = 'Sequências'
+        ordering = ['prefixo', '-periodo']
+        constraints = [
+            models.UniqueConstraint(fields=['prefixo', 'periodo'], name='sequencia_prefixo_periodo_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.prefixo}/{self.periodo} - {self.ultimo_valor}"
+    
+    @classmethod
+    def reservar(cls, prefixo, periodo, quantidade=1):
+        """
+        Incrementa o contador atomicamente em `quantidade` e retorna o novo
+        último valor. O bloco reservado é (retorno - quantidade, retorno].
+        """
+        with transaction.atomic():
+            atualizados = cls.objects.filter(prefixo=prefixo, periodo=periodo).update(
+                ultimo_valor=models.F('ultimo_valor') + quantidade,
+                data_atualizacao=timezone.now()
+            )
+            if not atualizados:
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(prefixo=prefixo, periodo=periodo, ultimo_valor=quantidade)
+                    return quantidade
+                except IntegrityError:
+                    # Outro processo criou o contador ao mesmo tempo
+                    cls.objects.filter(prefixo=prefixo, periodo=periodo).update(
+                        ultimo_valor=models.F('ultimo_valor') + quantidade,
+                        data_atualizacao=timezone.now()
+                    )
+            return cls.objects.filter(
+                prefixo=prefixo, periodo=periodo
+            ).values_list('ultimo_valor', flat=True).get()
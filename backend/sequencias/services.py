@@ -0,0 +1,57 @@
+"""Alocação de números sequenciais de documentos (pedidos, faturas, ...)."""
+import threading
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .models import Sequencia
+
+
+class AlocadorSequencia:
+    """
+    Entrega números sequenciais por prefixo/período.
+
+    Com `tamanho_bloco` > 1 cada processo reserva um bloco de números de uma
+    vez e os entrega da memória, de modo que apenas uma a cada N alocações
+    toca a linha do contador. Blocos só são reaproveitados quando reservados
+    fora de uma transação: dentro de um `atomic()` um rollback desfaria a
+    reserva no banco e os números guardados em memória colidiriam com os de
+    outro processo.
+    """
+
+    def __init__(self, tamanho_bloco=1):
+        self.tamanho_bloco = max(1, tamanho_bloco)
+        self._blocos = {}
+        self._lock = threading.Lock()
+
+    def proximo(self, prefixo, periodo):
+        if self.tamanho_bloco == 1 or connection.in_atomic_block:
+            return Sequencia.reservar(prefixo, periodo)
+
+        chave = (prefixo, periodo)
+        with self._lock:
+            atual, fim = self._blocos.get(chave, (0, 0))
+            if atual >= fim:
+                fim = Sequencia.reservar(prefixo, periodo, self.tamanho_bloco)
+                atual = fim - self.tamanho_bloco
+            atual += 1
+            self._blocos[chave] = (atual, fim)
+            return atual
+
+    def limpar(self):
+        """Descarta os blocos em memória (números não usados viram lacunas)"""
+        with self._lock:
+            self._blocos.clear()
+
+
+alocador = AlocadorSequencia(getattr(settings, 'SEQUENCIA_TAMANHO_BLOCO', 1))
+
+
+def periodo_atual():
+    """Retorna o período corrente no formato AAAAMM"""
+    return timezone.localdate().strftime('%Y%m')
+
+
+def proximo_numero(prefixo, periodo=None):
+    """Retorna (periodo, valor) com o próximo número livre do prefixo"""
+    periodo = periodo or periodo_atual()
+    return periodo, alocador.proximo(prefixo, periodo)
@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from .models import Sequencia
+from .services import AlocadorSequencia
+
+
+class SequenciaTest(TestCase):
+
+    def test_reservar_cria_e_incrementa_contador(self):
+        self.assertEqual(Sequencia.reservar('PED', '202611'), 1)
+        self.assertEqual(Sequencia.reservar('PED', '202611'), 2)
+        self.assertEqual(Sequencia.reservar('PED', '202612'), 1)
+        self.assertEqual(Sequencia.reservar('FAT', '202611', quantidade=10), 10)
+
+    def test_alocador_dentro_de_transacao_nao_guarda_bloco(self):
+        alocador = AlocadorSequencia(tamanho_bloco=50)
+        self.assertEqual(alocador.proximo('PED', '202611'), 1)
+        self.assertEqual(alocador.proximo('PED', '202611'), 2)
+        self.assertEqual(Sequencia.objects.get(prefixo='PED').ultimo_valor, 2)
+
+
+class SequenciaConcorrenciaTest(TransactionTestCase):
+    """Centenas de alocações paralelas não podem gerar números repetidos"""
+
+    PARALELOS = 300
+
+    def _alocar_em_paralelo(self, funcao):
+        def tarefa(indice):
+            try:
+                return funcao(indice)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            return list(executor.map(tarefa, range(self.PARALELOS)))
+
+    def test_reservas_paralelas_sem_colisao(self):
+        numeros = self._alocar_em_paralelo(lambda _: Sequencia.reservar('PED', '202611'))
+        self.assertEqual(len(set(numeros)), self.PARALELOS)
+        self.assertEqual(sorted(numeros), list(range(1, self.PARALELOS + 1)))
+
+    def test_blocos_paralelos_sem_colisao(self):
+        alocadores = [AlocadorSequencia(tamanho_bloco=7) for _ in range(4)]
+        numeros = self._alocar_em_paralelo(
+            lambda indice: alocadores[indice % 4].proximo('FAT', '202611')
+        )
+        self.assertEqual(len(set(numeros)), self.PARALELOS)
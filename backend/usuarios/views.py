@@ -4,6 +4,7 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework import status, viewsets, filters
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
+from config.condicional import GetCondicionalMixin
 from .models import Usuario, Departamento
 from .serializers import (
     UsuarioSerializer,
@@ -33,7 +34,7 @@ from .serializers import (
 )
 
 
-class DepartamentoViewSet(viewsets.ModelViewSet):
+class DepartamentoViewSet(GetCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para operações CRUD de Departamento.
     """
@@ -48,7 +49,7 @@ class DepartamentoViewSet(viewsets.ModelViewSet):
     ordering = ['nome']
 
 
-class UsuarioViewSet(viewsets.ModelViewSet):
+class UsuarioViewSet(GetCondicionalMixin, viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def me(self, request):
         serializer = UsuarioSerializer(request.user)
@@ -0,0 +1,99 @@
+"""Comando Django para medir o custo de criação de pedidos por quantidade de itens."""
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from usuarios.models import Usuario
+from clientes.models import Cliente
+from produtos.models import Categoria, Produto
+from vendas.models import Pedido, ItemPedido
+from vendas.services import criar_pedido_com_itens
+
+
+class _Rollback(Exception):
+    """Usada para desfazer todos os dados criados pelo benchmark"""
+
+
+class Command(BaseCommand):
+    help = 'Compara consultas e latência da criação de pedidos (item a item x em lote)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--linhas',
+            nargs='+',
+            type=int,
+            default=[1, 10, 50, 200],
+            help='Quantidades de itens por pedido a medir'
+        )
+
+    def handle(self, *args, **options):
+        linhas = sorted(options['linhas'])
+
+        self.stdout.write('=== BENCHMARK CRIAÇÃO DE PEDIDOS ===\n')
+        self.stdout.write(f'{"itens":>6} | {"item a item":>22} | {"em lote":>22}')
+        self.stdout.write(f'{"":>6} | {"consultas":>10} {"ms":>11} | {"consultas":>10} {"ms":>11}')
+
+        try:
+            with transaction.atomic():
+                cliente, vendedor, produtos = self._criar_dados(max(linhas))
+                for n in linhas:
+                    itens_data = [
+                        {'produto': produto, 'quantidade': 1, 'preco_unitario': produto.preco_venda}
+                        for produto in produtos[:n]
+                    ]
+                    dados = {'cliente': cliente, 'vendedor': vendedor, 'forma_pagamento': 'pix'}
+
+                    legado = self._medir(lambda: self._criar_item_a_item(itens_data, dados))
+                    lote = self._medir(lambda: criar_pedido_com_itens(itens_data, **dados))
+
+                    self.stdout.write(
+                        f'{n:>6} | {legado[0]:>10} {legado[1]:>11.1f} | {lote[0]:>10} {lote[1]:>11.1f}'
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark concluído (dados descartados)'))
+
+    def _medir(self, funcao):
+        """Retorna (consultas, milissegundos) da execução de funcao"""
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            funcao()
+            duracao = (time.perf_counter() - inicio) * 1000
+        return len(ctx.captured_queries), duracao
+
+    def _criar_item_a_item(self, itens_data, dados):
+        """Caminho antigo: um ItemPedido.save (e recálculo de totais) por item"""
+        pedido = Pedido.objects.create(**dados)
+        for item_data in itens_data:
+            ItemPedido.objects.create(pedido=pedido, **item_data)
+        pedido.calcular_totais()
+        return pedido
+
+    def _criar_dados(self, quantidade):
+        vendedor = Usuario.objects.create(username='benchmark_pedidos')
+        cliente = Cliente.objects.create(
+            nome_completo='Cliente Benchmark',
+            cpf_cnpj='000.000.000-00',
+            email='benchmark@email.com',
+            telefone='11999999999',
+            endereco='Rua Benchmark',
+            bairro='Centro',
+            cidade='São Paulo',
+            estado='SP',
+            cep='01310-100',
+        )
+        categoria = Categoria.objects.create(nome='Categoria Benchmark')
+        produtos = Produto.objects.bulk_create([
+            Produto(
+                codigo=f'BENCH-{i:05d}',
+                nome=f'Produto Benchmark {i}',
+                categoria=categoria,
+                preco_custo=Decimal('10.00'),
+                preco_venda=Decimal('15.00'),
+            )
+            for i in range(quantidade)
+        ])
+        return cliente, vendedor, produtos
@@ -0,0 +1,137 @@
+"""Comando Django para medir a confirmação concorrente de pedidos em SKUs disputados."""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection
+from usuarios.models import Usuario
+from clientes.models import Cliente
+from produtos.models import Categoria, Produto
+from estoque.models import Estoque, MovimentacaoEstoque
+from estoque.services import EstoqueInsuficienteError
+from vendas.models import Pedido
+from vendas.services import criar_pedido_com_itens, confirmar_pedido
+
+PREFIXO = 'BENCH-RESERVA'
+
+
+class Command(BaseCommand):
+    help = 'Mede vazão e consistência da confirmação paralela de pedidos sobre poucos SKUs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skus', type=int, default=3, help='Quantidade de SKUs disputados')
+        parser.add_argument('--pedidos', type=int, default=200, help='Pedidos confirmados por rodada')
+        parser.add_argument('--itens', type=int, default=2, help='Linhas por pedido (máx. = --skus)')
+        parser.add_argument(
+            '--threads',
+            nargs='+',
+            type=int,
+            default=[1, 4, 8, 16],
+            help='Quantidades de threads a medir'
+        )
+        parser.add_argument(
+            '--saldo',
+            type=int,
+            default=None,
+            help='Saldo inicial por SKU (padrão: suficiente para ~80%% dos pedidos)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('=== BENCHMARK RESERVA DE ESTOQUE ===\n')
+        self.stdout.write(
+            f'{"threads":>7} | {"confirmados":>11} | {"recusados":>9} | {"segundos":>8} | {"pedidos/s":>9} | saldo'
+        )
+
+        try:
+            for threads in options['threads']:
+                self._rodada(threads, options)
+        finally:
+            self._limpar()
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark concluído (dados removidos)'))
+
+    def _rodada(self, threads, options):
+        vendedor, cliente, skus = self._criar_dados(options['skus'])
+        itens_por_pedido = min(options['itens'], len(skus))
+        saldo = options['saldo']
+        if saldo is None:
+            saldo = int(options['pedidos'] * itens_por_pedido / len(skus) * 0.8)
+        Estoque.objects.filter(produto__in=skus).update(quantidade_atual=saldo)
+
+        pedidos = [
+            criar_pedido_com_itens(
+                [
+                    {'produto': produto, 'quantidade': 1, 'preco_unitario': produto.preco_venda}
+                    for produto in random.sample(skus, itens_por_pedido)
+                ],
+                cliente=cliente,
+                vendedor=vendedor,
+                forma_pagamento='pix',
+            )
+            for _ in range(options['pedidos'])
+        ]
+
+        def confirmar(pedido):
+            try:
+                confirmar_pedido(pedido, vendedor)
+                return True
+            except EstoqueInsuficienteError:
+                return False
+            finally:
+                connection.close()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            resultados = list(executor.map(confirmar, pedidos))
+        duracao = time.perf_counter() - inicio
+
+        confirmados = sum(resultados)
+        saidas = sum(
+            MovimentacaoEstoque.objects.filter(produto__in=skus, tipo='saida').values_list('quantidade', flat=True)
+        )
+        saldo_final = sum(Estoque.objects.filter(produto__in=skus).values_list('quantidade_atual', flat=True))
+        consistente = saldo_final == saldo * len(skus) - saidas and saldo_final >= 0
+
+        self.stdout.write(
+            f'{threads:>7} | {confirmados:>11} | {len(resultados) - confirmados:>9} | '
+            f'{duracao:>8.2f} | {len(resultados) / duracao:>9.1f} | '
+            + ('OK' if consistente else self.style.ERROR('INCONSISTENTE'))
+        )
+        self._limpar()
+
+    def _criar_dados(self, quantidade):
+        vendedor = Usuario.objects.create(username=PREFIXO.lower())
+        cliente = Cliente.objects.create(
+            nome_completo='Cliente Benchmark Reserva',
+            cpf_cnpj='000.000.000-01',
+            email='benchmark@email.com',
+            telefone='11999999999',
+            endereco='Rua Benchmark',
+            bairro='Centro',
+            cidade='São Paulo',
+            estado='SP',
+            cep='01310-100',
+        )
+        categoria = Categoria.objects.create(nome=PREFIXO)
+        skus = Produto.objects.bulk_create([
+            Produto(
+                codigo=f'{PREFIXO}-{i:03d}',
+                nome=f'SKU disputado {i}',
+                categoria=categoria,
+                preco_custo=Decimal('10.00'),
+                preco_venda=Decimal('15.00'),
+            )
+            for i in range(quantidade)
+        ])
+        Estoque.objects.bulk_create([Estoque(produto=produto) for produto in skus])
+        return vendedor, cliente, skus
+
+    def _limpar(self):
+        produtos = Produto.objects.filter(codigo__startswith=PREFIXO)
+        MovimentacaoEstoque.objects.filter(produto__in=produtos).delete()
+        Pedido.objects.filter(cliente__cpf_cnpj='000.000.000-01').delete()
+        produtos.delete()
+        Categoria.objects.filter(nome=PREFIXO).delete()
+        Cliente.objects.filter(cpf_cnpj='000.000.000-01').delete()
+        Usuario.objects.filter(username=PREFIXO.lower()).delete()
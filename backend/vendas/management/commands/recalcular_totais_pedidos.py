@@ -0,0 +1,34 @@
+"""Comando Django para recalcular os totais armazenados dos pedidos."""
+from django.core.management.base import BaseCommand
+from vendas.models import Pedido
+from vendas.services import recalcular_totais_pedidos
+
+
+class Command(BaseCommand):
+    help = 'Recalcula quantidade de itens e valores dos pedidos a partir dos itens (SQL em lote)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas conta os pedidos divergentes, sem corrigir'
+        )
+        parser.add_argument(
+            '--status',
+            help='Restringe a verificação a pedidos com este status'
+        )
+
+    def handle(self, *args, **options):
+        pedidos = Pedido.objects.all()
+        if options['status']:
+            pedidos = pedidos.filter(status=options['status'])
+
+        corrigir = not options['dry_run']
+        divergentes = recalcular_totais_pedidos(pedidos, corrigir=corrigir)
+
+        if not divergentes:
+            self.stdout.write(self.style.SUCCESS('✅ Todos os pedidos estão consistentes'))
+        elif corrigir:
+            self.stdout.write(self.style.SUCCESS(f'✅ {divergentes} pedido(s) corrigido(s)'))
+        else:
+            self.stdout.write(self.style.WARNING(f'⚠️ {divergentes} pedido(s) com totais divergentes'))
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:48
+
+from django.db import migrations
+
+
+def inicializar_sequencia(apps, schema_editor):
+    """Posiciona o contador PED de cada mês após o maior número já emitido"""
+    Pedido = apps.get_model('vendas', 'Pedido')
+    Sequencia = apps.get_model('sequencias', 'Sequencia')
+
+    maiores = {}
+    for numero in Pedido.objects.values_list('numero_pedido', flat=True).iterator():
+        periodo, valor = numero[:6], numero[6:]
+        if periodo.isdigit() and valor.isdigit():
+            maiores[periodo] = max(maiores.get(periodo, 0), int(valor))
+
+    for periodo, valor in maiores.items():
+        Sequencia.objects.update_or_create(
+            prefixo='PED', periodo=periodo, defaults={'ultimo_valor': valor}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sequencias', '0001_initial'),
+        ('vendas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(inicializar_sequencia, migrations.RunPython.noop),
+    ]
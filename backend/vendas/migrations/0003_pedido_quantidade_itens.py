@@ -0,0 +1,32 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:50
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def preencher_quantidade_itens(apps, schema_editor):
+    """Preenche a nova coluna com a soma das quantidades em um único UPDATE"""
+    Pedido = apps.get_model('vendas', 'Pedido')
+    ItemPedido = apps.get_model('vendas', 'ItemPedido')
+    soma = ItemPedido.objects.filter(
+        pedido=models.OuterRef('pk')
+    ).order_by().values('pedido').annotate(total=models.Sum('quantidade')).values('total')
+    Pedido.objects.update(
+        quantidade_itens=Coalesce(models.Subquery(soma), models.Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0002_inicializar_sequencia_pedidos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='quantidade_itens',
+            field=models.PositiveIntegerField(default=0, help_text='Soma das quantidades dos itens, mantida a cada alteração de item', verbose_name='Quantidade de Itens'),
+        ),
+        migrations.RunPython(preencher_quantidade_itens, migrations.RunPython.noop),
+    ]
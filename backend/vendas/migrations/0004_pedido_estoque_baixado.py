@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0003_pedido_quantidade_itens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='estoque_baixado',
+            field=models.BooleanField(default=False, help_text='Indica se a confirmação já retirou os itens do estoque', verbose_name='Estoque Baixado'),
+        ),
+    ]
@@ -1,13 +1,55 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
 from clientes.models import Cliente
 from produtos.models import Produto
+from sequencias.services import proximo_numero
 
 User = get_user_model()
 
 
+class _InvalidacaoResumos:
+    """
+    Clientes a invalidar no commit da transação corrente: um único callback
+    por transação (e savepoint), por mais itens de pedido que sejam gravados.
+    Pedidos sem cliente conhecido têm o cliente lido no commit, numa consulta.
+    """
+    
+    def __init__(self, savepoint_ids):
+        self.savepoint_ids = list(savepoint_ids)
+        self.clientes = set()
+        self.pedidos = set()
+    
+    def __call__(self):
+        clientes = set(self.clientes)
+        if self.pedidos:
+            clientes.update(Pedido.objects.filter(pk__in=self.pedidos).values_list('cliente_id', flat=True))
+        Cliente.invalidar_resumo(*clientes)
+    
+    @classmethod
+    def agendar(cls, pedido_id, cliente_id=None):
+        conexao = transaction.get_connection()
+        pendente = getattr(conexao, '_invalidacao_resumos', None)
+        # Callback descartado por rollback (ou já executado) não está mais na fila
+        if (
+            pendente is None
+            or pendente.savepoint_ids != conexao.savepoint_ids
+            or not any(funcao is pendente for _, funcao, _ in conexao.run_on_commit)
+        ):
+            pendente = conexao._invalidacao_resumos = cls(conexao.savepoint_ids)
+            registrar = True
+        else:
+            registrar = False
+        if cliente_id is not None:
+            pendente.clientes.add(cliente_id)
+        else:
+            pendente.pedidos.add(pedido_id)
+        if registrar:
+            transaction.on_commit(pendente)
+
+
 class Pedido(models.Model):
     """Model para pedidos de venda"""
     
@@ -20,6 +62,16 @@ class Pedido(models.Model):
         ('cancelado', 'Cancelado'),
     ]
     
+    # Máquina de estados: status de origem -> status de destino permitidos
+    TRANSICOES = {
+        'pendente': ['confirmado', 'cancelado'],
+        'confirmado': ['em_separacao', 'cancelado'],
+        'em_separacao': ['enviado', 'cancelado'],
+        'enviado': ['entregue', 'cancelado'],
+        'entregue': [],
+        'cancelado': [],
+    }
+    
     FORMA_PAGAMENTO_CHOICES = [
         ('dinheiro', 'Dinheiro'),
         ('cartao_credito', 'Cartão de Crédito'),
@@ -51,6 +103,11 @@ class Pedido(models.Model):
     
     # Status
     status = models.CharField('Status', max_length=15, choices=STATUS_CHOICES, default='pendente')
+    estoque_baixado = models.BooleanField(
+        'Estoque Baixado',
+        default=False,
+        help_text='Indica se a confirmação já retirou os itens do estoque'
+    )
     
     # Valores
     valor_subtotal = models.DecimalField(
@@ -81,6 +138,11 @@ class Pedido(models.Model):
         default=0,
         validators=[MinValueValidator(Decimal('0.00'))]
     )
+    quantidade_itens = models.PositiveIntegerField(
+        'Quantidade de Itens',
+        default=0,
+        help_text='Soma das quantidades dos itens, mantida a cada alteração de item'
+    )
     
     # Pagamento
     forma_pagamento = models.CharField(
@@ -107,38 +169,76 @@ class Pedido(models.Model):
     def __str__(self):
         return f"Pedido {self.numero_pedido} - {self.cliente.nome_completo}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Cliente carregado: se trocar, o resumo do anterior também é invalidado
+        instance._cliente_original = instance.__dict__.get('cliente_id')
+        return instance
+    
     def save(self, *args, **kwargs):
         """Gera número do pedido automaticamente se não existir"""
         if not self.numero_pedido:
-            from django.utils import timezone
-            data = timezone.now()
-            ultimo_pedido = Pedido.objects.filter(
-                data_pedido__year=data.year,
-                data_pedido__month=data.month
-            ).count()
-            self.numero_pedido = f"{data.year}{data.month:02d}{ultimo_pedido + 1:05d}"
+            self.numero_pedido = self.gerar_numero()
         
         # Calcula o valor total
         self.valor_total = self.valor_subtotal - self.valor_desconto + self.valor_frete
         
         super().save(*args, **kwargs)
     
+    @classmethod
+    def origens_permitidas(cls, novo_status):
+        """Retorna os status a partir dos quais é possível ir para novo_status"""
+        return [origem for origem, destinos in cls.TRANSICOES.items() if novo_status in destinos]
+    
+    def pode_transicionar(self, novo_status):
+        """Verifica se a máquina de estados permite ir do status atual para novo_status"""
+        return novo_status in self.TRANSICOES.get(self.status, [])
+    
+    @staticmethod
+    def gerar_numero():
+        """Reserva o próximo número de pedido do mês (AAAAMM + sequencial)"""
+        periodo, valor = proximo_numero('PED')
+        return f"{periodo}{valor:05d}"
+    
     def calcular_totais(self):
-        """Calcula os totais do pedido baseado nos itens"""
-        itens = self.itens.all()
-        self.valor_subtotal = sum(item.valor_total for item in itens)
+        """Recalcula os totais do pedido a partir dos itens (uma agregação e um UPDATE)"""
+        totais = self.itens.aggregate(
+            quantidade=models.Sum('quantidade'),
+            subtotal=models.Sum('valor_total')
+        )
+        self.quantidade_itens = totais['quantidade'] or 0
+        self.valor_subtotal = totais['subtotal'] or Decimal('0.00')
         self.valor_total = self.valor_subtotal - self.valor_desconto + self.valor_frete
-        self.save()
+        self.data_atualizacao = timezone.now()
+        Pedido.objects.filter(pk=self.pk).update(
+            quantidade_itens=self.quantidade_itens,
+            valor_subtotal=self.valor_subtotal,
+            valor_total=self.valor_total,
+            data_atualizacao=self.data_atualizacao,
+        )
+        _InvalidacaoResumos.agendar(self.pk, self.cliente_id)
+    
+    @classmethod
+    def aplicar_delta_itens(cls, pedido_id, quantidade, valor, cliente_id=None):
+        """
+        Soma deltas de quantidade e valor aos totais armazenados do pedido.
+        cliente_id, quando o chamador já o conhece, evita relê-lo no commit.
+        """
+        if not quantidade and not valor:
+            return
+        cls.objects.filter(pk=pedido_id).update(
+            quantidade_itens=models.F('quantidade_itens') + quantidade,
+            valor_subtotal=models.F('valor_subtotal') + valor,
+            valor_total=models.F('valor_total') + valor,
+            data_atualizacao=timezone.now(),
+        )
+        _InvalidacaoResumos.agendar(pedido_id, cliente_id)
     
     @property
     def subtotal(self):
         """Alias para valor_subtotal (compatibilidade admin)"""
         return self.valor_subtotal
-    
-    @property
-    def quantidade_itens(self):
-        """Retorna a quantidade total de itens no pedido"""
-        return self.itens.aggregate(total=models.Sum('quantidade'))['total'] or 0
 
 
 class ItemPedido(models.Model):
@@ -188,10 +288,47 @@ class ItemPedido(models.Model):
     def __str__(self):
         return f"{self.produto.nome} - Qtd: {self.quantidade}"
     
-    def save(self, *args, **kwargs):
-        """Calcula o valor total do item"""
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda os valores carregados para calcular o delta no próximo save
+        instance._totais_originais = (
+            instance.__dict__.get('pedido_id'),
+            instance.__dict__.get('quantidade'),
+            instance.__dict__.get('valor_total'),
+        )
+        return instance
+    
+    def calcular_valor_total(self):
+        """Calcula o valor total do item sem acessar o banco"""
         self.valor_total = (self.preco_unitario * self.quantidade) - self.desconto
+        return self.valor_total
+    
+    def save(self, *args, **kwargs):
+        """Calcula o valor total do item e atualiza os totais do pedido pela diferença"""
+        self.calcular_valor_total()
+        originais = getattr(self, '_totais_originais', None)
         super().save(*args, **kwargs)
         
-        # Atualiza os totais do pedido
-        self.pedido.calcular_totais()
+        if originais and None in originais:
+            # Item carregado com campos adiados: sem base para o delta
+            self.pedido.calcular_totais()
+        else:
+            pedido_anterior, quantidade_anterior, valor_anterior = originais or (None, 0, Decimal('0.00'))
+            if pedido_anterior not in (None, self.pedido_id):
+                Pedido.aplicar_delta_itens(pedido_anterior, -quantidade_anterior, -valor_anterior)
+                quantidade_anterior, valor_anterior = 0, Decimal('0.00')
+            self._aplicar_delta(self.quantidade - quantidade_anterior, self.valor_total - valor_anterior)
+        
+        self._totais_originais = (self.pedido_id, self.quantidade, self.valor_total)
+    
+    def _aplicar_delta(self, quantidade, valor):
+        """Aplica o delta no banco e no pedido já carregado em memória, se houver"""
+        pedido_em_cache = self._meta.get_field('pedido').is_cached(self)
+        Pedido.aplicar_delta_itens(
+            self.pedido_id, quantidade, valor, cliente_id=self.pedido.cliente_id if pedido_em_cache else None
+        )
+        if pedido_em_cache:
+            self.pedido.quantidade_itens += quantidade
+            self.pedido.valor_subtotal += valor
+            self.pedido.valor_total += valor
@@ -1,12 +1,17 @@
+from collections import Counter
 from rest_framework import serializers
 from .models import Pedido, ItemPedido
+from .services import criar_pedido_com_itens
 from clientes.serializers import ClienteListSerializer
-from produtos.serializers import ProdutoListSerializer
+from produtos.models import Produto
+from produtos.serializers import ProdutoListSerializer, ProdutoEmLoteField
 
 
 class ItemPedidoSerializer(serializers.ModelSerializer):
     """Serializer para o model ItemPedido"""
     
+    produto = ProdutoEmLoteField(queryset=Produto.objects.all())
+    
     # Produto aninhado para leitura
     produto_detail = ProdutoListSerializer(source='produto', read_only=True)
     
@@ -22,12 +27,41 @@ class ItemPedidoSerializer(serializers.ModelSerializer):
             'valor_total',
         ]
         read_only_fields = ['id', 'valor_total']
+        extra_kwargs = {
+            'preco_unitario': {'required': False},
+        }
     
     def validate_quantidade(self, value):
         """Validar quantidade positiva"""
         if value <= 0:
             raise serializers.ValidationError("A quantidade deve ser maior que zero")
         return value
+    
+    def validate(self, data):
+        """Valida o item contra o cadastro do produto (já carregado em memória)"""
+        produto = data.get('produto')
+        if produto is None:
+            return data
+        
+        if produto.status != 'ativo':
+            raise serializers.ValidationError({
+                'produto': f'O produto {produto.codigo} não está ativo'
+            })
+        
+        # O preço praticado é sempre o de venda do cadastro; negociação é feita via desconto
+        preco_unitario = data.get('preco_unitario', produto.preco_venda)
+        if preco_unitario != produto.preco_venda:
+            raise serializers.ValidationError({
+                'preco_unitario': f'Preço divergente do cadastro ({produto.preco_venda})'
+            })
+        data['preco_unitario'] = produto.preco_venda
+        
+        if data.get('desconto', 0) > preco_unitario * data.get('quantidade', 0):
+            raise serializers.ValidationError({
+                'desconto': 'O desconto não pode ser maior que o valor do item'
+            })
+        
+        return data
 
 
 class PedidoSerializer(serializers.ModelSerializer):
@@ -44,7 +78,6 @@ class PedidoSerializer(serializers.ModelSerializer):
     
     # Campos calculados
     subtotal = serializers.ReadOnlyField()
-    quantidade_itens = serializers.ReadOnlyField()
     
     # Display values
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -64,6 +97,7 @@ class PedidoSerializer(serializers.ModelSerializer):
             'data_entrega_realizada',
             'status',
             'status_display',
+            'estoque_baixado',
             'valor_subtotal',
             'subtotal',
             'valor_desconto',
@@ -80,11 +114,28 @@ class PedidoSerializer(serializers.ModelSerializer):
             'id',
             'numero_pedido',
             'data_pedido',
+            'estoque_baixado',
             'valor_subtotal',
             'valor_total',
+            'quantidade_itens',
             'data_atualizacao',
         ]
     
+    def validate_status(self, value):
+        """Aplica a máquina de estados nas alterações de status via PUT/PATCH"""
+        if self.instance is None or value == self.instance.status:
+            return value
+        if value in ('confirmado', 'cancelado'):
+            acao = 'confirmar' if value == 'confirmado' else 'cancelar'
+            raise serializers.ValidationError(
+                f'Use a ação {acao}, que também movimenta o estoque'
+            )
+        if not self.instance.pode_transicionar(value):
+            raise serializers.ValidationError(
+                f'Transição de {self.instance.status} para {value} não permitida'
+            )
+        return value
+    
     def validate(self, data):
         """Validações do pedido"""
         # Validar que data de entrega prevista é futura
@@ -116,19 +167,50 @@ class PedidoCreateSerializer(serializers.ModelSerializer):
             'observacoes',
             'itens',
         ]
+        extra_kwargs = {
+            'vendedor': {'required': False},
+        }
     
-    def create(self, validated_data):
-        """Criar pedido com itens"""
-        itens_data = validated_data.pop('itens')
-        pedido = Pedido.objects.create(**validated_data)
+    def to_internal_value(self, data):
+        """Carrega todos os produtos referenciados (com estoque) em uma consulta"""
+        self.produtos_em_lote = ProdutoEmLoteField.carregar_em_lote(
+            data.get('itens') if hasattr(data, 'get') else None,
+            Produto.objects.select_related('estoque')
+        )
+        return super().to_internal_value(data)
+    
+    def validate_itens(self, itens):
+        """Valida a disponibilidade em estoque somando as quantidades por produto"""
+        if not itens:
+            raise serializers.ValidationError('O pedido deve ter ao menos um item')
         
-        for item_data in itens_data:
-            ItemPedido.objects.create(pedido=pedido, **item_data)
+        quantidades = Counter()
+        produtos = {}
+        for item in itens:
+            quantidades[item['produto'].pk] += item['quantidade']
+            produtos[item['produto'].pk] = item['produto']
         
-        # Recalcular totais
-        pedido.calcular_totais()
+        erros = []
+        for produto_id, quantidade in quantidades.items():
+            produto = produtos[produto_id]
+            try:
+                disponivel = produto.estoque.quantidade_atual
+            except Produto.estoque.RelatedObjectDoesNotExist:
+                disponivel = 0
+            if quantidade > disponivel:
+                erros.append(
+                    f'Estoque insuficiente para {produto.codigo}. '
+                    f'Disponível: {disponivel}, solicitado: {quantidade}'
+                )
+        if erros:
+            raise serializers.ValidationError(erros)
         
-        return pedido
+        return itens
+    
+    def create(self, validated_data):
+        """Criar pedido com itens"""
+        itens_data = validated_data.pop('itens')
+        return criar_pedido_com_itens(itens_data, **validated_data)
 
 
 class PedidoListSerializer(serializers.ModelSerializer):
@@ -150,5 +232,17 @@ class PedidoListSerializer(serializers.ModelSerializer):
             'data_pedido',
             'status',
             'status_display',
+            'quantidade_itens',
             'valor_total',
         ]
+
+
+class TransicaoLoteSerializer(serializers.Serializer):
+    """Entrada da transição de status de vários pedidos"""
+    
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000
+    )
+    status = serializers.ChoiceField(choices=Pedido.STATUS_CHOICES)
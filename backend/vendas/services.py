@@ -0,0 +1,247 @@
+"""Serviços de domínio do módulo de vendas."""
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from clientes.models import Cliente
+from estoque.services import movimentar_em_lote
+from .models import Pedido, ItemPedido
+
+
+class TransicaoInvalidaError(ValueError):
+    """O pedido não está em um status que permita a operação"""
+
+
+def criar_pedido_com_itens(itens_data, **dados_pedido):
+    """
+    Cria um pedido e todos os seus itens em uma única transação.
+
+    Os totais dos itens e do pedido são calculados em memória antes do
+    INSERT do pedido, e os itens são gravados com um único bulk_create,
+    de modo que o número de consultas não cresce com a quantidade de itens.
+
+    O número do pedido é reservado antes da transação para que o contador
+    da sequência fique bloqueado apenas durante o próprio incremento.
+    """
+    itens = [ItemPedido(**item_data) for item_data in itens_data]
+    subtotal = sum((item.calcular_valor_total() for item in itens), Decimal('0.00'))
+
+    pedido = Pedido(**dados_pedido)
+    pedido.valor_subtotal = subtotal
+    pedido.quantidade_itens = sum(item.quantidade for item in itens)
+    if not pedido.numero_pedido:
+        pedido.numero_pedido = Pedido.gerar_numero()
+
+    with transaction.atomic():
+        pedido.save()
+
+        for item in itens:
+            item.pedido = pedido
+        ItemPedido.objects.bulk_create(itens)
+
+    for item in itens:
+        # bulk_create não passa por save(): registra a base para deltas futuros
+        item._totais_originais = (pedido.pk, item.quantidade, item.valor_total)
+
+    return pedido
+
+
+def _quantidades_por_produto(pedido):
+    """Soma as quantidades dos itens do pedido por produto (uma consulta)"""
+    return dict(
+        pedido.itens.order_by().values('produto').annotate(
+            total=models.Sum('quantidade')
+        ).values_list('produto', 'total')
+    )
+
+
+def _trocar_status(pedido, origem, novo_status, **campos):
+    """
+    UPDATE condicional: só altera o pedido se ele ainda satisfizer `origem`
+    (filtros sobre o status atual). Retorna True se a linha foi alterada.
+    """
+    atualizados = Pedido.objects.filter(pk=pedido.pk).filter(origem).update(
+        status=novo_status, data_atualizacao=timezone.now(), **campos
+    )
+    if atualizados:
+        transaction.on_commit(lambda: Cliente.invalidar_resumo(pedido.cliente_id))
+        pedido.status = novo_status
+        for campo, valor in campos.items():
+            setattr(pedido, campo, valor)
+    return bool(atualizados)
+
+
+def confirmar_pedido(pedido, usuario):
+    """
+    Confirma um pedido pendente retirando todos os itens do estoque na mesma
+    transação (saída/venda). Falta de saldo em qualquer produto desfaz tudo.
+
+    A troca de status é o primeiro comando da transação: o UPDATE condicional
+    bloqueia a linha do pedido e impede que duas confirmações simultâneas
+    baixem o estoque duas vezes.
+    """
+    with transaction.atomic():
+        confirmado = _trocar_status(
+            pedido, models.Q(status__in=Pedido.origens_permitidas('confirmado')), 'confirmado',
+            estoque_baixado=True
+        )
+        if not confirmado:
+            raise TransicaoInvalidaError('Apenas pedidos pendentes podem ser confirmados')
+
+        movimentar_em_lote(
+            _quantidades_por_produto(pedido),
+            tipo='saida',
+            motivo='venda',
+            usuario=usuario,
+            observacoes=f'Pedido {pedido.numero_pedido}'
+        )
+    return pedido
+
+
+def cancelar_pedido(pedido, usuario):
+    """
+    Cancela o pedido e, se a confirmação já havia baixado o estoque, devolve
+    os itens (entrada/devolução) na mesma transação.
+    """
+    cancelavel = models.Q(status__in=Pedido.origens_permitidas('cancelado'))
+
+    with transaction.atomic():
+        devolver = _trocar_status(
+            pedido, cancelavel & models.Q(estoque_baixado=True), 'cancelado', estoque_baixado=False
+        )
+        if not devolver and not _trocar_status(pedido, cancelavel, 'cancelado'):
+            raise TransicaoInvalidaError('Pedido não pode ser cancelado')
+
+        if devolver:
+            movimentar_em_lote(
+                _quantidades_por_produto(pedido),
+                tipo='entrada',
+                motivo='devolucao',
+                usuario=usuario,
+                observacoes=f'Cancelamento do pedido {pedido.numero_pedido}'
+            )
+    return pedido
+
+
+# Transições com efeitos colaterais (estoque) passam pelo serviço específico
+_TRANSICOES_COM_SERVICO = {
+    'confirmado': confirmar_pedido,
+    'cancelado': cancelar_pedido,
+}
+
+
+def transicionar_pedidos_em_lote(ids, novo_status, usuario):
+    """
+    Move vários pedidos para `novo_status` validando a máquina de estados.
+
+    Os status atuais são lidos em uma consulta; os pedidos válidos são
+    agrupados pelo status de origem e cada grupo é alterado por um único
+    UPDATE condicional (WHERE status = origem), de modo que um pedido movido
+    por outra operação no meio do caminho não é sobrescrito. Confirmação e
+    cancelamento, que movimentam estoque, são aplicados pedido a pedido pelos
+    serviços correspondentes.
+
+    Retorna um dict id -> {'sucesso', 'status_anterior', 'erro'}.
+    """
+    ids = list(dict.fromkeys(ids))
+    pedidos = Pedido.objects.only('status', 'numero_pedido', 'estoque_baixado', 'cliente').in_bulk(ids)
+    resultados = {}
+    grupos = {}
+
+    for pk in ids:
+        origem = pedidos[pk].status if pk in pedidos else None
+        if origem is None:
+            resultados[pk] = {'sucesso': False, 'status_anterior': None, 'erro': 'Pedido não encontrado'}
+        elif novo_status not in Pedido.TRANSICOES[origem]:
+            resultados[pk] = {
+                'sucesso': False,
+                'status_anterior': origem,
+                'erro': f'Transição de {origem} para {novo_status} não permitida',
+            }
+        else:
+            grupos.setdefault(origem, []).append(pk)
+
+    servico = _TRANSICOES_COM_SERVICO.get(novo_status)
+    if servico:
+        for origem, pks in grupos.items():
+            for pk in pks:
+                try:
+                    servico(pedidos[pk], usuario)
+                    resultados[pk] = {'sucesso': True, 'status_anterior': origem, 'erro': None}
+                except ValueError as e:
+                    resultados[pk] = {'sucesso': False, 'status_anterior': origem, 'erro': str(e)}
+        return resultados
+
+    agora = timezone.now()
+    campos = {'status': novo_status, 'data_atualizacao': agora}
+    if novo_status == 'entregue':
+        campos['data_entrega_realizada'] = timezone.localdate()
+
+    clientes = set()
+    for origem, pks in grupos.items():
+        atualizados = Pedido.objects.filter(pk__in=pks, status=origem).update(**campos)
+        if atualizados:
+            clientes.update(pedidos[pk].cliente_id for pk in pks)
+        alterados = set(pks)
+        if atualizados != len(pks):
+            # Alguns pedidos mudaram de status entre a leitura e o UPDATE
+            alterados = set(Pedido.objects.filter(
+                pk__in=pks, status=novo_status, data_atualizacao=agora
+            ).values_list('pk', flat=True))
+        for pk in pks:
+            resultados[pk] = {
+                'sucesso': pk in alterados,
+                'status_anterior': origem,
+                'erro': None if pk in alterados else 'O status do pedido foi alterado por outra operação',
+            }
+    if clientes:
+        transaction.on_commit(lambda: Cliente.invalidar_resumo(*clientes))
+
+    return resultados
+
+
+def _soma_itens(campo, output_field):
+    """Subconsulta correlacionada com a soma de `campo` dos itens do pedido"""
+    soma = ItemPedido.objects.filter(
+        pedido=models.OuterRef('pk')
+    ).order_by().values('pedido').annotate(total=models.Sum(campo)).values('total')
+    return Coalesce(models.Subquery(soma), models.Value(0), output_field=output_field)
+
+
+def recalcular_totais_pedidos(pedidos=None, corrigir=True):
+    """
+    Recalcula quantidade_itens, valor_subtotal e valor_total dos pedidos em
+    SQL (subconsultas correlacionadas), sem carregar itens em memória.
+
+    Retorna a quantidade de pedidos cujos totais armazenados divergiam; com
+    `corrigir=True` eles são atualizados em um único UPDATE.
+    """
+    pedidos = Pedido.objects.all() if pedidos is None else pedidos
+    quantidade = _soma_itens('quantidade', models.PositiveIntegerField())
+    subtotal = _soma_itens('valor_total', models.DecimalField(max_digits=10, decimal_places=2))
+    total = models.ExpressionWrapper(
+        subtotal - models.F('valor_desconto') + models.F('valor_frete'),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2)
+    )
+
+    divergentes = pedidos.annotate(
+        quantidade_calculada=quantidade,
+        subtotal_calculado=subtotal,
+        total_calculado=total,
+    ).exclude(
+        quantidade_itens=models.F('quantidade_calculada'),
+        valor_subtotal=models.F('subtotal_calculado'),
+        valor_total=models.F('total_calculado'),
+    )
+    total_divergentes = divergentes.count()
+
+    if corrigir and total_divergentes:
+        clientes = set(divergentes.values_list('cliente_id', flat=True))
+        Pedido.objects.filter(pk__in=divergentes.values('pk')).update(
+            quantidade_itens=quantidade,
+            valor_subtotal=subtotal,
+            valor_total=total,
+            data_atualizacao=timezone.now(),
+        )
+        transaction.on_commit(lambda: Cliente.invalidar_resumo(*clientes))
+    return total_divergentes
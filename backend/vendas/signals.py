@@ -0,0 +1,21 @@
+"""Totais do pedido ao excluir itens e invalidação do resumo de clientes em cache."""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from clientes.models import Cliente
+from .models import Pedido, ItemPedido
+
+
+@receiver(post_delete, sender=ItemPedido)
+def subtrair_item_do_pedido(sender, instance, **kwargs):
+    """Remove a contribuição do item excluído dos totais do pedido"""
+    instance._aplicar_delta(-instance.quantidade, -instance.valor_total)
+
+
+@receiver(post_save, sender=Pedido)
+@receiver(post_delete, sender=Pedido)
+def invalidar_resumo_do_cliente(sender, instance, **kwargs):
+    """O resumo em cache do cliente do pedido (e do anterior, se foi trocado) deixa de valer"""
+    clientes = {instance.cliente_id, getattr(instance, '_cliente_original', None)}
+    instance._cliente_original = instance.cliente_id
+    transaction.on_commit(lambda: Cliente.invalidar_resumo(*clientes))
@@ -1,3 +1,547 @@
-from django.test import TestCase
+import io
+from decimal import Decimal
+from unittest import mock
+from django.db import connection
+from concurrent.futures import ThreadPoolExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from openpyxl import load_workbook
+from rest_framework.test import APIClient
+from usuarios.models import Usuario
+from auditoria.models import LogAuditoria
+from clientes.models import Cliente
+from produtos.models import Categoria, Produto
+from estoque.models import Estoque, MovimentacaoEstoque
+from estoque.services import EstoqueInsuficienteError
+from .models import Pedido, ItemPedido
+from .serializers import PedidoCreateSerializer
+from .services import (
+    criar_pedido_com_itens,
+    recalcular_totais_pedidos,
+    confirmar_pedido,
+    cancelar_pedido,
+    transicionar_pedidos_em_lote,
+    TransicaoInvalidaError,
+)
 
-# Create your tests here.
+
+class PedidoTestMixin:
+    """Dados básicos compartilhados pelos testes de vendas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.criar_dados()
+
+    @classmethod
+    def criar_dados(cls):
+        cls.vendedor = Usuario.objects.create(username='vendedor')
+        cls.cliente = Cliente.objects.create(
+            nome_completo='Cliente Teste',
+            cpf_cnpj='123.456.789-01',
+            email='cliente@email.com',
+            telefone='11999999999',
+            endereco='Rua A',
+            bairro='Centro',
+            cidade='São Paulo',
+            estado='SP',
+            cep='01310-100',
+        )
+        cls.categoria = Categoria.objects.create(nome='Geral')
+        cls.produtos = [
+            Produto.objects.create(
+                codigo=f'P{i:03d}',
+                nome=f'Produto {i}',
+                categoria=cls.categoria,
+                preco_custo=Decimal('10.00'),
+                preco_venda=Decimal('15.00'),
+            )
+            for i in range(50)
+        ]
+        Estoque.objects.bulk_create([
+            Estoque(produto=produto, quantidade_atual=100) for produto in cls.produtos
+        ])
+
+    def itens(self, n, quantidade=2):
+        return [
+            {'produto': produto, 'quantidade': quantidade, 'preco_unitario': produto.preco_venda}
+            for produto in self.produtos[:n]
+        ]
+
+
+class CriarPedidoComItensTest(PedidoTestMixin, TestCase):
+
+    def test_calcula_totais_em_memoria(self):
+        pedido = criar_pedido_com_itens(
+            self.itens(3),
+            cliente=self.cliente,
+            vendedor=self.vendedor,
+            forma_pagamento='pix',
+            valor_frete=Decimal('5.00'),
+        )
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.itens.count(), 3)
+        self.assertEqual(pedido.valor_subtotal, Decimal('90.00'))
+        self.assertEqual(pedido.valor_total, Decimal('95.00'))
+
+    def test_consultas_nao_crescem_com_itens(self):
+        dados = {'cliente': self.cliente, 'vendedor': self.vendedor, 'forma_pagamento': 'pix'}
+        criar_pedido_com_itens(self.itens(1), **dados)  # cria o contador do mês
+        with CaptureQueriesContext(connection) as um_item:
+            criar_pedido_com_itens(self.itens(1), **dados)
+        with CaptureQueriesContext(connection) as cinquenta_itens:
+            criar_pedido_com_itens(self.itens(50), **dados)
+        self.assertEqual(len(um_item), len(cinquenta_itens))
+        self.assertEqual(Pedido.objects.count(), 3)
+
+
+class NumeracaoPedidoConcorrenteTest(PedidoTestMixin, TransactionTestCase):
+    """Criação paralela de pedidos não pode repetir numero_pedido"""
+
+    PARALELOS = 200
+
+    def setUp(self):
+        self.criar_dados()
+
+    def test_pedidos_paralelos_sem_colisao(self):
+        dados = {'cliente': self.cliente, 'vendedor': self.vendedor, 'forma_pagamento': 'pix'}
+
+        def criar(_):
+            try:
+                return criar_pedido_com_itens(self.itens(2), **dados).numero_pedido
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            numeros = list(executor.map(criar, range(self.PARALELOS)))
+
+        self.assertEqual(len(set(numeros)), self.PARALELOS)
+        self.assertEqual(Pedido.objects.count(), self.PARALELOS)
+
+
+class TotaisIncrementaisTest(PedidoTestMixin, TestCase):
+    """quantidade_itens e valores são mantidos por delta a cada alteração de item"""
+
+    def setUp(self):
+        self.pedido = criar_pedido_com_itens(
+            self.itens(2), cliente=self.cliente, vendedor=self.vendedor, forma_pagamento='pix'
+        )
+
+    def assertTotais(self, quantidade, subtotal):
+        pedido = Pedido.objects.get(pk=self.pedido.pk)
+        self.assertEqual(pedido.quantidade_itens, quantidade)
+        self.assertEqual(pedido.valor_subtotal, Decimal(subtotal))
+        self.assertEqual(pedido.valor_total, Decimal(subtotal))
+
+    def test_incluir_alterar_e_excluir_item(self):
+        self.assertTotais(4, '60.00')
+
+        item = ItemPedido.objects.create(
+            pedido=self.pedido, produto=self.produtos[10], quantidade=1, preco_unitario=Decimal('15.00')
+        )
+        self.assertTotais(5, '75.00')
+
+        item = ItemPedido.objects.get(pk=item.pk)
+        item.quantidade = 3
+        item.save()
+        self.assertTotais(7, '105.00')
+
+        item.delete()
+        self.assertTotais(4, '60.00')
+
+        self.pedido.itens.all().delete()
+        self.assertTotais(0, '0.00')
+
+    def test_uma_invalidacao_de_resumo_por_transacao(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for produto in self.produtos[10:15]:
+                ItemPedido.objects.create(
+                    pedido=self.pedido, produto=produto, quantidade=1, preco_unitario=Decimal('15.00')
+                )
+            for item in self.pedido.itens.all():
+                item.quantidade += 1
+                item.save()
+        self.assertEqual(len(callbacks), 1)
+        # Cliente vindo do pedido em memória: nada a reler no commit
+        with self.assertNumQueries(0), mock.patch.object(Cliente, 'invalidar_resumo') as invalidar:
+            callbacks[0]()
+        invalidar.assert_called_once_with(self.cliente.pk)
+
+        # Exclusão em massa: itens sem o pedido em memória, cliente lido uma vez no commit
+        with self.captureOnCommitCallbacks() as callbacks:
+            ItemPedido.objects.filter(pedido=self.pedido).delete()
+        self.assertEqual(len(callbacks), 1)
+        with self.assertNumQueries(1), mock.patch.object(Cliente, 'invalidar_resumo') as invalidar:
+            callbacks[0]()
+        invalidar.assert_called_once_with(self.cliente.pk)
+
+    def test_recalcular_corrige_divergencias(self):
+        Pedido.objects.filter(pk=self.pedido.pk).update(quantidade_itens=99, valor_subtotal=1)
+        self.assertEqual(recalcular_totais_pedidos(corrigir=False), 1)
+        self.assertEqual(recalcular_totais_pedidos(), 1)
+        self.assertTotais(4, '60.00')
+        self.assertEqual(recalcular_totais_pedidos(), 0)
+
+
+class ValidacaoItensEmLoteTest(PedidoTestMixin, TestCase):
+    """Produtos dos itens são validados a partir de uma única consulta"""
+
+    def payload(self, itens):
+        return {'cliente': self.cliente.pk, 'forma_pagamento': 'pix', 'itens': itens}
+
+    def itens_payload(self, n, quantidade=1):
+        return [{'produto': p.pk, 'quantidade': quantidade} for p in self.produtos[:n]]
+
+    def test_consultas_constantes_por_quantidade_de_itens(self):
+        with CaptureQueriesContext(connection) as um_item:
+            self.assertTrue(PedidoCreateSerializer(data=self.payload(self.itens_payload(1))).is_valid())
+        with CaptureQueriesContext(connection) as cinquenta_itens:
+            serializer = PedidoCreateSerializer(data=self.payload(self.itens_payload(50)))
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(len(um_item), len(cinquenta_itens))
+        self.assertEqual(serializer.validated_data['itens'][0]['preco_unitario'], Decimal('15.00'))
+
+    def test_rejeita_produto_inexistente_inativo_e_preco_divergente(self):
+        Produto.objects.filter(pk=self.produtos[1].pk).update(status='inativo')
+        itens = [
+            {'produto': 999999, 'quantidade': 1},
+            {'produto': self.produtos[1].pk, 'quantidade': 1},
+            {'produto': self.produtos[2].pk, 'quantidade': 1, 'preco_unitario': '1.00'},
+        ]
+        serializer = PedidoCreateSerializer(data=self.payload(itens))
+        self.assertFalse(serializer.is_valid())
+        erros = serializer.errors['itens']
+        self.assertIn('produto', erros[0])
+        self.assertIn('produto', erros[1])
+        self.assertIn('preco_unitario', erros[2])
+
+    def test_rejeita_estoque_insuficiente_somando_linhas(self):
+        produto = self.produtos[0].pk
+        itens = [{'produto': produto, 'quantidade': 60}, {'produto': produto, 'quantidade': 50}]
+        serializer = PedidoCreateSerializer(data=self.payload(itens))
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('Estoque insuficiente', str(serializer.errors['itens']))
+
+
+class ReservaEstoqueTest(PedidoTestMixin, TestCase):
+    """Confirmação baixa o estoque de todos os itens; cancelamento devolve"""
+
+    def setUp(self):
+        itens = self.itens(3, quantidade=10) + self.itens(1, quantidade=5)
+        self.pedido = criar_pedido_com_itens(
+            itens, cliente=self.cliente, vendedor=self.vendedor, forma_pagamento='pix'
+        )
+
+    def saldo(self, produto):
+        return Estoque.objects.get(produto=produto).quantidade_atual
+
+    def test_confirmar_e_cancelar(self):
+        confirmar_pedido(self.pedido, self.vendedor)
+        self.assertEqual(self.saldo(self.produtos[0]), 85)
+        self.assertEqual(self.saldo(self.produtos[1]), 90)
+        saida = MovimentacaoEstoque.objects.get(produto=self.produtos[0], tipo='saida')
+        self.assertEqual((saida.motivo, saida.quantidade_anterior, saida.quantidade_posterior), ('venda', 100, 85))
+
+        with self.assertRaises(TransicaoInvalidaError):
+            confirmar_pedido(self.pedido, self.vendedor)
+
+        cancelar_pedido(self.pedido, self.vendedor)
+        self.assertEqual(self.saldo(self.produtos[0]), 100)
+        self.assertEqual(MovimentacaoEstoque.objects.filter(tipo='entrada', motivo='devolucao').count(), 3)
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.status, 'cancelado')
+        self.assertFalse(self.pedido.estoque_baixado)
+
+    def test_falta_de_saldo_desfaz_tudo(self):
+        Estoque.objects.filter(produto=self.produtos[2]).update(quantidade_atual=3)
+        with self.assertRaises(EstoqueInsuficienteError) as ctx:
+            confirmar_pedido(self.pedido, self.vendedor)
+        self.assertEqual(ctx.exception.faltas, {self.produtos[2].pk: (3, 10)})
+        self.assertEqual(self.saldo(self.produtos[0]), 100)
+        self.assertFalse(MovimentacaoEstoque.objects.exists())
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.status, 'pendente')
+
+
+class ReservaEstoqueConcorrenteTest(PedidoTestMixin, TransactionTestCase):
+    """Confirmações paralelas no mesmo SKU nunca deixam o saldo negativo"""
+
+    def setUp(self):
+        self.criar_dados()
+        Estoque.objects.filter(produto=self.produtos[0]).update(quantidade_atual=50)
+
+    def test_confirmacoes_paralelas_sem_venda_a_descoberto(self):
+        pedidos = [
+            criar_pedido_com_itens(
+                self.itens(1, quantidade=3), cliente=self.cliente, vendedor=self.vendedor, forma_pagamento='pix'
+            )
+            for _ in range(40)
+        ]
+
+        def confirmar(pedido):
+            try:
+                confirmar_pedido(pedido, self.vendedor)
+                return True
+            except EstoqueInsuficienteError:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            confirmados = sum(executor.map(confirmar, pedidos))
+
+        self.assertEqual(confirmados, 16)
+        self.assertEqual(Estoque.objects.get(produto=self.produtos[0]).quantidade_atual, 2)
+        self.assertEqual(Pedido.objects.filter(status='confirmado').count(), 16)
+
+
+class TransicaoEmLoteTest(PedidoTestMixin, TestCase):
+    """Transição de status de vários pedidos com um UPDATE por status de origem"""
+
+    def setUp(self):
+        self.pedidos = [
+            criar_pedido_com_itens(
+                self.itens(1), cliente=self.cliente, vendedor=self.vendedor, forma_pagamento='pix'
+            )
+            for _ in range(6)
+        ]
+        Pedido.objects.filter(pk__in=[p.pk for p in self.pedidos[:4]]).update(status='confirmado')
+        Pedido.objects.filter(pk=self.pedidos[4].pk).update(status='em_separacao')
+
+    def test_um_update_por_status_de_origem(self):
+        ids = [p.pk for p in self.pedidos] + [999999]
+        # Leitura dos status + um UPDATE para o único grupo válido (confirmado)
+        with self.assertNumQueries(2):
+            resultados = transicionar_pedidos_em_lote(ids, 'em_separacao', self.vendedor)
+
+        sucessos = [pk for pk, r in resultados.items() if r['sucesso']]
+        self.assertEqual(sucessos, [p.pk for p in self.pedidos[:4]])
+        self.assertIn('não permitida', resultados[self.pedidos[4].pk]['erro'])
+        self.assertIn('não permitida', resultados[self.pedidos[5].pk]['erro'])
+        self.assertEqual(resultados[999999]['erro'], 'Pedido não encontrado')
+        self.assertEqual(Pedido.objects.filter(status='em_separacao').count(), 5)
+
+    def test_confirmacao_em_lote_baixa_estoque(self):
+        resultados = transicionar_pedidos_em_lote([self.pedidos[5].pk], 'confirmado', self.vendedor)
+        self.assertTrue(resultados[self.pedidos[5].pk]['sucesso'])
+        self.assertEqual(Estoque.objects.get(produto=self.produtos[0]).quantidade_atual, 98)
+
+    def test_endpoint(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.vendedor)
+        resposta = cliente.post(
+            '/api/pedidos/transicionar/',
+            {'ids': [self.pedidos[0].pk, self.pedidos[5].pk], 'status': 'em_separacao'},
+            format='json'
+        )
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual((resposta.data['sucessos'], resposta.data['falhas']), (1, 1))
+
+        resposta = cliente.patch(f'/api/pedidos/{self.pedidos[5].pk}/', {'status': 'enviado'}, format='json')
+        self.assertEqual(resposta.status_code, 400)
+
+
+class PaginacaoCursorTest(PedidoTestMixin, TestCase):
+    """?paginacao=cursor pagina pedidos por keyset, sem COUNT(*)"""
+
+    def test_percorre_todas_as_paginas(self):
+        for _ in range(25):
+            criar_pedido_com_itens(
+                self.itens(1), cliente=self.cliente, vendedor=self.vendedor, forma_pagamento='pix'
+            )
+        cliente = APIClient()
+        cliente.force_authenticate(self.vendedor)
+
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = cliente.get('/api/pedidos/', {'paginacao': 'cursor'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotIn('count', resposta.data)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in consultas.captured_queries))
+
+        vistos = [p['id'] for p in resposta.data['results']]
+        resposta = cliente.get(resposta.data['next'])
+        vistos += [p['id'] for p in resposta.data['results']]
+        self.assertIsNone(resposta.data['next'])
+        self.assertEqual(sorted(vistos), sorted(Pedido.objects.values_list('pk', flat=True)))
+
+        # Sem o parâmetro, a paginação por página continua igual
+        self.assertEqual(cliente.get('/api/pedidos/').data['count'], 25)
+
+    def test_ordenacao_por_coluna_com_empates(self):
+        for _ in range(25):
+            criar_pedido_com_itens(
+                self.itens(1), cliente=self.cliente, vendedor=self.vendedor, forma_pagamento='pix'
+            )
+        cliente = APIClient()
+        cliente.force_authenticate(self.vendedor)
+
+        # Todos com o mesmo valor_total: a chave primária desempata
+        vistos = []
+        resposta = cliente.get('/api/pedidos/', {'paginacao': 'cursor', 'ordering': '-valor_total'})
+        while True:
+            vistos += [p['id'] for p in resposta.data['results']]
+            if resposta.data['next'] is None:
+                break
+            resposta = cliente.get(resposta.data['next'])
+        self.assertEqual(vistos, sorted(Pedido.objects.values_list('pk', flat=True), reverse=True))
+
+
+class ExportacaoPedidosTest(PedidoTestMixin, TestCase):
+    """?export=csv|xlsx exporta a listagem filtrada em streaming"""
+
+    def setUp(self):
+        super().setUp()
+        for forma_pagamento in ['pix', 'pix', 'boleto']:
+            criar_pedido_com_itens(
+                self.itens(2), cliente=self.cliente, vendedor=self.vendedor, forma_pagamento=forma_pagamento
+            )
+        self.api = APIClient()
+        self.api.force_authenticate(self.vendedor)
+
+    def test_csv_respeita_filtros(self):
+        resposta = self.api.get('/api/pedidos/', {'export': 'csv', 'forma_pagamento': 'pix'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.streaming)
+        self.assertIn('attachment;', resposta['Content-Disposition'])
+
+        linhas = b''.join(resposta.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(linhas[0].split(',')[0], 'Número')
+        self.assertEqual(len(linhas), 3)
+        self.assertIn('Pendente', linhas[1])
+        self.assertIn('60.00', linhas[1])
+
+    def test_xlsx(self):
+        resposta = self.api.get('/api/pedidos/', {'export': 'xlsx'})
+        self.assertEqual(resposta.status_code, 200)
+
+        planilha = load_workbook(io.BytesIO(b''.join(resposta.streaming_content))).active
+        linhas = list(planilha.values)
+        self.assertEqual(len(linhas), 4)
+        self.assertEqual(linhas[0][0], 'Número')
+        self.assertEqual(
+            sorted(linha[0] for linha in linhas[1:]),
+            sorted(Pedido.objects.values_list('numero_pedido', flat=True))
+        )
+
+    def test_formato_invalido(self):
+        resposta = self.api.get('/api/pedidos/', {'export': 'pdf'})
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_texto_com_formula_sai_como_texto(self):
+        Cliente.objects.filter(pk=self.cliente.pk).update(nome_completo='=HYPERLINK("http://x","y")')
+        resposta = self.api.get('/api/pedidos/', {'export': 'csv'})
+        linhas = b''.join(resposta.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertIn('"\'=HYPERLINK(""http://x"",""y"")"', linhas[1])
+
+        resposta = self.api.get('/api/pedidos/', {'export': 'xlsx'})
+        planilha = load_workbook(io.BytesIO(b''.join(resposta.streaming_content))).active
+        self.assertEqual(list(planilha.values)[1][2], '\'=HYPERLINK("http://x","y")')
+
+    def test_tabulacao_e_retorno_no_inicio_saem_como_texto(self):
+        for prefixo in ('\t', '\r'):
+            Cliente.objects.filter(pk=self.cliente.pk).update(nome_completo=f'{prefixo}=1+1')
+            resposta = self.api.get('/api/pedidos/', {'export': 'xlsx'})
+            planilha = load_workbook(io.BytesIO(b''.join(resposta.streaming_content))).active
+            # O XML do xlsx normaliza \r em \n na leitura: basta o apóstrofo na frente
+            self.assertTrue(list(planilha.values)[1][2].startswith("'"))
+
+            resposta = self.api.get('/api/pedidos/', {'export': 'csv'})
+            conteudo = b''.join(resposta.streaming_content).decode('utf-8-sig')
+            self.assertIn(f"'{prefixo}=1+1", conteudo)
+
+    def test_exportacao_sem_get_condicional(self):
+        for _ in range(2):
+            resposta = self.api.get('/api/pedidos/', {'export': 'csv'}, HTTP_IF_NONE_MATCH='*')
+            self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(LogAuditoria.objects.filter(acao='exportar').count(), 2)
+
+
+class GetCondicionalTest(PedidoTestMixin, TestCase):
+    """ETag/Last-Modified: 304 sem serializar quando nada mudou"""
+
+    def setUp(self):
+        super().setUp()
+        self.pedido = criar_pedido_com_itens(
+            self.itens(2), cliente=self.cliente, vendedor=self.vendedor, forma_pagamento='pix'
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.vendedor)
+
+    def test_detalhe(self):
+        url = f'/api/pedidos/{self.pedido.pk}/'
+        resposta = self.api.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        etag = resposta['ETag']
+        self.assertIn('Last-Modified', resposta)
+
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.api.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 304)
+        self.assertEqual(len(consultas), 1)
+
+        confirmar_pedido(self.pedido, self.vendedor)
+        resposta = self.api.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['status'], 'confirmado')
+        self.assertNotEqual(resposta['ETag'], etag)
+
+    def test_listagem(self):
+        resposta = self.api.get('/api/pedidos/')
+        etag = resposta['ETag']
+        self.assertNotIn('Last-Modified', resposta)
+        self.assertEqual(self.api.get('/api/pedidos/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Outros filtros/páginas têm ETag próprio
+        self.assertEqual(
+            self.api.get('/api/pedidos/', {'status': 'pendente'}, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+        # Exclusão muda a contagem mesmo sem mudar o timestamp máximo
+        outro = criar_pedido_com_itens(
+            self.itens(1), cliente=self.cliente, vendedor=self.vendedor, forma_pagamento='pix'
+        )
+        etag = self.api.get('/api/pedidos/')['ETag']
+        Pedido.objects.filter(pk=outro.pk).delete()
+        self.assertEqual(self.api.get('/api/pedidos/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # If-Modified-Since sozinho não revalida listagens (exclusões não mudam o timestamp)
+        self.assertEqual(
+            self.api.get('/api/pedidos/', HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT').status_code, 200
+        )
+
+
+class ConsultasDetalhePedidoTest(PedidoTestMixin, TestCase):
+    """Situação de estoque dos itens vem do prefetch anotado, sem N+1"""
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.vendedor)
+
+    def test_detalhe_com_muitos_itens(self):
+        pedido = criar_pedido_com_itens(
+            self.itens(30), cliente=self.cliente, vendedor=self.vendedor, forma_pagamento='pix'
+        )
+        # Sonda do GET condicional, pedido, itens e produtos anotados
+        with self.assertNumQueries(4):
+            resposta = self.api.get(f'/api/pedidos/{pedido.pk}/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.data['itens']), 30)
+        self.assertEqual(
+            {item['produto_detail']['situacao_estoque'] for item in resposta.data['itens']}, {'disponivel'}
+        )
+
+    def test_criacao_retorna_situacao_sem_n_mais_1(self):
+        dados = {
+            'cliente': self.cliente.pk,
+            'forma_pagamento': 'pix',
+            'itens': [{'produto': produto.pk, 'quantidade': 1} for produto in self.produtos[:10]],
+        }
+        poucos_itens = {**dados, 'itens': dados['itens'][:2]}
+        self.api.post('/api/pedidos/', poucos_itens, format='json')  # sequência já inicializada
+        with CaptureQueriesContext(connection) as poucos:
+            self.api.post('/api/pedidos/', poucos_itens, format='json')
+        with CaptureQueriesContext(connection) as muitos:
+            resposta = self.api.post('/api/pedidos/', dados, format='json')
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(len(muitos), len(poucos))
+        self.assertEqual(resposta.data['itens'][0]['produto_detail']['situacao_estoque'], 'disponivel')
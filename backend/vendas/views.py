@@ -4,22 +4,30 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db import models
+from config.condicional import GetCondicionalMixin
+from config.exportacao import ExportacaoMixin
+from estoque.services import EstoqueInsuficienteError, prefetch_situacao_estoque
 from .models import Pedido, ItemPedido
+from .services import (
+    confirmar_pedido,
+    cancelar_pedido,
+    transicionar_pedidos_em_lote,
+    TransicaoInvalidaError
+)
 from .serializers import (
     PedidoSerializer,
     PedidoCreateSerializer,
     PedidoListSerializer,
-    ItemPedidoSerializer
+    ItemPedidoSerializer,
+    TransicaoLoteSerializer
 )
 
 
-class PedidoViewSet(viewsets.ModelViewSet):
+class PedidoViewSet(ExportacaoMixin, GetCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para operações CRUD de Pedido.
     """
-    queryset = Pedido.objects.select_related(
-        'cliente', 'vendedor'
-    ).prefetch_related('itens__produto').all()
+    queryset = Pedido.objects.select_related('cliente', 'vendedor').all()
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     
@@ -27,6 +35,31 @@ class PedidoViewSet(viewsets.ModelViewSet):
     search_fields = ['numero_pedido', 'cliente__nome_completo', 'observacoes']
     ordering_fields = ['data_pedido', 'valor_total', 'status']
     ordering = ['-data_pedido']
+    paginacao_cursor = True  # ?paginacao=cursor usa o índice (-data_pedido)
+    
+    nome_exportacao = 'pedidos'
+    colunas_exportacao = [
+        ('numero_pedido', 'Número'),
+        ('data_pedido', 'Data'),
+        ('cliente__nome_completo', 'Cliente'),
+        ('vendedor__username', 'Vendedor'),
+        ('status', 'Status'),
+        ('forma_pagamento', 'Forma de Pagamento'),
+        ('quantidade_itens', 'Itens'),
+        ('valor_subtotal', 'Subtotal'),
+        ('valor_desconto', 'Desconto'),
+        ('valor_frete', 'Frete'),
+        ('valor_total', 'Total'),
+    ]
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            # Totais e quantidade de itens são colunas do pedido; os itens só
+            # são carregados quando a representação completa é necessária,
+            # com o produto já anotado para a situação de estoque
+            queryset = queryset.prefetch_related(prefetch_situacao_estoque('itens__produto'))
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -35,6 +68,16 @@ class PedidoViewSet(viewsets.ModelViewSet):
             return PedidoListSerializer
         return PedidoSerializer
     
+    def create(self, request, *args, **kwargs):
+        """Cria o pedido em lote e retorna a representação completa"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        
+        pedido = self.get_queryset().get(pk=serializer.instance.pk)
+        output = PedidoSerializer(pedido, context=self.get_serializer_context())
+        return Response(output.data, status=status.HTTP_201_CREATED)
+    
     def perform_create(self, serializer):
         """Adiciona o vendedor automaticamente se não informado"""
         if 'vendedor' not in serializer.validated_data:
@@ -46,34 +89,57 @@ class PedidoViewSet(viewsets.ModelViewSet):
     def confirmar(self, request, pk=None):
         """Confirma o pedido"""
         pedido = self.get_object()
-        if pedido.status != 'pendente':
+        try:
+            confirmar_pedido(pedido, request.user)
+        except (TransicaoInvalidaError, EstoqueInsuficienteError) as e:
             return Response(
-                {'error': 'Apenas pedidos pendentes podem ser confirmados'},
+                {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        pedido.status = 'confirmado'
-        pedido.save()
         return Response({'status': 'Pedido confirmado'})
     
     @action(detail=True, methods=['post'])
     def cancelar(self, request, pk=None):
         """Cancela o pedido"""
         pedido = self.get_object()
-        if pedido.status in ['entregue', 'cancelado']:
+        try:
+            cancelar_pedido(pedido, request.user)
+        except TransicaoInvalidaError as e:
             return Response(
-                {'error': 'Pedido não pode ser cancelado'},
+                {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        pedido.status = 'cancelado'
-        pedido.save()
         return Response({'status': 'Pedido cancelado'})
 
+    
+    @action(detail=False, methods=['post'])
+    def transicionar(self, request):
+        """
+        Altera o status de vários pedidos de uma vez.
+        
+        Corpo: {"ids": [1, 2, 3], "status": "em_separacao"}
+        """
+        serializer = TransicaoLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        novo_status = serializer.validated_data['status']
+        
+        resultados = transicionar_pedidos_em_lote(
+            serializer.validated_data['ids'], novo_status, request.user
+        )
+        sucessos = sum(1 for resultado in resultados.values() if resultado['sucesso'])
+        return Response({
+            'status': novo_status,
+            'sucessos': sucessos,
+            'falhas': len(resultados) - sucessos,
+            'resultados': [{'id': pk, **resultado} for pk, resultado in resultados.items()],
+        })
+
 
 class ItemPedidoViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet read-only para ItemPedido (gerenciado via Pedido).
     """
-    queryset = ItemPedido.objects.select_related('pedido', 'produto').all()
+    queryset = ItemPedido.objects.select_related('pedido').prefetch_related(prefetch_situacao_estoque())
     serializer_class = ItemPedidoSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]